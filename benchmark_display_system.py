@@ -6,6 +6,7 @@ eMQTT-Bench 压测结果显示系统
 日期: 2025-01-27
 """
 
+import bisect
 import json
 import time
 import requests
@@ -15,9 +16,10 @@ from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import webbrowser
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import socketserver
 import argparse
+from urllib.parse import urlparse, parse_qs
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
@@ -34,6 +36,87 @@ import numpy as np
 
 console = Console()
 
+# 历史查询和报告趋势图最多绘制的点数
+DEFAULT_MAX_POINTS = 500
+# live/web 模式未指定 --history-file 时, 完整历史写入该目录
+DEFAULT_HISTORY_DIR = "reports"
+
+def _lttb_indices(xs: List[float], ys: List[float], threshold: int) -> List[int]:
+    """LTTB (Largest-Triangle-Three-Buckets) 降采样后保留的点的下标, 包含首尾点"""
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        return [0, n - 1][:max(threshold, 0)]
+    
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点, 作为三角形的第三个顶点
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / next_count
+        avg_y = sum(ys[next_start:next_end]) / next_count
+        
+        # 当前桶中与上一个选中点、下一个桶平均点构成最大三角形的点
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        max_area = -1.0
+        selected = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                selected = j
+        indices.append(selected)
+        a = selected
+    
+    indices.append(n - 1)
+    return indices
+
+def _minmax_indices(ys: List[float], threshold: int) -> List[int]:
+    """min/max 降采样后保留的点的下标, 每个桶保留最小值和最大值以保留尖峰"""
+    n = len(ys)
+    if threshold >= n:
+        return list(range(n))
+    
+    bucket_count = max(1, threshold // 2)
+    bucket_size = n / bucket_count
+    indices = []
+    for i in range(bucket_count):
+        start = int(i * bucket_size)
+        end = min(int((i + 1) * bucket_size), n)
+        if start >= end:
+            continue
+        bucket = range(start, end)
+        low = min(bucket, key=lambda j: ys[j])
+        high = max(bucket, key=lambda j: ys[j])
+        indices.extend(sorted({low, high}))
+    return indices
+
+def downsample(points: List[Tuple[float, float]], max_points: int = DEFAULT_MAX_POINTS,
+               method: str = "lttb") -> List[Tuple[float, float]]:
+    """对按时间升序的 (x, y) 点降采样, method 为 "lttb" 或 "minmax"
+
+    与 metrics/downsampling.py 的算法一致; 本脚本独立运行 (Docker 镜像只包含 metrics 目录), 因此不从该目录导入。
+    """
+    if len(points) <= max_points:
+        return list(points)
+    
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    if method == "minmax":
+        indices = _minmax_indices(ys, max_points)
+    else:
+        indices = _lttb_indices(xs, ys, max_points)
+    return [points[i] for i in indices]
+
+# 历史接口单次返回的最大点数
+MAX_HISTORY_POINTS = 5000
+
 @dataclass
 class BenchmarkMetrics:
     """压测指标数据结构"""
@@ -58,12 +141,24 @@ class TestConfig:
 class MetricsCollector:
     """指标收集器"""
     
-    def __init__(self, prometheus_ports: List[int]):
+    def __init__(self, prometheus_ports: List[int], history_file: Optional[str] = None):
         self.prometheus_ports = prometheus_ports
         self.session = requests.Session()
         self.session.timeout = 5
         self.metrics_history: List[BenchmarkMetrics] = []
         
+        # 完整历史按JSON Lines追加写入磁盘, 内存中只保留最近记录
+        self.history_file = Path(history_file) if history_file else None
+        if self.history_file:
+            self.history_file.parent.mkdir(parents=True, exist_ok=True)
+        self._history_lock = threading.Lock()
+        # 历史文件的 时间戳 -> 行起始字节偏移 索引, 查询时只读取时间窗口内的行
+        self._history_ts: List[float] = []
+        self._history_offsets: List[int] = []
+        self._history_size = 0  # 已建立索引的文件字节数
+        if self.history_file and self.history_file.exists():
+            self._index_history()
+        
     def collect_metrics(self, test_type: str = "conn") -> Optional[BenchmarkMetrics]:
         """收集当前指标数据"""
         try:
@@ -87,6 +182,7 @@ class MetricsCollector:
                 # 保持最近1000条记录
                 if len(self.metrics_history) > 1000:
                     self.metrics_history = self.metrics_history[-1000:]
+                self._append_history(metrics)
             
             return metrics
             
@@ -94,6 +190,107 @@ class MetricsCollector:
             console.print(f"[red]收集指标时出错: {e}[/red]")
             return None
     
+    def _append_history(self, metrics: BenchmarkMetrics):
+        """追加一条记录到磁盘历史文件, 同时更新时间索引"""
+        if not self.history_file:
+            return
+        line = (json.dumps(asdict(metrics), ensure_ascii=False) + '\n').encode('utf-8')
+        ts = datetime.fromisoformat(metrics.timestamp).timestamp()
+        with self._history_lock:
+            with open(self.history_file, 'ab') as f:
+                offset = f.seek(0, 2)
+                f.write(line)
+            if offset != self._history_size:
+                # 文件被其他进程追加过, 先补上这部分索引
+                self._index_history(limit=offset)
+            self._history_ts.append(ts)
+            self._history_offsets.append(offset)
+            self._history_size = offset + len(line)
+    
+    def _index_history(self, limit: Optional[int] = None):
+        """为历史文件中尚未建立索引的行建立时间索引 (调用方持有锁或在初始化时调用)"""
+        with open(self.history_file, 'rb') as f:
+            f.seek(self._history_size)
+            offset = self._history_size
+            for line in f:
+                if limit is not None and offset >= limit:
+                    break
+                try:
+                    ts = datetime.fromisoformat(json.loads(line)['timestamp']).timestamp()
+                except (ValueError, KeyError, TypeError):
+                    ts = None
+                if ts is not None:
+                    self._history_ts.append(ts)
+                    self._history_offsets.append(offset)
+                offset += len(line)
+        self._history_size = offset
+    
+    def load_history(self, start: Optional[float] = None, end: Optional[float] = None) -> List[Dict[str, Any]]:
+        """读取 [start, end] 时间范围内的完整历史
+
+        优先从磁盘历史文件读取: 按时间索引定位窗口对应的字节范围, 只解析窗口内的行,
+        解析时不持有追加锁。没有历史文件时退回内存中的最近记录。
+        """
+        if not (self.history_file and self.history_file.exists()):
+            return [record for record in (asdict(m) for m in self.metrics_history)
+                    if self._in_window(record, start, end)]
+        
+        # 索引只会追加, 记下当前长度后即可在锁外二分查找
+        with self._history_lock:
+            count = len(self._history_ts)
+            size = self._history_size
+        lo = 0 if start is None else bisect.bisect_left(self._history_ts, start, 0, count)
+        hi = count if end is None else bisect.bisect_right(self._history_ts, end, lo, count)
+        if lo >= hi:
+            return []
+        begin = self._history_offsets[lo]
+        stop = self._history_offsets[hi] if hi < count else size
+        
+        records = []
+        with open(self.history_file, 'rb') as f:
+            f.seek(begin)
+            for line in f.read(stop - begin).splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if self._in_window(record, start, end):
+                    records.append(record)
+        return records
+    
+    @staticmethod
+    def _in_window(record: Dict[str, Any], start: Optional[float], end: Optional[float]) -> bool:
+        if start is None and end is None:
+            return True
+        ts = datetime.fromisoformat(record['timestamp']).timestamp()
+        return (start is None or ts >= start) and (end is None or ts <= end)
+    
+    def get_history_series(self, start: Optional[float] = None, end: Optional[float] = None,
+                           max_points: int = DEFAULT_MAX_POINTS, method: str = "lttb") -> Dict[str, Any]:
+        """获取降采样后的历史时间序列
+
+        每个数值指标展开为 "类别.指标" 序列, 分别降采样到不超过 max_points 个点。
+        """
+        records = self.load_history(start, end)
+        series: Dict[str, List[Tuple[float, float]]] = {}
+        for record in records:
+            ts = datetime.fromisoformat(record['timestamp']).timestamp()
+            for section, values in record.items():
+                if not isinstance(values, dict):
+                    continue
+                for name, value in values.items():
+                    if isinstance(value, (int, float)):
+                        series.setdefault(f"{section}.{name}", []).append((ts, float(value)))
+        
+        return {
+            'from': start,
+            'to': end,
+            'total_points': len(records),
+            'max_points': max_points,
+            'method': method,
+            'series': {name: downsample(points, max_points, method) for name, points in series.items()}
+        }
+    
     def _parse_prometheus_metrics(self, metrics_text: str) -> Dict[str, float]:
         """解析Prometheus格式的指标"""
         metrics = {}
@@ -408,22 +605,135 @@ class RealTimeDisplay:
             'recommendation': recommendation
         }
 
+class MetricsSampler:
+    """后台指标采样器
+
+    单线程按固定间隔抓取一次指标并缓存快照, 所有浏览器连接共享该快照,
+    避免每个页面轮询都触发对压测端口的重新抓取。
+    """
+    
+    def __init__(self, collector: MetricsCollector, test_type: str = "conn", interval: float = 5.0):
+        self.collector = collector
+        self.test_type = test_type
+        self.interval = interval
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+        
+        # 最新快照及其版本号, 版本号每次数据变化时递增
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.version = 0
+        self.last_delta: Dict[str, Any] = {}
+        self._condition = threading.Condition()
+    
+    def start(self):
+        """启动采样线程"""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """停止采样线程并唤醒所有等待的订阅者"""
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+    
+    def _sample_loop(self):
+        """采样循环"""
+        while self.running:
+            started = time.monotonic()
+            try:
+                metrics = self.collector.collect_metrics(self.test_type)
+                if metrics:
+                    self._publish(asdict(metrics))
+            except Exception as e:
+                console.print(f"[red]后台采样出错: {e}[/red]")
+            
+            # 扣除采样耗时, 保持固定周期
+            elapsed = time.monotonic() - started
+            time.sleep(max(0.0, self.interval - elapsed))
+    
+    def _publish(self, snapshot: Dict[str, Any]):
+        """更新快照并通知订阅者"""
+        delta = self._compute_delta(self.snapshot, snapshot)
+        with self._condition:
+            self.snapshot = snapshot
+            self.last_delta = delta
+            self.version += 1
+            self._condition.notify_all()
+    
+    @staticmethod
+    def _compute_delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+        """计算两次快照之间变化的字段"""
+        if previous is None:
+            return current
+        
+        delta: Dict[str, Any] = {'timestamp': current.get('timestamp')}
+        for key, value in current.items():
+            if key == 'timestamp':
+                continue
+            old_value = previous.get(key)
+            if isinstance(value, dict) and isinstance(old_value, dict):
+                changed = {k: v for k, v in value.items() if old_value.get(k) != v}
+                if changed:
+                    delta[key] = changed
+            elif old_value != value:
+                delta[key] = value
+        return delta
+    
+    def get_snapshot(self) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """获取当前快照及版本号"""
+        with self._condition:
+            return self.version, self.snapshot
+    
+    def wait_for_update(self, last_version: int, timeout: float) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """等待新版本数据, 返回 (版本号, 增量)
+
+        若订阅者落后超过一个版本, 返回完整快照以保证客户端状态一致。
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != last_version or not self.running, timeout=timeout)
+            if self.version == last_version:
+                return last_version, None
+            if self.version == last_version + 1:
+                return self.version, self.last_delta
+            return self.version, self.snapshot
+
+def _parse_time_param(value: str) -> Optional[float]:
+    """解析时间查询参数, 支持Unix时间戳和ISO格式"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
 class WebDashboard:
     """Web仪表盘"""
     
-    def __init__(self, collector: MetricsCollector, port: int = 8080):
+    def __init__(self, collector: MetricsCollector, port: int = 8080, test_type: str = "conn",
+                 sample_interval: float = 5.0):
         self.collector = collector
         self.port = port
         self.server = None
+        self.sampler = MetricsSampler(collector, test_type, sample_interval)
         
     def start_dashboard(self):
         """启动Web仪表盘"""
+        dashboard = self
+        sampler = self.sampler
+        
         class DashboardHandler(BaseHTTPRequestHandler):
             def do_GET(self):
                 if self.path == '/':
                     self._serve_dashboard()
                 elif self.path == '/api/metrics':
                     self._serve_metrics_api()
+                elif self.path == '/api/stream':
+                    self._serve_event_stream()
                 elif self.path.startswith('/api/history'):
                     self._serve_history_api()
                 else:
@@ -434,7 +744,7 @@ class WebDashboard:
                 self.send_header('Content-type', 'text/html; charset=utf-8')
                 self.end_headers()
                 
-                html_content = self._generate_dashboard_html()
+                html_content = dashboard._generate_dashboard_html()
                 self.wfile.write(html_content.encode('utf-8'))
             
             def _serve_metrics_api(self):
@@ -443,23 +753,67 @@ class WebDashboard:
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
                 
-                metrics = self.collector.collect_metrics()
-                if metrics:
-                    response = asdict(metrics)
-                else:
-                    response = {"error": "No metrics available"}
+                # 返回后台采样器缓存的快照, 不触发新的抓取
+                _, snapshot = sampler.get_snapshot()
+                response = snapshot if snapshot else {"error": "No metrics available"}
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
             
+            def _serve_event_stream(self):
+                """Server-Sent Events: 首次推送完整快照, 之后只推送增量"""
+                self.send_response(200)
+                self.send_header('Content-type', 'text/event-stream; charset=utf-8')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'keep-alive')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                
+                try:
+                    version, snapshot = sampler.get_snapshot()
+                    if snapshot:
+                        self._write_event('snapshot', snapshot)
+                    
+                    while sampler.running:
+                        new_version, payload = sampler.wait_for_update(version, timeout=15)
+                        if payload is None:
+                            # 心跳, 防止代理断开空闲连接
+                            self.wfile.write(b': keepalive\n\n')
+                            self.wfile.flush()
+                            continue
+                        event = 'delta' if new_version == version + 1 and version > 0 else 'snapshot'
+                        self._write_event(event, payload)
+                        version = new_version
+                except (BrokenPipeError, ConnectionResetError):
+                    # 浏览器关闭页面
+                    pass
+            
+            def _write_event(self, event: str, data: Dict[str, Any]):
+                message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+                self.wfile.write(message.encode('utf-8'))
+                self.wfile.flush()
+            
             def _serve_history_api(self):
+                # /api/history?from=&to=&points=&method=  (from/to 为Unix时间戳或ISO时间)
+                query = parse_qs(urlparse(self.path).query)
+                try:
+                    start = _parse_time_param(query.get('from', [''])[0])
+                    end = _parse_time_param(query.get('to', [''])[0])
+                    points = int(query.get('points', [DEFAULT_MAX_POINTS])[0])
+                except ValueError as e:
+                    self.send_error(400, f"Invalid query: {e}")
+                    return
+                points = max(3, min(points, MAX_HISTORY_POINTS))
+                method = query.get('method', ['lttb'])[0]
+                if method not in ('lttb', 'minmax'):
+                    method = 'lttb'
+                
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
                 self.end_headers()
                 
-                # 返回最近100条历史数据
-                history = self.collector.metrics_history[-100:] if self.collector.metrics_history else []
-                response = [asdict(metric) for metric in history]
+                # 基于磁盘上的完整历史降采样, 任意时间范围都只返回有限数量的点
+                response = dashboard.collector.get_history_series(start, end, points, method)
                 
                 self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
             
@@ -468,7 +822,10 @@ class WebDashboard:
                 pass
         
         try:
-            self.server = HTTPServer(('localhost', self.port), DashboardHandler)
+            sampler.start()
+            # 多线程服务器: 长连接的事件流不会阻塞其他请求
+            self.server = ThreadingHTTPServer(('localhost', self.port), DashboardHandler)
+            self.server.daemon_threads = True
             console.print(f"[green]Web仪表盘已启动: http://localhost:{self.port}[/green]")
             
             # 自动打开浏览器
@@ -479,6 +836,8 @@ class WebDashboard:
             console.print("\n[yellow]Web仪表盘已停止[/yellow]")
         except Exception as e:
             console.print(f"[red]启动Web仪表盘失败: {e}[/red]")
+        finally:
+            sampler.stop()
     
     def _generate_dashboard_html(self) -> str:
         """生成仪表盘HTML"""
@@ -584,7 +943,7 @@ class WebDashboard:
         </div>
         
         <div class="refresh-info">
-            数据每5秒自动刷新 | 最后更新: <span id="lastUpdate">-</span>
+            数据由服务端每5秒推送 | 最后更新: <span id="lastUpdate">-</span>
         </div>
     </div>
 
@@ -592,12 +951,45 @@ class WebDashboard:
         let metricsData = null;
         let charts = {};
 
-        // 页面加载完成后开始获取数据
+        // 页面加载完成后订阅服务端推送, 不支持时回退为轮询缓存快照
         document.addEventListener('DOMContentLoaded', function() {
             loadMetrics();
-            setInterval(loadMetrics, 5000); // 每5秒刷新一次
+            if (window.EventSource) {
+                subscribeMetrics();
+            } else {
+                setInterval(loadMetrics, 5000); // 每5秒刷新一次
+            }
         });
 
+        function subscribeMetrics() {
+            const source = new EventSource('/api/stream');
+            source.addEventListener('snapshot', function(event) {
+                metricsData = JSON.parse(event.data);
+                updateDisplay();
+                updateLastUpdateTime();
+            });
+            source.addEventListener('delta', function(event) {
+                if (!metricsData) return;
+                applyDelta(metricsData, JSON.parse(event.data));
+                updateDisplay();
+                updateLastUpdateTime();
+            });
+            source.onerror = function() {
+                console.error('事件流连接中断, 浏览器将自动重连');
+            };
+        }
+
+        function applyDelta(target, delta) {
+            for (const key in delta) {
+                const value = delta[key];
+                if (value && typeof value === 'object' && !Array.isArray(value) && target[key]) {
+                    Object.assign(target[key], value);
+                } else {
+                    target[key] = value;
+                }
+            }
+        }
+
         async function loadMetrics() {
             try {
                 const response = await fetch('/api/metrics');
@@ -768,38 +1160,45 @@ class ReportGenerator:
         console.print(f"[green]测试报告已生成: {output_file}[/green]")
         return output_file
     
-    def _analyze_metrics_history(self) -> Dict[str, Any]:
-        """分析历史指标数据"""
-        if not self.collector.metrics_history:
+    def _analyze_metrics_history(self, max_points: int = DEFAULT_MAX_POINTS) -> Dict[str, Any]:
+        """分析历史指标数据
+
+        统计值基于完整历史计算, 趋势序列降采样到不超过 max_points 个点。
+        """
+        history = self.collector.load_history()
+        if not history:
             return {}
         
         # 计算趋势和统计信息
-        history = self.collector.metrics_history
+        timestamps = [datetime.fromisoformat(metrics['timestamp']).timestamp() for metrics in history]
         
         # 连接成功率趋势
         success_rates = []
         for metrics in history:
             success_rate = self._calculate_success_rate(
-                metrics.connection_metrics['connect_succ'],
-                metrics.connection_metrics['connect_fail']
+                metrics['connection_metrics']['connect_succ'],
+                metrics['connection_metrics']['connect_fail']
             )
             success_rates.append(success_rate)
         
         # 消息吞吐量趋势
         throughputs = []
         for metrics in history:
-            throughput = metrics.message_metrics['pub'] + metrics.message_metrics['recv']
+            throughput = metrics['message_metrics']['pub'] + metrics['message_metrics']['recv']
             throughputs.append(throughput)
         
         # 延迟趋势
         latencies = []
         for metrics in history:
-            latencies.append(metrics.latency_metrics['publish_latency'])
+            latencies.append(metrics['latency_metrics']['publish_latency'])
+        
+        def trend(values: List[float]) -> List[Tuple[float, float]]:
+            return downsample(list(zip(timestamps, values)), max_points)
         
         return {
-            'success_rate_trend': success_rates,
-            'throughput_trend': throughputs,
-            'latency_trend': latencies,
+            'success_rate_trend': trend(success_rates),
+            'throughput_trend': trend(throughputs),
+            'latency_trend': trend(latencies),
             'avg_success_rate': np.mean(success_rates) if success_rates else 0,
             'avg_throughput': np.mean(throughputs) if throughputs else 0,
             'avg_latency': np.mean(latencies) if latencies else 0,
@@ -1023,11 +1422,18 @@ def main():
                        help="Web仪表盘端口")
     parser.add_argument("--output", type=str,
                        help="报告输出文件路径")
+    parser.add_argument("--sample-interval", type=float, default=5.0,
+                       help="Web仪表盘后台采样间隔(秒)")
+    parser.add_argument("--history-file", type=str,
+                       help="完整历史数据文件(JSON Lines), live/web模式下默认为 reports/benchmark_history_<时间戳>.jsonl")
     
     args = parser.parse_args()
     
     # 创建指标收集器
-    collector = MetricsCollector(args.ports)
+    history_file = args.history_file
+    if not history_file and args.mode != "report":
+        history_file = str(Path(DEFAULT_HISTORY_DIR) / f"benchmark_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    collector = MetricsCollector(args.ports, history_file)
     
     console.print(f"[blue]🚀 eMQTT-Bench 压测结果显示系统启动[/blue]")
     console.print(f"[cyan]监控端口: {args.ports}[/cyan]")
@@ -1041,7 +1447,7 @@ def main():
             
         elif args.mode == "web":
             # Web仪表盘模式
-            dashboard = WebDashboard(collector, args.web_port)
+            dashboard = WebDashboard(collector, args.web_port, args.test_type, args.sample_interval)
             dashboard.start_dashboard()
             
         elif args.mode == "report":
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+报告分析数据帧
+每个测试套件只读取并解析一次指标文件和持续指标文件,
+将持续数据整理为按测试、按指标的列式时间序列 (pandas/NumPy),
+并预先计算速率和分位数, 供HTML、Markdown和增强版Markdown报告共享
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metric_registry import registry, KIND_COUNTER, KIND_HISTOGRAM
+from artifact_io import load_json, strip_compression_suffix
+from report_cache import ReportCache
+from series_codec import iter_frames
+from timeseries_store import TimeSeriesStore, is_store_file
+
+# 延迟直方图, 按优先级取第一个在区间内有新样本的
+LATENCY_HISTOGRAMS = ('e2e_latency', 'publish_latency', 'mqtt_client_connect_duration')
+
+# 预计算的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+# 系统资源列
+RESOURCE_COLUMNS = ('cpu_percent', 'memory_percent', 'disk_percent', 'load_percent', 'bench_cpu_percent',
+                    'bench_cpu_seconds', 'bench_rss_bytes', 'bench_fds', 'bench_threads', 'bench_ctx_switches',
+                    'bench_sockets')
+
+
+@dataclass
+class TestSeries:
+    """单个测试的持续指标时间序列"""
+    test_name: str
+    source_file: str
+    points: Sequence[Dict[str, Any]]  # 原始数据点 (可能为变化编码或按需读取的二进制文件), 逐点分析通过 iter_frames() 读取
+    values: pd.DataFrame  # 索引为时间戳(秒), 列为指标名 (同名不同标签的值相加, 忽略直方图桶)
+    resources: pd.DataFrame  # 索引为时间戳(秒), 列为系统资源使用率
+    rates: pd.DataFrame = field(default_factory=pd.DataFrame)  # 计数器每秒速率
+    quantiles: pd.DataFrame = field(default_factory=pd.DataFrame)  # 速率和资源的分位数, 索引为分位点
+
+    @property
+    def total_points(self) -> int:
+        return len(self.points)
+
+    @property
+    def start_time(self) -> Optional[str]:
+        return self.points[0].get('timestamp') if self.points else None
+
+    @property
+    def end_time(self) -> Optional[str]:
+        return self.points[-1].get('timestamp') if self.points else None
+
+    def iter_frames(self) -> Iterator[Dict[str, Any]]:
+        """按需逐个重建完整数据点 (变化编码的文件只保存变化的序列)"""
+        return iter_frames(self.points)
+
+    def column(self, name: str) -> pd.Series:
+        """获取指标列, 不存在时返回全 0 序列"""
+        if name in self.values.columns:
+            return self.values[name]
+        return pd.Series(0.0, index=self.values.index)
+
+    def latency_seconds(self) -> pd.Series:
+        """区间平均延迟 (秒): 直方图 sum/count 增量之比, ms 转为 s"""
+        latency = pd.Series(np.nan, index=self.values.index)
+        for histogram in LATENCY_HISTOGRAMS:
+            count_delta = self.column(f'{histogram}_count').diff()
+            sum_delta = self.column(f'{histogram}_sum').diff()
+            mask = latency.isna() & (count_delta > 0)
+            latency[mask] = sum_delta[mask] / count_delta[mask] / 1000
+        return latency.fillna(0.0)
+
+
+class AnalysisFrame:
+    """测试套件的共享分析数据帧"""
+
+    def __init__(self, cache: Optional[ReportCache] = None):
+        self.metrics_data: Dict[str, Dict[str, Any]] = {}
+        self.continuous_data_files: List[str] = []
+        self.series: Dict[str, Optional[TestSeries]] = {}  # 已解析的持续指标, 按需加载
+        self.load_errors: List[str] = []
+        self.cache = cache
+
+    @classmethod
+    def load(cls, test_results: Sequence[Any], continuous_data_files: Sequence[str],
+             preloaded: Optional[Dict[str, TestSeries]] = None,
+             cache: Optional[ReportCache] = None) -> 'AnalysisFrame':
+        """
+        读取测试套件的所有指标文件和持续指标文件
+
+        Args:
+            test_results: TestResult 列表
+            continuous_data_files: 持续指标文件路径列表
+            preloaded: 已在其他地方解析好的持续指标 (文件路径 -> 时间序列), 不再重复读取
+            cache: 报告缓存, 内容未变化的持续指标文件直接复用缓存的趋势数据而不解析
+
+        Returns:
+            加载完成的分析数据帧 (持续指标文件在首次使用时才解析)
+        """
+        frame = cls(cache)
+        for result in test_results:
+            frame.metrics_data[result.test_name] = frame._load_metrics_entry(result)
+        frame.continuous_data_files = list(continuous_data_files)
+        frame.series.update(preloaded or {})
+        return frame
+
+    def _load_metrics_entry(self, result: Any) -> Dict[str, Any]:
+        """读取单个测试的指标文件, 结构与原 all_metrics_data 一致"""
+        metrics: List[Dict[str, Any]] = []
+        if result.metrics_file and result.success:
+            try:
+                metrics = load_json(result.metrics_file)
+            except Exception as e:
+                self.load_errors.append(f"无法读取 {result.metrics_file}: {e}")
+                metrics = []
+
+        return {
+            'test_info': {
+                'port': result.port,
+                'duration': result.duration,
+                'start_time': result.start_time.isoformat(),
+                'end_time': result.end_time.isoformat(),
+                'metrics_file': result.metrics_file
+            },
+            'metrics': metrics
+        }
+
+    def _load_continuous_file(self, file_path: str) -> Optional[TestSeries]:
+        """解析持续指标文件为列式时间序列"""
+        if not os.path.exists(file_path):
+            return None
+        if is_store_file(file_path):
+            return self._load_store_file(file_path)
+        try:
+            points = load_json(file_path)
+        except Exception as e:
+            self.load_errors.append(f"无法读取 {file_path}: {e}")
+            return None
+
+        timestamps: List[float] = []
+        names: List[str] = []
+        values: List[float] = []
+        resource_rows: List[Tuple[float, ...]] = []
+        resource_index: List[float] = []
+
+        for point in iter_frames(points):
+            try:
+                ts = datetime.fromisoformat(point['timestamp']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+
+            for metric in point.get('metrics', []):
+                name = metric.get('name', '')
+                if not name or name.endswith('_bucket'):
+                    continue
+                try:
+                    value = float(metric.get('value', 0))
+                except (TypeError, ValueError):
+                    continue
+                timestamps.append(ts)
+                names.append(name)
+                values.append(value)
+
+            resources = point.get('system_resources') or {}
+            resource_index.append(ts)
+            resource_rows.append(tuple(float(resources[key]) if resources.get(key) is not None else np.nan
+                                       for key in RESOURCE_COLUMNS))
+
+        long_frame = pd.DataFrame({'ts': timestamps, 'name': names, 'value': values})
+        if long_frame.empty:
+            wide = pd.DataFrame(index=pd.Index(sorted(set(resource_index)), name='ts'), dtype=float)
+        else:
+            wide = long_frame.groupby(['ts', 'name'], sort=True)['value'].sum().unstack('name')
+            wide = wide.astype(float).ffill().fillna(0.0)
+
+        resource_frame = pd.DataFrame(resource_rows, index=pd.Index(resource_index, name='ts'),
+                                      columns=list(RESOURCE_COLUMNS), dtype=float)
+        resource_frame = resource_frame[~resource_frame.index.duplicated(keep='last')].sort_index()
+        return self._build_series(file_path, points, wide, resource_frame)
+
+    def _load_store_file(self, file_path: str) -> Optional[TestSeries]:
+        """通过内存映射读取二进制时间序列文件, 数据点按需重建"""
+        try:
+            store = TimeSeriesStore(file_path)
+            wide, resource_frame = store.wide_frame()
+        except Exception as e:
+            self.load_errors.append(f"无法读取 {file_path}: {e}")
+            return None
+        return self._build_series(file_path, store.points(), wide, resource_frame)
+
+    def _build_series(self, file_path: str, points: Sequence[Dict[str, Any]],
+                      wide: pd.DataFrame, resource_frame: pd.DataFrame) -> TestSeries:
+        """组装时间序列并预计算速率和分位数"""
+        series = TestSeries(
+            test_name=test_name_from_filename(file_path),
+            source_file=file_path,
+            points=points,
+            values=wide,
+            resources=resource_frame
+        )
+        series.rates = self._compute_rates(wide)
+        series.quantiles = self._compute_quantiles(series)
+        return series
+
+    @staticmethod
+    def _compute_rates(values: pd.DataFrame) -> pd.DataFrame:
+        """计算计数器列的每秒速率 (计数器重置产生的负值截断为 0)"""
+        counters = [name for name in values.columns
+                    if registry.lookup(name).kind in (KIND_COUNTER, KIND_HISTOGRAM)]
+        if values.empty or not counters:
+            return pd.DataFrame(index=values.index)
+
+        elapsed = pd.Series(values.index, index=values.index, dtype=float).diff()
+        rates = values[counters].diff().div(elapsed, axis=0).clip(lower=0)
+        return rates.iloc[1:]
+
+    @staticmethod
+    def _compute_quantiles(series: TestSeries) -> pd.DataFrame:
+        """预计算速率和系统资源的分位数"""
+        parts = [frame for frame in (series.rates, series.resources) if not frame.empty]
+        if not parts:
+            return pd.DataFrame(index=pd.Index(QUANTILES, name='quantile'))
+        combined = pd.concat(parts, axis=1)
+        return combined.quantile(list(QUANTILES))
+
+    def get_series(self, file_path: str) -> Optional[TestSeries]:
+        """获取持续指标文件的时间序列, 首次访问时解析"""
+        if file_path not in self.series:
+            self.series[file_path] = self._load_continuous_file(file_path)
+        return self.series[file_path]
+
+    def trend_records(self, file_paths: Optional[Sequence[str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        生成报告趋势图使用的记录 (未降采样, 按时间升序)
+
+        Args:
+            file_paths: 参与计算的持续指标文件, 默认全部
+
+        Returns:
+            {'performance': [...], 'connections': [...], 'errors': [...]}
+        """
+        performance: List[Dict[str, Any]] = []
+        connections: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+
+        for file_path in (file_paths if file_paths is not None else self.continuous_data_files):
+            records = self._cached_file_trend_records(file_path)
+            performance.extend(records['performance'])
+            connections.extend(records['connections'])
+            errors.extend(records['errors'])
+
+        performance.sort(key=lambda item: item['ts'])
+        connections.sort(key=lambda item: item['ts'])
+        errors.sort(key=lambda item: item['ts'])
+        return {'performance': performance, 'connections': connections, 'errors': errors}
+
+    def _cached_file_trend_records(self, file_path: str) -> Dict[str, List[Dict[str, Any]]]:
+        """单个文件的趋势记录, 文件内容未变化时直接读取缓存"""
+        cache_key = None
+        if self.cache is not None and self.cache.enabled and os.path.exists(file_path):
+            cache_key = self.cache.make_key([file_path])
+            cached = self.cache.get('trend', cache_key)
+            if cached is not None:
+                return cached
+
+        records = self._file_trend_records(file_path)
+        if cache_key is not None:
+            self.cache.put('trend', cache_key, records)
+        return records
+
+    def _file_trend_records(self, file_path: str) -> Dict[str, List[Dict[str, Any]]]:
+        """计算单个文件的趋势记录"""
+        performance: List[Dict[str, Any]] = []
+        connections: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+
+        series = self.get_series(file_path)
+        if series is None or len(series.values) < 2:
+            return {'performance': performance, 'connections': connections, 'errors': errors}
+
+        ts = pd.Series(series.values.index, index=series.values.index, dtype=float)
+        elapsed = ts.diff()
+        valid = (elapsed > 0).to_numpy()
+
+        messages = series.column('pub') + series.column('recv')
+        throughput = (messages.diff() / elapsed).clip(lower=0)
+        latency = series.latency_seconds()
+        cpu = series.resources['cpu_percent'].reindex(ts.index).fillna(0.0)
+
+        connect_succ = series.column('connect_succ')
+        connect_fail = series.column('connect_fail')
+        total = connect_succ + connect_fail
+        success_rate = (connect_succ / total.where(total > 0) * 100).fillna(0.0)
+        error_count = connect_fail + series.column('pub_fail') + series.column('sub_fail')
+        error_rate = (error_count.diff() / elapsed).clip(lower=0)
+
+        for i in np.flatnonzero(valid):
+            t = float(ts.iat[i])
+            label = datetime.fromtimestamp(t).strftime('%H:%M:%S')
+            performance.append({'ts': t, 'time': label, 'latency': float(latency.iat[i]),
+                                'throughput': float(throughput.iat[i]), 'cpu': float(cpu.iat[i])})
+            connections.append({'ts': t, 'time': label, 'active': float(connect_succ.iat[i]),
+                                'total': float(total.iat[i]), 'success_rate': float(success_rate.iat[i])})
+            errors.append({'ts': t, 'time': label, 'count': float(error_count.iat[i]),
+                           'rate': float(error_rate.iat[i])})
+
+        return {'performance': performance, 'connections': connections, 'errors': errors}
+
+
+def test_name_from_filename(filename: str) -> str:
+    """从持续指标文件名提取测试名称 (continuous_metrics_测试名_时间戳.json)"""
+    parts = Path(strip_compression_suffix(filename)).stem.split('_')
+    if len(parts) >= 3:
+        return '_'.join(parts[2:-1])
+    return "未知测试"
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+持续指标归档批量过滤
+逐个元素流式读取大型持续指标JSON数组, 在进程池中并行过滤多个文件,
+并在清单 (filter_manifest.json) 中记录源文件的路径、大小、修改时间、哈希和规则版本,
+重复运行时只处理内容或过滤规则发生变化的文件
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import argparse
+import codecs
+import glob
+import hashlib
+import json
+import os
+import signal
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from rich.console import Console
+from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+from artifact_io import compression_from_suffix, detect_compression, glob_artifacts, open_artifact, wrap_reader
+from series_codec import ChangeOnlyDecoder, ChangeOnlyEncoder, iter_frames
+
+console = Console()
+
+DEFAULT_MAX_WORKERS = 4
+MANIFEST_FILENAME = "filter_manifest.json"
+CONTINUOUS_FILE_PATTERN = "continuous_metrics_*.json"
+STORE_FILE_PATTERN = "continuous_metrics_*.cmts"  # 二进制时间序列文件 (timeseries_store.STORE_SUFFIX)
+
+# 流式读取的块大小
+_CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = ' \t\n\r'
+_SCALAR_END = _WHITESPACE + ',]'
+
+# 单个文件的处理结果
+STATUS_FILTERED = 'filtered'
+STATUS_INGEST = 'ingest'  # 采集时已按当前规则过滤, 无需再写副本
+STATUS_EMPTY = 'empty'
+STATUS_FAILED = 'failed'
+
+
+class _HashingFile:
+    """计算读过的原始字节的 SHA-256"""
+
+    def __init__(self, file_path: str):
+        self._file = open(file_path, 'rb')
+        self.digest = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        self.digest.update(data)
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self):
+        self._file.close()
+
+
+class _HashingReader:
+    """读取文本 (压缩文件透明解压) 的同时计算文件原始字节的 SHA-256, 避免为计算哈希再读一遍文件"""
+
+    def __init__(self, file_path: str):
+        self._raw = _HashingFile(file_path)
+        self._file = wrap_reader(self._raw, detect_compression(file_path))
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    @property
+    def digest(self):
+        return self._raw.digest
+
+    def read(self, size: int) -> str:
+        data = self._file.read(size)
+        return self._decoder.decode(data, final=not data)
+
+    def drain(self):
+        """读取剩余的原始字节, 只更新哈希不解压"""
+        for _ in iter(lambda: self._raw.read(_CHUNK_SIZE), b''):
+            pass
+
+    def close(self):
+        self._raw.close()
+
+
+def iter_json_array(reader: Any, chunk_size: int = _CHUNK_SIZE) -> Iterator[Any]:
+    """
+    流式解析顶层JSON数组, 逐个返回数组元素, 内存中只保留当前元素
+
+    Args:
+        reader: 带 read(size) 方法的文本读取对象
+        chunk_size: 每次读取的字符数
+
+    Returns:
+        数组元素迭代器
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        buffer = buffer[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or not fill():
+                return
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError("持续指标文件不是JSON数组")
+    pos += 1
+
+    expect_value = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError("JSON数组未正常结束")
+        if buffer[pos] == ']':
+            return
+        if not expect_value:
+            if buffer[pos] != ',':
+                raise ValueError(f"JSON数组元素之间缺少逗号 (位置 {pos})")
+            pos += 1
+            expect_value = True
+            continue
+
+        # 解析一个元素, 缓冲区内不完整时继续读取
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise
+            # 数字和字面量可能在块边界被截断 (如 "1.5" 只读到 "1." 时解析为 1):
+            # 后面没有紧跟空白、逗号或 ']' 时读取更多内容后重新解析
+            if (not isinstance(value, (dict, list, str))
+                    and (end == len(buffer) or buffer[end] not in _SCALAR_END) and fill()):
+                continue
+            break
+        pos = end
+        expect_value = False
+        yield value
+
+
+
+def iter_continuous_points(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    逐个读取持续指标文件的完整数据点, 支持 JSON (含压缩、变化编码) 和二进制时间序列文件
+
+    Args:
+        file_path: 持续指标文件路径
+
+    Returns:
+        完整数据点迭代器
+    """
+    from timeseries_store import TimeSeriesStore, is_store_file
+
+    if is_store_file(file_path):
+        yield from TimeSeriesStore(file_path).iter_points()
+        return
+    with open_artifact(file_path) as f:
+        yield from iter_frames(iter_json_array(f))
+
+
+@dataclass
+class ManifestEntry:
+    """清单中一个源文件的记录"""
+    size: int
+    mtime_ns: int
+    sha256: str
+    rules_version: str
+    status: str
+    output: Optional[str] = None
+    original_count: int = 0
+    filtered_count: int = 0
+    filtered_at: str = ""
+
+
+class FilterManifest:
+    """批量过滤清单: 源文件路径 -> (大小, 修改时间, 哈希, 规则版本, 输出文件)"""
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for source, entry in data.get('files', {}).items():
+            try:
+                self.entries[source] = ManifestEntry(**entry)
+            except TypeError:
+                continue
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def is_current(self, file_path: str, rules_version: str) -> bool:
+        """
+        源文件是否已按当前规则处理过
+        大小和修改时间一致时直接认定未变化; 仅修改时间变化时比较内容哈希
+
+        Args:
+            file_path: 源文件路径
+            rules_version: 当前过滤规则版本
+
+        Returns:
+            True 表示可以跳过
+        """
+        entry = self.entries.get(self._key(file_path))
+        if entry is None or entry.rules_version != rules_version:
+            return False
+        if entry.status == STATUS_FILTERED and not (entry.output and os.path.exists(entry.output)):
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        if _file_sha256(file_path) != entry.sha256:
+            return False
+        with self._lock:
+            entry.mtime_ns = stat.st_mtime_ns
+        return True
+
+    def record(self, file_path: str, entry: ManifestEntry):
+        with self._lock:
+            self.entries[self._key(file_path)] = entry
+
+    def save(self):
+        """原子写入清单"""
+        with self._lock:
+            data = {
+                'updated_at': datetime.now().isoformat(),
+                'files': {source: entry.__dict__ for source, entry in sorted(self.entries.items())}
+            }
+        os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---- 进程池任务 (模块级函数, 便于在子进程中反序列化) ----
+
+# 每个子进程只加载一次过滤规则
+_worker_filters: Dict[Optional[str], Any] = {}
+
+
+def _init_worker():
+    """子进程忽略 Ctrl+C, 中断由主进程处理"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _get_filter(rules_file: Optional[str]):
+    from test_specific_filter import TestSpecificFilter
+
+    test_filter = _worker_filters.get(rules_file)
+    if test_filter is None:
+        test_filter = _worker_filters[rules_file] = TestSpecificFilter(rules_file)
+    return test_filter
+
+
+def filtered_output_path(source_path: str, output_dir: str) -> str:
+    """过滤结果文件路径 (由源文件名确定, 重复运行时覆盖同一个文件), 二进制时间序列文件的结果为JSON"""
+    from timeseries_store import STORE_SUFFIX, is_store_file
+
+    name = os.path.basename(source_path)
+    if is_store_file(name):
+        name = name[:-len(STORE_SUFFIX)] + '.json'
+    return os.path.join(output_dir, f"filtered_{name}")
+
+
+def filter_continuous_archive(source_path: str, output_dir: str,
+                              rules_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    流式过滤单个持续指标文件: 逐个读取数据点, 过滤后立即写出
+    变化编码的文件逐点重建完整数据点后过滤, 输出同样使用变化编码;
+    二进制时间序列文件通过 iter_continuous_points 逐点重建, 输出为变化编码的JSON
+
+    Args:
+        source_path: 源文件路径
+        output_dir: 过滤结果目录
+        rules_file: 过滤规则配置文件, 默认使用 filter_rules.json
+
+    Returns:
+        处理结果 (状态、输出文件、指标数量、被移除指标统计、源文件签名)
+    """
+    from timeseries_store import is_store_file
+
+    test_filter = _get_filter(rules_file)
+    stat = os.stat(source_path)
+    result: Dict[str, Any] = {
+        'source': source_path,
+        'status': STATUS_EMPTY,
+        'output': None,
+        'original_count': 0,
+        'filtered_count': 0,
+        'removed': [],
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': '',
+        'rules_version': test_filter.rules_version
+    }
+
+    output_path = filtered_output_path(source_path, output_dir)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    removed = Counter()
+    store = is_store_file(source_path)
+    # JSON 文件边读边计算哈希; 二进制文件按记录随机读取, 单独计算哈希
+    reader = None if store else _HashingReader(source_path)
+    out = None
+    try:
+        filter_timestamp = datetime.now().isoformat()
+        rules = None
+        decoder = ChangeOnlyDecoder()
+        encoder = None
+        for encoded_point in (iter_continuous_points(source_path) if store else iter_json_array(reader)):
+            data_point = decoder.decode(encoded_point)
+            if rules is None:
+                # 采集时已按当前规则过滤的文件只计算哈希, 不再写副本
+                if test_filter.is_ingest_filtered([encoded_point]):
+                    result['status'] = STATUS_INGEST
+                    break
+                rules = test_filter.get_rules(data_point.get('test_name', 'Unknown'))
+                encoder = ChangeOnlyEncoder() if store or 'frame' in encoded_point else None
+                os.makedirs(output_dir, exist_ok=True)
+                out = open_artifact(tmp_path, 'w', compression=compression_from_suffix(output_path))
+                out.write('[')
+            else:
+                out.write(',')
+
+            metrics = data_point.get('metrics', [])
+            filtered_metrics = rules.filter_metrics(metrics, removed)
+            result['original_count'] += len(metrics)
+            result['filtered_count'] += len(filtered_metrics)
+
+            filtered_point = dict(data_point)
+            filtered_point['metrics'] = filtered_metrics
+            filtered_point['filter_info'] = {
+                "original_count": len(metrics),
+                "filtered_count": len(filtered_metrics),
+                "removed_count": len(metrics) - len(filtered_metrics),
+                "filter_timestamp": filter_timestamp,
+                "rules_version": test_filter.rules_version
+            }
+            if encoder is not None:
+                filtered_point = encoder.encode_point(filtered_point)
+            out.write('\n')
+            out.write(json.dumps(filtered_point, indent=2, ensure_ascii=False))
+        if reader is not None:
+            reader.drain()  # 压缩文件解压结束后可能还有未读的尾部字节 (或已提前结束读取)
+
+        if out is not None:
+            out.write('\n]\n')
+            out.close()
+            out = None
+            os.replace(tmp_path, output_path)
+            result['status'] = STATUS_FILTERED
+            result['output'] = output_path
+    finally:
+        if reader is not None:
+            reader.close()
+        if out is not None:
+            out.close()
+            os.remove(tmp_path)
+
+    result['sha256'] = _file_sha256(source_path) if store else reader.digest.hexdigest()
+    result['removed'] = [[name, reason, count] for (name, reason), count in removed.items()]
+    return result
+
+
+@dataclass
+class BatchFilterResult:
+    """批量过滤汇总"""
+    filtered_files: List[str] = field(default_factory=list)
+    skipped: int = 0  # 内容和规则均未变化
+    ingest_filtered: int = 0  # 采集时已过滤
+    empty: int = 0
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    original_metrics: int = 0
+    filtered_metrics: int = 0
+    removed: Counter = field(default_factory=Counter)
+
+    @property
+    def removed_metrics(self) -> int:
+        return self.original_metrics - self.filtered_metrics
+
+
+def find_continuous_files(paths: Sequence[str], recursive: bool = False) -> List[str]:
+    """在目录中查找持续指标文件 (JSON 和二进制时间序列文件, 也可直接传入文件路径)"""
+    files: List[str] = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        directory = os.path.join(path, '**') if recursive else path
+        files.extend(glob_artifacts(os.path.join(directory, CONTINUOUS_FILE_PATTERN), recursive=recursive))
+        files.extend(glob.glob(os.path.join(directory, STORE_FILE_PATTERN), recursive=recursive))
+    return sorted(set(files))
+
+
+def batch_filter_continuous_files(files: Sequence[str], output_dir: str, rules_file: Optional[str] = None,
+                                  max_workers: Optional[int] = None,
+                                  manifest_path: Optional[str] = None) -> BatchFilterResult:
+    """
+    并行、增量地过滤一批持续指标文件
+
+    Args:
+        files: 源文件列表
+        output_dir: 过滤结果目录
+        rules_file: 过滤规则配置文件
+        max_workers: 进程数, 默认 min(4, CPU核数)
+        manifest_path: 清单路径, 默认 output_dir/filter_manifest.json
+
+    Returns:
+        批量过滤汇总
+    """
+    from test_specific_filter import TestSpecificFilter
+
+    rules_version = TestSpecificFilter(rules_file).rules_version
+    manifest = FilterManifest(manifest_path or os.path.join(output_dir, MANIFEST_FILENAME))
+    summary = BatchFilterResult()
+
+    pending = []
+    for file_path in files:
+        if manifest.is_current(file_path, rules_version):
+            summary.skipped += 1
+        else:
+            pending.append(file_path)
+
+    if pending:
+        max_workers = max_workers or min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TextColumn("{task.completed}/{task.total}"),
+            TimeElapsedColumn(),
+            console=console
+        ) as progress:
+            task = progress.add_task("过滤持续指标文件...", total=len(pending))
+            for file_path, result, error in _run_filter_jobs(pending, output_dir, rules_file, max_workers):
+                progress.advance(task)
+                if error is not None:
+                    summary.failed.append((file_path, error))
+                    continue
+                _merge_result(summary, result)
+                manifest.record(file_path, ManifestEntry(
+                    size=result['size'],
+                    mtime_ns=result['mtime_ns'],
+                    sha256=result['sha256'],
+                    rules_version=result['rules_version'],
+                    status=result['status'],
+                    output=os.path.abspath(result['output']) if result['output'] else None,
+                    original_count=result['original_count'],
+                    filtered_count=result['filtered_count'],
+                    filtered_at=datetime.now().isoformat()
+                ))
+
+    try:
+        manifest.save()
+    except OSError as e:
+        console.print(f"[yellow]⚠️ 无法保存过滤清单 {manifest.manifest_path}: {e}[/yellow]")
+    return summary
+
+
+def _run_filter_jobs(files: Sequence[str], output_dir: str, rules_file: Optional[str],
+                     max_workers: int) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """在进程池中过滤文件, 进程池不可用或只有一个文件时在当前进程中串行处理"""
+    executor = None
+    if max_workers > 1 and len(files) > 1:
+        try:
+            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        except (OSError, NotImplementedError) as e:
+            console.print(f"[yellow]⚠️ 无法创建进程池, 改为串行过滤: {e}[/yellow]")
+
+    if executor is None:
+        for file_path in files:
+            try:
+                yield file_path, filter_continuous_archive(file_path, output_dir, rules_file), None
+            except Exception as e:
+                yield file_path, None, str(e)
+        return
+
+    with executor:
+        futures = {executor.submit(filter_continuous_archive, file_path, output_dir, rules_file): file_path
+                   for file_path in files}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, str(e)
+
+
+def _merge_result(summary: BatchFilterResult, result: Dict[str, Any]):
+    status = result['status']
+    if status == STATUS_INGEST:
+        summary.ingest_filtered += 1
+    elif status == STATUS_EMPTY:
+        summary.empty += 1
+    elif status == STATUS_FILTERED:
+        summary.filtered_files.append(result['output'])
+        summary.original_metrics += result['original_count']
+        summary.filtered_metrics += result['filtered_count']
+        for name, reason, count in result['removed']:
+            summary.removed[(name, reason)] += count
+
+
+def print_batch_summary(summary: BatchFilterResult, output_dir: str):
+    """显示批量过滤统计"""
+    console.print("[green]🎉 批量过滤完成![/green]")
+    console.print("[blue]📊 总体统计:[/blue]")
+    console.print(f"[dim]  • 本次过滤文件数: {len(summary.filtered_files)}[/dim]")
+    console.print(f"[dim]  • 未变化跳过: {summary.skipped}[/dim]")
+    if summary.ingest_filtered:
+        console.print(f"[dim]  • 采集时已过滤: {summary.ingest_filtered}[/dim]")
+    if summary.empty:
+        console.print(f"[dim]  • 空文件: {summary.empty}[/dim]")
+    console.print(f"[dim]  • 原始指标总数: {summary.original_metrics}[/dim]")
+    console.print(f"[dim]  • 过滤后指标数: {summary.filtered_metrics}[/dim]")
+    console.print(f"[dim]  • 移除指标数: {summary.removed_metrics}[/dim]")
+    console.print(f"[dim]  • 过滤后文件保存在: {output_dir}/[/dim]")
+    for file_path, error in summary.failed:
+        console.print(f"[red]❌ 过滤文件失败 {file_path}: {error}[/red]")
+
+
+def main():
+    """命令行入口: 批量回填历史持续指标文件"""
+    parser = argparse.ArgumentParser(description='持续指标归档批量过滤工具')
+    parser.add_argument('paths', nargs='*', default=['reports'], help='持续指标文件或所在目录 (默认: reports)')
+    parser.add_argument('-o', '--output-dir', help='过滤结果目录 (默认: 第一个目录下的 filtered/)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='递归查找子目录')
+    parser.add_argument('-j', '--workers', type=int, help='并行进程数')
+    parser.add_argument('--rules', help='过滤规则配置文件')
+    args = parser.parse_args()
+
+    files = find_continuous_files(args.paths, recursive=args.recursive)
+    if not files:
+        console.print(f"[yellow]⚠️ 未找到持续指标文件: {', '.join(args.paths)}[/yellow]")
+        return
+
+    base_dir = args.paths[0] if os.path.isdir(args.paths[0]) else os.path.dirname(args.paths[0])
+    output_dir = args.output_dir or os.path.join(base_dir, "filtered")
+    console.print(f"[blue]📁 找到 {len(files)} 个持续指标文件[/blue]")
+    summary = batch_filter_continuous_files(files, output_dir, rules_file=args.rules, max_workers=args.workers)
+    print_batch_summary(summary, output_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+测试产物压缩读写
+metrics_*.json、continuous_metrics_*.json、raw_data/*.json、metrics/*.csv 等产物内容重复度很高,
+可按配置写为 zstd (.zst) 或 gzip (.gz) 压缩文件, 写入时流式压缩;
+读取时按文件头魔数识别压缩格式并透明解压, 未压缩的旧文件照常读取
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import glob
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, IO, List, Optional, Union
+
+COMPRESSION_NONE = 'none'
+COMPRESSION_GZIP = 'gzip'
+COMPRESSION_ZSTD = 'zstd'
+COMPRESSION_AUTO = 'auto'  # 安装了 zstandard 时使用 zstd, 否则使用 gzip
+COMPRESSION_CHOICES = (COMPRESSION_NONE, COMPRESSION_AUTO, COMPRESSION_ZSTD, COMPRESSION_GZIP)
+
+COMPRESSION_SUFFIXES = {COMPRESSION_GZIP: '.gz', COMPRESSION_ZSTD: '.zst'}
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+
+PathLike = Union[str, Path]
+
+# 新写入产物的默认压缩格式, 由主程序按测试配置设置
+_default_compression = COMPRESSION_NONE
+
+
+def _import_zstandard():
+    """按需导入 zstandard (可选依赖)"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def _require_zstandard():
+    zstandard = _import_zstandard()
+    if zstandard is None:
+        raise RuntimeError("读写 zstd 压缩文件需要安装 zstandard: pip install zstandard")
+    return zstandard
+
+
+def resolve_compression(compression: Optional[str]) -> str:
+    """
+    解析压缩格式配置
+
+    Args:
+        compression: none/auto/zstd/gzip, None 表示使用默认设置
+
+    Returns:
+        实际使用的压缩格式 (未安装 zstandard 时 zstd 回退为 gzip)
+    """
+    compression = (compression or _default_compression).lower()
+    if compression not in COMPRESSION_CHOICES:
+        raise ValueError(f"不支持的压缩格式: {compression}, 可选: {', '.join(COMPRESSION_CHOICES)}")
+    if compression in (COMPRESSION_AUTO, COMPRESSION_ZSTD):
+        return COMPRESSION_ZSTD if _import_zstandard() is not None else COMPRESSION_GZIP
+    return compression
+
+
+def set_default_compression(compression: Optional[str]) -> str:
+    """设置新写入产物的默认压缩格式, 返回实际使用的格式"""
+    global _default_compression
+    _default_compression = resolve_compression(compression or COMPRESSION_NONE)
+    return _default_compression
+
+
+def get_default_compression() -> str:
+    return _default_compression
+
+
+def artifact_path(path: PathLike, compression: Optional[str] = None) -> str:
+    """为产物路径加上压缩格式的后缀, 如 metrics_x.json -> metrics_x.json.zst"""
+    suffix = COMPRESSION_SUFFIXES.get(resolve_compression(compression), '')
+    return str(path) + suffix
+
+
+def compression_from_suffix(path: PathLike) -> str:
+    """按文件后缀判断压缩格式"""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if str(path).endswith(suffix):
+            return compression
+    return COMPRESSION_NONE
+
+
+def strip_compression_suffix(path: PathLike) -> str:
+    """去掉压缩后缀, 如 metrics_x.json.zst -> metrics_x.json"""
+    suffix = COMPRESSION_SUFFIXES.get(compression_from_suffix(path), '')
+    return str(path)[:len(str(path)) - len(suffix)] if suffix else str(path)
+
+
+def detect_compression(path: PathLike) -> str:
+    """按文件头魔数识别压缩格式"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic.startswith(_GZIP_MAGIC):
+        return COMPRESSION_GZIP
+    if magic.startswith(_ZSTD_MAGIC):
+        return COMPRESSION_ZSTD
+    return COMPRESSION_NONE
+
+
+def wrap_reader(raw: BinaryIO, compression: str) -> BinaryIO:
+    """在二进制流上套一层流式解压"""
+    if compression == COMPRESSION_GZIP:
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == COMPRESSION_ZSTD:
+        return _require_zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    return raw
+
+
+def open_artifact(path: PathLike, mode: str = 'r', compression: Optional[str] = None,
+                  encoding: str = 'utf-8', newline: Optional[str] = None) -> IO:
+    """
+    打开产物文件, 压缩文件读取时透明解压、写入时流式压缩
+
+    Args:
+        path: 文件路径
+        mode: 'r'/'w' (文本) 或 'rb'/'wb' (二进制)
+        compression: 写入时的压缩格式, 默认按文件后缀判断; 读取时总是按文件头识别
+        encoding: 文本模式的编码
+        newline: 文本模式的换行处理 (写 CSV 时传入 '')
+
+    Returns:
+        文件对象
+    """
+    binary = 'b' in mode
+    if mode.startswith('r'):
+        compression = detect_compression(path)
+        if compression == COMPRESSION_NONE:
+            return open(path, 'rb') if binary else open(path, 'r', encoding=encoding, newline=newline)
+        stream = wrap_reader(open(path, 'rb'), compression)
+        if compression == COMPRESSION_ZSTD:
+            stream = io.BufferedReader(stream)
+    elif mode.startswith('w'):
+        compression = compression or compression_from_suffix(path)
+        if compression == COMPRESSION_NONE:
+            return open(path, 'wb') if binary else open(path, 'w', encoding=encoding, newline=newline)
+        if compression == COMPRESSION_GZIP:
+            stream = gzip.open(path, 'wb', compresslevel=GZIP_LEVEL)
+        else:
+            zstandard = _require_zstandard()
+            stream = zstandard.open(path, 'wb', cctx=zstandard.ZstdCompressor(level=ZSTD_LEVEL))
+    else:
+        raise ValueError(f"不支持的打开模式: {mode}")
+
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding=encoding, newline=newline)
+
+
+def resolve_artifact(path: PathLike) -> str:
+    """
+    查找产物文件: 路径本身不存在时依次尝试压缩后缀的文件
+
+    Returns:
+        存在的文件路径, 都不存在时原样返回
+    """
+    path = str(path)
+    if os.path.exists(path):
+        return path
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+
+def glob_artifacts(pattern: str, recursive: bool = False) -> List[str]:
+    """按模式查找产物文件, 同时匹配压缩后的文件 (如 *.json 也匹配 *.json.zst、*.json.gz)"""
+    files = glob.glob(pattern, recursive=recursive)
+    for suffix in COMPRESSION_SUFFIXES.values():
+        files.extend(glob.glob(pattern + suffix, recursive=recursive))
+    return sorted(set(files))
+
+
+def load_json(path: PathLike) -> Any:
+    """读取JSON产物 (自动解压)"""
+    with open_artifact(path, 'r') as f:
+        return json.load(f)
+
+
+def dump_json(data: Any, path: PathLike, indent: Optional[int] = 2, compression: Optional[str] = None):
+    """写入JSON产物, 压缩格式默认按文件后缀判断 (json.dump 分块写出, 不在内存中生成完整文本)"""
+    with open_artifact(path, 'w', compression=compression) as f:
+        json.dump(data, f, indent=indent, ensure_ascii=False)
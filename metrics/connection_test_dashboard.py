@@ -8,31 +8,83 @@
 
 import json
 import os
+import gzip
+import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 import webbrowser
 import threading
 import time
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import socketserver
+from downsampling import downsample_records, lttb_indices, DEFAULT_MAX_POINTS
 
 class ConnectionTestDashboard:
     """连接测试专业仪表盘"""
     
-    def __init__(self, metrics_data: Dict[str, Any], port: int = 8080):
+    def __init__(self, metrics_data: Dict[str, Any], port: int = 8080, max_trend_points: int = DEFAULT_MAX_POINTS):
         self.metrics_data = metrics_data
         self.port = port
+        self.max_trend_points = max_trend_points
         self.server = None
         self.server_thread = None
         
+        # 分析结果与渲染结果缓存, 仅在指标数据更新时失效
+        self._data_version = 0
+        self._cache_lock = threading.RLock()
+        self._analysis_cache: Optional[Dict[str, Any]] = None
+        self._analysis_version = -1
+        self._response_cache: Dict[str, Dict[str, Any]] = {}
+        
+    def update_metrics(self, metrics_data: Dict[str, Any]):
+        """更新指标数据, 使缓存的分析结果和页面失效"""
+        with self._cache_lock:
+            self.metrics_data = metrics_data
+            self._data_version += 1
+            self._analysis_cache = None
+            self._response_cache.clear()
+    
+    def get_analysis(self) -> Dict[str, Any]:
+        """获取分析结果, 同一版本的指标数据只分析一次"""
+        with self._cache_lock:
+            if self._analysis_cache is None or self._analysis_version != self._data_version:
+                self._analysis_cache = self._analyze_metrics_data()
+                self._analysis_version = self._data_version
+            return self._analysis_cache
+    
+    def _get_cached_response(self, key: str) -> Dict[str, Any]:
+        """获取缓存的响应体 (原始内容、gzip压缩内容和ETag)"""
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+            if cached and cached['version'] == self._data_version:
+                return cached
+            
+            analysis = self.get_analysis()
+            if key == 'charts':
+                body = json.dumps(self._build_chart_data(analysis), ensure_ascii=False).encode('utf-8')
+                content_type = 'application/json; charset=utf-8'
+            else:
+                body = self._generate_html_template(analysis, embed_chart_data=False).encode('utf-8')
+                content_type = 'text/html; charset=utf-8'
+            
+            cached = {
+                'version': self._data_version,
+                'content_type': content_type,
+                'body': body,
+                'gzip': gzip.compress(body, compresslevel=6),
+                'etag': f'"{self._data_version}-{hashlib.md5(body).hexdigest()[:16]}"'
+            }
+            self._response_cache[key] = cached
+            return cached
+        
     def generate_dashboard(self) -> str:
         """生成连接测试仪表盘HTML"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         dashboard_file = f"connection_test_dashboard_{timestamp}.html"
         
         # 分析指标数据
-        analysis = self._analyze_metrics_data()
+        analysis = self.get_analysis()
         
         # 生成HTML内容
         html_content = self._generate_html_template(analysis)
@@ -138,7 +190,8 @@ class ConnectionTestDashboard:
                     'successful_connections': metrics.get('successful_connections', 0)
                 })
         
-        return growth_data
+        # 长时间测试降采样到有限点数
+        return downsample_records(growth_data, 'time', 'concurrent_connections', self.max_trend_points)
     
     def _calculate_connection_stability(self) -> Dict[str, float]:
         """计算连接稳定性"""
@@ -275,6 +328,11 @@ class ConnectionTestDashboard:
                 error_rate = (failed / total_attempts * 100) if total_attempts > 0 else 0
                 trend_data['error_rate'].append(error_rate)
         
+        # 长时间测试按连接时间序列做LTTB降采样, 各序列保留相同的时间点
+        if len(trend_data['timeline']) > self.max_trend_points:
+            indices = lttb_indices(trend_data['timeline'], trend_data['connection_time'], self.max_trend_points)
+            trend_data = {key: [values[i] for i in indices] for key, values in trend_data.items()}
+        
         return trend_data
     
     def _generate_recommendations(self, analysis: Dict) -> List[Dict]:
@@ -346,8 +404,33 @@ class ConnectionTestDashboard:
         
         return recommendations
     
-    def _generate_html_template(self, analysis: Dict) -> str:
-        """生成HTML模板"""
+    def _build_chart_data(self, analysis: Dict) -> Dict[str, Any]:
+        """提取图表所需数据, 供内嵌或 /api/charts 接口使用"""
+        growth_curve = analysis['concurrency_metrics']['connection_growth_curve']
+        network = analysis['network_performance']
+        return {
+            'timeline': analysis['trend_data']['timeline'],
+            'connection_success_rate': analysis['trend_data']['connection_success_rate'],
+            'connection_time': analysis['trend_data']['connection_time'],
+            'growth_timeline': [item['time'] for item in growth_curve],
+            'concurrent_connections': [item['concurrent_connections'] for item in growth_curve],
+            'network_times': [
+                round(network.get('avg_connection_time', 0), 1),
+                round(network.get('p90_connection_time', 0), 1),
+                round(network.get('p95_connection_time', 0), 1),
+                round(network.get('p99_connection_time', 0), 1)
+            ],
+            'cpu_usage': round(analysis['system_resources'].get('cpu_usage', {}).get('avg', 0), 1),
+            'memory_usage': round(analysis['system_resources'].get('memory_usage', {}).get('avg', 0), 1),
+            'error_types': analysis['error_analysis'].get('error_types', {})
+        }
+    
+    def _generate_html_template(self, analysis: Dict, embed_chart_data: bool = True) -> str:
+        """生成HTML模板
+
+        embed_chart_data 为 False 时图表数据不内嵌, 由页面从 /api/charts 加载。
+        """
+        chart_data_js = json.dumps(self._build_chart_data(analysis), ensure_ascii=False) if embed_chart_data else 'null'
         return f"""
 <!DOCTYPE html>
 <html lang="zh-CN">
@@ -683,29 +766,38 @@ class ConnectionTestDashboard:
     </div>
     
     <script>
-        // 初始化图表
+        const embeddedChartData = {chart_data_js};
+        
+        // 初始化图表: 静态文件使用内嵌数据, Web服务模式从接口加载
         document.addEventListener('DOMContentLoaded', function() {{
-            initializeCharts();
+            if (embeddedChartData) {{
+                initializeCharts(embeddedChartData);
+            }} else {{
+                fetch('/api/charts')
+                    .then(response => response.json())
+                    .then(initializeCharts)
+                    .catch(error => console.error('加载图表数据失败:', error));
+            }}
         }});
         
-        function initializeCharts() {{
+        function initializeCharts(chartData) {{
             // 连接性能趋势图
             const connectionTrendCtx = document.getElementById('connectionTrendChart');
             if (connectionTrendCtx) {{
                 new Chart(connectionTrendCtx, {{
                     type: 'line',
                     data: {{
-                        labels: {json.dumps(analysis['trend_data']['timeline'])},
+                        labels: chartData.timeline,
                         datasets: [{{
                             label: '连接成功率 (%)',
-                            data: {json.dumps(analysis['trend_data']['connection_success_rate'])},
+                            data: chartData.connection_success_rate,
                             borderColor: '#27ae60',
                             backgroundColor: 'rgba(39, 174, 96, 0.1)',
                             tension: 0.4,
                             yAxisID: 'y'
                         }}, {{
                             label: '连接时间 (ms)',
-                            data: {json.dumps(analysis['trend_data']['connection_time'])},
+                            data: chartData.connection_time,
                             borderColor: '#e74c3c',
                             backgroundColor: 'rgba(231, 76, 60, 0.1)',
                             tension: 0.4,
@@ -748,10 +840,10 @@ class ConnectionTestDashboard:
                 new Chart(concurrencyCtx, {{
                     type: 'line',
                     data: {{
-                        labels: {json.dumps([item['time'] for item in analysis['concurrency_metrics']['connection_growth_curve']])},
+                        labels: chartData.growth_timeline,
                         datasets: [{{
                             label: '并发连接数',
-                            data: {json.dumps([item['concurrent_connections'] for item in analysis['concurrency_metrics']['connection_growth_curve']])},
+                            data: chartData.concurrent_connections,
                             borderColor: '#3498db',
                             backgroundColor: 'rgba(52, 152, 219, 0.1)',
                             tension: 0.4,
@@ -783,12 +875,7 @@ class ConnectionTestDashboard:
                         labels: ['平均时间', 'P90时间', 'P95时间', 'P99时间'],
                         datasets: [{{
                             label: '连接时间 (ms)',
-                            data: [
-                                {analysis['network_performance'].get('avg_connection_time', 0):.1f},
-                                {analysis['network_performance'].get('p90_connection_time', 0):.1f},
-                                {analysis['network_performance'].get('p95_connection_time', 0):.1f},
-                                {analysis['network_performance'].get('p99_connection_time', 0):.1f}
-                            ],
+                            data: chartData.network_times,
                             backgroundColor: [
                                 'rgba(39, 174, 96, 0.8)',
                                 'rgba(52, 152, 219, 0.8)',
@@ -816,8 +903,8 @@ class ConnectionTestDashboard:
             // 系统资源使用图
             const systemCtx = document.getElementById('systemResourcesChart');
             if (systemCtx) {{
-                const cpuUsage = {analysis['system_resources'].get('cpu_usage', {}).get('avg', 0):.1f};
-                const memoryUsage = {analysis['system_resources'].get('memory_usage', {}).get('avg', 0):.1f};
+                const cpuUsage = chartData.cpu_usage;
+                const memoryUsage = chartData.memory_usage;
                 
                 new Chart(systemCtx, {{
                     type: 'doughnut',
@@ -844,7 +931,7 @@ class ConnectionTestDashboard:
             // 错误分析图
             const errorCtx = document.getElementById('errorAnalysisChart');
             if (errorCtx) {{
-                const errorTypes = {json.dumps(analysis['error_analysis'].get('error_types', {}))};
+                const errorTypes = chartData.error_types;
                 const labels = Object.keys(errorTypes);
                 const data = Object.values(errorTypes);
                 
@@ -909,26 +996,49 @@ class ConnectionTestDashboard:
     
     def start_web_server(self):
         """启动Web服务器"""
+        dashboard = self
+        
         class DashboardHandler(BaseHTTPRequestHandler):
             def do_GET(self):
                 if self.path == '/':
-                    self.send_response(200)
-                    self.send_header('Content-type', 'text/html; charset=utf-8')
-                    self.end_headers()
-                    
-                    # 生成仪表盘HTML
-                    analysis = self._analyze_metrics_data()
-                    html_content = self._generate_html_template(analysis)
-                    self.wfile.write(html_content.encode('utf-8'))
+                    self._send_cached('html')
+                elif self.path == '/api/charts':
+                    self._send_cached('charts')
                 else:
                     self.send_response(404)
                     self.end_headers()
             
+            def _send_cached(self, key: str):
+                # 分析和渲染结果按数据版本缓存, 请求只做查表和发送
+                cached = dashboard._get_cached_response(key)
+                
+                if self.headers.get('If-None-Match') == cached['etag']:
+                    self.send_response(304)
+                    self.send_header('ETag', cached['etag'])
+                    self.end_headers()
+                    return
+                
+                use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+                body = cached['gzip'] if use_gzip else cached['body']
+                
+                self.send_response(200)
+                self.send_header('Content-type', cached['content_type'])
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', cached['etag'])
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Vary', 'Accept-Encoding')
+                if use_gzip:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.end_headers()
+                self.wfile.write(body)
+            
             def log_message(self, format, *args):
                 pass  # 禁用日志输出
         
         try:
-            self.server = HTTPServer(('localhost', self.port), DashboardHandler)
+            # 多线程服务器, 慢客户端不会阻塞其他请求
+            self.server = ThreadingHTTPServer(('localhost', self.port), DashboardHandler)
+            self.server.daemon_threads = True
             self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
             self.server_thread.start()
             
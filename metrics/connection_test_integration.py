@@ -183,9 +183,14 @@ class ConnectionTestIntegration:
                 console.print("✅ [green]Web仪表盘已启动[/green]")
                 console.print("💡 [dim]按 Ctrl+C 停止服务器[/dim]")
                 
-                # 保持服务器运行
+                # 保持服务器运行, 仅在收集到新指标时刷新仪表盘缓存
+                last_seen = self._latest_metrics()
                 while True:
                     time.sleep(1)
+                    latest = self._latest_metrics()
+                    if latest is not last_seen:
+                        dashboard.update_metrics(self.metrics_collector.get_performance_summary())
+                        last_seen = latest
             else:
                 console.print("❌ [red]Web服务器启动失败[/red]")
                 
@@ -194,6 +199,12 @@ class ConnectionTestIntegration:
         finally:
             dashboard.stop_web_server()
     
+    def _latest_metrics(self):
+        """获取收集器最新的数据点, 用于判断指标是否更新"""
+        if not self.metrics_collector or not self.metrics_collector.metrics_history:
+            return None
+        return self.metrics_collector.metrics_history[-1]
+    
     def _cleanup(self):
         """清理资源"""
         self.running = False
@@ -17,6 +17,9 @@ from pathlib import Path
 import statistics
 import threading
 from collections import defaultdict, deque
+from resource_sampler import get_resource_sampler
+from self_metrics import MISSED_TICKS, PARSE_SECONDS, SCRAPE_SECONDS, get_self_metrics
+from tick_scheduler import ScrapeStamp, TickScheduler
 
 @dataclass
 class ConnectionMetrics:
@@ -44,6 +47,12 @@ class ConnectionTestMetricsCollector:
         self.last_metrics_time = self.start_time
         self.collection_thread = None
         self.running = False
+        self.missed_ticks = 0  # 采集耗时超过间隔而跳过的周期数
+        
+        # 主机和被测 emqtt_bench 进程树的资源由共享采样线程采集
+        self.resource_sampler = get_resource_sampler()
+        self.bench_pid: Optional[int] = None
+        self.self_metrics = get_self_metrics()
         
         # 性能统计
         self.performance_stats = {
@@ -56,8 +65,17 @@ class ConnectionTestMetricsCollector:
             'system_resource_usage': {}
         }
     
-    def start_collection(self, interval: float = 1.0):
-        """开始收集指标"""
+    def start_collection(self, interval: float = 1.0, pid: Optional[int] = None):
+        """
+        开始收集指标
+        
+        Args:
+            interval: 收集间隔(秒)
+            pid: 被测 emqtt_bench 进程 (或启动它的 shell) 的 PID, 用于记录进程树的资源使用
+        """
+        self.bench_pid = pid
+        if pid is not None:
+            self.resource_sampler.track(id(self), pid)
         self.running = True
         self.collection_thread = threading.Thread(
             target=self._collection_loop, 
@@ -72,24 +90,28 @@ class ConnectionTestMetricsCollector:
         self.running = False
         if self.collection_thread:
             self.collection_thread.join(timeout=2)
+        self.resource_sampler.untrack(id(self))
         print("⏹️ 连接测试指标收集器已停止")
     
     def _collection_loop(self, interval: float):
-        """指标收集循环"""
-        while self.running:
+        """指标收集循环 (按绝对截止时间触发, 抓取耗时不累积成漂移)"""
+        for tick in TickScheduler(interval, lambda: self.running):
             try:
-                metrics = self._collect_metrics()
+                if tick.missed:
+                    self.missed_ticks += tick.missed
+                    self.self_metrics.inc(MISSED_TICKS, tick.missed, collector='connection')
+                    print(f"⚠️ 采集耗时超过间隔, 跳过 {tick.missed} 个周期")
+                metrics = self._collect_metrics(tick.stamp)
                 if metrics:
                     self.metrics_history.append(metrics)
                     self._update_performance_stats(metrics)
-                
-                time.sleep(interval)
             except Exception as e:
                 print(f"❌ 指标收集错误: {e}")
-                time.sleep(interval)
     
-    def _collect_metrics(self) -> Optional[ConnectionMetrics]:
-        """收集单次指标数据"""
+    def _collect_metrics(self, stamp: Optional[ScrapeStamp] = None) -> Optional[ConnectionMetrics]:
+        """收集单次指标数据, stamp 为本次抓取的时间戳 (为空时取当前时刻)"""
+        if stamp is None:
+            stamp = ScrapeStamp.now()
         try:
             # 从Prometheus端点获取指标
             prometheus_metrics = self._fetch_prometheus_metrics()
@@ -97,7 +119,8 @@ class ConnectionTestMetricsCollector:
                 return None
             
             # 解析连接相关指标
-            connection_data = self._parse_connection_metrics(prometheus_metrics)
+            with self.self_metrics.time(PARSE_SECONDS, collector='connection'):
+                connection_data = self._parse_connection_metrics(prometheus_metrics)
             
             # 获取系统资源使用情况
             system_resources = self._get_system_resources()
@@ -112,7 +135,7 @@ class ConnectionTestMetricsCollector:
             connection_rate = self._calculate_connection_rate()
             
             return ConnectionMetrics(
-                timestamp=datetime.now(),
+                timestamp=datetime.fromtimestamp(stamp.wall),
                 total_attempts=connection_data.get('total_attempts', 0),
                 successful_connections=connection_data.get('successful_connections', 0),
                 failed_connections=connection_data.get('failed_connections', 0),
@@ -132,7 +155,8 @@ class ConnectionTestMetricsCollector:
         """从Prometheus端点获取指标"""
         try:
             url = f"http://localhost:{self.prometheus_port}/metrics"
-            response = requests.get(url, timeout=5)
+            with self.self_metrics.time(SCRAPE_SECONDS, port=self.prometheus_port):
+                response = requests.get(url, timeout=5)
             if response.status_code == 200:
                 return response.text
             else:
@@ -253,39 +277,44 @@ class ConnectionTestMetricsCollector:
         return 0.0
     
     def _get_system_resources(self) -> Dict[str, float]:
-        """获取系统资源使用情况"""
+        """获取系统资源使用情况 (共享采样线程的最近快照, 不阻塞收集线程)"""
         try:
-            # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            
-            # 内存使用情况
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
+            host = self.resource_sampler.host_snapshot()
+            if not host:
+                return {}
+            network = host.get('network_io', {})
+            resources = {
+                'cpu_usage_percent': host['cpu_percent'],
+                'memory_usage_percent': host['memory_percent'],
+                'memory_used_gb': host['memory_used'] / (1024**3),
+                'memory_total_gb': host['memory_total'] / (1024**3),
+                'network_bytes_sent': network.get('bytes_sent', 0),
+                'network_bytes_recv': network.get('bytes_recv', 0)
+            }
             
-            # 文件描述符使用情况
+            # 文件描述符使用情况: 优先统计被测 emqtt_bench 进程树
+            sample = self.resource_sampler.process_snapshot(id(self)) if self.bench_pid is not None else None
             try:
-                fd_count = len(psutil.Process().open_files())
                 fd_limit = psutil.Process().rlimit(psutil.RLIMIT_NOFILE)[1]
+                if sample is not None and sample.fds is not None:
+                    fd_count = sample.fds
+                else:
+                    fd_count = len(psutil.Process().open_files())
                 fd_percent = (fd_count / fd_limit) * 100 if fd_limit > 0 else 0
             except (OSError, AttributeError):
                 fd_count = 0
                 fd_percent = 0
+            resources['file_descriptors_count'] = fd_count
+            resources['file_descriptors_percent'] = fd_percent
             
-            # 网络统计
-            network = psutil.net_io_counters()
-            network_bytes_sent = network.bytes_sent
-            network_bytes_recv = network.bytes_recv
-            
-            return {
-                'cpu_usage_percent': cpu_percent,
-                'memory_usage_percent': memory_percent,
-                'memory_used_gb': memory.used / (1024**3),
-                'memory_total_gb': memory.total / (1024**3),
-                'file_descriptors_count': fd_count,
-                'file_descriptors_percent': fd_percent,
-                'network_bytes_sent': network_bytes_sent,
-                'network_bytes_recv': network_bytes_recv
-            }
+            if sample is not None:
+                resources.update({
+                    'bench_cpu_percent': sample.cpu_percent,
+                    'bench_rss_mb': sample.rss_bytes / (1024**2),
+                    'bench_threads': sample.threads,
+                    'bench_sockets': sample.sockets,
+                })
+            return resources
         except Exception as e:
             print(f"⚠️ 获取系统资源信息失败: {e}")
             return {}
@@ -353,6 +382,7 @@ class ConnectionTestMetricsCollector:
         return {
             'test_duration': (datetime.now() - self.start_time).total_seconds(),
             'total_metrics_collected': len(self.metrics_history),
+            'missed_ticks': self.missed_ticks,
             'performance_stats': self.performance_stats,
             'connection_time_stats': time_stats,
             'error_summary': dict(total_errors),
@@ -397,6 +427,13 @@ class ConnectionTestMetricsCollector:
                 'min': min(memory_values)
             }
         
+        # 每连接内存: 最近一次 emqtt_bench 进程树 RSS / 已建立连接数
+        latest = self.metrics_history[-1]
+        rss_mb = latest.system_resources.get('bench_rss_mb')
+        connections = latest.system_resources.get('bench_sockets') or latest.successful_connections
+        if rss_mb is not None and connections:
+            summary['memory_per_connection_kb'] = rss_mb * 1024 / connections
+        
         return summary
     
     def export_metrics(self, output_file: str = None) -> str:
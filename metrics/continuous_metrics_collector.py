@@ -7,16 +7,42 @@
 """
 
 import threading
-import time
 import json
 import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any, Sequence, TextIO, Union, TYPE_CHECKING
 from dataclasses import dataclass, asdict
-from collections import deque
+from collections import Counter, deque
 from pathlib import Path
 import requests
 from rich.console import Console
+from metric_registry import registry
+from artifact_io import artifact_path, dump_json
+from resource_sampler import get_resource_sampler
+from self_metrics import (FILTER_SECONDS, MISSED_TICKS, PARSE_SECONDS, PERSIST_SECONDS, QUEUE_DEPTH, SCRAPE_SECONDS,
+                          get_self_metrics)
+from tick_scheduler import ScrapeStamp, TickScheduler
+from series_codec import (ChangeOnlyDecoder, ChangeOnlyEncoder, DEFAULT_KEYFRAME_INTERVAL,
+                          FRAME_DELTA, FRAME_KEY)
+
+if TYPE_CHECKING:
+    from timeseries_store import TimeSeriesWriter
+    from test_specific_filter import CompiledFilterRules, TestSpecificFilter
+
+# 注册表类别 -> 性能统计字段
+_CATEGORY_STAT_KEYS = {
+    'connection': 'connection_metrics',
+    'publish': 'publish_metrics',
+    'subscribe': 'subscribe_metrics',
+    'error': 'error_metrics',
+    'latency': 'latency_metrics',
+    'system': 'system_metrics'
+}
+
+# 持续指标存储格式: JSON 文件 (保存时一次写入) 或二进制时间序列文件 (采集时追加写入)
+STORAGE_JSON = 'json'
+STORAGE_BINARY = 'binary'
+STORAGE_BACKENDS = (STORAGE_JSON, STORAGE_BINARY)
 
 console = Console()
 
@@ -29,11 +55,35 @@ class ContinuousMetricData:
     metrics: List[Dict[str, Any]]
     performance_stats: Dict[str, Any]
     system_resources: Dict[str, Any]
+    filter_info: Optional[Dict[str, Any]] = None  # 采集时过滤的统计, 未启用过滤时为 None
+    frame: Optional[str] = None  # 变化编码的帧类型, 未启用变化编码时为 None (metrics 为完整列表)
+    removed: Optional[List[str]] = None  # 增量帧中已消失的序列标识
+    monotonic: Optional[float] = None  # 抓取时的单调时钟读数, 与 timestamp 出自同一次抓取
 
 class ContinuousMetricsCollector:
     """通用持续指标收集器"""
     
-    def __init__(self, base_url: str = "http://localhost"):
+    def __init__(self, base_url: str = "http://localhost",
+                 ingest_filter: Optional['TestSpecificFilter'] = None,
+                 raw_output_dir: Optional[str] = None,
+                 change_only: bool = True,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 storage_backend: str = STORAGE_JSON,
+                 output_dir: str = "reports"):
+        """
+        Args:
+            base_url: Prometheus端点基础地址
+            ingest_filter: 测试特定过滤器, 设置后每个样本在采集时即按测试类型过滤,
+                只保存与该测试相关的指标
+            raw_output_dir: 调试用, 设置后未过滤的原始样本另行追加写入该目录下的JSONL文件
+            change_only: 变化编码, 每个数据点只保存值发生变化的序列
+            keyframe_interval: 变化编码时每隔多少个数据点保存一次完整关键帧
+            storage_backend: 存储格式, json 或 binary (.cmts 二进制时间序列文件,
+                采集时逐点追加, 不受历史队列长度限制, 适合长时间压测)
+            output_dir: binary 格式下采集开始时创建文件的目录
+        """
+        if storage_backend not in STORAGE_BACKENDS:
+            raise ValueError(f"不支持的存储格式: {storage_backend}, 可选: {', '.join(STORAGE_BACKENDS)}")
         self.base_url = base_url
         self.session = requests.Session()
         self.session.timeout = 5
@@ -44,12 +94,54 @@ class ContinuousMetricsCollector:
         self.metrics_history: Dict[str, deque] = {}
         self.performance_stats: Dict[str, Dict[str, Any]] = {}
         
+        # 采集时过滤
+        self.ingest_filter = ingest_filter
+        self.raw_output_dir = raw_output_dir
+        self._ingest_rules: Dict[str, 'CompiledFilterRules'] = {}
+        self.ingest_removed: Dict[str, Counter] = {}  # 测试名 -> (指标名, 原因) 移除次数
+        self._raw_files: Dict[str, TextIO] = {}
+        self.raw_data_files: Dict[str, str] = {}  # 测试名 -> 原始样本文件路径
+        
+        # 变化编码
+        self.change_only = change_only
+        self.keyframe_interval = keyframe_interval
+        self._encoders: Dict[str, ChangeOnlyEncoder] = {}
+        self._history_base: Dict[str, ChangeOnlyDecoder] = {}  # 历史队列第一个数据点之前的重建状态
+        
+        # 二进制时间序列存储
+        self.storage_backend = storage_backend
+        self.output_dir = output_dir
+        self._writers: Dict[str, 'TimeSeriesWriter'] = {}
+        
+        # 逐点回调 (自适应时长、实时守护规则等): 测试名 -> [callback(时间戳, 过滤后的完整指标)]
+        self._sample_listeners: Dict[str, List[Callable[[float, List[Dict[str, Any]]], None]]] = {}
+        
+        # 主机与被测 emqtt_bench 进程树的资源由共享采样线程采集, 收集线程只读取最近的快照
+        self._resource_sampler = get_resource_sampler()
+        
+        # 编排程序自身开销 (抓取/解析/过滤/持久化耗时、队列深度、错过的周期)
+        self._self_metrics = get_self_metrics()
+        
         # 配置
         self.max_history_points = 1000  # 每个测试最多保留1000个数据点
         self.default_interval = 1.0  # 默认收集间隔1秒
         
-    def start_collection(self, test_name: str, port: int, interval: float = None) -> bool:
-        """开始为指定测试收集指标"""
+    def start_collection(self, test_name: str, port: int, interval: float = None,
+                         filter_type: Optional[str] = None,
+                         on_sample: Union[Callable[[float, List[Dict[str, Any]]], None],
+                                          Sequence[Callable[[float, List[Dict[str, Any]]], None]], None] = None,
+                         pid: Optional[int] = None) -> bool:
+        """
+        开始为指定测试收集指标
+
+        Args:
+            test_name: 测试名称
+            port: Prometheus端口
+            interval: 收集间隔(秒)
+            filter_type: 采集时过滤使用的测试类型, 默认与测试名称相同
+            on_sample: 每采集到一个数据点时在收集线程中调用的回调 (或回调列表), 参数为 (Unix 时间戳, 过滤后的完整指标列表)
+            pid: 被测 emqtt_bench 进程 (或启动它的 shell) 的 PID, 用于记录进程树的 CPU、内存、文件描述符和套接字
+        """
         if interval is None:
             interval = self.default_interval
             
@@ -59,13 +151,40 @@ class ContinuousMetricsCollector:
             
         # 初始化测试数据存储
         self.metrics_history[test_name] = deque(maxlen=self.max_history_points)
+        if self.change_only:
+            self._encoders[test_name] = ChangeOnlyEncoder(self.keyframe_interval)
+            self._history_base[test_name] = ChangeOnlyDecoder()
         self.performance_stats[test_name] = {
             'start_time': datetime.now(),
             'total_metrics_collected': 0,
             'last_collection_time': None,
-            'collection_errors': 0
+            'collection_errors': 0,
+            'missed_ticks': 0,
+            'raw_metrics_seen': 0,
+            'metrics_kept': 0
         }
         
+        # 按测试类型准备采集时过滤规则
+        if self.ingest_filter is not None:
+            self._ingest_rules[test_name] = self.ingest_filter.get_rules(filter_type or test_name)
+            self.ingest_removed[test_name] = Counter()
+            if self.raw_output_dir:
+                self._open_raw_file(test_name)
+        
+        if self.storage_backend == STORAGE_BINARY:
+            self._open_store_writer(test_name, port)
+        
+        listeners = [on_sample] if callable(on_sample) else [listener for listener in on_sample or () if listener]
+        if listeners:
+            self._sample_listeners[test_name] = listeners
+        else:
+            self._sample_listeners.pop(test_name, None)
+        
+        if pid is not None:
+            self._resource_sampler.track((id(self), test_name), pid)
+        else:
+            self._resource_sampler.untrack((id(self), test_name))
+        
         # 启动收集线程
         self.running = True
         thread = threading.Thread(
@@ -94,6 +213,12 @@ class ContinuousMetricsCollector:
         
         # 清理
         del self.collection_threads[test_name]
+        self._sample_listeners.pop(test_name, None)
+        self._resource_sampler.untrack((id(self), test_name))
+        self._close_raw_file(test_name)
+        writer = self._writers.get(test_name)
+        if writer is not None:
+            writer.flush()
         # if test_name in self.metrics_history:
         #     del self.metrics_history[test_name]
         # if test_name in self.performance_stats:
@@ -110,14 +235,25 @@ class ContinuousMetricsCollector:
         console.print("⏹️ [blue]已停止所有指标收集[/blue]")
     
     def _collection_loop(self, test_name: str, port: int, interval: float):
-        """指标收集循环"""
-        while self.running and test_name in self.collection_threads:
+        """指标收集循环 (按绝对截止时间触发, 抓取耗时不累积成漂移)"""
+        scheduler = TickScheduler(interval, lambda: self.running and test_name in self.collection_threads)
+        for tick in scheduler:
             try:
+                if tick.missed:
+                    self.performance_stats[test_name]['missed_ticks'] += tick.missed
+                    self._self_metrics.inc(MISSED_TICKS, tick.missed, collector='continuous')
+                    console.print(f"[yellow]⚠️ {test_name} 采集耗时超过间隔, 跳过 {tick.missed} 个周期[/yellow]")
+                
                 # 收集指标
-                metrics_data = self._collect_single_metrics(test_name, port)
+                metrics_data = self._collect_single_metrics(test_name, port, tick.stamp)
                 if metrics_data:
-                    # 存储到历史数据
-                    self.metrics_history[test_name].append(metrics_data)
+                    # 存储到历史数据 (队列满时被挤出的数据点并入重建状态)
+                    history = self.metrics_history[test_name]
+                    base = self._history_base.get(test_name)
+                    if base is not None and len(history) == history.maxlen:
+                        base.apply(self._to_point(history[0]))
+                    history.append(metrics_data)
+                    self._self_metrics.set_gauge(QUEUE_DEPTH, len(history), queue=test_name)
                     
                     # 更新性能统计
                     self._update_performance_stats(test_name, metrics_data)
@@ -126,47 +262,152 @@ class ContinuousMetricsCollector:
                     if len(self.metrics_history[test_name]) % 10 == 0:  # 每10次显示一次
                         console.print(f"📊 [dim]{test_name}: 已收集 {len(self.metrics_history[test_name])} 个数据点[/dim]")
                 
-                time.sleep(interval)
-                
             except Exception as e:
                 console.print(f"❌ [red]{test_name} 指标收集错误: {e}[/red]")
                 if test_name in self.performance_stats:
                     self.performance_stats[test_name]['collection_errors'] += 1
-                time.sleep(interval)
     
-    def _collect_single_metrics(self, test_name: str, port: int) -> Optional[ContinuousMetricData]:
-        """收集单次指标数据"""
+    def _collect_single_metrics(self, test_name: str, port: int,
+                                stamp: Optional[ScrapeStamp] = None) -> Optional[ContinuousMetricData]:
+        """
+        收集单次指标数据
+
+        Args:
+            test_name: 测试名称
+            port: Prometheus端口
+            stamp: 本次抓取的时间戳, 为空时取当前时刻
+        """
+        if stamp is None:
+            stamp = ScrapeStamp.now()
         try:
             # 从Prometheus端点获取指标
             url = f"{self.base_url}:{port}/metrics"
-            response = self.session.get(url)
+            with self._self_metrics.time(SCRAPE_SECONDS, port=port):
+                response = self.session.get(url)
             response.raise_for_status()
 
             # 解析指标
-            metrics = self._parse_metrics(response.text)
+            with self._self_metrics.time(PARSE_SECONDS, collector='continuous'):
+                metrics = self._parse_metrics(response.text)
             # print('[DEBUG]', test_name, response.text)
             if not metrics:
                 return None
             
+            # 同一次抓取的所有指标、资源和回调共用一个时间戳
+            timestamp = stamp.isoformat()
+            sample_ts = stamp.wall
+            
+            # 采集时按测试类型过滤, 只保留与该测试相关的指标
+            filter_info = None
+            rules = self._ingest_rules.get(test_name)
+            if rules is not None:
+                self._write_raw_sample(test_name, timestamp, port, metrics)
+                original_count = len(metrics)
+                with self._self_metrics.time(FILTER_SECONDS, collector='continuous'):
+                    metrics = rules.filter_metrics(metrics, self.ingest_removed[test_name])
+                filter_info = {
+                    "original_count": original_count,
+                    "filtered_count": len(metrics),
+                    "removed_count": original_count - len(metrics),
+                    "stage": "ingest",
+                    "rules_version": self.ingest_filter.rules_version
+                }
+            
             # 获取系统资源
-            system_resources = self._get_system_resources()
+            system_resources = self._get_system_resources(test_name)
             
             # 计算性能统计
             performance_stats = self._calculate_performance_stats(metrics)
             
+            # 二进制存储自行做变化编码, 写入完整指标
+            writer = self._writers.get(test_name)
+            if writer is not None:
+                with self._self_metrics.time(PERSIST_SECONDS, target='store'):
+                    writer.append(sample_ts, metrics, system_resources)
+            
+            for listener in self._sample_listeners.get(test_name, ()):
+                listener(sample_ts, metrics)
+            
+            # 变化编码: 只保存值发生变化的序列
+            frame, removed = None, None
+            encoder = self._encoders.get(test_name)
+            if encoder is not None:
+                frame, metrics, removed = encoder.encode(metrics)
+            
             return ContinuousMetricData(
-                timestamp=datetime.now().isoformat(),
+                timestamp=timestamp,
                 test_name=test_name,
                 port=port,
                 metrics=metrics,
                 performance_stats=performance_stats,
-                system_resources=system_resources
+                system_resources=system_resources,
+                filter_info=filter_info,
+                frame=frame,
+                removed=removed or None,
+                monotonic=stamp.monotonic
             )
             
         except Exception as e:
             console.print(f"❌ [red]收集 {test_name} 指标失败: {e}[/red]")
             return None
     
+    def _open_raw_file(self, test_name: str):
+        """打开原始样本文件 (JSONL, 每行一个未过滤的数据点)"""
+        try:
+            os.makedirs(self.raw_output_dir, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"continuous_raw_{test_name.lower().replace(' ', '_')}_{timestamp}.jsonl"
+            filepath = os.path.join(self.raw_output_dir, filename)
+            self._raw_files[test_name] = open(filepath, 'a', encoding='utf-8')
+            self.raw_data_files[test_name] = filepath
+        except OSError as e:
+            console.print(f"[yellow]⚠️ 无法创建原始样本文件, 不保存 {test_name} 的原始数据: {e}[/yellow]")
+    
+    def _write_raw_sample(self, test_name: str, timestamp: str, port: int, metrics: List[Dict[str, Any]]):
+        """追加一个未过滤的原始样本"""
+        raw_file = self._raw_files.get(test_name)
+        if raw_file is None:
+            return
+        try:
+            with self._self_metrics.time(PERSIST_SECONDS, target='raw'):
+                raw_file.write(json.dumps({'timestamp': timestamp, 'test_name': test_name, 'port': port,
+                                           'metrics': metrics}, ensure_ascii=False) + '\n')
+        except (OSError, ValueError):
+            pass
+    
+    def _close_raw_file(self, test_name: str):
+        """关闭原始样本文件"""
+        raw_file = self._raw_files.pop(test_name, None)
+        if raw_file is not None:
+            raw_file.close()
+            console.print(f"📝 [dim]{test_name} 原始样本已保存: {self.raw_data_files.get(test_name)}[/dim]")
+    
+    def _open_store_writer(self, test_name: str, port: int):
+        """创建二进制时间序列文件, 采集过程中逐点追加"""
+        from timeseries_store import STORE_SUFFIX, TimeSeriesWriter
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"continuous_metrics_{test_name.lower().replace(' ', '_')}_{timestamp}{STORE_SUFFIX}"
+        filepath = os.path.join(self.output_dir, filename)
+        self._writers[test_name] = TimeSeriesWriter(filepath, test_name, port, self.keyframe_interval)
+    
+    def _save_store_data(self, test_name: str, output_dir: str) -> str:
+        """关闭二进制时间序列文件, 需要时移动到输出目录"""
+        writer = self._writers.pop(test_name)
+        writer.close()
+        filepath = writer.file_path
+        if os.path.abspath(os.path.dirname(filepath)) != os.path.abspath(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+            target = os.path.join(output_dir, os.path.basename(filepath))
+            os.replace(filepath, target)
+            filepath = target
+        
+        size_mb = os.path.getsize(filepath) / 1024 / 1024
+        console.print(f"💾 [green]已保存 {test_name} 持续指标数据: {filepath} "
+                      f"({writer.samples} 个数据点, {size_mb:.1f} MB)[/green]")
+        self._print_ingest_summary(test_name, list(self.metrics_history.get(test_name, ())))
+        return filepath
+    
     def _parse_metrics(self, metrics_text: str) -> List[Dict[str, Any]]:
         """解析Prometheus格式的指标数据"""
         metrics = []
@@ -228,24 +469,22 @@ class ContinuousMetricsCollector:
             'metric_type': metric_type
         }
     
-    def _get_system_resources(self) -> Dict[str, Any]:
-        """获取系统资源使用情况"""
-        try:
-            import psutil
-            
-            return {
-                'cpu_percent': psutil.cpu_percent(),
-                'memory_percent': psutil.virtual_memory().percent,
-                'disk_percent': psutil.disk_usage('/').percent,
-                'network_io': psutil.net_io_counters()._asdict() if hasattr(psutil.net_io_counters(), '_asdict') else {}
-            }
-        except ImportError:
+    def _get_system_resources(self, test_name: Optional[str] = None) -> Dict[str, Any]:
+        """获取系统资源使用情况 (共享采样线程的最近快照, 不阻塞收集线程)"""
+        resources = self._resource_sampler.host_snapshot()
+        if not resources:
             return {
                 'cpu_percent': 0.0,
                 'memory_percent': 0.0,
                 'disk_percent': 0.0,
                 'network_io': {}
             }
+        resources.pop('memory_used', None)
+        resources.pop('memory_total', None)
+        sample = self._resource_sampler.process_snapshot((id(self), test_name))
+        if sample is not None:
+            resources.update(sample.as_resources())
+        return resources
     
     def _calculate_performance_stats(self, metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
         """计算性能统计"""
@@ -259,28 +498,11 @@ class ContinuousMetricsCollector:
             'system_metrics': 0
         }
         
+        # 按统一的指标注册表分类
         for metric in metrics:
-            name = metric.get('name', '').lower()
-            
-            # 连接相关指标（精确匹配）
-            if name in ['connect_succ', 'connect_retried', 'reconnect_succ', 'connection_idle']:
-                stats['connection_metrics'] += 1
-            # 发布相关指标
-            elif name in ['pub', 'pub_succ', 'pub_overrun', 'publish_latency']:
-                stats['publish_metrics'] += 1
-            # 订阅相关指标
-            elif name in ['sub', 'recv']:
-                stats['subscribe_metrics'] += 1
-            # 错误相关指标
-            elif name in ['connect_fail', 'pub_fail', 'sub_fail', 'unreachable', 
-                          'connection_refused', 'connection_timeout']:
-                stats['error_metrics'] += 1
-            # 延迟相关指标（直方图）
-            elif 'duration' in name or 'latency' in name or name == 'e2e_latency':
-                stats['latency_metrics'] += 1
-            # 系统资源指标
-            elif name.startswith('erlang_vm_') or name.startswith('system_'):
-                stats['system_metrics'] += 1
+            stat_key = _CATEGORY_STAT_KEYS.get(registry.lookup(metric.get('name', '')).category)
+            if stat_key:
+                stats[stat_key] += 1
         
         return stats
     
@@ -292,12 +514,58 @@ class ContinuousMetricsCollector:
         stats = self.performance_stats[test_name]
         stats['total_metrics_collected'] += 1
         stats['last_collection_time'] = metrics_data.timestamp
+        if metrics_data.filter_info:
+            stats['raw_metrics_seen'] += metrics_data.filter_info['original_count']
+            stats['metrics_kept'] += metrics_data.filter_info['filtered_count']
     
     def get_test_history(self, test_name: str) -> List[ContinuousMetricData]:
-        """获取指定测试的历史数据"""
+        """获取指定测试的历史数据 (变化编码的数据点重建为完整指标列表)"""
         if test_name not in self.metrics_history:
             return []
-        return list(self.metrics_history[test_name])
+        history = list(self.metrics_history[test_name])
+        base = self._history_base.get(test_name)
+        if base is None:
+            return history
+        
+        decoder = base.copy()
+        full_history = []
+        for data_point in history:
+            if data_point.frame is None:
+                full_history.append(data_point)
+                continue
+            decoder.apply(self._to_point(data_point))
+            full_history.append(ContinuousMetricData(
+                timestamp=data_point.timestamp,
+                test_name=data_point.test_name,
+                port=data_point.port,
+                metrics=decoder.current_metrics(),
+                performance_stats=data_point.performance_stats,
+                system_resources=data_point.system_resources,
+                filter_info=data_point.filter_info,
+                monotonic=data_point.monotonic
+            ))
+        return full_history
+    
+    @staticmethod
+    def _to_point(data_point: ContinuousMetricData) -> Dict[str, Any]:
+        """转换为持续指标文件中的数据点格式"""
+        point = {
+            'timestamp': data_point.timestamp,
+            'test_name': data_point.test_name,
+            'port': data_point.port,
+            'metrics': data_point.metrics,
+            'performance_stats': data_point.performance_stats,
+            'system_resources': data_point.system_resources
+        }
+        if data_point.filter_info is not None:
+            point['filter_info'] = data_point.filter_info
+        if data_point.frame is not None:
+            point['frame'] = data_point.frame
+        if data_point.removed:
+            point['removed'] = data_point.removed
+        if data_point.monotonic is not None:
+            point['monotonic'] = data_point.monotonic
+        return point
     
     def get_test_summary(self, test_name: str) -> Dict[str, Any]:
         """获取指定测试的摘要信息"""
@@ -305,7 +573,7 @@ class ContinuousMetricsCollector:
             return {}
             
         stats = self.performance_stats[test_name]
-        history = self.get_test_history(test_name)
+        history = self.metrics_history.get(test_name, ())
         
         return {
             'test_name': test_name,
@@ -313,46 +581,64 @@ class ContinuousMetricsCollector:
             'total_collections': stats['total_metrics_collected'],
             'last_collection': stats['last_collection_time'],
             'collection_errors': stats['collection_errors'],
+            'missed_ticks': stats.get('missed_ticks', 0),
             'history_points': len(history),
-            'is_running': test_name in self.collection_threads
+            'is_running': test_name in self.collection_threads,
+            'ingest_filtered': test_name in self._ingest_rules,
+            'raw_metrics_seen': stats.get('raw_metrics_seen', 0),
+            'metrics_kept': stats.get('metrics_kept', 0)
         }
     
     def save_test_data(self, test_name: str, output_dir: str = "reports") -> str:
-        """保存测试数据到文件"""
+        """保存测试数据到文件 (binary 格式下关闭采集时追加写入的文件)"""
+        if test_name in self._writers:
+            return self._save_store_data(test_name, output_dir)
         if test_name not in self.metrics_history:
             return ""
             
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
-        # 获取历史数据
-        history = self.get_test_history(test_name)
+        # 获取历史数据 (保持变化编码)
+        history = list(self.metrics_history[test_name])
         if not history:
             return ""
         
         # 转换为可序列化格式
-        serializable_data = []
-        for data_point in history:
-            serializable_data.append({
-                'timestamp': data_point.timestamp,
-                'test_name': data_point.test_name,
-                'port': data_point.port,
-                'metrics': data_point.metrics,
-                'performance_stats': data_point.performance_stats,
-                'system_resources': data_point.system_resources
-            })
+        serializable_data = [self._to_point(data_point) for data_point in history]
+        
+        # 文件必须从关键帧开始: 历史队列开头的增量帧按之前的状态重建为关键帧
+        first = serializable_data[0]
+        if first.get('frame') == FRAME_DELTA and test_name in self._history_base:
+            first = self._history_base[test_name].copy().decode(first)
+            first['frame'] = FRAME_KEY
+            serializable_data[0] = first
         
         # 保存到文件
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"continuous_metrics_{test_name.lower().replace(' ', '_')}_{timestamp}.json"
-        filepath = os.path.join(output_dir, filename)
+        filepath = artifact_path(os.path.join(output_dir, filename))
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(serializable_data, f, indent=2, ensure_ascii=False)
+        with self._self_metrics.time(PERSIST_SECONDS, target='json'):
+            dump_json(serializable_data, filepath)
         
         console.print(f"💾 [green]已保存 {test_name} 持续指标数据: {filepath} ({len(history)} 个数据点)[/green]")
+        self._print_ingest_summary(test_name, history)
         return filepath
     
+    def _print_ingest_summary(self, test_name: str, history: List[ContinuousMetricData]):
+        """显示采集时过滤的统计"""
+        original = sum(point.filter_info['original_count'] for point in history if point.filter_info)
+        if not original:
+            return
+        kept = sum(point.filter_info['filtered_count'] for point in history if point.filter_info)
+        console.print(f"[dim]  • 采集时过滤: 原始指标 {original}, 保留 {kept}, "
+                      f"移除 {original - kept} ({(original - kept) / original * 100:.1f}%)[/dim]")
+    
+    def is_ingest_filtered(self, test_name: str) -> bool:
+        """指定测试的数据是否已在采集时过滤"""
+        return test_name in self._ingest_rules
+    
     def get_all_summaries(self) -> Dict[str, Dict[str, Any]]:
         """获取所有测试的摘要信息"""
         summaries = {}
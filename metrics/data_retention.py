@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+测试数据保留策略
+近期的运行保留完整分辨率, 较早运行的持续数据按 10秒 / 1分钟 聚合 (min/max/avg/last) 保存在数据库中,
+原始分辨率的文件随之删除; 超过最长保留期的运行连同全部关联数据一起删除, 最后增量回收数据库空间。
+累计型指标 (计数器和直方图的 _bucket/_sum/_count) 取聚合窗口内的 last 即为合并后的值,
+长期趋势分析不受影响, 数据库也不会无限增长
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from archive_filter import iter_continuous_points
+from run_catalog import RunCatalog
+
+# 保留级别
+LEVEL_FULL = 0
+LEVEL_10S = 10
+LEVEL_1M = 60
+
+# 聚合分辨率 (秒)
+ROLLUP_RESOLUTIONS = (LEVEL_10S, LEVEL_1M)
+
+# 引用 test_results.id 的子表 (表名 -> 外键列), 删除运行时按此顺序级联删除
+CHILD_TABLES = {
+    'metrics_data': 'test_result_id',
+    'continuous_data': 'test_result_id',
+    'continuous_rollup': 'test_result_id',
+    'run_retention': 'test_result_id',
+    'run_catalog': 'test_id'
+}
+
+_DAY_SECONDS = 24 * 60 * 60
+
+
+@dataclass
+class RetentionPolicy:
+    """保留策略 (按运行开始时间计算天数)"""
+    full_resolution_days: int = 7  # 保留完整分辨率的天数
+    rollup_10s_days: int = 90  # 10秒聚合保留的天数, 之后合并为1分钟聚合
+    rollup_1m_days: int = 365  # 1分钟聚合保留的天数, 之后删除整个运行
+    delete_files: bool = True  # 降为聚合后删除原始分辨率的文件
+    vacuum_pages: Optional[int] = 2000  # 每次增量回收的页数上限, None 表示全部回收
+
+    def __post_init__(self):
+        if self.full_resolution_days < 0:
+            raise ValueError("完整分辨率保留天数不能为负数")
+        self.rollup_10s_days = max(self.rollup_10s_days, self.full_resolution_days)
+        self.rollup_1m_days = max(self.rollup_1m_days, self.rollup_10s_days)
+
+    def target_level(self, age_days: float) -> Optional[int]:
+        """运行应处的保留级别, None 表示应删除"""
+        if age_days >= self.rollup_1m_days:
+            return None
+        if age_days >= self.rollup_10s_days:
+            return LEVEL_1M
+        if age_days >= self.full_resolution_days:
+            return LEVEL_10S
+        return LEVEL_FULL
+
+
+@dataclass
+class RetentionReport:
+    """一次保留策略执行的结果"""
+    rolled_up_10s: List[int] = field(default_factory=list)
+    rolled_up_1m: List[int] = field(default_factory=list)
+    deleted_runs: List[int] = field(default_factory=list)
+    rollup_rows: int = 0
+    deleted_rows: int = 0
+    orphan_rows: int = 0
+    deleted_files: int = 0
+    freed_bytes: int = 0
+    vacuumed_pages: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
+def rollup_samples(samples: Iterable[Tuple[float, str, str, float]],
+                   resolution: int) -> Dict[Tuple[int, str, str], List[float]]:
+    """
+    把样本聚合到固定时间窗口
+
+    Args:
+        samples: (时间戳秒, 指标名, 标签JSON, 值)
+        resolution: 窗口大小 (秒)
+
+    Returns:
+        (窗口开始时间, 指标名, 标签JSON) -> [min, max, sum, count, last, last_ts]
+    """
+    buckets: Dict[Tuple[int, str, str], List[float]] = {}
+    for ts, name, labels, value in samples:
+        key = (int(ts // resolution) * resolution, name, labels)
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [value, value, value, 1, value, ts]
+            continue
+        agg[0] = min(agg[0], value)
+        agg[1] = max(agg[1], value)
+        agg[2] += value
+        agg[3] += 1
+        if ts >= agg[5]:
+            agg[4], agg[5] = value, ts
+    return buckets
+
+
+def merge_rollup_rows(rows: Iterable[Tuple[int, str, str, float, float, float, float, int]],
+                      resolution: int) -> Dict[Tuple[int, str, str], List[float]]:
+    """
+    把较细的聚合合并为较粗的聚合 (avg 按样本数加权, last 取最晚窗口的值)
+
+    Args:
+        rows: (窗口开始时间, 指标名, 标签JSON, min, max, avg, last, 样本数)
+        resolution: 目标窗口大小 (秒)
+
+    Returns:
+        与 rollup_samples 相同结构
+    """
+    buckets: Dict[Tuple[int, str, str], List[float]] = {}
+    for bucket_start, name, labels, min_value, max_value, avg_value, last_value, count in rows:
+        key = (int(bucket_start // resolution) * resolution, name, labels)
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [min_value, max_value, avg_value * count, count, last_value, bucket_start]
+            continue
+        agg[0] = min(agg[0], min_value)
+        agg[1] = max(agg[1], max_value)
+        agg[2] += avg_value * count
+        agg[3] += count
+        if bucket_start >= agg[5]:
+            agg[4], agg[5] = last_value, bucket_start
+    return buckets
+
+
+class RetentionEngine:
+    """按保留策略对测试数据库和数据文件做降采样、级联删除和空间回收"""
+
+    def __init__(self, db_path: Path, base_dir: Path, policy: Optional[RetentionPolicy] = None):
+        self.db_path = db_path
+        self.base_dir = base_dir
+        self.policy = policy or RetentionPolicy()
+        self.catalog = RunCatalog(db_path)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """创建聚合表和保留级别表"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS continuous_rollup (
+                test_result_id INTEGER NOT NULL,
+                resolution INTEGER NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                metric_name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                min_value REAL NOT NULL,
+                max_value REAL NOT NULL,
+                avg_value REAL NOT NULL,
+                last_value REAL NOT NULL,
+                sample_count INTEGER NOT NULL,
+                PRIMARY KEY (test_result_id, resolution, bucket_start, metric_name, labels),
+                FOREIGN KEY (test_result_id) REFERENCES test_results (id) ON DELETE CASCADE
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_retention (
+                test_result_id INTEGER PRIMARY KEY,
+                level INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (test_result_id) REFERENCES test_results (id) ON DELETE CASCADE
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_metrics_data_run ON metrics_data (test_result_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_continuous_data_run ON continuous_data (test_result_id)')
+
+    def apply(self, now: Optional[float] = None) -> RetentionReport:
+        """
+        执行保留策略
+
+        Args:
+            now: 当前时间 (Unix 秒), 默认系统时间
+
+        Returns:
+            执行结果
+        """
+        now = time.time() if now is None else now
+        report = RetentionReport()
+
+        conn = self.catalog.connect()
+        try:
+            self.ensure_schema(conn)
+            run_files = self.catalog.files(conn)
+            runs = conn.execute('''
+                SELECT r.id, r.start_time, r.created_at, r.continuous_data_file,
+                       COALESCE(s.level, 0)
+                FROM test_results r LEFT JOIN run_retention s ON s.test_result_id = r.id
+                ORDER BY r.id
+            ''').fetchall()
+
+            for run_id, start_time, created_at, continuous_file, level in runs:
+                age_days = (now - _run_timestamp(start_time, created_at, now)) / _DAY_SECONDS
+                target = self.policy.target_level(age_days)
+                try:
+                    if target is None:
+                        self._delete_run(conn, run_id, continuous_file, run_files.get(run_id, {}), report)
+                        continue
+                    if level < LEVEL_10S <= target:
+                        self._rollup_full(conn, run_id, continuous_file, report)
+                    if level < LEVEL_1M <= target:
+                        self._rollup_coarse(conn, run_id, report)
+                    conn.commit()
+                except Exception as e:
+                    conn.rollback()
+                    report.errors.append((run_id, str(e)))
+                    continue
+                # 聚合和级别变更提交后才删除原始文件, 失败回滚时原始数据仍在
+                if level < LEVEL_10S <= target:
+                    self._remove_full_resolution_files(continuous_file, run_files.get(run_id, {}), report)
+                    report.rolled_up_10s.append(run_id)
+                if level < LEVEL_1M <= target:
+                    report.rolled_up_1m.append(run_id)
+
+            report.orphan_rows = self._delete_orphans(conn)
+            conn.commit()
+            self._remove_expired_untracked_files(now, run_files, report)
+            report.vacuumed_pages = self._incremental_vacuum(conn)
+        finally:
+            conn.close()
+        return report
+
+    # ---- 降采样 ----
+
+    def _rollup_full(self, conn: sqlite3.Connection, run_id: int, continuous_file: Optional[str],
+                     report: RetentionReport):
+        """完整分辨率 -> 10秒聚合: 读取数据库中的持续数据和持续指标文件"""
+        def samples():
+            for timestamp, name, labels, value in conn.execute(
+                    'SELECT timestamp, metric_name, labels, metric_value FROM continuous_data '
+                    'WHERE test_result_id = ?', (run_id,)).fetchall():
+                ts = _parse_timestamp(timestamp)
+                if ts is not None:
+                    yield ts, name, labels or '{}', float(value)
+            if continuous_file and os.path.exists(continuous_file):
+                for point in iter_continuous_points(continuous_file):
+                    ts = _parse_timestamp(point.get('timestamp'))
+                    if ts is None:
+                        continue
+                    for metric in point.get('metrics', []):
+                        try:
+                            value = float(metric.get('value', 0))
+                        except (TypeError, ValueError):
+                            continue
+                        yield (ts, metric.get('name', ''),
+                               json.dumps(metric.get('labels', {}), sort_keys=True, ensure_ascii=False), value)
+
+        buckets = rollup_samples(samples(), LEVEL_10S)
+        report.rollup_rows += self._write_rollup(conn, run_id, LEVEL_10S, buckets)
+        report.deleted_rows += conn.execute('DELETE FROM continuous_data WHERE test_result_id = ?',
+                                            (run_id,)).rowcount
+        self._set_level(conn, run_id, LEVEL_10S)
+
+    def _rollup_coarse(self, conn: sqlite3.Connection, run_id: int, report: RetentionReport):
+        """10秒聚合 -> 1分钟聚合"""
+        rows = conn.execute('''
+            SELECT bucket_start, metric_name, labels, min_value, max_value, avg_value, last_value, sample_count
+            FROM continuous_rollup WHERE test_result_id = ? AND resolution = ?
+        ''', (run_id, LEVEL_10S)).fetchall()
+        buckets = merge_rollup_rows(rows, LEVEL_1M)
+        report.rollup_rows += self._write_rollup(conn, run_id, LEVEL_1M, buckets)
+        report.deleted_rows += conn.execute(
+            'DELETE FROM continuous_rollup WHERE test_result_id = ? AND resolution = ?',
+            (run_id, LEVEL_10S)).rowcount
+        self._set_level(conn, run_id, LEVEL_1M)
+
+    @staticmethod
+    def _write_rollup(conn: sqlite3.Connection, run_id: int, resolution: int,
+                      buckets: Dict[Tuple[int, str, str], List[float]]) -> int:
+        conn.executemany('''
+            INSERT OR REPLACE INTO continuous_rollup (
+                test_result_id, resolution, bucket_start, metric_name, labels,
+                min_value, max_value, avg_value, last_value, sample_count
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(run_id, resolution, bucket_start, name, labels,
+               agg[0], agg[1], agg[2] / agg[3], agg[4], int(agg[3]))
+              for (bucket_start, name, labels), agg in buckets.items()])
+        return len(buckets)
+
+    @staticmethod
+    def _set_level(conn: sqlite3.Connection, run_id: int, level: int):
+        conn.execute('INSERT OR REPLACE INTO run_retention (test_result_id, level, updated_at) VALUES (?, ?, ?)',
+                     (run_id, level, datetime.now().isoformat()))
+
+    # ---- 删除 ----
+
+    def _delete_run(self, conn: sqlite3.Connection, run_id: int, continuous_file: Optional[str],
+                    files: Dict[str, str], report: RetentionReport):
+        """删除运行及其全部关联数据 (子表先于 test_results 删除)"""
+        for table, column in CHILD_TABLES.items():
+            report.deleted_rows += conn.execute(f'DELETE FROM {table} WHERE {column} = ?', (run_id,)).rowcount
+        report.deleted_rows += conn.execute('DELETE FROM test_results WHERE id = ?', (run_id,)).rowcount
+        conn.commit()
+        report.deleted_runs.append(run_id)
+        if self.policy.delete_files:
+            for path in [continuous_file, *files.values()]:
+                self._unlink(path, report)
+
+    def _remove_full_resolution_files(self, continuous_file: Optional[str], files: Dict[str, str],
+                                      report: RetentionReport):
+        """降为聚合后删除原始分辨率的文件 (持续指标文件、原始JSON、指标CSV), 保留性能摘要"""
+        if not self.policy.delete_files:
+            return
+        for path in (continuous_file, files.get('json'), files.get('csv')):
+            self._unlink(path, report)
+
+    @staticmethod
+    def _delete_orphans(conn: sqlite3.Connection) -> int:
+        """清理已删除运行遗留的子表数据"""
+        deleted = 0
+        for table, column in CHILD_TABLES.items():
+            deleted += conn.execute(
+                f'DELETE FROM {table} WHERE {column} IS NULL '
+                f'OR {column} NOT IN (SELECT id FROM test_results)').rowcount
+        return deleted
+
+    def _remove_expired_untracked_files(self, now: float, run_files: Dict[int, Dict[str, str]],
+                                        report: RetentionReport):
+        """数据目录中没有对应运行记录、且超过最长保留期的文件按修改时间删除"""
+        if not self.policy.delete_files:
+            return
+        tracked = {os.path.abspath(path) for files in run_files.values() for path in files.values()}
+        cutoff = now - self.policy.rollup_1m_days * _DAY_SECONDS
+        for dir_name in ('raw_data', 'metrics', 'analysis'):
+            dir_path = self.base_dir / dir_name
+            if not dir_path.is_dir():
+                continue
+            for file_path in dir_path.iterdir():
+                if (file_path.is_file() and os.path.abspath(file_path) not in tracked
+                        and file_path.stat().st_mtime < cutoff):
+                    self._unlink(str(file_path), report)
+
+    @staticmethod
+    def _unlink(path: Optional[str], report: RetentionReport):
+        if not path or not os.path.isfile(path):
+            return
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        report.deleted_files += 1
+        report.freed_bytes += size
+
+    # ---- 空间回收 ----
+
+    def _incremental_vacuum(self, conn: sqlite3.Connection) -> int:
+        """
+        增量回收空闲页; 旧数据库首次执行时切换为增量自动回收模式 (需要一次完整 VACUUM)
+
+        Returns:
+            回收的页数
+        """
+        freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+            return freelist
+        pages = freelist if self.policy.vacuum_pages is None else min(freelist, self.policy.vacuum_pages)
+        if pages:
+            conn.execute(f'PRAGMA incremental_vacuum({int(pages)})')
+        return pages
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_timestamp(start_time: Optional[str], created_at: Optional[str], default: float) -> float:
+    """运行时间: 优先使用开始时间, 其次使用入库时间"""
+    for value in (start_time, created_at):
+        ts = _parse_timestamp(value)
+        if ts is not None:
+            return ts
+    return default
+
+
+def format_report(report: RetentionReport) -> List[str]:
+    """保留策略执行结果的摘要行"""
+    lines = [
+        f"降为10秒聚合: {len(report.rolled_up_10s)} 个运行",
+        f"降为1分钟聚合: {len(report.rolled_up_1m)} 个运行",
+        f"删除运行: {len(report.deleted_runs)} 个",
+        f"写入聚合行: {report.rollup_rows}, 删除数据行: {report.deleted_rows}, 清理孤立数据行: {report.orphan_rows}",
+        f"删除文件: {report.deleted_files} 个 ({report.freed_bytes / 1024 / 1024:.1f} MB)",
+        f"回收数据库页: {report.vacuumed_pages}"
+    ]
+    for run_id, error in report.errors:
+        lines.append(f"运行 {run_id} 处理失败: {error}")
+    return lines
@@ -18,6 +18,7 @@ from rich.prompt import Prompt, Confirm
 from rich.progress import Progress, SpinnerColumn, TextColumn
 
 from test_data_manager import TestDataManager, TestData
+from artifact_io import glob_artifacts
 
 console = Console()
 
@@ -63,11 +64,24 @@ class DataViewer:
             else:
                 console.print("[red]❌ 无效选择，请重新输入[/red]")
     
-    def show_all_tests(self):
-        """显示所有测试记录"""
+    def show_all_tests(self, limit: int = 200):
+        """显示测试记录 (从运行目录按条件查询, 开始时间倒序)"""
         console.print("\n[blue]📋 所有测试记录[/blue]")
         
-        all_tests = self.data_manager.get_all_tests()
+        test_types = self.data_manager.catalog.test_types()
+        if test_types:
+            console.print(f"[dim]测试类型: {', '.join(test_types)}[/dim]")
+        test_type = Prompt.ask("按测试类型筛选 (留空为全部)", default="").strip() or None
+        days = Prompt.ask("只看最近几天 (留空为全部)", default="").strip()
+        since = None
+        if days:
+            try:
+                since = datetime.now().timestamp() - float(days) * 24 * 60 * 60
+            except ValueError:
+                console.print("[yellow]⚠️ 天数无效, 显示全部时间范围[/yellow]")
+        
+        total = self.data_manager.catalog.count(test_type=test_type, since=since)
+        all_tests = self.data_manager.find_tests(test_type=test_type, since=since, limit=limit)
         if not all_tests:
             console.print("[yellow]⚠️ 暂无测试数据[/yellow]")
             return
@@ -97,7 +111,10 @@ class DataViewer:
             )
         
         console.print(table)
-        console.print(f"\n[dim]共 {len(all_tests)} 条测试记录[/dim]")
+        if total > len(all_tests):
+            console.print(f"\n[dim]共 {total} 条测试记录, 显示最近 {len(all_tests)} 条[/dim]")
+        else:
+            console.print(f"\n[dim]共 {total} 条测试记录[/dim]")
     
     def show_test_details(self):
         """显示特定测试详情"""
@@ -227,9 +244,11 @@ class DataViewer:
         console.print("  [green]1.[/green] JSON格式")
         console.print("  [green]2.[/green] CSV格式")
         console.print("  [green]3.[/green] Excel格式")
+        console.print("  [green]4.[/green] Parquet格式 (列式, 含持续时间序列)")
+        console.print("  [green]5.[/green] Arrow格式 (列式, 含持续时间序列)")
         
         format_choice = Prompt.ask("请选择", default="1")
-        format_map = {"1": "json", "2": "csv", "3": "excel"}
+        format_map = {"1": "json", "2": "csv", "3": "excel", "4": "parquet", "5": "arrow"}
         export_format = format_map.get(format_choice, "json")
         
         try:
@@ -316,16 +335,17 @@ class DataViewer:
         """清理旧数据"""
         console.print("\n[blue]🧹 清理旧数据[/blue]")
         
-        days = Prompt.ask("请输入要保留的天数", default="30")
+        console.print("[dim]超过保留天数的运行降为 10秒/1分钟 聚合, 超过一年的运行连同关联数据一起删除[/dim]")
+        days = Prompt.ask("请输入保留完整分辨率的天数", default="30")
         try:
             days = int(days)
             if days < 1:
                 console.print("[red]❌ 保留天数必须大于0[/red]")
                 return
             
-            if Confirm.ask(f"确定要清理 {days} 天前的数据吗？"):
+            if Confirm.ask(f"确定要对 {days} 天前的数据执行保留策略吗？"):
                 self.data_manager.cleanup_old_data(days)
-                console.print(f"[green]✅ 已清理 {days} 天前的数据[/green]")
+                console.print(f"[green]✅ 已按保留策略处理 {days} 天前的数据[/green]")
             else:
                 console.print("[yellow]取消清理操作[/yellow]")
                 
@@ -346,8 +366,8 @@ class DataViewer:
         
         # 统计文件数量
         stats = {
-            'raw_data': len(list((data_dir / "raw_data").glob("*.json"))),
-            'metrics': len(list((data_dir / "metrics").glob("*.csv"))),
+            'raw_data': len(glob_artifacts(str(data_dir / "raw_data" / "*.json"))),
+            'metrics': len(glob_artifacts(str(data_dir / "metrics" / "*.csv"))),
             'analysis': len(list((data_dir / "analysis").glob("*.json"))),
             'database_size': (data_dir / "database" / "test_data.db").stat().st_size if (data_dir / "database" / "test_data.db").exists() else 0
         }
@@ -371,8 +391,7 @@ class DataViewer:
         console.print(f"    📂 raw_data/ - 原始测试数据")
         console.print(f"    📂 metrics/ - 指标数据")
         console.print(f"    📂 analysis/ - 分析报告")
-        console.print(f"    📂 database/ - SQLite数据库")
-        console.print(f"    📄 data_index.json - 数据索引")
+        console.print(f"    📂 database/ - SQLite数据库 (含运行目录 run_catalog)")
 
 def main():
     """主函数"""
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+时间序列降采样工具
+提供 LTTB (Largest-Triangle-Three-Buckets) 和 min/max 降采样,
+使任意时间范围的数据都能以有限数量的点绘制
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+DEFAULT_MAX_POINTS = 500
+
+
+def lttb_indices(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    计算 LTTB 降采样后保留的点的下标
+
+    Args:
+        xs: 横坐标 (通常为时间戳, 需单调递增)
+        ys: 纵坐标
+        threshold: 目标点数
+
+    Returns:
+        保留点的下标列表 (升序, 包含首尾点)
+    """
+    n = len(xs)
+    if threshold >= n:
+        return list(range(n))
+    if threshold < 3:
+        # 点数过少时只保留首尾
+        return [0, n - 1][:max(threshold, 0)]
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        # 下一个桶的平均点, 作为三角形的第三个顶点
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / next_count
+        avg_y = sum(ys[next_start:next_end]) / next_count
+
+        # 当前桶中与上一个选中点、下一个桶平均点构成最大三角形的点
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        max_area = -1.0
+        selected = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                selected = j
+
+        indices.append(selected)
+        a = selected
+
+    indices.append(n - 1)
+    return indices
+
+
+def minmax_indices(ys: Sequence[float], threshold: int) -> List[int]:
+    """
+    计算 min/max 降采样后保留的点的下标
+
+    每个桶保留最小值和最大值两个点, 适合需要保留尖峰的错误类指标。
+
+    Args:
+        ys: 纵坐标
+        threshold: 目标点数
+
+    Returns:
+        保留点的下标列表 (升序)
+    """
+    n = len(ys)
+    if threshold >= n:
+        return list(range(n))
+
+    bucket_count = max(1, threshold // 2)
+    bucket_size = n / bucket_count
+    indices = []
+    for i in range(bucket_count):
+        start = int(i * bucket_size)
+        end = min(int((i + 1) * bucket_size), n)
+        if start >= end:
+            continue
+        bucket = range(start, end)
+        low = min(bucket, key=lambda j: ys[j])
+        high = max(bucket, key=lambda j: ys[j])
+        indices.extend(sorted({low, high}))
+    return indices
+
+
+def downsample(points: Sequence[Point], max_points: int = DEFAULT_MAX_POINTS, method: str = "lttb") -> List[Point]:
+    """
+    对 (x, y) 点序列降采样
+
+    Args:
+        points: 按 x 升序排列的点
+        max_points: 最多保留的点数
+        method: 降采样方法, "lttb" 或 "minmax"
+
+    Returns:
+        降采样后的点列表
+    """
+    if len(points) <= max_points:
+        return list(points)
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    if method == "minmax":
+        indices = minmax_indices(ys, max_points)
+    else:
+        indices = lttb_indices(xs, ys, max_points)
+    return [points[i] for i in indices]
+
+
+def downsample_records(records: Sequence[Dict[str, Any]], x_key: str, y_key: str,
+                       max_points: int = DEFAULT_MAX_POINTS, method: str = "lttb") -> List[Dict[str, Any]]:
+    """
+    按主序列对记录列表降采样, 同一记录的其他字段随之保留
+
+    Args:
+        records: 按 x_key 升序排列的记录
+        x_key: 横坐标字段
+        y_key: 用于选择保留点的主序列字段
+        max_points: 最多保留的记录数
+        method: 降采样方法, "lttb" 或 "minmax"
+
+    Returns:
+        降采样后的记录列表
+    """
+    if len(records) <= max_points:
+        return list(records)
+
+    xs = [float(r.get(x_key, 0) or 0) for r in records]
+    ys = [float(r.get(y_key, 0) or 0) for r in records]
+    if method == "minmax":
+        indices = minmax_indices(ys, max_points)
+    else:
+        indices = lttb_indices(xs, ys, max_points)
+    return [records[i] for i in indices]
+
+
+def slice_by_time(points: Sequence[Any], start: Optional[float] = None, end: Optional[float] = None,
+                  key: Callable[[Any], float] = lambda p: p[0]) -> List[Any]:
+    """
+    截取 [start, end] 时间范围内的数据
+
+    Args:
+        points: 按时间升序排列的数据
+        start: 起始时间戳 (秒), None 表示不限
+        end: 结束时间戳 (秒), None 表示不限
+        key: 从数据项中取时间戳的函数
+
+    Returns:
+        时间范围内的数据
+    """
+    return [p for p in points
+            if (start is None or key(p) >= start) and (end is None or key(p) <= end)]
@@ -68,6 +68,25 @@ class TestConfig:
     # 测试配置
     test_duration: int = 30
     emqtt_bench_path: str = "emqtt_bench"
+    keep_raw_metrics: bool = False  # 调试用: 持续收集时另存未过滤的原始样本
+    continuous_storage: str = "json"  # 持续指标存储格式: json 或 binary (.cmts 内存映射时间序列, 适合长时间压测)
+    artifact_compression: str = "none"  # 测试产物压缩格式: none/auto/zstd/gzip (auto 优先 zstd, 未安装时用 gzip)
+    fail_on_regression: bool = False  # 检测到相对历史基线的性能回归时以非零退出码退出 (夜间任务把关)
+    trial_count: int = 1  # 每个测试重复执行的次数, 大于 1 时报告均值、标准差和置信区间
+    trial_interleave: bool = True  # 重复试验按轮次交错执行不同测试 (A B A B), 否则连续重复 (A A B B)
+    trial_max_cv: float = 0.1  # 试验间变异系数超过该值时建议增加试验次数
+    adaptive_duration: bool = False  # 自适应时长: 速率进入稳态且估计收敛后提前结束测试, test_duration 为最长时长
+    adaptive_tolerance: float = 0.05  # 收敛条件: 吞吐量和延迟估计的 95% 置信区间半宽 / 均值
+    adaptive_min_duration: int = 15  # 自适应时长下每个测试至少运行的秒数
+    live_guard: bool = True  # 实时守护规则: 错误比例过高、消息停滞、pub_overrun 增长、应收消息却收不到时提前结束测试
+    guard_action: str = "skip"  # 规则触发后: skip 跳过当前测试, abort 终止剩余测试, warn 只提示
+    guard_grace_period: int = 10  # 采集开始后多少秒内不检查规则
+    guard_max_error_ratio: float = 0.5  # 最近 5 秒 失败 / (失败 + 成功) 的上限
+    guard_stall_seconds: int = 15  # 发布/接收计数停止增长多少秒视为停滞
+    guard_max_overrun_ratio: float = 0.1  # 最近 5 秒 pub_overrun 增量 / 发布增量 的上限
+    guard_recv_timeout: int = 30  # 华为云订阅/广播测试多少秒内仍未收到消息视为失败
+    self_metrics_port: int = 9190  # 编排程序自身指标的 Prometheus 端口, 0 表示不开启端点 (报告中仍汇总)
+    self_metrics_addr: str = "127.0.0.1"  # 自身指标端点的监听地址, 默认只允许本机访问, 远程抓取时改为 0.0.0.0
     
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
@@ -6,35 +6,65 @@
 日期: 2025-09-28
 """
 
-import json
 import os
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterable, List, Any, Optional
 from pathlib import Path
 from rich.console import Console
+from metric_registry import registry
+from analysis_frame import AnalysisFrame, TestSeries, test_name_from_filename
+from report_cache import ReportCache
+from saturation import format_markdown as format_saturation_markdown
+from self_metrics import format_markdown as format_self_metrics_markdown
 
 console = Console()
 
+# 注册表类别 -> 趋势分析分组
+_TREND_GROUPS = {
+    'connection': 'connection_metrics',
+    'publish': 'publish_metrics',
+    'subscribe': 'subscribe_metrics',
+    'error': 'error_metrics'
+}
+
+# 发布详细分析使用的计数器
+_PUBLISH_DETAIL_FIELDS = {
+    'pub_succ': 'published_total',
+    'pub_fail': 'publish_fail_total',
+    'pub': 'publish_total'
+}
+
 class EnhancedMarkdownGenerator:
     """增强版Markdown报告生成器"""
     
-    def __init__(self, reports_dir: str = "reports"):
+    def __init__(self, reports_dir: str = "reports", cache: Optional[ReportCache] = None):
         self.reports_dir = Path(reports_dir)
         self.reports_dir.mkdir(exist_ok=True)
+        self.cache = cache
     
     def generate_continuous_analysis_report(self, continuous_data_files: List[str], 
                                          test_results: List[Any], 
-                                         start_time: datetime) -> str:
-        """生成基于持续收集数据的分析报告"""
+                                         start_time: datetime,
+                                         analysis_frame: Optional[AnalysisFrame] = None,
+                                         test_analyses: Optional[Dict[str, Dict[str, Any]]] = None,
+                                         saturation_report: Any = None, self_metrics: Any = None) -> str:
+        """生成基于持续收集数据的分析报告
+
+        test_analyses 为已在后台完成的各测试分析 (持续指标文件 -> 分析数据), 可直接复用;
+        saturation_report 为压测机自饱和分析结果 (saturation.SaturationReport);
+        self_metrics 为编排程序自身开销汇总 (self_metrics.SelfMetricsSnapshot)
+        """
         
         console.print("[blue]📊 生成增强版持续数据分析报告...[/blue]")
         
-        # 分析持续数据
-        continuous_analysis = self._analyze_continuous_data(continuous_data_files)
+        # 分析持续数据 (未传入共享分析数据帧时自行加载一次)
+        if analysis_frame is None:
+            analysis_frame = AnalysisFrame.load([], continuous_data_files)
+        continuous_analysis = self._analyze_continuous_data(continuous_data_files, analysis_frame, test_analyses or {})
         
         # 生成报告内容
         report_content = self._generate_report_content(
-            continuous_analysis, test_results, start_time
+            continuous_analysis, test_results, start_time, saturation_report, self_metrics
         )
         
         # 保存报告
@@ -47,7 +77,8 @@ class EnhancedMarkdownGenerator:
         console.print(f"[green]✅ 增强版持续数据分析报告已生成: {report_file}[/green]")
         return str(report_file)
     
-    def _analyze_continuous_data(self, continuous_data_files: List[str]) -> Dict[str, Any]:
+    def _analyze_continuous_data(self, continuous_data_files: List[str], analysis_frame: AnalysisFrame,
+                                 test_analyses: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
         """分析持续收集的数据"""
         analysis = {
             'total_tests': len(continuous_data_files),
@@ -59,47 +90,72 @@ class EnhancedMarkdownGenerator:
             }
         }
         
+        analysis['section_keys'] = {}
+        
         for data_file in continuous_data_files:
             if not os.path.exists(data_file):
                 continue
                 
             test_name = self._extract_test_name_from_filename(data_file)
-            test_analysis = self._analyze_single_test_data(data_file)
+            test_analysis = test_analyses.get(data_file) or self.analyze_test_file(data_file, analysis_frame)
+            if test_analysis is None:
+                continue
             analysis['test_analyses'][test_name] = test_analysis
+            analysis['section_keys'][test_name] = self._cache_key(data_file)
             analysis['overall_stats']['total_data_points'] += test_analysis.get('total_points', 0)
         
         return analysis
     
+    def _cache_key(self, data_file: str) -> Optional[str]:
+        """持续指标文件内容对应的缓存键, 未启用缓存时为 None"""
+        if self.cache is None or not self.cache.enabled:
+            return None
+        return self.cache.make_key([data_file])
+    
+    def analyze_test_file(self, data_file: str, analysis_frame: Optional[AnalysisFrame] = None) -> Optional[Dict[str, Any]]:
+        """分析单个持续指标文件, 文件内容未变化时直接使用缓存的分析结果"""
+        cache_key = self._cache_key(data_file)
+        if cache_key is not None:
+            cached = self.cache.get('continuous_analysis', cache_key)
+            if cached is not None:
+                return cached
+        
+        if analysis_frame is None:
+            analysis_frame = AnalysisFrame.load([], [data_file])
+        series = analysis_frame.get_series(data_file)
+        if series is None:
+            return None
+        
+        test_analysis = self._analyze_single_test_data(series)
+        if cache_key is not None and 'analysis' not in test_analysis:
+            self.cache.put('continuous_analysis', cache_key, test_analysis)
+        return test_analysis
+    
     def _extract_test_name_from_filename(self, filename: str) -> str:
         """从文件名提取测试名称"""
         # 文件名格式: continuous_metrics_测试名_时间戳.json
-        parts = Path(filename).stem.split('_')
-        if len(parts) >= 3:
-            return '_'.join(parts[2:-1])  # 排除 'continuous', 'metrics' 和时间戳
-        return "未知测试"
+        return test_name_from_filename(filename)
     
-    def _analyze_single_test_data(self, data_file: str) -> Dict[str, Any]:
+    def _analyze_single_test_data(self, series: TestSeries) -> Dict[str, Any]:
         """分析单个测试的持续数据"""
         try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            
+            data = series.points
             if not data:
                 return {'total_points': 0, 'analysis': '无数据'}
             
             # 基本统计
-            total_points = len(data)
-            start_time = data[0]['timestamp'] if data else None
-            end_time = data[-1]['timestamp'] if data else None
+            total_points = series.total_points
+            start_time = series.start_time
+            end_time = series.end_time
             
-            # 分析指标趋势
-            metrics_trends = self._analyze_metrics_trends(data)
+            # 分析指标趋势 (按需重建完整数据点)
+            metrics_trends = self._analyze_metrics_trends(series.iter_frames())
             
             # 分析性能变化
             performance_analysis = self._analyze_performance_changes(data)
             
             # 分析系统资源使用
-            system_resources_analysis = self._analyze_system_resources(data)
+            system_resources_analysis = self._analyze_system_resources(series)
             
             return {
                 'total_points': total_points,
@@ -108,14 +164,15 @@ class EnhancedMarkdownGenerator:
                 'metrics_trends': metrics_trends,
                 'performance_analysis': performance_analysis,
                 'system_resources_analysis': system_resources_analysis,
-                'data_quality': self._assess_data_quality(data)
+                'data_quality': self._assess_data_quality(series.iter_frames()),
+                'rate_quantiles': self._summarize_rate_quantiles(series)
             }
             
         except Exception as e:
-            console.print(f"[red]❌ 分析数据文件 {data_file} 失败: {e}[/red]")
+            console.print(f"[red]❌ 分析数据文件 {series.source_file} 失败: {e}[/red]")
             return {'total_points': 0, 'analysis': f'分析失败: {e}'}
     
-    def _analyze_metrics_trends(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_metrics_trends(self, data: Iterable[Dict]) -> Dict[str, Any]:
         """分析指标趋势"""
         if not data:
             return {}
@@ -140,28 +197,22 @@ class EnhancedMarkdownGenerator:
         for point in data:
             metrics = point.get('metrics', [])
             for metric in metrics:
-                name = metric.get('name', '').lower()
+                name = metric.get('name', '')
                 value = metric.get('value', 0)
                 
-                if 'connect' in name:
-                    key_metrics['connection_metrics'].append(value)
-                elif 'pub' in name or 'publish' in name:
-                    key_metrics['publish_metrics'].append(value)
-                    # 详细分析发布指标
-                    if 'published_total' in name or 'pub_succ' in name:
-                        publish_analysis['published_total'].append(value)
-                    elif 'publish_fail_total' in name or 'pub_fail' in name:
-                        publish_analysis['publish_fail_total'].append(value)
-                    elif 'publish_total' in name or 'pub' in name:
-                        publish_analysis['publish_total'].append(value)
-                    elif 'publish_rate' in name:
-                        publish_analysis['publish_rate'].append(value)
-                    elif 'throughput_bytes' in name:
-                        publish_analysis['throughput_bytes'].append(value)
-                elif 'sub' in name or 'subscribe' in name:
-                    key_metrics['subscribe_metrics'].append(value)
-                elif 'error' in name or 'fail' in name:
-                    key_metrics['error_metrics'].append(value)
+                # 按统一的指标注册表分组
+                group = _TREND_GROUPS.get(registry.lookup(name).category)
+                if group:
+                    key_metrics[group].append(value)
+                
+                # 详细分析发布指标
+                detail_field = _PUBLISH_DETAIL_FIELDS.get(name)
+                if detail_field:
+                    publish_analysis[detail_field].append(value)
+                elif 'publish_rate' in name:
+                    publish_analysis['publish_rate'].append(value)
+                elif 'throughput_bytes' in name:
+                    publish_analysis['throughput_bytes'].append(value)
         
         # 计算趋势
         trends = {}
@@ -270,55 +321,47 @@ class EnhancedMarkdownGenerator:
             'avg_total_metrics': sum(total_metrics) / len(total_metrics) if total_metrics else 0
         }
     
-    def _analyze_system_resources(self, data: List[Dict]) -> Dict[str, Any]:
+    def _analyze_system_resources(self, series: TestSeries) -> Dict[str, Any]:
         """分析系统资源使用"""
-        if not data:
-            return {}
-        
-        cpu_usage = []
-        memory_usage = []
-        
-        for point in data:
-            resources = point.get('system_resources', {})
-            if 'cpu_percent' in resources:
-                cpu_usage.append(resources['cpu_percent'])
-            if 'memory_percent' in resources:
-                memory_usage.append(resources['memory_percent'])
-        
         analysis = {}
-        if cpu_usage:
-            analysis['cpu'] = {
-                'avg': sum(cpu_usage) / len(cpu_usage),
-                'max': max(cpu_usage),
-                'min': min(cpu_usage),
-                'trend': self._calculate_trend(cpu_usage)
-            }
-        
-        if memory_usage:
-            analysis['memory'] = {
-                'avg': sum(memory_usage) / len(memory_usage),
-                'max': max(memory_usage),
-                'min': min(memory_usage),
-                'trend': self._calculate_trend(memory_usage)
+        for key, column in (('cpu', 'cpu_percent'), ('memory', 'memory_percent')):
+            usage = series.resources[column].dropna()
+            if usage.empty:
+                continue
+            analysis[key] = {
+                'avg': float(usage.mean()),
+                'max': float(usage.max()),
+                'min': float(usage.min()),
+                'trend': self._calculate_trend(usage.tolist())
             }
         
         return analysis
     
-    def _assess_data_quality(self, data: List[Dict]) -> Dict[str, Any]:
+    def _summarize_rate_quantiles(self, series: TestSeries) -> Dict[str, Dict[str, float]]:
+        """从预计算的分位数中提取关键速率 (消息/秒)"""
+        summary = {}
+        for name in ('pub', 'pub_succ', 'recv', 'connect_succ', 'pub_fail'):
+            if name in series.quantiles.columns:
+                column = series.quantiles[name]
+                summary[name] = {f"p{int(q * 100)}": float(value) for q, value in column.items()}
+        return summary
+    
+    def _assess_data_quality(self, data: Iterable[Dict]) -> Dict[str, Any]:
         """评估数据质量"""
-        if not data:
-            return {'quality': '无数据', 'score': 0}
-        
-        total_points = len(data)
+        total_points = 0
         valid_points = 0
         metrics_counts = []
         
         for point in data:
+            total_points += 1
             metrics = point.get('metrics', [])
             if metrics:
                 valid_points += 1
                 metrics_counts.append(len(metrics))
         
+        if not total_points:
+            return {'quality': '无数据', 'score': 0}
+        
         completeness = valid_points / total_points if total_points > 0 else 0
         avg_metrics_per_point = sum(metrics_counts) / len(metrics_counts) if metrics_counts else 0
         
@@ -343,7 +386,8 @@ class EnhancedMarkdownGenerator:
             'valid_points': valid_points
         }
     
-    def _generate_report_content(self, continuous_analysis: Dict, test_results: List, start_time: datetime) -> str:
+    def _generate_report_content(self, continuous_analysis: Dict, test_results: List, start_time: datetime,
+                                 saturation_report: Any = None, self_metrics: Any = None) -> str:
         """生成报告内容"""
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
@@ -363,19 +407,45 @@ class EnhancedMarkdownGenerator:
 
 ---
 
+## 🖥️ 压测机饱和分析
+
+{format_saturation_markdown(saturation_report)}
+
+---
+
+## 🔬 测量工具自身开销
+
+{format_self_metrics_markdown(self_metrics)}
+
+---
+
 ## 🔍 详细分析
 
 """
         
         # 为每个测试生成详细分析
+        section_keys = continuous_analysis.get('section_keys', {})
         for test_name, analysis in continuous_analysis['test_analyses'].items():
-            content += self._generate_test_analysis_section(test_name, analysis)
+            content += self._render_cached_section(section_keys.get(test_name), test_name, analysis)
         
         # 添加总结
         content += self._generate_summary_section(continuous_analysis)
         
         return content
     
+    def _render_cached_section(self, cache_key: Optional[str], test_name: str, analysis: Dict) -> str:
+        """渲染单个测试的分析部分, 输入未变化时直接复用缓存的渲染结果"""
+        if cache_key is not None:
+            section_key = f"{cache_key}-{test_name}"
+            cached = self.cache.get('continuous_section', section_key)
+            if cached is not None:
+                return cached
+        
+        section = self._generate_test_analysis_section(test_name, analysis)
+        if cache_key is not None:
+            self.cache.put('continuous_section', section_key, section)
+        return section
+    
     def _generate_test_analysis_section(self, test_name: str, analysis: Dict) -> str:
         """生成单个测试的分析部分"""
         section = f"""### 🧪 {test_name} 持续数据分析
@@ -417,6 +487,15 @@ class EnhancedMarkdownGenerator:
             section += f"- **发布指标趋势**: {performance.get('publish_metrics_trend', '未知')}\n"
             section += f"- **峰值指标数**: {performance.get('peak_total_metrics', 0)}\n\n"
         
+        # 速率分位数
+        rate_quantiles = analysis.get('rate_quantiles', {})
+        if rate_quantiles:
+            section += "**速率分位数 (/秒)**:\n"
+            for name, quantiles in rate_quantiles.items():
+                section += f"- **{registry.lookup(name).display_name}** ({name}): " + ", ".join(
+                    f"{label} {value:.1f}" for label, value in quantiles.items()) + "\n"
+            section += "\n"
+        
         # 系统资源分析
         system_resources = analysis.get('system_resources_analysis', {})
         if system_resources:
@@ -16,16 +16,31 @@ import random
 import statistics
 from collections import defaultdict
 from utils import safe_divide, safe_percentage, safe_float, validate_metrics_data
+from downsampling import downsample_records, DEFAULT_MAX_POINTS
+from metric_registry import registry
+from analysis_frame import AnalysisFrame
+from regression import STATUS_IMPROVED, STATUS_INSUFFICIENT, STATUS_REGRESSION
+from saturation import format_microstates
+from self_metrics import MISSED_TICKS, QUEUE_DEPTH
 
 class EnhancedReportGenerator:
     """增强版HTML报告生成器"""
     
-    def __init__(self, test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str = "reports"):
+    def __init__(self, test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str = "reports",
+                 continuous_data_files: Optional[List[str]] = None, max_trend_points: int = DEFAULT_MAX_POINTS,
+                 analysis_frame: Optional[AnalysisFrame] = None, regression_report: Any = None,
+                 saturation_report: Any = None, self_metrics: Any = None):
         self.test_results = test_results
         self.all_metrics_data = all_metrics_data
         self.start_time = start_time
         self.report_timestamp = datetime.now()
         self.reports_dir = reports_dir
+        self.continuous_data_files = continuous_data_files or []
+        self.max_trend_points = max_trend_points
+        self.analysis_frame = analysis_frame
+        self.regression_report = regression_report  # regression.RegressionReport, 与历史基线的比较结果
+        self.saturation_report = saturation_report  # saturation.SaturationReport, 压测机自饱和分析
+        self.self_metrics = self_metrics  # self_metrics.SelfMetricsSnapshot, 编排程序自身开销
         
         # 确保报告目录存在
         os.makedirs(self.reports_dir, exist_ok=True)
@@ -89,7 +104,6 @@ class EnhancedReportGenerator:
             for metric in metrics:
                 # 处理不同的指标格式
                 if isinstance(metric, dict):
-                    metric_name = metric.get('name', '').lower()
                     metric_value = self._safe_float(metric.get('value', 0))
                     metric_type = metric.get('metric_type', 'unknown')
                     metric_help = metric.get('help_text', '')
@@ -97,45 +111,10 @@ class EnhancedReportGenerator:
                     # 如果是其他格式，跳过
                     continue
                 
-                # 性能指标
-                if any(keyword in metric_name for keyword in ['latency', 'throughput', 'rate', 'duration', 'time']):
-                    analysis['performance_metrics'][metric.get('name', '')] = {
-                        'value': metric_value,
-                        'test': test_name,
-                        'type': metric_type,
-                        'help': metric_help
-                    }
-                
-                # 连接指标
-                elif any(keyword in metric_name for keyword in ['connect', 'connection', 'client', 'session']):
-                    analysis['connection_metrics'][metric.get('name', '')] = {
-                        'value': metric_value,
-                        'test': test_name,
-                        'type': metric_type,
-                        'help': metric_help
-                    }
-                
-                # MQTT指标
-                elif any(keyword in metric_name for keyword in ['mqtt', 'publish', 'subscribe', 'message', 'pub', 'sub', 'handshake']):
-                    analysis['mqtt_metrics'][metric.get('name', '')] = {
-                        'value': metric_value,
-                        'test': test_name,
-                        'type': metric_type,
-                        'help': metric_help
-                    }
-                
-                # 系统指标
-                elif any(keyword in metric_name for keyword in ['cpu', 'memory', 'disk', 'network', 'system']):
-                    analysis['system_metrics'][metric.get('name', '')] = {
-                        'value': metric_value,
-                        'test': test_name,
-                        'type': metric_type,
-                        'help': metric_help
-                    }
-                
-                # 错误指标
-                elif any(keyword in metric_name for keyword in ['error', 'fail', 'exception', 'timeout']):
-                    analysis['error_metrics'][metric.get('name', '')] = {
+                # 按统一的指标注册表归入 性能/连接/MQTT/系统/错误 分组
+                report_group = registry.lookup(metric.get('name', '')).report_group
+                if report_group:
+                    analysis[f'{report_group}_metrics'][metric.get('name', '')] = {
                         'value': metric_value,
                         'test': test_name,
                         'type': metric_type,
@@ -158,7 +137,16 @@ class EnhancedReportGenerator:
         return safe_float(value)
     
     def _generate_trend_data(self) -> Dict[str, List]:
-        """生成趋势数据"""
+        """生成趋势数据
+
+        有持续指标文件时基于完整时间序列计算, 并用LTTB降采样到有限点数;
+        否则生成模拟数据。
+        """
+        if self.continuous_data_files:
+            trend_data = self._generate_trend_data_from_continuous()
+            if trend_data['performance']:
+                return trend_data
+        
         trend_data = {
             'timeline': [],
             'performance': [],
@@ -197,6 +185,28 @@ class EnhancedReportGenerator:
         
         return trend_data
     
+    def _generate_trend_data_from_continuous(self) -> Dict[str, List]:
+        """从共享分析数据帧生成降采样后的趋势数据"""
+        records = self._get_analysis_frame().trend_records(self.continuous_data_files)
+        
+        # 性能和连接趋势用LTTB保留形状, 错误用min/max保留尖峰
+        performance = downsample_records(records['performance'], 'ts', 'throughput', self.max_trend_points)
+        connections = downsample_records(records['connections'], 'ts', 'active', self.max_trend_points)
+        errors = downsample_records(records['errors'], 'ts', 'rate', self.max_trend_points, method='minmax')
+        
+        return {
+            'timeline': [item['time'] for item in performance],
+            'performance': performance,
+            'connections': connections,
+            'errors': errors
+        }
+    
+    def _get_analysis_frame(self) -> AnalysisFrame:
+        """获取分析数据帧, 未传入时按持续指标文件加载一次"""
+        if self.analysis_frame is None:
+            self.analysis_frame = AnalysisFrame.load([], self.continuous_data_files)
+        return self.analysis_frame
+    
     def _generate_alerts(self, analysis: Dict) -> List[Dict]:
         """生成告警信息"""
         alerts = []
@@ -237,6 +247,37 @@ class EnhancedReportGenerator:
                 'icon': '❌'
             })
         
+        # 检查跨运行性能回归
+        if self.regression_report is not None:
+            for run, item in self.regression_report.regressions:
+                alerts.append({
+                    'level': 'critical',
+                    'title': '性能回归告警',
+                    'message': f'{run.test_name} {item.label} {item.current:.2f} {item.unit}，'
+                               f'较历史基线 {item.baseline:.2f} 变差 {abs(item.change_pct):.1f}% (p={item.p_value:.4f})',
+                    'icon': '📉'
+                })
+        
+        # 检查压测机自饱和 (压测机是瓶颈时结果不反映服务器性能)
+        if self.saturation_report is not None:
+            for result in self.saturation_report.saturated:
+                alerts.append({
+                    'level': 'warning',
+                    'title': '压测机饱和',
+                    'message': f'{result.test_name} 运行期间 emqtt_bench 已饱和，结果反映的是压测机上限：'
+                               f'{"；".join(result.reasons)}',
+                    'icon': '🖥️'
+                })
+        
+        # 检查采集是否跟不上采集间隔 (测量工具自身干扰了采样)
+        if self.self_metrics is not None and self.self_metrics.missed_ticks:
+            alerts.append({
+                'level': 'warning',
+                'title': '采集周期丢失',
+                'message': f'编排程序采集耗时超过采集间隔，共错过 {self.self_metrics.missed_ticks} 个采集周期',
+                'icon': '🔬'
+            })
+        
         # 如果没有告警，添加成功信息
         if not alerts:
             alerts.append({
@@ -273,11 +314,11 @@ class EnhancedReportGenerator:
             
             for metric in metrics:
                 if isinstance(metric, dict):
-                    metric_name = metric.get('name', '').lower()
                     metric_value = self._safe_float(metric.get('value', 0))
+                    metric_info = registry.lookup(metric.get('name', ''))
                     
-                    # 连接建立相关指标
-                    if any(keyword in metric_name for keyword in ['connect', 'connection']):
+                    # 连接建立相关指标 (含连接失败和连接时长)
+                    if metric_info.scope == 'connection':
                         connection_metrics.append({
                             'name': metric.get('name', ''),
                             'value': metric_value,
@@ -285,7 +326,7 @@ class EnhancedReportGenerator:
                         })
                     
                     # 错误相关指标
-                    elif any(keyword in metric_name for keyword in ['fail', 'error']):
+                    elif metric_info.is_error:
                         error_metrics.append({
                             'name': metric.get('name', ''),
                             'value': metric_value,
@@ -293,7 +334,7 @@ class EnhancedReportGenerator:
                         })
                     
                     # 性能相关指标
-                    elif any(keyword in metric_name for keyword in ['time', 'duration', 'latency']):
+                    elif metric_info.category == 'latency':
                         performance_metrics.append({
                             'name': metric.get('name', ''),
                             'value': metric_value,
@@ -1379,8 +1420,196 @@ class EnhancedReportGenerator:
         </div>
         """
         
+        html += self._generate_regression_panel()
+        html += self._generate_saturation_panel()
+        html += self._generate_self_metrics_panel()
+        
         return html
     
+    def _generate_regression_panel(self) -> str:
+        """生成跨运行回归检测面板"""
+        if self.regression_report is None or not self.regression_report.runs:
+            return ""
+        
+        status_badges = {
+            STATUS_REGRESSION: ('error', '🚨 回归'),
+            STATUS_IMPROVED: ('success', '📈 提升'),
+            STATUS_INSUFFICIENT: ('warning', '⏳ 基线不足')
+        }
+        rows = ""
+        for run in self.regression_report.runs:
+            for item in run.comparisons:
+                status_class, status_text = status_badges.get(item.status, ('success', '✅ 正常'))
+                change = '-' if math.isnan(item.change_pct) else f"{item.change_pct:+.1f}%"
+                baseline = '-' if math.isnan(item.baseline) else f"{item.baseline:.2f}"
+                ci = '-' if math.isnan(item.ci_low) else f"{item.ci_low:.2f} ~ {item.ci_high:.2f}"
+                p_value = '-' if math.isnan(item.p_value) else f"{item.p_value:.4f}"
+                rows += f"""
+                        <tr>
+                            <td>{run.test_name}</td>
+                            <td class="metric-name">{item.label} ({item.unit})</td>
+                            <td class="metric-value">{item.current:.2f}</td>
+                            <td>{baseline}</td>
+                            <td>{ci}</td>
+                            <td>{change}</td>
+                            <td>{p_value}</td>
+                            <td>{item.baseline_runs}</td>
+                            <td><span class="status-indicator status-{status_class}"></span>{status_text}</td>
+                        </tr>
+                """
+        
+        return f"""
+        <div class="panel">
+            <div class="panel-header">
+                <h3 class="panel-title">📉 跨运行回归检测</h3>
+            </div>
+            <div class="panel-content">
+                <table class="metrics-table">
+                    <thead>
+                        <tr>
+                            <th>测试</th>
+                            <th>指标</th>
+                            <th>当前</th>
+                            <th>基线中位数</th>
+                            <th>基线置信区间</th>
+                            <th>变化</th>
+                            <th>p 值</th>
+                            <th>基线运行数</th>
+                            <th>结论</th>
+                        </tr>
+                    </thead>
+                    <tbody>{rows}
+                    </tbody>
+                </table>
+                <small style="color: #95a5a6;">基线为配置相同的最近历史运行, 当前值和基线均为逐区间样本的中位数, 变化以变好为正</small>
+            </div>
+        </div>
+        """
+    
+    def _generate_saturation_panel(self) -> str:
+        """生成压测机自饱和分析面板"""
+        if self.saturation_report is None:
+            return ""
+        results = [result for result in self.saturation_report.results if result.has_data]
+        if not results:
+            return ""
+        
+        def percent(value, scale=1.0):
+            return '-' if value is None else f"{value * scale:.0f}%"
+        
+        rows = ""
+        for result in results:
+            if result.saturated:
+                status = f'<span class="status-indicator status-warning"></span>⚠️ 饱和: {"; ".join(result.reasons)}'
+            else:
+                status = '<span class="status-indicator status-success"></span>✅ 正常'
+            utilization = '-'
+            if result.utilization is not None:
+                utilization = f"{percent(result.utilization, 100)} / {percent(result.utilization_p95, 100)} ({result.utilization_source})"
+            run_queue = '-' if result.run_queue is None else f"{result.run_queue:.2f}"
+            memory = '-' if result.memory_per_connection is None else f"{result.memory_per_connection / 1024:.1f} KB"
+            cpu = '-' if result.cpu_per_message is None else f"{result.cpu_per_message:.1f} µs"
+            rows += f"""
+                        <tr>
+                            <td>{result.test_name}</td>
+                            <td class="metric-value">{utilization}</td>
+                            <td>{format_microstates(result)}</td>
+                            <td>{run_queue}</td>
+                            <td>{percent(result.bench_cpu)}</td>
+                            <td>{percent(result.host_cpu)}</td>
+                            <td>{percent(result.host_load)}</td>
+                            <td class="metric-value">{memory}</td>
+                            <td class="metric-value">{cpu}</td>
+                            <td>{status}</td>
+                        </tr>
+                """
+        
+        return f"""
+        <div class="panel">
+            <div class="panel-header">
+                <h3 class="panel-title">🖥️ 压测机饱和分析</h3>
+            </div>
+            <div class="panel-content">
+                <table class="metrics-table">
+                    <thead>
+                        <tr>
+                            <th>测试</th>
+                            <th>调度器利用率 (中位数/P95)</th>
+                            <th>微状态构成</th>
+                            <th>运行队列/调度器</th>
+                            <th>emqtt_bench CPU</th>
+                            <th>主机 CPU</th>
+                            <th>主机负载</th>
+                            <th>每连接内存</th>
+                            <th>每消息 CPU</th>
+                            <th>结论</th>
+                        </tr>
+                    </thead>
+                    <tbody>{rows}
+                    </tbody>
+                </table>
+                <small style="color: #95a5a6;">压测机饱和时测得的吞吐量和延迟受 emqtt_bench 自身限制, 不能代表服务器性能; 每连接内存 = emqtt_bench 进程树 RSS / 已建立连接数, 每消息 CPU = 进程树 CPU 时间 / 发布与接收消息数</small>
+            </div>
+        </div>
+        """
+    
+    def _generate_self_metrics_panel(self) -> str:
+        """生成测量工具自身开销面板"""
+        snapshot = self.self_metrics
+        if snapshot is None or not snapshot.rows:
+            return ""
+        
+        def seconds(value):
+            return f"{value * 1000:.2f} ms" if value < 1 else f"{value:.2f} s"
+        
+        rows = ""
+        for row in snapshot.rows:
+            if row.name == QUEUE_DEPTH:
+                mean, maximum, total = '-', f"{row.maximum:.0f}", f"当前 {row.last:.0f}"
+            elif row.name == MISSED_TICKS:
+                mean, maximum, total = '-', '-', f"{row.total:.0f}"
+            else:
+                mean, maximum, total = seconds(row.mean), seconds(row.maximum), seconds(row.total)
+            rows += f"""
+                        <tr>
+                            <td class="metric-name">{row.name}</td>
+                            <td>{row.labels}</td>
+                            <td>{row.count}</td>
+                            <td class="metric-value">{mean}</td>
+                            <td>{maximum}</td>
+                            <td>{total}</td>
+                        </tr>
+                """
+        
+        per_scrape = seconds(snapshot.hot_path_seconds / snapshot.scrapes) if snapshot.scrapes else '-'
+        cpu_share = f"{snapshot.cpu_seconds / snapshot.uptime * 100:.1f}%" if snapshot.uptime > 0 else '-'
+        endpoint = f" · 指标端点 {snapshot.endpoint}" if snapshot.endpoint else ""
+        return f"""
+        <div class="panel">
+            <div class="panel-header">
+                <h3 class="panel-title">🔬 测量工具自身开销</h3>
+            </div>
+            <div class="panel-content">
+                <p>每次采集热路径平均 <strong>{per_scrape}</strong> · 错过的采集周期 <strong>{snapshot.missed_ticks}</strong> · 编排进程 CPU <strong>{cpu_share}</strong> (单核){endpoint}</p>
+                <table class="metrics-table">
+                    <thead>
+                        <tr>
+                            <th>指标</th>
+                            <th>标签</th>
+                            <th>次数</th>
+                            <th>平均</th>
+                            <th>最大</th>
+                            <th>累计</th>
+                        </tr>
+                    </thead>
+                    <tbody>{rows}
+                    </tbody>
+                </table>
+                <small style="color: #95a5a6;">汇总截至报告渲染开始, 本次报告的渲染耗时在渲染完成后写入指标端点和控制台</small>
+            </div>
+        </div>
+        """
+    
     def _generate_connection_test_tab(self, analysis: Dict) -> str:
         """生成连接测试标签页"""
         connection_analysis = analysis.get('connection_test_analysis', {})
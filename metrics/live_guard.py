@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+实时守护规则
+持续采集时逐点检查测试是否已经没有继续运行的意义: 错误比例过高、消息计数停滞、
+pub_overrun 持续增长、需要接收消息的测试长时间 recv 为 0。
+规则触发后由测试循环按 guard_action 跳过当前测试或终止整个测试套件, 并把原因记录到测试结果
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from metric_registry import KIND_COUNTER, lookup_metric
+
+# 规则
+RULE_ERROR_RATE = 'error_rate'
+RULE_STALLED = 'stalled'
+RULE_OVERRUN = 'pub_overrun'
+RULE_NO_RECV = 'no_recv'
+
+# 规则触发后的处理方式
+ACTION_SKIP = 'skip'  # 结束当前测试并记为失败, 继续执行后续测试
+ACTION_ABORT = 'abort'  # 结束当前测试并跳过剩余测试
+ACTION_WARN = 'warn'  # 只提示, 测试照常运行
+ACTIONS = (ACTION_SKIP, ACTION_ABORT, ACTION_WARN)
+
+DEFAULT_GRACE_PERIOD = 10.0  # 采集开始后多少秒内不检查 (连接建立阶段)
+DEFAULT_WINDOW = 5.0  # 错误比例和溢出比例的统计窗口 (秒)
+DEFAULT_MAX_ERROR_RATIO = 0.5  # 窗口内 失败 / (失败 + 成功) 的上限
+DEFAULT_MIN_ERRORS = 5  # 窗口内至少有这么多失败才判断错误比例
+DEFAULT_STALL_SECONDS = 15.0  # 消息计数停止增长多少秒视为停滞
+DEFAULT_MAX_OVERRUN_RATIO = 0.1  # 窗口内 pub_overrun 增量 / pub 增量 的上限
+DEFAULT_RECV_TIMEOUT = 30.0  # 需要接收消息的测试多少秒内仍未收到消息视为失败
+
+# 各环节的成功计数器, 失败计数器由指标注册表的错误类别确定
+_SUCCESS_COUNTERS = {
+    'connection': ('connect_succ', 'reconnect_succ'),
+    'publish': ('pub',),
+    'subscribe': ('sub',),
+}
+_SCOPE_LABELS = {'connection': '连接', 'publish': '发布', 'subscribe': '订阅'}
+_FLOW_COUNTERS = {'pub': '发布消息数', 'recv': '接收消息数'}  # 停滞检测的消息计数器
+
+
+@dataclass
+class GuardViolation:
+    """一次规则触发"""
+    rule: str
+    message: str
+    elapsed: float  # 距采集开始的秒数
+
+    def describe(self) -> str:
+        return f"{self.message} (第 {self.elapsed:.0f}s, 规则 {self.rule})"
+
+
+class LiveGuard:
+    """单个测试的实时守护规则, 由持续指标收集线程逐点喂入数据"""
+
+    def __init__(self, action: str = ACTION_SKIP, grace_period: float = DEFAULT_GRACE_PERIOD,
+                 window: float = DEFAULT_WINDOW, max_error_ratio: float = DEFAULT_MAX_ERROR_RATIO,
+                 min_errors: int = DEFAULT_MIN_ERRORS, stall_seconds: float = DEFAULT_STALL_SECONDS,
+                 max_overrun_ratio: float = DEFAULT_MAX_OVERRUN_RATIO, expect_recv: bool = False,
+                 recv_timeout: float = DEFAULT_RECV_TIMEOUT):
+        """
+        Args:
+            action: 规则触发后的处理方式, skip / abort / warn
+            grace_period: 采集开始后不做检查的秒数
+            window: 错误比例和溢出比例的统计窗口 (秒)
+            max_error_ratio: 任一环节窗口内失败比例的上限
+            min_errors: 窗口内失败数少于该值时不判断错误比例
+            stall_seconds: 已有增长的消息计数停止增长多少秒视为停滞
+            max_overrun_ratio: 窗口内 pub_overrun 增量相对 pub 增量的上限
+            expect_recv: 测试是否应该收到消息 (有广播发送方的订阅测试)
+            recv_timeout: expect_recv 时多少秒内仍未收到消息视为失败
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"不支持的 guard_action: {action}, 可选 {', '.join(ACTIONS)}")
+        self.action = action
+        self.grace_period = grace_period
+        self.window = window
+        self.max_error_ratio = max_error_ratio
+        self.min_errors = min_errors
+        self.stall_seconds = stall_seconds
+        self.max_overrun_ratio = max_overrun_ratio
+        self.expect_recv = expect_recv
+        self.recv_timeout = recv_timeout
+        self._lock = threading.Lock()
+        self._first_ts: Optional[float] = None
+        self._history: deque = deque()  # (时间戳, 计数器汇总), 只保留统计窗口内的数据点
+        self._last_progress: Dict[str, float] = {}  # 消息计数器最近一次增长的时间戳
+        self._last_values: Dict[str, float] = {}
+        self.violations: List[GuardViolation] = []  # 每条规则最多记录一次
+        self._reported = 0
+
+    @property
+    def tripped(self) -> bool:
+        return bool(self.violations)
+
+    @property
+    def should_stop(self) -> bool:
+        """是否需要提前结束当前测试"""
+        return self.tripped and self.action != ACTION_WARN
+
+    @property
+    def reason(self) -> Optional[str]:
+        """第一条触发的规则, 用作测试失败原因"""
+        return self.violations[0].describe() if self.violations else None
+
+    def pop_new(self) -> List[GuardViolation]:
+        """取出上次调用之后新触发的规则 (供测试循环打印)"""
+        with self._lock:
+            new = self.violations[self._reported:]
+            self._reported = len(self.violations)
+        return new
+
+    @staticmethod
+    def _counters(metrics: List[Dict[str, Any]]) -> Dict[str, float]:
+        """汇总 emqtt_bench 计数器 (同名不同标签相加)"""
+        totals: Dict[str, float] = {}
+        for metric in metrics:
+            name = metric.get('name', '')
+            info = lookup_metric(name)
+            if not info.known or info.kind != KIND_COUNTER or info.scope not in _SUCCESS_COUNTERS:
+                continue
+            try:
+                totals[name] = totals.get(name, 0.0) + float(metric.get('value', 0))
+            except (TypeError, ValueError):
+                continue
+        return totals
+
+    def observe(self, ts: float, metrics: List[Dict[str, Any]]):
+        """喂入一个完整数据点 (收集线程调用)"""
+        counters = self._counters(metrics)
+        with self._lock:
+            if self._first_ts is None:
+                self._first_ts = ts
+            elapsed = ts - self._first_ts
+            self._track_progress(ts, counters)
+            self._history.append((ts, counters))
+            while len(self._history) > 2 and ts - self._history[1][0] >= self.window:
+                self._history.popleft()
+
+            if elapsed < self.grace_period or (self.tripped and self.action != ACTION_WARN):
+                return
+            fired = {violation.rule for violation in self.violations}
+            for rule, check in ((RULE_ERROR_RATE, self._check_error_rate), (RULE_OVERRUN, self._check_overrun),
+                                (RULE_STALLED, self._check_stalled), (RULE_NO_RECV, self._check_no_recv)):
+                if rule in fired:
+                    continue
+                message = check(ts, elapsed, counters)
+                if message:
+                    self.violations.append(GuardViolation(rule, message, elapsed))
+
+    def _track_progress(self, ts: float, counters: Dict[str, float]):
+        for name in _FLOW_COUNTERS:
+            value = counters.get(name)
+            if value is None:
+                continue
+            if value > self._last_values.get(name, 0.0):
+                self._last_progress[name] = ts
+            self._last_values[name] = value
+
+    def _window_delta(self, counters: Dict[str, float], names) -> Optional[float]:
+        """窗口内若干计数器的增量之和, 窗口还不够长时返回 None"""
+        oldest_ts, oldest = self._history[0]
+        if self._history[-1][0] - oldest_ts < self.window:
+            return None
+        return sum(counters.get(name, 0.0) - oldest.get(name, 0.0) for name in names)
+
+    def _check_error_rate(self, ts: float, elapsed: float, counters: Dict[str, float]) -> Optional[str]:
+        for scope, success_names in _SUCCESS_COUNTERS.items():
+            error_names = [name for name in counters
+                           if lookup_metric(name).is_error and lookup_metric(name).scope == scope]
+            if not error_names:
+                continue
+            errors = self._window_delta(counters, error_names)
+            if errors is None or errors < self.min_errors:
+                continue
+            successes = max(0.0, self._window_delta(counters, success_names))
+            ratio = errors / (errors + successes)
+            if ratio > self.max_error_ratio:
+                return (f"{_SCOPE_LABELS[scope]}失败比例 {ratio * 100:.0f}% 超过 {self.max_error_ratio * 100:.0f}% "
+                        f"(最近 {self.window:.0f}s 失败 {errors:.0f} 次, 成功 {successes:.0f} 次)")
+        return None
+
+    def _check_overrun(self, ts: float, elapsed: float, counters: Dict[str, float]) -> Optional[str]:
+        overrun = self._window_delta(counters, ('pub_overrun',))
+        if not overrun or overrun <= 0:
+            return None
+        published = max(0.0, self._window_delta(counters, ('pub',)))
+        if published and overrun / published <= self.max_overrun_ratio:
+            return None
+        return (f"pub_overrun 持续增长: 最近 {self.window:.0f}s 增加 {overrun:.0f}, 同期发布 {published:.0f} 条, "
+                f"发送端跟不上设定的发送间隔")
+
+    def _check_stalled(self, ts: float, elapsed: float, counters: Dict[str, float]) -> Optional[str]:
+        for name, label in _FLOW_COUNTERS.items():
+            last = self._last_progress.get(name)
+            # 只检查已经开始增长过的计数器, 连接测试等没有消息流量的测试不受影响
+            if last is not None and ts - last >= self.stall_seconds:
+                return f"{label}已停滞 {ts - last:.0f}s (停在 {self._last_values[name]:.0f})"
+        return None
+
+    def _check_no_recv(self, ts: float, elapsed: float, counters: Dict[str, float]) -> Optional[str]:
+        if self.expect_recv and elapsed >= self.recv_timeout and counters.get('recv', 0.0) <= 0:
+            subscribed = counters.get('sub', 0.0)
+            return f"{elapsed:.0f}s 内未收到任何消息 (订阅成功 {subscribed:.0f})"
+        return None
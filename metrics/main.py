@@ -13,7 +13,7 @@ import signal
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 # 添加当前目录到Python路径
 sys.path.insert(0, str(Path(__file__).parent))
@@ -31,7 +31,19 @@ from metrics_collector import PrometheusMetricsCollector, MetricsAnalyzer
 from continuous_metrics_collector import ContinuousMetricsCollector
 from enhanced_markdown_generator import EnhancedMarkdownGenerator
 from test_data_manager import TestDataManager, TestData
+from persistence_service import PersistenceService
+from regression import RegressionEngine, RegressionReport, EXIT_REGRESSION
+from trial_runner import TrialRecorder, TrialSet, build_trial_schedule
+from steady_state import SteadyStateDetector
+from live_guard import LiveGuard, ACTION_ABORT
+from saturation import SaturationAnalyzer, SaturationReport
+from self_metrics import REPORT_RENDER_SECONDS, REPORT_STAGE_SECONDS, get_self_metrics
 from test_specific_filter import TestSpecificFilter
+from metric_registry import registry
+from analysis_frame import AnalysisFrame
+from report_cache import ReportCache, DEFAULT_CACHE_DIR
+from artifact_io import artifact_path, dump_json, glob_artifacts, load_json, set_default_compression
+from report_pipeline import ReportPipeline, render_html_report, render_markdown_report, render_enhanced_markdown_report
 from rich.console import Console
 from rich.panel import Panel
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
@@ -49,12 +61,24 @@ class AutoDataCollector:
         self.test_manager = EMQTTTestManager()
         self.metrics_collector = PrometheusMetricsCollector()
         self.metrics_analyzer = MetricsAnalyzer()
-        self.continuous_collector = ContinuousMetricsCollector()  # 新增持续收集器
+        self.test_filter = TestSpecificFilter()  # 新增测试特定过滤器
+        self.continuous_collector = ContinuousMetricsCollector(ingest_filter=self.test_filter)  # 持续收集器, 采集时按测试类型过滤
         self.enhanced_generator = EnhancedMarkdownGenerator()  # 新增增强版报告生成器
         self.data_manager = TestDataManager()  # 新增测试数据管理器
-        self.test_filter = TestSpecificFilter()  # 新增测试特定过滤器
+        self.persistence = PersistenceService(self.data_manager)  # 后台写线程, 测试数据保存不阻塞测试循环
         self.test_results: List[TestResult] = []
         self.continuous_data_files: List[str] = []  # 存储持续数据文件路径
+        self.continuous_files_by_test: Dict[str, str] = {}  # 测试名 -> 持续数据文件路径
+        self.analysis_frame: Optional[AnalysisFrame] = None  # 报告共享的分析数据帧
+        self.regression_report: Optional[RegressionReport] = None  # 本次运行与历史基线的比较结果
+        self.trial_recorder: Optional[TrialRecorder] = None  # 重复试验记录 (trial_count > 1 时)
+        self.trial_summary: Dict[str, TrialSet] = {}  # 测试名 -> 重复试验统计
+        self.saturation_report: Optional[SaturationReport] = None  # 压测机自饱和分析结果
+        self.self_metrics = get_self_metrics()  # 编排程序自身开销 (抓取/解析/过滤/持久化/报告耗时)
+        self._analysis_frame_key = None
+        self.report_cache = ReportCache(DEFAULT_CACHE_DIR)  # 按内容哈希缓存的分析结果和报告章节
+        self.report_pipeline = ReportPipeline(reports_dir=str(self.enhanced_generator.reports_dir),
+                                              cache=self.report_cache)  # 报告并行渲染流水线
         self.running = True
         self.start_time = datetime.now()
         
@@ -107,6 +131,9 @@ class AutoDataCollector:
             if summary.get('total_collections', 0) > 0:
                 self.continuous_collector.save_test_data(test_name)
         
+        # 写完队列中已提交的测试数据
+        self._flush_persistence()
+        
         self.generate_final_report()
         sys.exit(0)
     
@@ -139,6 +166,11 @@ class AutoDataCollector:
             # 5. 生成最终报告
             self.generate_final_report()
 
+            # 6. 需要时以退出码标记性能回归 (供夜间任务把关)
+            if config.fail_on_regression and self.regression_report and self.regression_report.regressions:
+                console.print("[red]🚨 检测到性能回归, 以非零退出码退出[/red]")
+                sys.exit(EXIT_REGRESSION)
+
         except KeyboardInterrupt:
             console.print("\n[yellow]用户中断数据收集[/yellow]")
             self.generate_final_report()
@@ -197,6 +229,11 @@ class AutoDataCollector:
             config.port = IntPrompt.ask("MQTT端口", default=config.port)
             config.client_count = IntPrompt.ask("客户端数量", default=config.client_count)
             config.test_duration = IntPrompt.ask("测试持续时间(秒)", default=config.test_duration)
+            config.trial_count = IntPrompt.ask("每个测试重复次数 (多次试验可给出误差范围)", default=config.trial_count)
+            if config.trial_count > 1:
+                config.trial_interleave = Confirm.ask("是否按轮次交错执行不同测试?", default=config.trial_interleave)
+            config.adaptive_duration = Confirm.ask("是否启用自适应测试时长 (速率稳定且估计收敛后提前结束)?",
+                                                   default=config.adaptive_duration)
             config.prometheus_port = IntPrompt.ask("Prometheus起始端口", default=config.prometheus_port)
             
             # MQTT配置
@@ -621,14 +658,42 @@ class AutoDataCollector:
         """执行测试并收集数据"""
         console.print(Panel.fit("[bold blue]🔄 开始执行测试和数据收集[/bold blue]"))
         
+        # 测试配置参与报告缓存键, 配置变化后不会复用旧的分析结果
+        self.report_cache.set_config(config)
+        
+        # 调试时另存未过滤的原始样本
+        self.continuous_collector.raw_output_dir = (
+            os.path.join(str(self.enhanced_generator.reports_dir), "raw") if getattr(config, 'keep_raw_metrics', False) else None)
+        
+        # 持续指标存储格式, binary 格式在采集开始时即创建文件并逐点追加
+        self.continuous_collector.storage_backend = getattr(config, 'continuous_storage', 'json')
+        self.continuous_collector.output_dir = str(self.enhanced_generator.reports_dir)
+        
+        # 测试产物压缩格式 (zstd, 未安装 zstandard 时回退为 gzip)
+        compression = set_default_compression(getattr(config, 'artifact_compression', 'none'))
+        if compression != 'none':
+            console.print(f"[dim]🗜️ 测试产物使用 {compression} 压缩保存[/dim]")
+        
+        # 编排程序自身指标端点 (抓取/解析/过滤/持久化耗时、队列深度、错过的周期、报告渲染耗时)
+        self_metrics_port = getattr(config, 'self_metrics_port', 9190)
+        if self_metrics_port:
+            self.self_metrics.start_server(self_metrics_port, getattr(config, 'self_metrics_addr', '127.0.0.1'))
+        
         # 显示将要执行的测试
         console.print(f"\n[cyan]📋 将执行 {len(selected_tests)} 个测试项:[/cyan]")
         for i, test in enumerate(selected_tests, 1):
             console.print(f"  {i}. {test['name']} (端口: {test['port']})")
         console.print("")
         
-        # 使用选中的测试任务
+        # 使用选中的测试任务, 重复试验时按轮次交错或连续重复
         test_tasks = selected_tests
+        trial_count = max(1, getattr(config, 'trial_count', 1))
+        if trial_count > 1:
+            interleave = getattr(config, 'trial_interleave', True)
+            test_tasks = build_trial_schedule(selected_tests, trial_count, interleave)
+            self.trial_recorder = TrialRecorder(max_cv=getattr(config, 'trial_max_cv', 0.1), cache=self.report_cache)
+            console.print(f"[cyan]🔁 每个测试重复 {trial_count} 次 ({'交错' if interleave else '连续'}执行), "
+                          f"共 {len(test_tasks)} 次试验[/cyan]\n")
         
         # 执行测试任务
         with Progress(
@@ -643,22 +708,59 @@ class AutoDataCollector:
                 if not self.running:
                     break
                     
+                trial_label = f" (试验 {task['trial']}/{task['trials']})" if 'trial' in task else ""
                 task_progress = progress.add_task(
-                    f"执行 {task['name']}...", 
+                    f"执行 {task['name']}{trial_label}...", 
                     total=task['duration']
                 )
                 
                 # 执行测试
+                files_before = len(self.continuous_data_files)
                 result = self._execute_single_test(task, progress, task_progress)
                 if result:
                     self.test_results.append(result)
                     # 保存测试数据
                     self._save_test_data(result, task)
+                    # 记录试验结果 (只使用本次试验新保存的持续数据文件)
+                    if self.trial_recorder is not None:
+                        new_file = (self.continuous_data_files[-1]
+                                    if len(self.continuous_data_files) > files_before else None)
+                        self.trial_recorder.record(task['name'], task['trial'], result.success, new_file)
                 
                 progress.update(task_progress, completed=task['duration'])
                 console.print(f"[green]✅ {task['name']} 完成[/green]")
         
         console.print(f"\n[green]🎉 所有测试完成！共完成 {len(self.test_results)} 个测试[/green]")
+        
+        if self.trial_recorder is not None:
+            self.trial_summary = self.trial_recorder.summarize()
+            self._show_trial_summary()
+    
+    def _show_trial_summary(self):
+        """显示重复试验的均值、置信区间和变异系数"""
+        table = Table(title="🔁 重复试验统计", show_header=True, header_style="bold magenta")
+        table.add_column("测试", style="cyan")
+        table.add_column("指标", style="white")
+        table.add_column("成功试验", justify="right")
+        table.add_column("均值 ± 标准差", justify="right")
+        table.add_column("95% 置信区间", justify="right")
+        table.add_column("变异系数", justify="right")
+        table.add_column("建议", style="yellow")
+        
+        for test in self.trial_summary.values():
+            for stats in test.stats.values():
+                if stats.n == 0:
+                    continue
+                spread = f"{stats.mean:.2f} ± {stats.std:.2f}" if stats.n > 1 else f"{stats.mean:.2f}"
+                ci = f"{stats.ci_low:.2f} ~ {stats.ci_high:.2f}" if stats.n > 1 else "-"
+                cv = f"{stats.cv * 100:.1f}%" if stats.n > 1 and stats.mean else "-"
+                if stats.recommended_trials:
+                    advice = f"波动大, 建议 {stats.recommended_trials} 次"
+                else:
+                    advice = "稳定" if stats.n > 1 else "试验不足"
+                table.add_row(test.test_name, f"{stats.label} ({stats.unit})", f"{test.successful}/{len(test.trials)}",
+                              spread, ci, cv, advice)
+        console.print(table)
     
     def _save_test_data(self, result: TestResult, task: Dict[str, Any]):
         """保存测试数据"""
@@ -666,9 +768,7 @@ class AutoDataCollector:
             # 读取指标数据
             raw_metrics = []
             if result.metrics_file:
-                import json
-                with open(result.metrics_file, 'r', encoding='utf-8') as f:
-                    raw_metrics = json.load(f)
+                raw_metrics = load_json(result.metrics_file)
             
             # 生成性能摘要（使用原始数据）
             performance_summary = self._generate_performance_summary(raw_metrics)
@@ -703,19 +803,33 @@ class AutoDataCollector:
                 success=result.success,
                 error_message=result.error_message,
                 metrics_file=result.metrics_file,
-                continuous_data_file=None,  # 持续数据文件路径
+                continuous_data_file=self.continuous_files_by_test.get(result.test_name),  # 持续数据文件路径
                 config=config_dict,
                 raw_metrics=raw_metrics,  # 使用原始数据
                 performance_summary=performance_summary
             )
             
-            # 保存到数据管理器
-            saved_file = self.data_manager.save_test_data(test_data)
-            console.print(f"[blue]💾 测试数据已保存: {saved_file}[/blue]")
+            # 提交到后台持久化队列, 立即开始下一个测试 (服务已关闭时同步保存)
+            if not self.persistence.submit(test_data):
+                saved_file = self.data_manager.save_test_data(test_data)
+                console.print(f"[blue]💾 测试数据已保存: {saved_file}[/blue]")
             
         except Exception as e:
             console.print(f"[yellow]⚠️ 保存测试数据失败: {e}[/yellow]")
     
+    def _flush_persistence(self):
+        """等待后台持久化队列写完并停止写线程 (可重复调用)"""
+        pending = self.persistence.pending
+        if pending:
+            console.print(f"[blue]💾 等待 {pending} 个测试的数据写入...[/blue]")
+        self.persistence.close()
+        stats = self.persistence.stats
+        if stats.backpressure_events:
+            console.print(f"[yellow]⏳ 持久化背压: 队列满 {stats.backpressure_events} 次, "
+                          f"测试循环共等待 {stats.backpressure_wait:.1f}s[/yellow]")
+        if stats.failed:
+            console.print(f"[yellow]⚠️ {stats.failed} 个测试的数据保存失败[/yellow]")
+    
     def _filter_invalid_metrics(self, raw_metrics: List[Dict[str, Any]], test_name: str) -> List[Dict[str, Any]]:
         """过滤无效的指标数据"""
         if not raw_metrics:
@@ -882,9 +996,7 @@ class AutoDataCollector:
                     
                     try:
                         # 读取原始指标数据
-                        import json
-                        with open(result.metrics_file, 'r', encoding='utf-8') as f:
-                            raw_metrics = json.load(f)
+                        raw_metrics = load_json(result.metrics_file)
                         
                         # 使用新的测试特定过滤器
                         filtered_metrics = self.test_filter.filter_test_data(result.test_name, raw_metrics)
@@ -935,6 +1047,11 @@ class AutoDataCollector:
     def _auto_filter_continuous_metrics(self):
         """自动过滤持续指标文件"""
         try:
+            # 持续指标已在采集时按测试类型过滤, 不再重新读取和另写过滤副本
+            if self.continuous_collector.ingest_filter is not None:
+                self._show_ingest_filter_summary()
+                return
+            
             console.print("[blue]🔍 检查需要过滤的持续指标文件...[/blue]")
             
             # 使用测试特定过滤器处理持续指标文件
@@ -962,6 +1079,24 @@ class AutoDataCollector:
             import traceback
             console.print(f"[dim]详细错误信息: {traceback.format_exc()}[/dim]")
     
+    def _show_ingest_filter_summary(self):
+        """显示采集时过滤的总体统计"""
+        summaries = [summary for summary in self.continuous_collector.get_all_summaries().values()
+                     if summary.get('ingest_filtered')]
+        total_seen = sum(summary['raw_metrics_seen'] for summary in summaries)
+        if not total_seen:
+            console.print("[yellow]⚠️ 没有采集时过滤的持续指标数据[/yellow]")
+            return
+        
+        total_kept = sum(summary['metrics_kept'] for summary in summaries)
+        console.print("[green]✅ 持续指标已在采集时过滤[/green]")
+        console.print(f"[dim]  • 测试数量: {len(summaries)}[/dim]")
+        console.print(f"[dim]  • 原始指标总数: {total_seen}[/dim]")
+        console.print(f"[dim]  • 保留指标总数: {total_kept}[/dim]")
+        console.print(f"[dim]  • 总体减少比例: {(total_seen - total_kept) / total_seen * 100:.1f}%[/dim]")
+        if self.continuous_collector.raw_data_files:
+            console.print(f"[dim]  • 原始样本保存位置: {self.continuous_collector.raw_output_dir}/[/dim]")
+    
     def _build_connection_test_command(self, config: TestConfig) -> str:
         """构建连接测试命令"""
         cmd = f"{config.emqtt_bench_path} conn -h {config.host} -p {config.port} -c {config.client_count} -i 10"
@@ -1112,10 +1247,13 @@ class AutoDataCollector:
             
             # 启动持续指标收集
             console.print(f"[blue]🔍 启动 {task['name']} 持续指标收集...[/blue]")
+            guard = self._create_live_guard(expect_recv=True)
             self.continuous_collector.start_collection(
                 test_name=task['name'],
                 port=task['port'],
-                interval=1.0
+                interval=1.0,
+                on_sample=guard.observe if guard is not None else None,
+                pid=subscribe_process.pid
             )
             
             # 等待测试完成
@@ -1131,6 +1269,10 @@ class AutoDataCollector:
                 
                 time.sleep(1)
                 progress.update(task_progress, advance=1)
+                
+                # 实时守护规则触发则提前结束
+                if self._live_guard_stop(guard, task['name']):
+                    break
             
             # 停止持续指标收集
             console.print(f"[blue]⏹️ 停止 {task['name']} 持续指标收集...[/blue]")
@@ -1140,7 +1282,7 @@ class AutoDataCollector:
             continuous_data_file = self.continuous_collector.save_test_data(task['name'])
             if continuous_data_file:
                 console.print(f"[green]💾 已保存 {task['name']} 持续指标数据: {continuous_data_file}[/green]")
-                self.continuous_data_files.append(continuous_data_file)
+                self._register_continuous_data_file(continuous_data_file, task['name'])
             
             # 收集指标
             metrics_file = self._collect_metrics(task['port'], task['name'])
@@ -1150,8 +1292,12 @@ class AutoDataCollector:
             self._cleanup_process(broadcast_process)
             self._cleanup_process(subscribe_process)
             
-            success = True
-            console.print(f"[green]✅ {task['name']} 测试完成[/green]")
+            if guard is not None and guard.should_stop:
+                error_message = f"实时守护规则触发: {guard.reason}"
+                console.print(f"[red]❌ {task['name']} 已提前结束: {guard.reason}[/red]")
+            else:
+                success = True
+                console.print(f"[green]✅ {task['name']} 测试完成[/green]")
             
         except Exception as e:
             error_message = str(e)
@@ -1343,10 +1489,13 @@ class AutoDataCollector:
             
             # 启动持续指标收集
             console.print(f"[blue]🔍 启动 {task['name']} 持续指标收集...[/blue]")
+            guard = self._create_live_guard(expect_recv=True)
             self.continuous_collector.start_collection(
                 test_name=task['name'],
                 port=task['port'],
-                interval=1.0
+                interval=1.0,
+                on_sample=guard.observe if guard is not None else None,
+                pid=subscribe_process.pid
             )
             
             # 等待测试完成
@@ -1362,6 +1511,10 @@ class AutoDataCollector:
                 
                 time.sleep(1)
                 progress.update(task_progress, advance=1)
+                
+                # 实时守护规则触发则提前结束
+                if self._live_guard_stop(guard, task['name']):
+                    break
             
             # 停止持续指标收集
             console.print(f"[blue]⏹️ 停止 {task['name']} 持续指标收集...[/blue]")
@@ -1371,7 +1524,7 @@ class AutoDataCollector:
             continuous_data_file = self.continuous_collector.save_test_data(task['name'])
             if continuous_data_file:
                 console.print(f"[green]💾 已保存 {task['name']} 持续指标数据: {continuous_data_file}[/green]")
-                self.continuous_data_files.append(continuous_data_file)
+                self._register_continuous_data_file(continuous_data_file, task['name'])
             
             # 收集指标
             metrics_file = self._collect_metrics(task['port'], task['name'])
@@ -1381,8 +1534,12 @@ class AutoDataCollector:
             self._cleanup_process(broadcast_process)
             self._cleanup_process(subscribe_process)
             
-            success = True
-            console.print(f"[green]✅ {task['name']} 测试完成[/green]")
+            if guard is not None and guard.should_stop:
+                error_message = f"实时守护规则触发: {guard.reason}"
+                console.print(f"[red]❌ {task['name']} 已提前结束: {guard.reason}[/red]")
+            else:
+                success = True
+                console.print(f"[green]✅ {task['name']} 测试完成[/green]")
             
         except Exception as e:
             error_message = str(e)
@@ -1456,12 +1613,16 @@ class AutoDataCollector:
             # 等待进程启动并稳定
             time.sleep(3)
             
-            # 启动持续指标收集
+            # 启动持续指标收集 (逐点检查实时守护规则, 自适应时长时检测稳态和收敛)
             console.print(f"[blue]🔍 启动 {task['name']} 持续指标收集...[/blue]")
+            detector = self._create_steady_state_detector()
+            guard = self._create_live_guard()
             self.continuous_collector.start_collection(
                 test_name=task['name'],
                 port=task['port'],
-                interval=1.0  # 每秒收集一次
+                interval=1.0,  # 每秒收集一次
+                on_sample=[observer.observe for observer in (detector, guard) if observer is not None],
+                pid=process.pid
             )
             
             # 检查进程是否仍在运行
@@ -1507,6 +1668,20 @@ class AutoDataCollector:
                     
                     time.sleep(1)
                     progress.update(task_progress, advance=1)
+                    
+                    # 实时守护规则触发则提前结束
+                    if self._live_guard_stop(guard, task['name']):
+                        self.test_manager.process_manager.terminate_process(process)
+                        break
+                    
+                    # 自适应时长: 估计已收敛则提前结束
+                    if detector is not None and detector.converged:
+                        console.print(f"[green]⏱️ {task['name']} 在 {detector.converged_at:.0f}s 收敛 "
+                                      f"(稳态开始于 {detector.steady_at:.0f}s), 提前结束: {detector.describe()}[/green]")
+                        break
+                else:
+                    if detector is not None:
+                        console.print(f"[yellow]⏱️ {task['name']} 在最长时长内未收敛: {detector.describe()}[/yellow]")
                 
                 # 停止持续指标收集
                 console.print(f"[blue]⏹️ 停止 {task['name']} 持续指标收集...[/blue]")
@@ -1516,7 +1691,7 @@ class AutoDataCollector:
                 continuous_data_file = self.continuous_collector.save_test_data(task['name'])
                 if continuous_data_file:
                     console.print(f"[green]💾 已保存 {task['name']} 持续指标数据: {continuous_data_file}[/green]")
-                    self.continuous_data_files.append(continuous_data_file)
+                    self._register_continuous_data_file(continuous_data_file, task['name'])
                 
                 # 如果进程仍在运行，认为测试成功
                 if process.poll() is None:
@@ -1534,6 +1709,12 @@ class AutoDataCollector:
                     else:
                         success = True
                         console.print(f"[green]✅ {task['name']} 测试成功完成[/green]")
+                
+                # 守护规则提前结束的测试记为失败并记录原因
+                if guard is not None and guard.should_stop:
+                    success = False
+                    error_message = f"实时守护规则触发: {guard.reason}"
+                    console.print(f"[red]❌ {task['name']} 已提前结束: {guard.reason}[/red]")
             
             end_time = datetime.now()
             
@@ -1597,6 +1778,56 @@ class AutoDataCollector:
                     except Exception:
                         pass
     
+    def _create_steady_state_detector(self) -> Optional[SteadyStateDetector]:
+        """启用自适应时长时为测试创建稳态检测器"""
+        config = self.test_manager.config_manager.config
+        if not getattr(config, 'adaptive_duration', False):
+            return None
+        return SteadyStateDetector(tolerance=getattr(config, 'adaptive_tolerance', 0.05),
+                                   min_duration=getattr(config, 'adaptive_min_duration', 15))
+    
+    def _create_live_guard(self, expect_recv: bool = False) -> Optional[LiveGuard]:
+        """
+        为测试创建实时守护规则
+        
+        Args:
+            expect_recv: 测试是否应该收到消息 (华为云广播/订阅测试有广播发送方)
+        """
+        config = self.test_manager.config_manager.config
+        if not getattr(config, 'live_guard', True):
+            return None
+        # 发送间隔较长时放宽停滞判断, 避免把正常的发送间隙当作停滞
+        stall_seconds = max(getattr(config, 'guard_stall_seconds', 15), 3 * getattr(config, 'msg_interval', 1000) / 1000)
+        recv_timeout = getattr(config, 'guard_recv_timeout', 30)
+        if expect_recv:
+            broadcast_interval = getattr(config, 'broadcast_interval', 5)
+            stall_seconds = max(stall_seconds, 3 * broadcast_interval)
+            recv_timeout = max(recv_timeout, 3 * broadcast_interval)
+        try:
+            return LiveGuard(action=getattr(config, 'guard_action', 'skip'),
+                             grace_period=getattr(config, 'guard_grace_period', 10),
+                             max_error_ratio=getattr(config, 'guard_max_error_ratio', 0.5),
+                             stall_seconds=stall_seconds,
+                             max_overrun_ratio=getattr(config, 'guard_max_overrun_ratio', 0.1),
+                             expect_recv=expect_recv,
+                             recv_timeout=recv_timeout)
+        except ValueError as e:
+            console.print(f"[yellow]⚠️ 实时守护规则未启用: {e}[/yellow]")
+            return None
+    
+    def _live_guard_stop(self, guard: Optional[LiveGuard], test_name: str) -> bool:
+        """打印新触发的守护规则, 需要提前结束当前测试时返回 True"""
+        if guard is None:
+            return False
+        for violation in guard.pop_new():
+            console.print(f"[red]🛑 {test_name} 触发实时守护规则: {violation.describe()}[/red]")
+        if not guard.should_stop:
+            return False
+        if guard.action == ACTION_ABORT and self.running:
+            console.print("[red]🛑 guard_action 为 abort, 跳过剩余测试[/red]")
+            self.running = False
+        return True
+    
     def _collect_metrics(self, port: int, test_name: str) -> str:
         """收集指标数据"""
         max_retries = 3
@@ -1620,7 +1851,7 @@ class AutoDataCollector:
                     # 保存指标文件到reports文件夹
                     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                     metrics_file = f"metrics_{test_name.lower().replace(' ', '_')}_{timestamp}.json"
-                    metrics_path = os.path.join("reports", metrics_file)
+                    metrics_path = artifact_path(os.path.join("reports", metrics_file))
                     
                     # 转换为可序列化格式
                     metrics_data = []
@@ -1634,10 +1865,8 @@ class AutoDataCollector:
                             'metric_type': metric.metric_type
                         })
                     
-                    # 保存到文件
-                    import json
-                    with open(metrics_path, 'w', encoding='utf-8') as f:
-                        json.dump(metrics_data, f, indent=2, ensure_ascii=False)
+                    # 保存到文件 (配置了压缩时流式写入压缩文件)
+                    dump_json(metrics_data, metrics_path)
                     
                     console.print(f"[green]✅ 指标已保存: {metrics_path} (收集到 {len(metrics)} 个指标)[/green]")
                     return metrics_path
@@ -1662,6 +1891,9 @@ class AutoDataCollector:
         console.print("🎯 [dim]正在生成完整的测试分析报告，包含所有关键指标和性能评估...[/dim]")
         console.print("")
         
+        # 报告读取的测试数据须先全部落盘
+        self._flush_persistence()
+        
         try:
             # 创建时间戳报告目录
             timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
@@ -1671,29 +1903,46 @@ class AutoDataCollector:
             
             # 自动执行数据过滤操作
             console.print("[blue]🧹 自动执行数据过滤操作...[/blue]")
-            self._auto_filter_all_test_data()
+            with self.self_metrics.time(REPORT_STAGE_SECONDS, stage='filter_test_data'):
+                self._auto_filter_all_test_data()
             
             # 自动过滤持续指标文件
             console.print("[blue]🧹 自动过滤持续指标文件...[/blue]")
-            self._auto_filter_continuous_metrics()
-            
-            # 生成HTML报告
-            console.print("[blue]📄 生成HTML可视化报告...[/blue]")
-            html_report_file = self._generate_html_report()
-            
-            # 生成Markdown详细分析报告
-            console.print("[blue]📝 生成Markdown详细分析报告...[/blue]")
-            markdown_report_file = self._generate_markdown_report()
+            with self.self_metrics.time(REPORT_STAGE_SECONDS, stage='filter_continuous'):
+                self._auto_filter_continuous_metrics()
+            
+            # 一次性加载所有指标文件和持续指标文件, 供各报告生成器共享 (过滤可能改写了文件, 重新加载)
+            console.print("[blue]📥 加载测试数据分析帧...[/blue]")
+            load_started = time.perf_counter()
+            # 测试运行期间已在后台分析完成的测试章节直接复用
+            preloaded_series, test_analyses = self.report_pipeline.collect_test_sections(self.continuous_data_files)
+            self.analysis_frame = None
+            analysis_frame = self._get_analysis_frame(preloaded_series)
+            load_seconds = time.perf_counter() - load_started
+            self.self_metrics.observe(REPORT_STAGE_SECONDS, load_seconds, stage='load')
+            console.print(f"[green]✅ 已加载 {len(analysis_frame.metrics_data)} 个测试、"
+                          f"{len(analysis_frame.continuous_data_files)} 个持续指标文件 "
+                          f"({load_seconds:.2f} 秒)[/green]")
+            
+            # 与历史上配置相同的运行比较, 检测性能回归
+            with self.self_metrics.time(REPORT_STAGE_SECONDS, stage='regression'):
+                self.regression_report = self._check_regressions()
+            
+            # 检查压测机 (emqtt_bench) 自身是否成为瓶颈
+            with self.self_metrics.time(REPORT_STAGE_SECONDS, stage='saturation'):
+                self.saturation_report = self._check_saturation(analysis_frame)
+            
+            # 并行渲染HTML、Markdown和增强版持续数据分析报告
+            console.print("[blue]📄 并行生成HTML可视化报告、Markdown详细分析报告和增强版持续数据分析报告...[/blue]")
+            report_files = self.report_pipeline.render(self._build_report_jobs(analysis_frame, test_analyses))
+            self.report_pipeline.shutdown()
+            self._show_self_metrics()
+            self.report_cache.flush()
+            html_report_file = report_files.get('HTML可视化报告') or "生成失败"
+            markdown_report_file = report_files.get('Markdown详细分析报告') or "生成失败"
             
-            # 生成增强版持续数据分析报告
             if self.continuous_data_files:
-                console.print("[blue]📊 生成增强版持续数据分析报告...[/blue]")
-                enhanced_report_file = self.enhanced_generator.generate_continuous_analysis_report(
-                    continuous_data_files=self.continuous_data_files,
-                    test_results=self.test_results,
-                    start_time=self.start_time
-                )
-                console.print(f"[green]✅ 增强版持续数据分析报告: {enhanced_report_file}[/green]")
+                console.print(f"[green]✅ 增强版持续数据分析报告: {report_files.get('增强版持续数据分析报告')}[/green]")
             else:
                 console.print("[yellow]⚠️ 无持续数据文件，跳过增强版报告生成[/yellow]")
             
@@ -1728,6 +1977,7 @@ class AutoDataCollector:
             console.print(f"   📂 报告保存位置: [blue]{self.current_report_dir}/ 文件夹[/blue]")
             console.print(f"   💾 测试数据保存位置: [blue]test_data/ 文件夹[/blue]")
             console.print(f"   🧹 过滤数据保存位置: [blue]test_data/filtered_data/ 文件夹[/blue]")
+            console.print(f"   🗃️ 报告缓存位置: [blue]{self.report_cache.cache_dir}/ 文件夹[/blue]")
             console.print(f"   ⏱️ 总耗时: [blue]{(datetime.now() - self.start_time).total_seconds():.1f} 秒[/blue]")
             
             # 显示使用建议
@@ -1743,86 +1993,106 @@ class AutoDataCollector:
             import traceback
             console.print(f"[dim]详细错误信息: {traceback.format_exc()}[/dim]")
     
-    def _generate_html_report(self) -> str:
-        """生成增强版HTML报告"""
-        # 收集所有指标数据
-        all_metrics_data = self._collect_all_metrics_data()
-        
-        # 使用增强版报告生成器，指定报告保存到时间戳目录
-        from enhanced_report_generator import EnhancedReportGenerator
-        report_generator = EnhancedReportGenerator(
-            test_results=self.test_results,
-            all_metrics_data=all_metrics_data,
-            start_time=self.start_time,
-            reports_dir=self.current_report_dir
-        )
+    def _check_regressions(self) -> Optional[RegressionReport]:
+        """检测本次运行的各测试相对历史基线的性能回归"""
+        console.print("[blue]📉 与历史运行比较, 检测性能回归...[/blue]")
+        try:
+            report = RegressionEngine(self.data_manager, cache=self.report_cache).check(since=self.start_time)
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 回归检测失败: {e}[/yellow]")
+            return None
         
-        report_file = report_generator.generate_enhanced_report()
-        return report_file
+        for run, item in report.regressions:
+            console.print(f"[red]🚨 {run.test_name} {item.label}回归: {item.current:.2f} {item.unit} "
+                          f"(基线 {item.baseline:.2f}, {item.change_pct:+.1f}%, p={item.p_value:.4f})[/red]")
+        if report.runs and not report.regressions:
+            console.print(f"[green]✅ 未检测到性能回归 ({len(report.runs)} 个运行)[/green]")
+        return report
     
-    def _generate_markdown_report(self) -> str:
-        """生成Markdown详细分析报告"""
-        # 收集所有指标数据
-        all_metrics_data = self._collect_all_metrics_data()
-        
-        # 使用Markdown报告生成器
-        from simple_markdown_generator import MarkdownReportGenerator
-        markdown_generator = MarkdownReportGenerator(
-            test_results=self.test_results,
-            all_metrics_data=all_metrics_data,
-            start_time=self.start_time,
-            reports_dir=self.current_report_dir
-        )
+    def _check_saturation(self, analysis_frame: AnalysisFrame) -> Optional[SaturationReport]:
+        """分析各测试运行期间压测机是否饱和"""
+        if not self.continuous_data_files:
+            return None
+        console.print("[blue]🖥️ 分析压测机自饱和...[/blue]")
+        try:
+            report = SaturationAnalyzer(analysis_frame).analyze(self.continuous_data_files)
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 压测机饱和分析失败: {e}[/yellow]")
+            return None
         
-        markdown_file = markdown_generator.generate_markdown_report()
-        return markdown_file
+        for result in report.saturated:
+            console.print(f"[yellow]⚠️ {result.test_name} 运行期间压测机已饱和, 结果反映的是 emqtt_bench 的上限: "
+                          f"{'; '.join(result.reasons)}[/yellow]")
+        if report.results and not report.saturated:
+            console.print(f"[green]✅ 压测机未饱和 ({len(report.results)} 个测试)[/green]")
+        for result in report.results:
+            costs = []
+            if result.memory_per_connection is not None:
+                costs.append(f"每连接内存 {result.memory_per_connection / 1024:.1f} KB")
+            if result.cpu_per_message is not None:
+                costs.append(f"每消息 CPU {result.cpu_per_message:.1f} µs")
+            if costs:
+                console.print(f"[dim]   {result.test_name}: {', '.join(costs)}[/dim]")
+        return report
+    
+    def _build_report_jobs(self, analysis_frame: AnalysisFrame, test_analyses: Dict[str, Dict[str, Any]]) -> Dict[str, tuple]:
+        """构建互相独立的报告渲染任务: 报告名称 -> (渲染函数, 参数)"""
+        self_metrics = self.self_metrics.snapshot()  # 截至渲染开始的编排程序自身开销
+        jobs = {
+            # HTML报告和Markdown报告保存到时间戳目录
+            'HTML可视化报告': (render_html_report, (
+                self.test_results, analysis_frame.metrics_data, self.start_time,
+                self.current_report_dir, self.continuous_data_files, analysis_frame, self.regression_report,
+                self.saturation_report, self_metrics
+            )),
+            'Markdown详细分析报告': (render_markdown_report, (
+                self.test_results, analysis_frame.metrics_data, self.start_time, self.current_report_dir,
+                self.report_cache, self.regression_report, self.trial_summary, self.saturation_report,
+                self_metrics
+            ))
+        }
+        if self.continuous_data_files:
+            jobs['增强版持续数据分析报告'] = (render_enhanced_markdown_report, (
+                self.continuous_data_files, self.test_results, self.start_time,
+                str(self.enhanced_generator.reports_dir), analysis_frame, test_analyses, self.report_cache,
+                self.saturation_report, self_metrics
+            ))
+        return jobs
+    
+    def _show_self_metrics(self):
+        """显示编排程序自身开销摘要 (含本次报告的渲染耗时)"""
+        snapshot = self.self_metrics.snapshot()
+        if snapshot.scrapes:
+            console.print(f"[dim]🔬 采集热路径: {snapshot.scrapes} 次抓取, 平均每次 "
+                          f"{snapshot.hot_path_seconds / snapshot.scrapes * 1000:.2f} ms, "
+                          f"错过的采集周期 {snapshot.missed_ticks}[/dim]")
+        for row in snapshot.select(REPORT_RENDER_SECONDS):
+            console.print(f"[dim]🔬 {row.labels.split('=', 1)[-1]} 渲染耗时 {row.last:.2f} 秒[/dim]")
+    
+    def _register_continuous_data_file(self, continuous_data_file: str, test_name: Optional[str] = None):
+        """记录持续数据文件, 并在后续测试运行期间后台预先分析"""
+        self.continuous_data_files.append(continuous_data_file)
+        if test_name:
+            self.continuous_files_by_test[test_name] = continuous_data_file
+        self.report_pipeline.submit_test_section(continuous_data_file)
     
     def _collect_all_metrics_data(self) -> Dict[str, Any]:
         """收集所有测试的指标数据"""
-        all_metrics_data = {}
-        
-        for result in self.test_results:
-            if result.metrics_file and result.success:
-                try:
-                    import json
-                    with open(result.metrics_file, 'r', encoding='utf-8') as f:
-                        metrics_data = json.load(f)
-                    
-                    all_metrics_data[result.test_name] = {
-                        'test_info': {
-                            'port': result.port,
-                            'duration': result.duration,
-                            'start_time': result.start_time.isoformat(),
-                            'end_time': result.end_time.isoformat(),
-                            'metrics_file': result.metrics_file
-                        },
-                        'metrics': metrics_data
-                    }
-                except Exception as e:
-                    console.print(f"[yellow]⚠️ 无法读取 {result.metrics_file}: {e}[/yellow]")
-                    all_metrics_data[result.test_name] = {
-                        'test_info': {
-                            'port': result.port,
-                            'duration': result.duration,
-                            'start_time': result.start_time.isoformat(),
-                            'end_time': result.end_time.isoformat(),
-                            'metrics_file': result.metrics_file
-                        },
-                        'metrics': []
-                    }
-            else:
-                all_metrics_data[result.test_name] = {
-                    'test_info': {
-                        'port': result.port,
-                        'duration': result.duration,
-                        'start_time': result.start_time.isoformat(),
-                        'end_time': result.end_time.isoformat(),
-                        'metrics_file': result.metrics_file
-                    },
-                    'metrics': []
-                }
-        
-        return all_metrics_data
+        return self._get_analysis_frame().metrics_data
+    
+    def _get_analysis_frame(self, preloaded_series: Optional[Dict[str, Any]] = None) -> AnalysisFrame:
+        """获取共享分析数据帧, 测试结果或持续数据文件变化时才重新加载"""
+        frame_key = (
+            tuple((r.test_name, r.metrics_file, r.success) for r in self.test_results),
+            tuple(self.continuous_data_files)
+        )
+        if self.analysis_frame is None or frame_key != self._analysis_frame_key:
+            self.analysis_frame = AnalysisFrame.load(self.test_results, self.continuous_data_files, preloaded_series,
+                                                     cache=self.report_cache)
+            self._analysis_frame_key = frame_key
+            for message in self.analysis_frame.load_errors:
+                console.print(f"[yellow]⚠️ {message}[/yellow]")
+        return self.analysis_frame
     
     def _show_report_summary(self):
         """显示报告摘要"""
@@ -1915,9 +2185,7 @@ class AutoDataCollector:
     def _show_test_metrics(self, result):
         """显示单个测试的关键指标"""
         try:
-            import json
-            with open(result.metrics_file, 'r', encoding='utf-8') as f:
-                metrics_data = json.load(f)
+            metrics_data = load_json(result.metrics_file)
             
             if not metrics_data:
                 console.print(f"   [yellow]⚠️ 指标文件为空[/yellow]")
@@ -1945,22 +2213,22 @@ class AutoDataCollector:
                 if isinstance(metric, dict):
                     name = metric.get('name', '')
                     value = metric.get('value', 0)
-                    name_lower = name.lower()
+                    category = registry.lookup(name).category
                     
-                    # 按类别分类指标
-                    if any(keyword in name_lower for keyword in ['connect', 'connection']):
+                    # 按统一的指标注册表分类
+                    if category == 'connection':
                         connection_metrics.append((name, value))
-                    elif any(keyword in name_lower for keyword in ['mqtt', 'publish', 'subscribe', 'message', 'pub', 'sub', 'handshake']):
+                    elif category in ('publish', 'subscribe'):
                         mqtt_metrics.append((name, value))
-                    elif any(keyword in name_lower for keyword in ['latency', 'duration', 'time']):
+                    elif category == 'latency':
                         performance_metrics.append((name, value))
-                        if 'latency' in name_lower:
+                        if 'latency' in name.lower():
                             latency_metrics.append((name, value))
-                    elif any(keyword in name_lower for keyword in ['error', 'fail', 'exception', 'timeout', 'refused', 'unreachable']):
+                    elif category == 'error':
                         error_metrics.append((name, value))
-                    elif any(keyword in name_lower for keyword in ['cpu', 'memory', 'disk', 'network', 'system', 'erlang']):
+                    elif category == 'system':
                         system_metrics.append((name, value))
-                    elif any(keyword in name_lower for keyword in ['throughput', 'rate', 'succ', 'recv']):
+                    elif category == 'throughput':
                         throughput_metrics.append((name, value))
             
             # 显示关键指标表格
@@ -2156,17 +2424,17 @@ class AutoDataCollector:
             
             for metric in metrics:
                 if isinstance(metric, dict):
-                    name = metric.get('name', '').lower()
+                    report_group = registry.lookup(metric.get('name', '')).report_group
                     
-                    if any(keyword in name for keyword in ['mqtt', 'publish', 'subscribe', 'message', 'pub', 'sub', 'handshake']):
+                    if report_group == 'mqtt':
                         mqtt_metrics_count += 1
-                    elif any(keyword in name for keyword in ['connect', 'connection']):
+                    elif report_group == 'connection':
                         connection_metrics_count += 1
-                    elif any(keyword in name for keyword in ['latency', 'throughput', 'rate', 'duration', 'time']):
+                    elif report_group == 'performance':
                         performance_metrics_count += 1
-                    elif any(keyword in name for keyword in ['error', 'fail', 'exception', 'timeout']):
+                    elif report_group == 'error':
                         error_metrics_count += 1
-                    elif any(keyword in name for keyword in ['cpu', 'memory', 'disk', 'network', 'system']):
+                    elif report_group == 'system':
                         system_metrics_count += 1
         
         # 显示统计表格
@@ -2540,7 +2808,7 @@ def filter_existing_data():
         console.print(f"[red]❌ 目录不存在: {raw_data_dir}[/red]")
         return
     
-    raw_data_files = [f for f in os.listdir(raw_data_dir) if f.endswith('.json')]
+    raw_data_files = [os.path.basename(f) for f in glob_artifacts(os.path.join(raw_data_dir, '*.json'))]
     
     if not raw_data_files:
         console.print(f"[yellow]⚠️ 在 {raw_data_dir} 中未找到JSON文件[/yellow]")
@@ -2555,14 +2823,24 @@ def filter_existing_data():
     if Confirm.ask("是否过滤所有raw_data文件?", default=True):
         console.print("[green]✅ 开始过滤所有文件...[/green]")
         
+        # 内容和过滤规则都未变化的文件直接复用上次的过滤结果
+        cache = collector.report_cache
+        skipped_count = 0
+        
         for file in raw_data_files:
             file_path = os.path.join(raw_data_dir, file)
+            cache_key = cache.make_key([file_path], extra=['filter_raw_data', collector.invalid_data_patterns])
+            cached_path = cache.get('filtered_raw_data', cache_key)
+            if cached_path and os.path.exists(cached_path):
+                skipped_count += 1
+                console.print(f"[dim]⏭️ 未变化, 跳过: {file} -> {cached_path}[/dim]")
+                continue
+            
             console.print(f"\n[blue]🔍 处理文件: {file}[/blue]")
             
             try:
-                # 读取原始数据
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                # 读取原始数据 (压缩文件自动解压)
+                data = load_json(file_path)
                 
                 # 提取测试信息
                 test_name = data.get('test_name', 'Unknown')
@@ -2614,11 +2892,15 @@ def filter_existing_data():
                 console.print(f"[dim]  • 过滤后指标: {filtered_count}[/dim]")
                 console.print(f"[dim]  • 移除指标: {removed_count} ({reduction_percent:.1f}%)[/dim]")
                 console.print(f"[dim]  • 保存位置: {filtered_path}[/dim]")
+                cache.put('filtered_raw_data', cache_key, filtered_path)
                 
             except Exception as e:
                 console.print(f"[red]❌ 处理文件 {file} 失败: {e}[/red]")
         
+        cache.flush()
         console.print(f"\n[green]🎉 数据过滤完成！[/green]")
+        if skipped_count:
+            console.print(f"[blue]⏭️ {skipped_count} 个文件内容未变化, 已复用上次的过滤结果[/blue]")
         console.print(f"[blue]📁 过滤后的数据保存在: test_data/filtered_data/[/blue]")
     else:
         console.print("[yellow]用户取消操作[/yellow]")
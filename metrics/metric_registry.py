@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+指标分类注册表
+统一维护 emqtt_bench 指标名称到 类别/单位/类型/显示名称 的映射,
+供所有报告生成器和收集器共享, 保证各报告中的指标分类一致
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 指标类别
+CATEGORY_CONNECTION = 'connection'
+CATEGORY_PUBLISH = 'publish'
+CATEGORY_SUBSCRIBE = 'subscribe'
+CATEGORY_LATENCY = 'latency'
+CATEGORY_THROUGHPUT = 'throughput'
+CATEGORY_ERROR = 'error'
+CATEGORY_SYSTEM = 'system'
+CATEGORY_HUAWEI = 'huawei'
+CATEGORY_OTHER = 'other'
+
+# 指标类型
+KIND_COUNTER = 'counter'
+KIND_GAUGE = 'gauge'
+KIND_HISTOGRAM = 'histogram'
+
+# 报告中常用的五大分组 (性能/连接/MQTT/系统/错误)
+REPORT_GROUPS = {
+    CATEGORY_CONNECTION: 'connection',
+    CATEGORY_PUBLISH: 'mqtt',
+    CATEGORY_SUBSCRIBE: 'mqtt',
+    CATEGORY_LATENCY: 'performance',
+    CATEGORY_THROUGHPUT: 'performance',
+    CATEGORY_ERROR: 'error',
+    CATEGORY_SYSTEM: 'system',
+    CATEGORY_HUAWEI: 'connection',
+    CATEGORY_OTHER: None,
+}
+
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+
+
+@dataclass(frozen=True)
+class MetricInfo:
+    """单个指标的分类信息"""
+    name: str
+    category: str
+    unit: str
+    kind: str
+    display_name: str
+    scope: str  # 所属测试环节: connection / publish / subscribe / system / other
+    report_key: str  # 报告中使用的指标键名
+    known: bool = True
+
+    @property
+    def report_group(self) -> Optional[str]:
+        """报告五大分组名称, 无对应分组时为 None"""
+        return REPORT_GROUPS.get(self.category)
+
+    @property
+    def is_error(self) -> bool:
+        return self.category == CATEGORY_ERROR
+
+
+# emqtt_bench 计数器: 名称 -> (类别, 所属环节, 显示名称, 报告键名)
+_BENCH_COUNTERS: Dict[str, Tuple[str, str, str, str]] = {
+    'connect_succ': (CATEGORY_CONNECTION, 'connection', '连接成功数', 'emqtt_bench_connected_total'),
+    'connect_retried': (CATEGORY_CONNECTION, 'connection', '连接重试数', 'emqtt_bench_reconnect_total'),
+    'reconnect_succ': (CATEGORY_CONNECTION, 'connection', '重连成功数', 'emqtt_bench_reconnect_success_total'),
+    'connection_idle': (CATEGORY_CONNECTION, 'connection', '空闲连接数', 'emqtt_bench_idle_connections'),
+    'connect_fail': (CATEGORY_ERROR, 'connection', '连接失败数', 'emqtt_bench_connect_fail_total'),
+    'unreachable': (CATEGORY_ERROR, 'connection', '不可达次数', 'emqtt_bench_unreachable_total'),
+    'connection_refused': (CATEGORY_ERROR, 'connection', '连接被拒数', 'emqtt_bench_connection_refused_total'),
+    'connection_timeout': (CATEGORY_ERROR, 'connection', '连接超时数', 'emqtt_bench_connection_timeout_total'),
+    'pub': (CATEGORY_PUBLISH, 'publish', '发布消息数', 'emqtt_bench_publish_total'),
+    'pub_succ': (CATEGORY_PUBLISH, 'publish', '发布成功数', 'emqtt_bench_published_total'),
+    'pub_overrun': (CATEGORY_PUBLISH, 'publish', '发布溢出数', 'emqtt_bench_publish_overrun_total'),
+    'pub_fail': (CATEGORY_ERROR, 'publish', '发布失败数', 'emqtt_bench_publish_fail_total'),
+    'sub': (CATEGORY_SUBSCRIBE, 'subscribe', '订阅成功数', 'emqtt_bench_subscribed_total'),
+    'recv': (CATEGORY_SUBSCRIBE, 'subscribe', '接收消息数', 'emqtt_bench_messages_received_total'),
+    'sub_fail': (CATEGORY_ERROR, 'subscribe', '订阅失败数', 'emqtt_bench_subscribe_fail_total'),
+    'publish_latency': (CATEGORY_LATENCY, 'publish', '发布延迟', 'emqtt_bench_publish_latency_seconds'),
+}
+
+# emqtt_bench 直方图 (单位 ms): 名称 -> (所属环节, 显示名称)
+_BENCH_HISTOGRAMS: Dict[str, Tuple[str, str]] = {
+    'mqtt_client_tcp_handshake_duration': ('connection', 'TCP握手时长'),
+    'mqtt_client_handshake_duration': ('connection', 'MQTT握手时长'),
+    'mqtt_client_connect_duration': ('connection', '连接建立时长'),
+    'mqtt_client_subscribe_duration': ('subscribe', '订阅时长'),
+    'e2e_latency': ('subscribe', '端到端延迟'),
+}
+
+# Erlang VM 指标: 名称 -> (单位, 类型, 显示名称, 报告键名)
+_ERLANG_VM_METRICS: Dict[str, Tuple[str, str, str, str]] = {
+    'erlang_vm_process_count': ('count', KIND_GAUGE, '进程数', 'erlang_vm_process_count'),
+    'erlang_vm_port_count': ('count', KIND_GAUGE, '端口数', 'erlang_vm_port_count'),
+    'erlang_vm_atom_count': ('count', KIND_GAUGE, '原子数', 'erlang_vm_atom_count'),
+    'erlang_vm_schedulers': ('count', KIND_GAUGE, '调度器数', 'erlang_vm_schedulers'),
+    'erlang_vm_schedulers_online': ('count', KIND_GAUGE, '在线调度器数', 'erlang_vm_schedulers_online'),
+    'erlang_vm_logical_processors': ('count', KIND_GAUGE, '逻辑处理器数', 'erlang_vm_logical_processors'),
+    'erlang_vm_logical_processors_online': ('count', KIND_GAUGE, '在线逻辑处理器数', 'erlang_vm_logical_processors_online'),
+    'erlang_vm_logical_processors_available': ('count', KIND_GAUGE, '可用逻辑处理器数', 'erlang_vm_logical_processors_available'),
+    'erlang_vm_memory_bytes_total': ('bytes', KIND_GAUGE, 'VM内存总量', 'erlang_vm_memory_bytes_total'),
+    'erlang_vm_memory_processes_bytes_total': ('bytes', KIND_GAUGE, '进程内存', 'erlang_vm_memory_processes_bytes_total'),
+    'erlang_vm_memory_system_bytes_total': ('bytes', KIND_GAUGE, '系统内存', 'erlang_vm_memory_system_bytes_total'),
+    'erlang_vm_memory_atom_bytes_total': ('bytes', KIND_GAUGE, '原子内存', 'erlang_vm_memory_atom_bytes_total'),
+    'erlang_vm_memory_ets_tables': ('count', KIND_GAUGE, 'ETS表数', 'erlang_vm_memory_ets_tables'),
+    'erlang_vm_memory_dets_tables': ('count', KIND_GAUGE, 'DETS表数', 'erlang_vm_memory_dets_tables'),
+    'erlang_vm_statistics_garbage_collection_number_of_gcs': ('count', KIND_COUNTER, 'GC次数', 'erlang_vm_gc_count'),
+    'erlang_vm_statistics_garbage_collection_words_reclaimed': ('count', KIND_COUNTER, 'GC回收字数', 'erlang_vm_gc_words_reclaimed'),
+    'erlang_vm_statistics_garbage_collection_bytes_reclaimed': ('bytes', KIND_COUNTER, 'GC回收字节', 'erlang_vm_gc_bytes_reclaimed'),
+    'erlang_vm_statistics_reductions_total': ('count', KIND_COUNTER, 'Reductions', 'erlang_vm_reductions_total'),
+    'erlang_vm_statistics_runtime_milliseconds': ('ms', KIND_COUNTER, '运行时间', 'erlang_vm_runtime_ms'),
+    'erlang_vm_statistics_wallclock_time_milliseconds': ('ms', KIND_COUNTER, '墙钟时间', 'erlang_vm_wallclock_ms'),
+    'erlang_vm_statistics_context_switches': ('count', KIND_COUNTER, '上下文切换', 'erlang_vm_context_switches'),
+    'erlang_vm_statistics_run_queues_length': ('count', KIND_GAUGE, '运行队列长度', 'erlang_vm_run_queues_length'),
+    'erlang_vm_statistics_dirty_cpu_run_queue_length': ('count', KIND_GAUGE, '脏CPU运行队列长度', 'erlang_vm_dirty_cpu_run_queue_length'),
+    'erlang_vm_statistics_dirty_io_run_queue_length': ('count', KIND_GAUGE, '脏IO运行队列长度', 'erlang_vm_dirty_io_run_queue_length'),
+    'erlang_vm_statistics_bytes_received_total': ('bytes', KIND_COUNTER, '接收字节', 'erlang_vm_bytes_received_total'),
+    'erlang_vm_statistics_bytes_output_total': ('bytes', KIND_COUNTER, '发送字节', 'erlang_vm_bytes_output_total'),
+    'erlang_vm_dirty_cpu_schedulers': ('count', KIND_GAUGE, '脏CPU调度器数', 'erlang_vm_dirty_cpu_schedulers'),
+    'erlang_vm_dirty_cpu_schedulers_online': ('count', KIND_GAUGE, '在线脏CPU调度器数', 'erlang_vm_dirty_cpu_schedulers_online'),
+    'erlang_vm_dirty_io_schedulers': ('count', KIND_GAUGE, '脏IO调度器数', 'erlang_vm_dirty_io_schedulers'),
+    'erlang_vm_msacc_emulator_seconds_total': ('seconds', KIND_COUNTER, '微状态-emulator', 'erlang_vm_msacc_emulator_seconds'),
+    'erlang_vm_msacc_gc_seconds_total': ('seconds', KIND_COUNTER, '微状态-gc', 'erlang_vm_msacc_gc_seconds'),
+    'erlang_vm_msacc_port_seconds_total': ('seconds', KIND_COUNTER, '微状态-port', 'erlang_vm_msacc_port_seconds'),
+    'erlang_vm_msacc_other_seconds_total': ('seconds', KIND_COUNTER, '微状态-other', 'erlang_vm_msacc_other_seconds'),
+    'erlang_vm_msacc_sleep_seconds_total': ('seconds', KIND_COUNTER, '微状态-sleep', 'erlang_vm_msacc_sleep_seconds'),
+    'erlang_vm_msacc_check_io_seconds_total': ('seconds', KIND_COUNTER, '微状态-check_io', 'erlang_vm_msacc_check_io_seconds'),
+    'erlang_vm_msacc_aux_seconds_total': ('seconds', KIND_COUNTER, '微状态-aux', 'erlang_vm_msacc_aux_seconds'),
+    'erlang_vm_wordsize_bytes': ('bytes', KIND_GAUGE, '字长', 'erlang_vm_wordsize_bytes'),
+    'erlang_vm_time_correction': ('', KIND_GAUGE, '时间校正', 'erlang_vm_time_correction'),
+    'erlang_vm_thread_pool_size': ('count', KIND_GAUGE, '线程池大小', 'erlang_vm_thread_pool_size'),
+    'erlang_vm_threads': ('', KIND_GAUGE, '线程支持', 'erlang_vm_threads'),
+    'erlang_vm_smp_support': ('', KIND_GAUGE, 'SMP支持', 'erlang_vm_smp_support'),
+    'erlang_vm_process_limit': ('count', KIND_GAUGE, '进程上限', 'erlang_vm_process_limit'),
+    'erlang_vm_port_limit': ('count', KIND_GAUGE, '端口上限', 'erlang_vm_port_limit'),
+    'erlang_vm_atom_limit': ('count', KIND_GAUGE, '原子上限', 'erlang_vm_atom_limit'),
+    'erlang_vm_ets_limit': ('count', KIND_GAUGE, 'ETS上限', 'erlang_vm_ets_limit'),
+    'erlang_vm_allocators': ('', KIND_GAUGE, '内存分配器', 'erlang_vm_allocators'),
+}
+
+# 未登记指标的关键字分类规则, 按顺序匹配
+_FALLBACK_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    (CATEGORY_ERROR, ('error', 'fail', 'exception', 'timeout', 'refused', 'unreachable')),
+    (CATEGORY_HUAWEI, ('huawei', 'cloud', 'iot', 'device', 'auth', 'payload')),
+    (CATEGORY_LATENCY, ('latency', 'duration')),
+    (CATEGORY_THROUGHPUT, ('throughput', 'rate')),
+    (CATEGORY_SYSTEM, ('erlang', 'cpu', 'memory', 'disk', 'network', 'system', 'process', 'thread', 'scheduler')),
+    (CATEGORY_CONNECTION, ('connect', 'connection', 'client', 'session', 'concurrent')),
+    (CATEGORY_SUBSCRIBE, ('subscribe', 'sub', 'recv', 'message', 'qos')),
+    (CATEGORY_PUBLISH, ('publish', 'pub', 'mqtt', 'handshake')),
+]
+
+_CATEGORY_SCOPES = {
+    CATEGORY_CONNECTION: 'connection',
+    CATEGORY_PUBLISH: 'publish',
+    CATEGORY_SUBSCRIBE: 'subscribe',
+    CATEGORY_SYSTEM: 'system',
+}
+
+
+class MetricRegistry:
+    """指标分类注册表, 构建一次后按名称 O(1) 查询"""
+
+    def __init__(self):
+        self._index: Dict[str, MetricInfo] = {}
+        self._build_index()
+
+    def _register(self, info: MetricInfo):
+        self._index[info.name] = info
+
+    def _build_index(self):
+        """构建已知指标索引"""
+        for name, (category, scope, display_name, report_key) in _BENCH_COUNTERS.items():
+            unit = 'ms' if category == CATEGORY_LATENCY else 'count'
+            self._register(MetricInfo(name, category, unit, KIND_COUNTER, display_name, scope, report_key))
+
+        for name, (scope, display_name) in _BENCH_HISTOGRAMS.items():
+            self._register(MetricInfo(name, CATEGORY_LATENCY, 'ms', KIND_HISTOGRAM, display_name, scope, name))
+            for suffix in HISTOGRAM_SUFFIXES:
+                series_name = f"{name}{suffix}"
+                report_key = f"emqtt_bench_{series_name}" if name == 'e2e_latency' else series_name
+                self._register(MetricInfo(series_name, CATEGORY_LATENCY, 'ms', KIND_HISTOGRAM,
+                                          f"{display_name}({suffix[1:]})", scope, report_key))
+
+        for name, (unit, kind, display_name, report_key) in _ERLANG_VM_METRICS.items():
+            self._register(MetricInfo(name, CATEGORY_SYSTEM, unit, kind, display_name, 'system', report_key))
+
+    def lookup(self, name: str) -> MetricInfo:
+        """查询指标分类信息, 未登记的指标按关键字规则推断 (结果会被缓存)"""
+        info = self._index.get(name)
+        if info is not None:
+            return info
+        return _classify_unknown(name)
+
+    def category(self, name: str) -> str:
+        return self.lookup(name).category
+
+    def known_metrics(self) -> Iterable[MetricInfo]:
+        return self._index.values()
+
+
+@lru_cache(maxsize=4096)
+def _classify_unknown(name: str) -> MetricInfo:
+    """按关键字规则推断未登记指标的分类"""
+    lowered = name.lower()
+
+    category = CATEGORY_OTHER
+    for rule_category, keywords in _FALLBACK_RULES:
+        if any(keyword in lowered for keyword in keywords):
+            category = rule_category
+            break
+
+    kind = KIND_GAUGE
+    if lowered.endswith(HISTOGRAM_SUFFIXES):
+        kind = KIND_HISTOGRAM
+    elif lowered.endswith('_total'):
+        kind = KIND_COUNTER
+
+    if lowered.endswith('_bytes') or '_bytes_' in lowered:
+        unit = 'bytes'
+    elif lowered.endswith('_seconds') or '_seconds_' in lowered:
+        unit = 'seconds'
+    elif category == CATEGORY_LATENCY:
+        unit = 'ms'
+    else:
+        unit = ''
+
+    scope = 'system' if lowered.startswith('erlang_vm_') else _CATEGORY_SCOPES.get(category, 'other')
+    return MetricInfo(name, category, unit, kind, name, scope, name, known=False)
+
+
+# 全局注册表实例
+registry = MetricRegistry()
+
+
+def lookup_metric(name: str) -> MetricInfo:
+    """查询指标分类信息"""
+    return registry.lookup(name)
@@ -21,6 +21,7 @@ from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich.panel import Panel
 from rich import print as rprint
+from tick_scheduler import TickScheduler
 
 console = Console()
 
@@ -55,10 +56,11 @@ class PrometheusMetricsCollector:
             return []
     
     def _parse_metrics(self, metrics_text: str, port: int) -> List[MetricData]:
-        """解析 Prometheus 格式的指标数据"""
+        """解析 Prometheus 格式的指标数据 (同一次抓取的指标共用一个时间戳)"""
         metrics = []
         current_help = ""
         current_type = ""
+        timestamp = datetime.now().isoformat()
         
         for line in metrics_text.strip().split('\n'):
             line = line.strip()
@@ -72,13 +74,14 @@ class PrometheusMetricsCollector:
                 continue
             
             # 解析指标行
-            metric = self._parse_metric_line(line, current_help, current_type, port)
+            metric = self._parse_metric_line(line, current_help, current_type, port, timestamp)
             if metric:
                 metrics.append(metric)
         
         return metrics
     
-    def _parse_metric_line(self, line: str, help_text: str, metric_type: str, port: int) -> Optional[MetricData]:
+    def _parse_metric_line(self, line: str, help_text: str, metric_type: str, port: int,
+                           timestamp: str) -> Optional[MetricData]:
         """解析单个指标行"""
         # 匹配指标格式: name{labels} value
         pattern = r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{([^}]*)\})?\s+(.+)$'
@@ -108,7 +111,7 @@ class PrometheusMetricsCollector:
             return None
         
         return MetricData(
-            timestamp=datetime.now().isoformat(),
+            timestamp=timestamp,
             name=name,
             value=value,
             labels=labels,
@@ -340,7 +343,8 @@ def monitor(port, host, interval, duration):
     start_time = time.time()
     
     try:
-        while True:
+        # 按绝对截止时间触发, 抓取和显示耗时不累积成漂移
+        for _ in TickScheduler(interval):
             # 收集指标
             metrics = collector.fetch_metrics(port)
             filtered = analyzer.filter_mqtt_bench_metrics(metrics)
@@ -363,8 +367,6 @@ def monitor(port, host, interval, duration):
             if duration and (time.time() - start_time) >= duration:
                 break
             
-            time.sleep(interval)
-            
     except KeyboardInterrupt:
         console.print("\n[yellow]监控已停止[/yellow]")
 
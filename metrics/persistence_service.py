@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+测试数据后台持久化服务
+单个写线程消费有界队列, 把多个测试的数据库写入合并为一个事务、依次写出原始JSON/CSV/摘要文件,
+测试循环提交后立即开始下一个测试; 队列满时提示背压并等待, 中断时先写完队列中的数据再退出
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+from rich.console import Console
+
+from self_metrics import PERSIST_SECONDS, QUEUE_DEPTH, get_self_metrics
+
+console = Console()
+
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_WAIT = 0.5  # 收到第一条数据后最多再等多久凑成一批 (秒)
+
+_STOP = object()
+
+
+@dataclass
+class PersistenceStats:
+    """持久化统计"""
+    submitted: int = 0
+    saved: int = 0
+    failed: int = 0
+    batches: int = 0
+    max_depth: int = 0  # 队列最大积压
+    backpressure_events: int = 0  # 提交时队列已满的次数
+    backpressure_wait: float = 0.0  # 因队列已满等待的总秒数
+    write_time: float = 0.0  # 写线程实际写入耗时
+
+
+class PersistenceService:
+    """测试数据的单写线程持久化队列"""
+
+    def __init__(self, data_manager: Any, max_queue: int = DEFAULT_QUEUE_SIZE,
+                 batch_size: int = DEFAULT_BATCH_SIZE, batch_wait: float = DEFAULT_BATCH_WAIT):
+        """
+        Args:
+            data_manager: TestDataManager, 使用其 save_to_database / save_test_files 批量保存
+            max_queue: 队列容量, 写入跟不上时提交方等待 (背压)
+            batch_size: 每批最多合并的测试数
+            batch_wait: 收到第一条数据后等待凑批的时间
+        """
+        self.data_manager = data_manager
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.stats = PersistenceStats()
+        self.saved_files: List[str] = []
+        self.self_metrics = get_self_metrics()
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer_loop, name="persistence-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """队列中等待写入的测试数"""
+        return self._queue.qsize()
+
+    def submit(self, test_data: Any) -> bool:
+        """
+        提交一个测试的数据, 队列未满时立即返回
+
+        Returns:
+            bool: 是否已进入队列 (服务已关闭时返回 False, 由调用方同步保存)
+        """
+        if self._closed:
+            return False
+        self.stats.submitted += 1
+        try:
+            self._queue.put_nowait(test_data)
+        except queue.Full:
+            self.stats.backpressure_events += 1
+            console.print(f"[yellow]⏳ 持久化队列已满 ({self._queue.maxsize} 个测试待写入), 等待写入完成...[/yellow]")
+            waited = time.perf_counter()
+            self._queue.put(test_data)
+            self.stats.backpressure_wait += time.perf_counter() - waited
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+        self.self_metrics.set_gauge(QUEUE_DEPTH, self._queue.qsize(), queue='persistence')
+        return True
+
+    def _next_batch(self) -> List[Any]:
+        """阻塞等待第一条数据, 之后在 batch_wait 内尽量凑满一批"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _writer_loop(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            items = [item for item in batch if item is not _STOP]
+            if items:
+                self._write_batch(items)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _write_batch(self, items: List[Any]):
+        started = time.perf_counter()
+        try:
+            # 数据库插入是单个事务, 失败时整批回滚, 可以逐个重试
+            test_ids = self.data_manager.save_to_database(items)
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 批量写入数据库失败, 逐个重试: {e}[/yellow]")
+            test_ids = []
+            for item in items:
+                try:
+                    test_ids.extend(self.data_manager.save_to_database([item]))
+                except Exception as item_error:
+                    test_ids.append(None)
+                    self._report_failure(item, item_error)
+        inserted = [(item, test_id) for item, test_id in zip(items, test_ids) if test_id is not None]
+        if inserted:
+            self._write_files(inserted)
+        self.stats.batches += 1
+        self.stats.write_time += time.perf_counter() - started
+        self.self_metrics.observe(PERSIST_SECONDS, time.perf_counter() - started, target='test_data')
+        self.self_metrics.set_gauge(QUEUE_DEPTH, self._queue.qsize(), queue='persistence')
+
+    def _write_files(self, inserted: List[Tuple[Any, int]]):
+        """写出已入库测试的数据文件, 失败时只对这些 test_id 逐个重试文件写入, 不会重复插入数据库"""
+        try:
+            saved = self.data_manager.save_test_files([item for item, _ in inserted],
+                                                      [test_id for _, test_id in inserted])
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 批量保存数据文件失败, 逐个重试: {e}[/yellow]")
+            saved = []
+            for item, test_id in inserted:
+                try:
+                    saved.extend(self.data_manager.save_test_files([item], [test_id]))
+                except Exception as item_error:
+                    self._report_failure(item, item_error)
+        with self._lock:
+            self.saved_files.extend(saved)
+        self.stats.saved += len(saved)
+        for path in saved:
+            console.print(f"[blue]💾 测试数据已保存: {path}[/blue]")
+
+    def _report_failure(self, item: Any, error: Exception):
+        self.stats.failed += 1
+        console.print(f"[yellow]⚠️ 保存测试数据失败 ({getattr(item, 'test_name', '?')}): {error}[/yellow]")
+
+    def flush(self):
+        """等待队列中已提交的数据全部写入"""
+        self._queue.join()
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        写完队列中的数据并停止写线程 (可重复调用)
+
+        Args:
+            timeout: 最多等待的秒数, None 表示一直等待
+
+        Returns:
+            bool: 是否已全部写入
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
@@ -23,9 +23,9 @@ def show_help():
 命令:
   list                    - 列出所有测试记录
   show <test_id>          - 显示特定测试详情
-  export <format>         - 导出数据 (json/csv/excel)
+  export <format>         - 导出数据 (json/csv/excel/parquet/arrow)
   stats                   - 显示数据统计
-  cleanup <days>          - 清理旧数据
+  cleanup <days>          - 按保留策略清理旧数据 (超过天数的运行降为聚合)
   help                    - 显示此帮助信息
 
 示例:
@@ -145,7 +145,7 @@ def cleanup_data(days: int):
     
     try:
         data_manager.cleanup_old_data(days)
-        print(f"✅ 已清理 {days} 天前的数据")
+        print(f"✅ 已按保留策略处理 {days} 天前的数据")
     except Exception as e:
         print(f"❌ 清理失败: {e}")
 
@@ -172,8 +172,8 @@ def main():
             print("❌ 测试ID必须是数字")
     elif command == "export":
         format_type = sys.argv[2] if len(sys.argv) > 2 else "json"
-        if format_type not in ["json", "csv", "excel"]:
-            print("❌ 支持的格式: json, csv, excel")
+        if format_type not in ["json", "csv", "excel", "parquet", "arrow"]:
+            print("❌ 支持的格式: json, csv, excel, parquet, arrow")
             return
         export_data(format_type)
     elif command == "stats":
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+跨运行性能回归检测
+按可比较的测试配置 (测试项、服务器类别、客户端数、QoS、发送间隔、认证方式) 对历史运行分组,
+以最近若干个可比较运行为基线, 用稳健统计比较吞吐量和延迟分布:
+基线取各运行中位数的中位数, 自助法 (bootstrap) 估计基线置信区间, Mann-Whitney U 检验逐区间样本分布,
+三者同时满足才判定为回归; 命令行模式以退出码供夜间任务把关
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import argparse
+import hashlib
+import ipaddress
+import json
+import math
+import sqlite3
+import sys
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+
+from analysis_frame import AnalysisFrame, LATENCY_HISTOGRAMS
+from report_cache import ReportCache
+from test_data_manager import TestDataManager
+
+console = Console()
+
+# 退出码: 无回归 / 检测到回归 / 没有可检测的运行
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_NO_DATA = 2
+
+# 比较结果状态
+STATUS_OK = "ok"
+STATUS_REGRESSION = "regression"
+STATUS_IMPROVED = "improved"
+STATUS_INSUFFICIENT = "insufficient"  # 可比较的历史运行不足
+
+# 比较的指标: 名称 -> (显示名称, 单位, 数值越大越好)
+METRICS = {
+    'throughput': ('吞吐量', 'msg/s', True),
+    'latency': ('平均延迟', 'ms', False)
+}
+
+
+def host_class(host: Optional[str]) -> str:
+    """服务器类别: loopback / private / public / huaweicloud / remote (域名)"""
+    host = (host or '').strip().lower()
+    if host in ('', 'localhost'):
+        return 'loopback'
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return 'huaweicloud' if 'huaweicloud' in host else 'remote'
+    if address.is_loopback:
+        return 'loopback'
+    return 'private' if address.is_private else 'public'
+
+
+def comparison_key(test_name: str, config: Any) -> str:
+    """
+    可比较配置的指纹, 指纹相同的运行才互相比较
+
+    Args:
+        test_name: 测试名称 (测试项)
+        config: TestConfig 或保存在数据库中的配置字典
+
+    Returns:
+        16 位十六进制指纹
+    """
+    if not isinstance(config, dict):
+        config = asdict(config)
+    fields = {
+        'test': test_name,
+        'host_class': host_class(config.get('host')),
+        'client_count': config.get('client_count'),
+        'qos': config.get('qos'),
+        'msg_interval': config.get('msg_interval'),
+        'auth': 'huawei' if config.get('use_huawei_auth') else 'plain'
+    }
+    payload = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def bootstrap_ci(values: Sequence[float], confidence: float = 0.95, resamples: int = 2000,
+                 seed: int = 0) -> Tuple[float, float]:
+    """中位数的自助法百分位置信区间"""
+    data = np.asarray(values, dtype=float)
+    if len(data) == 0:
+        return math.nan, math.nan
+    rng = np.random.default_rng(seed)
+    medians = np.median(rng.choice(data, size=(resamples, len(data)), replace=True), axis=1)
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(medians, [tail, 100 - tail])
+    return float(low), float(high)
+
+
+def mann_whitney_u(x: Sequence[float], y: Sequence[float], alternative: str = 'two-sided') -> Tuple[float, float]:
+    """
+    Mann-Whitney U 检验 (正态近似, 含结值校正和连续性校正)
+
+    Args:
+        x: 当前运行的样本
+        y: 基线样本
+        alternative: 'less' (x 偏小) / 'greater' (x 偏大) / 'two-sided'
+
+    Returns:
+        (x 的 U 统计量, p 值)
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n1, n2 = len(x), len(y)
+    if n1 == 0 or n2 == 0:
+        return math.nan, 1.0
+    combined = np.concatenate([x, y])
+    ranks = pd.Series(combined).rank(method='average').to_numpy()
+    u1 = float(ranks[:n1].sum() - n1 * (n1 + 1) / 2)
+
+    n = n1 + n2
+    _, ties = np.unique(combined, return_counts=True)
+    tie_term = float((ties ** 3 - ties).sum()) / (n * (n - 1)) if n > 1 else 0.0
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return u1, 1.0
+
+    mu = n1 * n2 / 2
+    if alternative == 'less':
+        p = 0.5 * math.erfc(-(u1 - mu + 0.5) / sigma / math.sqrt(2))
+    elif alternative == 'greater':
+        p = 0.5 * math.erfc((u1 - mu - 0.5) / sigma / math.sqrt(2))
+    else:
+        z = (abs(u1 - mu) - 0.5) / sigma
+        p = math.erfc(max(z, 0.0) / math.sqrt(2))
+    return u1, min(1.0, p)
+
+
+@dataclass
+class RunSamples:
+    """单个运行的逐区间样本"""
+    throughput: np.ndarray  # msg/s
+    latency: np.ndarray  # ms
+    source: str  # continuous / rollup / summary
+
+    def get(self, metric: str) -> np.ndarray:
+        return getattr(self, metric)
+
+
+@dataclass
+class MetricComparison:
+    """单个指标与基线的比较结果"""
+    metric: str
+    status: str
+    current: float
+    baseline: float = math.nan  # 基线运行中位数的中位数
+    ci_low: float = math.nan
+    ci_high: float = math.nan
+    change_pct: float = math.nan  # 相对基线的变化, 正值表示变好
+    p_value: float = math.nan
+    baseline_runs: int = 0
+
+    @property
+    def label(self) -> str:
+        return METRICS[self.metric][0]
+
+    @property
+    def unit(self) -> str:
+        return METRICS[self.metric][1]
+
+
+@dataclass
+class RunRegression:
+    """单个运行的回归检测结果"""
+    test_id: int
+    test_name: str
+    start_time: str
+    comparison_key: str
+    baseline_ids: List[int] = field(default_factory=list)
+    comparisons: List[MetricComparison] = field(default_factory=list)
+
+    @property
+    def regressions(self) -> List[MetricComparison]:
+        return [item for item in self.comparisons if item.status == STATUS_REGRESSION]
+
+
+@dataclass
+class RegressionReport:
+    """一组运行的回归检测结果"""
+    runs: List[RunRegression] = field(default_factory=list)
+
+    @property
+    def regressions(self) -> List[Tuple[RunRegression, MetricComparison]]:
+        return [(run, item) for run in self.runs for item in run.regressions]
+
+    @property
+    def exit_code(self) -> int:
+        if not self.runs:
+            return EXIT_NO_DATA
+        return EXIT_REGRESSION if self.regressions else EXIT_OK
+
+
+def continuous_samples(file_path: Optional[str], cache: Optional[ReportCache] = None) -> Optional[RunSamples]:
+    """从持续指标文件计算运行的逐区间吞吐量和延迟样本, 文件不存在或没有数据时返回 None"""
+    if not file_path:
+        return None
+    try:
+        frame = AnalysisFrame.load([], [file_path], cache=cache)
+        performance = frame.trend_records([file_path])['performance']
+    except (OSError, ValueError) as e:
+        console.print(f"[yellow]⚠️ 无法读取持续指标文件 {file_path}: {e}[/yellow]")
+        return None
+    if not performance:
+        return None
+    throughput = np.array([item['throughput'] for item in performance], dtype=float)
+    latency = np.array([item['latency'] * 1000 for item in performance if item['latency'] > 0], dtype=float)
+    return RunSamples(throughput, latency, 'continuous')
+
+
+class RegressionEngine:
+    """跨运行回归检测引擎"""
+
+    def __init__(self, data_manager: TestDataManager, baseline_runs: int = 10, min_runs: int = 3,
+                 threshold: float = 0.05, alpha: float = 0.05, confidence: float = 0.95,
+                 resamples: int = 2000, cache: Optional[ReportCache] = None):
+        """
+        Args:
+            data_manager: 测试数据管理器 (运行目录和数据库)
+            baseline_runs: 基线最多使用的最近可比较运行数
+            min_runs: 至少需要的可比较运行数, 不足时不判定
+            threshold: 相对基线变差超过该比例才判定为回归
+            alpha: Mann-Whitney 检验的显著性水平
+            confidence: 基线自助法置信区间的置信度
+            resamples: 自助法重抽样次数
+            cache: 报告缓存, 解析持续指标文件时复用
+        """
+        self.data_manager = data_manager
+        self.baseline_runs = baseline_runs
+        self.min_runs = max(1, min_runs)
+        self.threshold = threshold
+        self.alpha = alpha
+        self.confidence = confidence
+        self.resamples = resamples
+        self.cache = cache
+        self._samples: Dict[int, Optional[RunSamples]] = {}
+        self._details: Dict[int, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+
+    # ---- 运行数据 ----
+
+    def _load_details(self, run_ids: Sequence[int]):
+        """批量读取运行的配置和性能摘要"""
+        missing = [run_id for run_id in run_ids if run_id not in self._details]
+        if not missing:
+            return
+        conn = sqlite3.connect(self.data_manager.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT id, config, performance_summary FROM test_results WHERE id IN ({','.join('?' * len(missing))})",
+                missing).fetchall()
+        finally:
+            conn.close()
+        for run_id, config, summary in rows:
+            self._details[run_id] = (json.loads(config) if config else {}, json.loads(summary) if summary else {})
+
+    def _run_key(self, record: Dict[str, Any]) -> str:
+        config, _ = self._details.get(record['test_id'], ({}, {}))
+        return comparison_key(record['test_name'], config)
+
+    def run_samples(self, record: Dict[str, Any]) -> Optional[RunSamples]:
+        """
+        运行的吞吐量和延迟样本: 优先持续指标文件, 文件已按保留策略删除时用聚合数据, 最后退回性能摘要
+        """
+        run_id = record['test_id']
+        if run_id not in self._samples:
+            samples = continuous_samples(record.get('continuous_data_file'), self.cache)
+            if samples is None:
+                samples = self._rollup_samples(run_id)
+            if samples is None:
+                self._load_details([run_id])
+                samples = self._summary_samples(self._details.get(run_id, ({}, {}))[1], record.get('duration'))
+            self._samples[run_id] = samples
+        return self._samples[run_id]
+
+    def _rollup_samples(self, run_id: int) -> Optional[RunSamples]:
+        """从最细的聚合数据计算逐窗口样本 (累计型指标取窗口 last 值求差)"""
+        try:
+            rollup = self.data_manager.load_rollup(run_id)
+        except (sqlite3.Error, pd.errors.DatabaseError):
+            return None
+        if rollup.empty:
+            return None
+        rollup = rollup[rollup['resolution'] == rollup['resolution'].min()]
+        values = rollup.pivot_table(index='timestamp', columns='metric_name', values='last', aggfunc='sum')
+        if len(values) < 2:
+            return None
+        elapsed = values.index.to_series().diff().dt.total_seconds()
+
+        def column(name: str) -> pd.Series:
+            return values[name] if name in values.columns else pd.Series(0.0, index=values.index)
+
+        throughput = ((column('pub') + column('recv')).diff() / elapsed).clip(lower=0).iloc[1:]
+        latency = pd.Series(np.nan, index=values.index)
+        for histogram in LATENCY_HISTOGRAMS:
+            count_delta = column(f'{histogram}_count').diff()
+            sum_delta = column(f'{histogram}_sum').diff()
+            mask = latency.isna() & (count_delta > 0)
+            latency[mask] = sum_delta[mask] / count_delta[mask]
+        return RunSamples(throughput.to_numpy(dtype=float), latency.dropna().to_numpy(dtype=float), 'rollup')
+
+    @staticmethod
+    def _summary_samples(summary: Dict[str, Any], duration: Optional[float]) -> Optional[RunSamples]:
+        """只有性能摘要时, 整个运行作为一个样本"""
+        if not summary:
+            return None
+
+        def latest(name: str) -> float:
+            return float(summary.get(name, {}).get('latest', 0) or 0)
+
+        throughput = np.array([(latest('pub') + latest('recv')) / duration] if duration else [], dtype=float)
+        latency = np.array([], dtype=float)
+        for histogram in LATENCY_HISTOGRAMS:
+            count = latest(f'{histogram}_count')
+            if count > 0:
+                latency = np.array([latest(f'{histogram}_sum') / count], dtype=float)
+                break
+        return RunSamples(throughput, latency, 'summary')
+
+    # ---- 比较 ----
+
+    def baseline_for(self, record: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """运行之前最近的可比较成功运行 (新到旧)"""
+        self._load_details([record['test_id']])
+        key = self._run_key(record)
+        baseline: List[Dict[str, Any]] = []
+        page = max(self.baseline_runs * 5, 50)
+        offset = 0
+        while len(baseline) < self.baseline_runs:
+            candidates = self.data_manager.find_tests(test_type=record['test_type'], until=record['start_time'],
+                                                      success=True, limit=page, offset=offset)
+            matching = [item for item in candidates
+                        if item['test_name'] == record['test_name'] and item['test_id'] != record['test_id']]
+            self._load_details([item['test_id'] for item in matching])
+            baseline.extend(item for item in matching if self._run_key(item) == key)
+            if len(candidates) < page:
+                break
+            offset += page
+        return baseline[:self.baseline_runs]
+
+    def compare(self, metric: str, current: np.ndarray, baseline: List[np.ndarray]) -> Optional[MetricComparison]:
+        """
+        比较单个指标
+
+        Args:
+            metric: 'throughput' 或 'latency'
+            current: 当前运行的样本
+            baseline: 各基线运行的样本
+
+        Returns:
+            比较结果, 当前运行没有该指标的样本时返回 None
+        """
+        if len(current) == 0:
+            return None
+        current_median = float(np.median(current))
+        baseline = [samples for samples in baseline if len(samples) > 0]
+        if len(baseline) < self.min_runs:
+            return MetricComparison(metric, STATUS_INSUFFICIENT, current_median, baseline_runs=len(baseline))
+
+        higher_is_better = METRICS[metric][2]
+        run_medians = [float(np.median(samples)) for samples in baseline]
+        baseline_median = float(np.median(run_medians))
+        ci_low, ci_high = bootstrap_ci(run_medians, self.confidence, self.resamples)
+        if baseline_median:
+            change = (current_median - baseline_median) / abs(baseline_median)
+            change_pct = (change if higher_is_better else -change) * 100
+        else:
+            change_pct = math.nan
+
+        pooled = np.concatenate(baseline)
+        _, p_worse = mann_whitney_u(current, pooled, 'less' if higher_is_better else 'greater')
+        _, p_better = mann_whitney_u(current, pooled, 'greater' if higher_is_better else 'less')
+        # 样本太少 (只有性能摘要) 时检验没有意义, 只依据置信区间和阈值
+        testable = len(current) >= 2 and len(pooled) >= 2
+
+        worse = current_median < ci_low if higher_is_better else current_median > ci_high
+        better = current_median > ci_high if higher_is_better else current_median < ci_low
+        status = STATUS_OK
+        if not math.isnan(change_pct) and abs(change_pct) >= self.threshold * 100:
+            if worse and change_pct < 0 and (not testable or p_worse < self.alpha):
+                status = STATUS_REGRESSION
+            elif better and change_pct > 0 and (not testable or p_better < self.alpha):
+                status = STATUS_IMPROVED
+
+        return MetricComparison(metric, status, current_median, baseline_median, ci_low, ci_high, change_pct,
+                                p_worse if status != STATUS_IMPROVED else p_better, len(baseline))
+
+    def check_run(self, record: Dict[str, Any]) -> RunRegression:
+        """与可比较的历史运行比较单个运行"""
+        baseline_records = self.baseline_for(record)
+        result = RunRegression(record['test_id'], record['test_name'], record['start_time'], self._run_key(record),
+                               [item['test_id'] for item in baseline_records])
+        current = self.run_samples(record)
+        if current is None:
+            return result
+        baseline = [samples for samples in (self.run_samples(item) for item in baseline_records) if samples is not None]
+        for metric in METRICS:
+            comparison = self.compare(metric, current.get(metric), [samples.get(metric) for samples in baseline])
+            if comparison is not None:
+                result.comparisons.append(comparison)
+        return result
+
+    def check(self, since: Any = None, test_ids: Optional[Sequence[int]] = None,
+              test_type: Optional[str] = None) -> RegressionReport:
+        """
+        检测一组成功运行
+
+        Args:
+            since: 只检测该时间之后开始的运行 (例如本次测试套件的开始时间)
+            test_ids: 只检测指定的运行
+            test_type: 只检测指定的测试类型
+
+        Returns:
+            回归检测结果
+        """
+        records = self.data_manager.find_tests(test_type=test_type, since=since, success=True)
+        if test_ids is not None:
+            wanted = set(test_ids)
+            records = [item for item in records if item['test_id'] in wanted]
+        return RegressionReport([self.check_run(record) for record in reversed(records)])
+
+
+def _format_value(value: float, digits: int = 2) -> str:
+    return '-' if value is None or math.isnan(value) else f"{value:.{digits}f}"
+
+
+def format_markdown(report: Optional[RegressionReport]) -> str:
+    """回归检测结果的 Markdown 章节内容"""
+    if report is None or not report.runs:
+        return "没有可进行跨运行比较的测试运行。"
+
+    regressions = report.regressions
+    if regressions:
+        lines = [f"🚨 **检测到 {len(regressions)} 项性能回归**", ""]
+    else:
+        lines = ["✅ **未检测到性能回归**", ""]
+
+    lines += ["| 测试 | 指标 | 当前 | 基线中位数 | 基线置信区间 | 变化 | p 值 | 基线运行数 | 结论 |",
+              "|------|------|------|------------|--------------|------|------|------------|------|"]
+    status_text = {STATUS_OK: '✅ 正常', STATUS_REGRESSION: '🚨 回归', STATUS_IMPROVED: '📈 提升',
+                   STATUS_INSUFFICIENT: '⏳ 基线不足'}
+    for run in report.runs:
+        if not run.comparisons:
+            lines.append(f"| {run.test_name} | - | - | - | - | - | - | {len(run.baseline_ids)} | 无样本 |")
+        for item in run.comparisons:
+            change = '-' if math.isnan(item.change_pct) else f"{item.change_pct:+.1f}%"
+            ci = '-' if math.isnan(item.ci_low) else f"{item.ci_low:.2f} ~ {item.ci_high:.2f}"
+            lines.append(f"| {run.test_name} | {item.label} ({item.unit}) | {_format_value(item.current)} | "
+                         f"{_format_value(item.baseline)} | {ci} | {change} | {_format_value(item.p_value, 4)} | "
+                         f"{item.baseline_runs} | {status_text[item.status]} |")
+    lines += ["", "*基线为配置相同 (测试项、服务器类别、客户端数、QoS、发送间隔、认证方式) 的最近历史运行; "
+              "当前值和基线均为逐区间样本的中位数, 变化以变好为正。*"]
+    return "\n".join(lines)
+
+
+def main():
+    """命令行入口: 检测最近的运行, 有回归时以非零退出码退出"""
+    parser = argparse.ArgumentParser(description='跨运行性能回归检测')
+    parser.add_argument('--data-dir', default='../test_data', help='测试数据目录 (默认: ../test_data)')
+    parser.add_argument('--since', help='只检测该时间之后开始的运行 (ISO 时间)')
+    parser.add_argument('--test-id', type=int, action='append', dest='test_ids', help='只检测指定运行, 可重复')
+    parser.add_argument('--test-type', help='只检测指定的测试类型')
+    parser.add_argument('--last', type=int, default=1, help='未指定 --since/--test-id 时检测每个测试项最近的几个运行')
+    parser.add_argument('--baseline-runs', type=int, default=10, help='基线使用的最近可比较运行数')
+    parser.add_argument('--min-runs', type=int, default=3, help='至少需要的可比较运行数')
+    parser.add_argument('--threshold', type=float, default=0.05, help='判定回归的相对变化阈值 (默认 0.05)')
+    parser.add_argument('--alpha', type=float, default=0.05, help='Mann-Whitney 检验显著性水平')
+    args = parser.parse_args()
+
+    engine = RegressionEngine(TestDataManager(args.data_dir), baseline_runs=args.baseline_runs,
+                              min_runs=args.min_runs, threshold=args.threshold, alpha=args.alpha)
+    test_ids = args.test_ids
+    if test_ids is None and args.since is None:
+        # 每个测试项最近的运行
+        latest: Dict[str, List[int]] = {}
+        for record in engine.data_manager.find_tests(test_type=args.test_type, success=True):
+            ids = latest.setdefault(record['test_name'], [])
+            if len(ids) < args.last:
+                ids.append(record['test_id'])
+        test_ids = [run_id for ids in latest.values() for run_id in ids]
+    report = engine.check(since=args.since, test_ids=test_ids, test_type=args.test_type)
+
+    console.print(format_markdown(report))
+    if report.exit_code == EXIT_NO_DATA:
+        console.print("[yellow]⚠️ 没有找到可检测的运行[/yellow]")
+    elif report.exit_code == EXIT_REGRESSION:
+        console.print(f"[red]🚨 检测到 {len(report.regressions)} 项性能回归[/red]")
+    sys.exit(report.exit_code)
+
+
+if __name__ == "__main__":
+    main()
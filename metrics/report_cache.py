@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+报告内容哈希缓存
+以输入文件 (指标JSON、持续指标JSON) 内容和测试配置的哈希为键,
+把各测试的分析结果和渲染好的报告章节保存在磁盘上,
+重新生成报告时只重新分析内容发生变化的测试
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+# 分析/渲染逻辑变化时递增, 使旧缓存全部失效
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join("reports", ".cache")
+
+# 计算配置指纹时忽略的敏感字段
+_SECRET_FIELDS = ('huawei_secret', 'huawei_sk', 'huawei_ak', 'password')
+
+
+class ReportCache:
+    """按内容哈希索引的磁盘缓存"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 文件哈希索引: 路径 -> [size, mtime_ns, sha256], 文件未变化时不重新读取
+        self._hash_index_file = os.path.join(cache_dir, "file_hashes.json")
+        self._hash_index: Optional[Dict[str, list]] = None
+        self._hash_index_dirty = False
+        self.config_digest = ''
+
+    def set_config(self, config: Any):
+        """设置当前测试配置, 配置变化时所有缓存键随之变化"""
+        self.config_digest = config_fingerprint(config) if config is not None else ''
+
+    def __getstate__(self):
+        # 传递到报告渲染子进程时不携带锁
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _load_hash_index(self) -> Dict[str, list]:
+        if self._hash_index is None:
+            try:
+                with open(self._hash_index_file, 'r', encoding='utf-8') as f:
+                    self._hash_index = json.load(f)
+            except (OSError, ValueError):
+                self._hash_index = {}
+        return self._hash_index
+
+    def file_hash(self, file_path: str) -> str:
+        """
+        计算文件内容的 SHA-256, 大小和修改时间未变时复用索引中的结果
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            十六进制哈希, 文件不存在时返回 'missing'
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return 'missing'
+
+        path_key = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._load_hash_index().get(path_key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        file_digest = digest.hexdigest()
+
+        with self._lock:
+            self._load_hash_index()[path_key] = [stat.st_size, stat.st_mtime_ns, file_digest]
+            self._hash_index_dirty = True
+        return file_digest
+
+    def make_key(self, files: Iterable[Optional[str]] = (), config: Any = None, extra: Any = None) -> str:
+        """
+        由输入文件内容、配置和附加信息生成缓存键
+
+        Args:
+            files: 输入文件路径 (None 会被忽略)
+            config: 测试配置 (敏感字段不参与计算), 默认使用 set_config 设置的配置
+            extra: 其他影响结果的信息 (如测试名称), 需可JSON序列化
+
+        Returns:
+            缓存键
+        """
+        digest = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+        for file_path in files:
+            if file_path:
+                digest.update(self.file_hash(file_path).encode())
+        digest.update((config_fingerprint(config) if config else self.config_digest).encode())
+        if extra is not None:
+            digest.update(json.dumps(extra, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.cache_dir, namespace, key[:2], f"{key}.json")
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """读取缓存项, 未命中时返回 None"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._entry_path(namespace, key), 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, namespace: str, key: str, value: Any):
+        """写入缓存项 (先写临时文件再替换, 避免并发读到半个文件)"""
+        if not self.enabled:
+            return
+        entry_path = self._entry_path(namespace, key)
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, entry_path)
+        except (OSError, TypeError, ValueError):
+            pass
+
+    def flush(self):
+        """保存文件哈希索引"""
+        with self._lock:
+            if not self.enabled or not self._hash_index_dirty or self._hash_index is None:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{self._hash_index_file}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._hash_index, f)
+                os.replace(tmp_path, self._hash_index_file)
+                self._hash_index_dirty = False
+            except OSError:
+                pass
+
+
+def config_fingerprint(config: Any) -> str:
+    """计算测试配置的指纹 (忽略敏感字段)"""
+    if hasattr(config, '__dataclass_fields__'):
+        from dataclasses import asdict
+        config = asdict(config)
+    elif not isinstance(config, dict):
+        config = getattr(config, '__dict__', {'value': str(config)})
+    public_config = {k: v for k, v in config.items() if k not in _SECRET_FIELDS}
+    return hashlib.sha256(json.dumps(public_config, sort_keys=True, ensure_ascii=False,
+                                     default=str).encode('utf-8')).hexdigest()
+
+
+# 进程内共享的默认缓存实例
+_default_cache: Optional[ReportCache] = None
+
+
+def get_report_cache(cache_dir: str = DEFAULT_CACHE_DIR) -> ReportCache:
+    """获取默认报告缓存"""
+    global _default_cache
+    if _default_cache is None or _default_cache.cache_dir != cache_dir:
+        _default_cache = ReportCache(cache_dir)
+    return _default_cache
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+报告渲染流水线
+在进程池中并行渲染互相独立的报告 (HTML / Markdown / 增强版Markdown)
+以及各测试独立的分析章节, 并可在后续测试仍在运行时提前开始处理已完成测试的数据
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import os
+import signal
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from rich.console import Console
+from rich.progress import BarColumn, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+from analysis_frame import AnalysisFrame, TestSeries
+from report_cache import ReportCache
+from self_metrics import REPORT_RENDER_SECONDS, get_self_metrics
+
+console = Console()
+
+DEFAULT_MAX_WORKERS = 4
+
+
+# ---- 进程池任务 (模块级函数, 便于在子进程中反序列化) ----
+
+def _init_worker():
+    """子进程忽略 Ctrl+C, 中断统一由主进程的信号处理器处理"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def analyze_test_section(file_path: str, reports_dir: str,
+                         cache: Optional[ReportCache] = None) -> Tuple[Optional[TestSeries], Dict[str, Any]]:
+    """加载单个持续指标文件并生成其增强版分析章节数据 (缓存命中时不解析文件, 时间序列为 None)"""
+    from enhanced_markdown_generator import EnhancedMarkdownGenerator
+
+    frame = AnalysisFrame.load([], [file_path], cache=cache)
+    analysis = EnhancedMarkdownGenerator(reports_dir, cache=cache).analyze_test_file(file_path, frame)
+    if cache is not None:
+        cache.flush()
+    return frame.series.get(file_path), analysis or {}
+
+
+def render_html_report(test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str,
+                       continuous_data_files: List[str], analysis_frame: Optional[AnalysisFrame],
+                       regression_report: Any = None, saturation_report: Any = None,
+                       self_metrics: Any = None) -> str:
+    """渲染HTML可视化报告"""
+    from enhanced_report_generator import EnhancedReportGenerator
+
+    report_file = EnhancedReportGenerator(
+        test_results=test_results,
+        all_metrics_data=all_metrics_data,
+        start_time=start_time,
+        reports_dir=reports_dir,
+        continuous_data_files=continuous_data_files,
+        analysis_frame=analysis_frame,
+        regression_report=regression_report,
+        saturation_report=saturation_report,
+        self_metrics=self_metrics
+    ).generate_enhanced_report()
+    if analysis_frame is not None and analysis_frame.cache is not None:
+        analysis_frame.cache.flush()
+    return report_file
+
+
+def render_markdown_report(test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str,
+                           cache: Optional[ReportCache] = None, regression_report: Any = None,
+                           trial_summary: Optional[Dict[str, Any]] = None, saturation_report: Any = None,
+                           self_metrics: Any = None) -> str:
+    """渲染Markdown详细分析报告"""
+    from simple_markdown_generator import MarkdownReportGenerator
+
+    report_file = MarkdownReportGenerator(
+        test_results=test_results,
+        all_metrics_data=all_metrics_data,
+        start_time=start_time,
+        reports_dir=reports_dir,
+        cache=cache,
+        regression_report=regression_report,
+        trial_summary=trial_summary,
+        saturation_report=saturation_report,
+        self_metrics=self_metrics
+    ).generate_markdown_report()
+    if cache is not None:
+        cache.flush()
+    return report_file
+
+
+def render_enhanced_markdown_report(continuous_data_files: List[str], test_results: List, start_time: datetime,
+                                    reports_dir: str, analysis_frame: Optional[AnalysisFrame],
+                                    test_analyses: Optional[Dict[str, Dict[str, Any]]] = None,
+                                    cache: Optional[ReportCache] = None, saturation_report: Any = None,
+                                    self_metrics: Any = None) -> str:
+    """渲染增强版持续数据分析报告"""
+    from enhanced_markdown_generator import EnhancedMarkdownGenerator
+
+    report_file = EnhancedMarkdownGenerator(reports_dir, cache=cache).generate_continuous_analysis_report(
+        continuous_data_files=continuous_data_files,
+        test_results=test_results,
+        start_time=start_time,
+        analysis_frame=analysis_frame,
+        test_analyses=test_analyses,
+        saturation_report=saturation_report,
+        self_metrics=self_metrics
+    )
+    if cache is not None:
+        cache.flush()
+    return report_file
+
+
+class ReportPipeline:
+    """报告渲染流水线"""
+
+    def __init__(self, reports_dir: str = "reports", max_workers: Optional[int] = None,
+                 cache: Optional[ReportCache] = None):
+        self.reports_dir = reports_dir
+        self.cache = cache
+        self.max_workers = max_workers or min(DEFAULT_MAX_WORKERS, os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pool_failed = False
+        # 持续指标文件 -> (文件签名, 章节任务)
+        self._section_futures: Dict[str, Tuple[Tuple[float, int], Future]] = {}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        """获取进程池, 创建失败时返回 None 并退回串行渲染"""
+        if self._pool_failed:
+            return None
+        if self._executor is None:
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker)
+            except (OSError, NotImplementedError) as e:
+                console.print(f"[yellow]⚠️ 无法创建报告渲染进程池, 改为串行渲染: {e}[/yellow]")
+                self._pool_failed = True
+                return None
+        return self._executor
+
+    @staticmethod
+    def _file_signature(file_path: str) -> Tuple[float, int]:
+        stat = os.stat(file_path)
+        return stat.st_mtime, stat.st_size
+
+    def submit_test_section(self, file_path: str):
+        """测试完成后立即在后台开始分析其持续数据, 不阻塞后续测试"""
+        executor = self._get_executor()
+        if executor is None or not os.path.exists(file_path):
+            return
+        try:
+            future = executor.submit(analyze_test_section, file_path, self.reports_dir, self.cache)
+        except Exception as e:
+            console.print(f"[yellow]⚠️ 后台分析 {os.path.basename(file_path)} 提交失败: {e}[/yellow]")
+            return
+        self._section_futures[file_path] = (self._file_signature(file_path), future)
+
+    def collect_test_sections(self, continuous_data_files: Sequence[str]) -> Tuple[Dict[str, TestSeries], Dict[str, Dict[str, Any]]]:
+        """
+        收集各测试的分析章节, 未提交或文件已变化的测试在此补充提交
+
+        Returns:
+            (持续指标文件 -> 时间序列, 持续指标文件 -> 章节分析数据)
+        """
+        for file_path in continuous_data_files:
+            entry = self._section_futures.get(file_path)
+            if entry is None or (os.path.exists(file_path) and entry[0] != self._file_signature(file_path)):
+                self.submit_test_section(file_path)
+
+        series_by_file: Dict[str, TestSeries] = {}
+        analyses: Dict[str, Dict[str, Any]] = {}
+        for file_path in continuous_data_files:
+            entry = self._section_futures.get(file_path)
+            if entry is None:
+                continue
+            try:
+                series, analysis = entry[1].result()
+            except Exception as e:
+                console.print(f"[yellow]⚠️ 分析 {os.path.basename(file_path)} 失败, 将在报告生成时重试: {e}[/yellow]")
+                continue
+            if series is not None:
+                series_by_file[file_path] = series
+            if analysis:
+                analyses[file_path] = analysis
+        return series_by_file, analyses
+
+    def render(self, jobs: Dict[str, Tuple[Callable[..., str], tuple]]) -> Dict[str, Optional[str]]:
+        """
+        并行渲染互相独立的报告
+
+        Args:
+            jobs: 报告名称 -> (渲染函数, 参数)
+
+        Returns:
+            报告名称 -> 生成的报告文件路径 (失败时为 None)
+        """
+        results: Dict[str, Optional[str]] = {}
+        self_metrics = get_self_metrics()
+
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            BarColumn(),
+            TimeElapsedColumn(),
+            console=console
+        ) as progress:
+            tasks = {name: progress.add_task(f"渲染{name}...", total=1) for name in jobs}
+
+            executor = self._get_executor()
+            futures: Dict[Future, str] = {}
+            started = time.perf_counter()
+            if executor is not None:
+                try:
+                    futures = {executor.submit(func, *args): name for name, (func, args) in jobs.items()}
+                except Exception as e:
+                    console.print(f"[yellow]⚠️ 报告渲染任务提交失败, 改为串行渲染: {e}[/yellow]")
+                    futures = {}
+
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    console.print(f"[yellow]⚠️ {name}并行渲染失败, 改为串行渲染: {e}[/yellow]")
+                    continue
+                # 并行渲染时记录从提交到完成的耗时
+                self_metrics.observe(REPORT_RENDER_SECONDS, time.perf_counter() - started, report=name)
+                progress.update(tasks[name], completed=1, description=f"✅ {name}")
+
+            # 未能并行完成的报告在当前进程中串行渲染
+            for name, (func, args) in jobs.items():
+                if name in results:
+                    continue
+                try:
+                    with self_metrics.time(REPORT_RENDER_SECONDS, report=name):
+                        results[name] = func(*args)
+                    progress.update(tasks[name], completed=1, description=f"✅ {name}")
+                except Exception as e:
+                    console.print(f"[red]❌ {name}生成失败: {e}[/red]")
+                    results[name] = None
+                    progress.update(tasks[name], completed=1, description=f"❌ {name}")
+
+        return results
+
+    def shutdown(self):
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        self._section_futures.clear()
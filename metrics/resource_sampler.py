@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+压测进程资源采样
+所有收集器共享一个后台采样线程: 每个周期采集一次主机资源 (CPU、内存、磁盘、负载、网络),
+并跟踪每个被测 emqtt_bench 的进程树 (CPU、RSS、文件描述符、线程、上下文切换、套接字数)。
+收集器只读取最近一次的快照, 不会在采集线程中阻塞
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from tick_scheduler import TickScheduler
+
+DEFAULT_INTERVAL = 1.0  # 采样周期 (秒)
+DEFAULT_SOCKET_EVERY = 5  # 套接字统计开销较大, 每隔几个周期采一次
+
+# 写入持续指标 system_resources 的进程树字段 (键名加 bench_ 前缀)
+PROCESS_RESOURCE_KEYS = ('cpu_percent', 'cpu_seconds', 'rss_bytes', 'fds', 'threads', 'ctx_switches', 'sockets')
+
+
+@dataclass
+class ProcessTreeSample:
+    """单个 emqtt_bench 进程树的资源快照"""
+    processes: int = 0
+    cpu_percent: float = 0.0  # 自上次采样以来的 CPU, 占主机全部核心的百分比
+    cpu_seconds: float = 0.0  # 累计 CPU 时间 (用户态 + 内核态)
+    rss_bytes: float = 0.0
+    fds: Optional[float] = None  # 文件描述符数 (Windows 上为句柄数)
+    threads: float = 0.0
+    ctx_switches: float = 0.0  # 累计上下文切换次数 (自愿 + 非自愿)
+    sockets: Optional[float] = None  # 已建立的 TCP 连接数, 尚未采到时为 None
+
+    def as_resources(self) -> Dict[str, Any]:
+        """转换为 system_resources 中的 bench_* 字段"""
+        values = asdict(self)
+        return {f'bench_{key}': values[key] for key in PROCESS_RESOURCE_KEYS}
+
+
+class _TrackedTree:
+    """跟踪中的进程树, 复用 Process 对象以便 cpu_percent 计算增量"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.processes: Dict[int, Any] = {}
+        self.sockets: Optional[float] = None
+        self.sample: Optional[ProcessTreeSample] = None
+
+
+class ResourceSampler:
+    """共享的主机与进程树资源采样器"""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, socket_every: int = DEFAULT_SOCKET_EVERY):
+        """
+        Args:
+            interval: 采样周期 (秒)
+            socket_every: 每隔多少个周期统计一次进程树的套接字
+        """
+        self.interval = interval
+        self.socket_every = max(1, socket_every)
+        self._lock = threading.Lock()
+        self._trees: Dict[Hashable, _TrackedTree] = {}
+        self._host: Dict[str, Any] = {}
+        self._ticks = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        try:
+            import psutil
+            self._psutil = psutil
+            self._cpu_count = psutil.cpu_count() or 1
+        except ImportError:
+            self._psutil = None
+            self._cpu_count = 1
+
+    @property
+    def available(self) -> bool:
+        return self._psutil is not None
+
+    def start(self):
+        """启动采样线程 (可重复调用), 先同步采样一次, 保证收集器第一次读取时已有快照"""
+        if self._psutil is None or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._sample()
+        self._thread = threading.Thread(target=self._loop, name="resource-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def track(self, key: Hashable, pid: int):
+        """开始跟踪以 pid 为根的进程树 (pid 可以是启动 emqtt_bench 的 shell)"""
+        with self._lock:
+            self._trees[key] = _TrackedTree(pid)
+        self.start()
+
+    def untrack(self, key: Hashable):
+        with self._lock:
+            self._trees.pop(key, None)
+
+    def host_snapshot(self) -> Dict[str, Any]:
+        """最近一次主机资源快照"""
+        self.start()
+        with self._lock:
+            return dict(self._host)
+
+    def process_snapshot(self, key: Hashable) -> Optional[ProcessTreeSample]:
+        """最近一次进程树快照, 未跟踪或进程已退出时为 None"""
+        with self._lock:
+            tree = self._trees.get(key)
+            return tree.sample if tree is not None else None
+
+    def _loop(self):
+        ticks = iter(TickScheduler(self.interval, lambda: not self._stop.is_set()))
+        next(ticks, None)  # 第一次采样已在 start() 中同步完成
+        for _ in ticks:
+            try:
+                self._sample()
+            except Exception:
+                continue
+
+    def _sample(self):
+        psutil = self._psutil
+        self._ticks += 1
+        network = psutil.net_io_counters()
+        memory = psutil.virtual_memory()
+        host = {
+            'cpu_percent': psutil.cpu_percent(None),
+            'memory_percent': memory.percent,
+            'memory_used': memory.used,
+            'memory_total': memory.total,
+            'disk_percent': psutil.disk_usage('/').percent,
+            # 1 分钟平均负载 (可运行队列) 相对 CPU 核数的百分比
+            'load_percent': psutil.getloadavg()[0] / self._cpu_count * 100,
+            'network_io': network._asdict() if network is not None else {}
+        }
+        with self._lock:
+            trees = list(self._trees.values())
+        count_sockets = self._ticks % self.socket_every == 1 or self.socket_every == 1
+        samples = {id(tree): self._sample_tree(tree, count_sockets) for tree in trees}
+        with self._lock:
+            self._host = host
+            for tree in trees:
+                tree.sample = samples[id(tree)]
+
+    def _sample_tree(self, tree: _TrackedTree, count_sockets: bool) -> Optional[ProcessTreeSample]:
+        psutil = self._psutil
+        try:
+            root = tree.processes.get(tree.pid) or psutil.Process(tree.pid)
+            members = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return None
+
+        sample = ProcessTreeSample()
+        alive: Dict[int, Any] = {}
+        sockets = 0
+        for process in members:
+            process = tree.processes.get(process.pid, process)
+            try:
+                with process.oneshot():
+                    cpu_percent = process.cpu_percent(None)  # 新进程第一次采样为 0
+                    cpu_times = process.cpu_times()
+                    rss = process.memory_info().rss
+                    threads = process.num_threads()
+                    switches = process.num_ctx_switches()
+                    fds = process.num_fds() if hasattr(process, 'num_fds') else process.num_handles()
+                if count_sockets:
+                    connections = getattr(process, 'net_connections', None) or process.connections
+                    sockets += sum(1 for conn in connections(kind='tcp') if conn.status == psutil.CONN_ESTABLISHED)
+            except psutil.Error:
+                continue
+            alive[process.pid] = process
+            sample.cpu_percent += cpu_percent / self._cpu_count
+            sample.cpu_seconds += cpu_times.user + cpu_times.system
+            sample.rss_bytes += rss
+            sample.threads += threads
+            sample.ctx_switches += switches.voluntary + switches.involuntary
+            sample.fds = (sample.fds or 0) + fds
+        if not alive:
+            return None
+        tree.processes = alive
+        if count_sockets:
+            tree.sockets = float(sockets)
+        sample.processes = len(alive)
+        sample.sockets = tree.sockets
+        return sample
+
+
+_shared_sampler: Optional[ResourceSampler] = None
+_shared_lock = threading.Lock()
+
+
+def get_resource_sampler() -> ResourceSampler:
+    """所有收集器共享的采样器"""
+    global _shared_sampler
+    with _shared_lock:
+        if _shared_sampler is None:
+            _shared_sampler = ResourceSampler()
+        return _shared_sampler
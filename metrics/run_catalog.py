@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+测试运行目录
+替代每次保存都整体重写的 data_index.json: 每个运行在测试数据库的 run_catalog 表中追加一行,
+单条 INSERT 即为原子写入, 并发写入由 SQLite 串行化;
+按测试类型、时间范围、配置指纹建有索引, 数千个运行时列表和筛选仍然很快
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 并发写入时等待数据库锁的秒数
+BUSY_TIMEOUT = 30.0
+
+_COLUMNS = ('test_id', 'test_name', 'test_type', 'start_time', 'end_time', 'start_ts', 'duration', 'success', 'port',
+            'config_fingerprint', 'json_file', 'csv_file', 'summary_file', 'continuous_data_file', 'recorded_at')
+
+
+def config_fingerprint(config: Optional[Dict[str, Any]]) -> str:
+    """配置指纹: 配置按键排序序列化后的 SHA-256 前 16 位, 相同配置的运行指纹相同"""
+    payload = json.dumps(config or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class RunCatalog:
+    """测试运行目录 (测试数据库中的 run_catalog 表)"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
+
+    @staticmethod
+    def ensure_schema(conn: sqlite3.Connection):
+        """创建目录表和索引"""
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS run_catalog (
+                test_id INTEGER PRIMARY KEY,
+                test_name TEXT NOT NULL,
+                test_type TEXT NOT NULL,
+                start_time TEXT NOT NULL,
+                end_time TEXT,
+                start_ts REAL,
+                duration REAL,
+                success BOOLEAN NOT NULL,
+                port INTEGER,
+                config_fingerprint TEXT,
+                json_file TEXT,
+                csv_file TEXT,
+                summary_file TEXT,
+                continuous_data_file TEXT,
+                recorded_at TEXT NOT NULL,
+                FOREIGN KEY (test_id) REFERENCES test_results (id) ON DELETE CASCADE
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_catalog_type_start ON run_catalog (test_type, start_ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_catalog_start ON run_catalog (start_ts)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_run_catalog_config ON run_catalog (config_fingerprint, start_ts)')
+
+    def migrate(self, conn: sqlite3.Connection, legacy_index: Path) -> int:
+        """
+        目录为空时从旧的 data_index.json 和 test_results 表导入已有运行 (只执行一次)
+
+        Returns:
+            导入的运行数
+        """
+        if conn.execute('SELECT 1 FROM run_catalog LIMIT 1').fetchone():
+            return 0
+
+        files: Dict[int, Dict[str, str]] = {}
+        if legacy_index.exists():
+            try:
+                with open(legacy_index, 'r', encoding='utf-8') as f:
+                    index_data = json.load(f)
+                files = {record['test_id']: record.get('files', {})
+                         for record in index_data.get('tests', []) if 'test_id' in record}
+            except (OSError, ValueError, TypeError):
+                files = {}
+
+        rows = conn.execute('''
+            SELECT id, test_name, test_type, start_time, end_time, duration, success, port, config,
+                   continuous_data_file, created_at
+            FROM test_results
+        ''').fetchall()
+        conn.executemany(self._insert_sql(), [
+            (run_id, name, test_type, start_time, end_time, _timestamp(start_time), duration, bool(success), port,
+             config_fingerprint(json.loads(config) if config else {}),
+             files.get(run_id, {}).get('json'), files.get(run_id, {}).get('csv'),
+             files.get(run_id, {}).get('summary'), continuous_file, created_at or datetime.now().isoformat())
+            for run_id, name, test_type, start_time, end_time, duration, success, port, config, continuous_file,
+            created_at in rows])
+        return len(rows)
+
+    @staticmethod
+    def _insert_sql() -> str:
+        return (f"INSERT OR REPLACE INTO run_catalog ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})")
+
+    def record(self, test_id: int, test_data: Any, files: Dict[str, Optional[str]]):
+        """
+        追加一个运行 (单条 INSERT, 原子写入)
+
+        Args:
+            test_id: test_results 中的ID
+            test_data: TestData
+            files: {'json': ..., 'csv': ..., 'summary': ...}
+        """
+        self.record_many([(test_id, test_data, files)])
+
+    def record_many(self, entries: Iterable[Tuple[int, Any, Dict[str, Optional[str]]]]):
+        """一次事务追加多个运行, entries 为 (test_id, test_data, files)"""
+        rows = [(test_id, test_data.test_name, test_data.test_type, test_data.start_time, test_data.end_time,
+                 _timestamp(test_data.start_time), test_data.duration, bool(test_data.success), test_data.port,
+                 config_fingerprint(test_data.config), files.get('json'), files.get('csv'), files.get('summary'),
+                 test_data.continuous_data_file, datetime.now().isoformat())
+                for test_id, test_data, files in entries]
+        conn = self.connect()
+        try:
+            with conn:
+                conn.executemany(self._insert_sql(), rows)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _where(test_type: Optional[str], since: Any, until: Any, fingerprint: Optional[str],
+               success: Optional[bool]) -> Tuple[str, List[Any]]:
+        clauses: List[str] = []
+        params: List[Any] = []
+        if test_type:
+            clauses.append('test_type = ?')
+            params.append(test_type)
+        if since is not None:
+            clauses.append('start_ts >= ?')
+            params.append(_timestamp(since))
+        if until is not None:
+            clauses.append('start_ts < ?')
+            params.append(_timestamp(until))
+        if fingerprint:
+            clauses.append('config_fingerprint = ?')
+            params.append(fingerprint)
+        if success is not None:
+            clauses.append('success = ?')
+            params.append(bool(success))
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def find(self, test_type: Optional[str] = None, since: Any = None, until: Any = None,
+             config_fingerprint: Optional[str] = None, success: Optional[bool] = None,
+             limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按条件查询运行, 开始时间倒序
+
+        Args:
+            test_type: 测试类型
+            since: 开始时间下限 (含), datetime / ISO 字符串 / Unix 秒
+            until: 开始时间上限 (不含)
+            config_fingerprint: 配置指纹
+            success: 只查成功或失败的运行
+            limit: 最多返回条数
+            offset: 跳过条数
+
+        Returns:
+            运行记录列表
+        """
+        where, params = self._where(test_type, since, until, config_fingerprint, success)
+        query = f"SELECT {', '.join(_COLUMNS)} FROM run_catalog{where} ORDER BY start_ts DESC, test_id DESC"
+        if limit is not None:
+            query += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        conn = self.connect()
+        try:
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [self._to_record(row) for row in rows]
+
+    def count(self, test_type: Optional[str] = None, since: Any = None, until: Any = None,
+              config_fingerprint: Optional[str] = None, success: Optional[bool] = None) -> int:
+        """按条件统计运行数"""
+        where, params = self._where(test_type, since, until, config_fingerprint, success)
+        conn = self.connect()
+        try:
+            return conn.execute(f'SELECT COUNT(*) FROM run_catalog{where}', params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_types(self) -> List[str]:
+        """目录中出现过的测试类型"""
+        conn = self.connect()
+        try:
+            return [row[0] for row in conn.execute('SELECT DISTINCT test_type FROM run_catalog ORDER BY test_type')]
+        finally:
+            conn.close()
+
+    def files(self, conn: sqlite3.Connection, run_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, str]]:
+        """每个运行的数据文件 (json/csv/summary/continuous)"""
+        query = 'SELECT test_id, json_file, csv_file, summary_file, continuous_data_file FROM run_catalog'
+        params: List[Any] = []
+        if run_ids is not None:
+            run_ids = list(run_ids)
+            query += f" WHERE test_id IN ({','.join('?' * len(run_ids))})"
+            params = run_ids
+        return {row[0]: {key: path for key, path in zip(('json', 'csv', 'summary', 'continuous'), row[1:]) if path}
+                for row in conn.execute(query, params)}
+
+    @staticmethod
+    def _to_record(row: Tuple) -> Dict[str, Any]:
+        record = dict(zip(_COLUMNS, row))
+        record['success'] = bool(record['success'])
+        # 与 TestDataManager.get_all_tests 原有字段保持一致
+        record['id'] = record['test_id']
+        record['created_at'] = record['recorded_at']
+        return record
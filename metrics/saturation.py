@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+压测机自饱和分析
+压测结果只有在 emqtt_bench 自身不是瓶颈时才可信。根据 bench VM 暴露的微状态统计 (erlang_vm_msacc_*)、
+运行时间/墙钟时间、运行队列长度, 以及采集时记录的 emqtt_bench 进程树 CPU 和主机负载,
+计算调度器利用率和微状态构成, 标记压测机已饱和的运行, 供各报告加注;
+同时给出 emqtt_bench 的每连接内存和每消息 CPU 时间
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import argparse
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+from rich.console import Console
+
+from analysis_frame import AnalysisFrame, TestSeries
+from report_cache import ReportCache
+
+console = Console()
+
+# 判定阈值 (均按整个测试的中位数比较, 偶发尖峰不算饱和)
+SCHEDULER_UTILIZATION_THRESHOLD = 0.90  # 调度器利用率
+RUN_QUEUE_THRESHOLD = 1.0  # 每个调度器的平均运行队列长度
+BENCH_CPU_THRESHOLD = 90.0  # emqtt_bench 进程树 CPU, 占主机全部核心的百分比
+HOST_CPU_THRESHOLD = 95.0  # 主机 CPU 使用率
+HOST_LOAD_THRESHOLD = 100.0  # 主机 1 分钟负载相对核数的百分比
+
+MSACC_PREFIX = 'erlang_vm_msacc_'
+MSACC_SUFFIX = '_seconds_total'
+MSACC_SCHEDULER_TYPE = 'scheduler'
+MSACC_IDLE_STATE = 'sleep'
+
+RUNTIME_METRIC = 'erlang_vm_statistics_runtime_milliseconds'
+WALLCLOCK_METRIC = 'erlang_vm_statistics_wallclock_time_milliseconds'
+SCHEDULERS_METRIC = 'erlang_vm_schedulers_online'
+RUN_QUEUE_METRICS = ('erlang_vm_statistics_run_queues_length', 'erlang_vm_statistics_run_queues_length_total')
+
+# 利用率来源
+SOURCE_MSACC = 'msacc'  # 微状态统计: 1 - sleep 时间占比
+SOURCE_RUNTIME = 'runtime'  # 运行时间增量 / (墙钟时间增量 × 在线调度器数)
+
+
+@dataclass
+class SaturationResult:
+    """单个测试运行的压测机饱和分析"""
+    test_name: str
+    source_file: str
+    utilization: Optional[float] = None  # 调度器利用率中位数 (0~1)
+    utilization_p95: Optional[float] = None
+    utilization_source: Optional[str] = None
+    microstates: Dict[str, float] = field(default_factory=dict)  # 调度器线程各微状态的时间占比
+    run_queue: Optional[float] = None  # 每个调度器的运行队列长度中位数
+    run_queue_max: Optional[float] = None
+    bench_cpu: Optional[float] = None  # emqtt_bench 进程树 CPU 中位数 (占主机全部核心的百分比)
+    host_cpu: Optional[float] = None  # 主机 CPU 使用率中位数
+    host_load: Optional[float] = None  # 主机负载中位数 (相对核数的百分比)
+    bench_rss: Optional[float] = None  # emqtt_bench 进程树 RSS 中位数 (字节)
+    connections: Optional[float] = None  # 已建立的连接数 (进程树 TCP 连接, 没有时取 connect_succ)
+    memory_per_connection: Optional[float] = None  # 每连接内存 (字节)
+    cpu_per_message: Optional[float] = None  # 每条发布/接收消息消耗的 emqtt_bench CPU 时间 (微秒)
+    reasons: List[str] = field(default_factory=list)  # 判定为饱和的原因
+
+    @property
+    def saturated(self) -> bool:
+        return bool(self.reasons)
+
+    @property
+    def has_data(self) -> bool:
+        return any(value is not None for value in (self.utilization, self.run_queue, self.bench_cpu,
+                                                    self.host_cpu, self.host_load))
+
+    def summary(self) -> str:
+        """一行说明"""
+        parts = []
+        if self.utilization is not None:
+            parts.append(f"调度器利用率 {self.utilization * 100:.0f}% ({self.utilization_source})")
+        if self.run_queue is not None:
+            parts.append(f"运行队列 {self.run_queue:.2f}/调度器")
+        if self.bench_cpu is not None:
+            parts.append(f"emqtt_bench CPU {self.bench_cpu:.0f}%")
+        if self.host_cpu is not None:
+            parts.append(f"主机 CPU {self.host_cpu:.0f}%")
+        if self.host_load is not None:
+            parts.append(f"主机负载 {self.host_load:.0f}%")
+        if self.memory_per_connection is not None:
+            parts.append(f"每连接内存 {self.memory_per_connection / 1024:.1f} KB")
+        if self.cpu_per_message is not None:
+            parts.append(f"每消息 CPU {self.cpu_per_message:.1f} µs")
+        return ", ".join(parts) or "无可用数据"
+
+
+@dataclass
+class SaturationReport:
+    """测试套件的压测机饱和分析结果"""
+    results: List[SaturationResult] = field(default_factory=list)
+
+    @property
+    def saturated(self) -> List[SaturationResult]:
+        return [result for result in self.results if result.saturated]
+
+    def for_test(self, test_name: str) -> List[SaturationResult]:
+        return [result for result in self.results if result.test_name == test_name]
+
+    def is_saturated(self, test_name: str) -> bool:
+        return any(result.saturated for result in self.for_test(test_name))
+
+
+def _median(values: pd.Series) -> Optional[float]:
+    values = values.dropna()
+    return float(values.median()) if len(values) else None
+
+
+def _scheduler_microstates(series: TestSeries) -> pd.DataFrame:
+    """逐点汇总普通调度器线程各微状态的累计秒数, 索引为时间戳, 列为微状态"""
+    rows: Dict[float, Dict[str, float]] = {}
+    for point in series.iter_frames():
+        try:
+            ts = datetime.fromisoformat(point['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            continue
+        states: Dict[str, float] = {}
+        for metric in point.get('metrics', []):
+            name = metric.get('name', '')
+            if not (name.startswith(MSACC_PREFIX) and name.endswith(MSACC_SUFFIX)):
+                continue
+            if (metric.get('labels') or {}).get('type') != MSACC_SCHEDULER_TYPE:
+                continue
+            state = name[len(MSACC_PREFIX):-len(MSACC_SUFFIX)]
+            try:
+                states[state] = states.get(state, 0.0) + float(metric.get('value', 0))
+            except (TypeError, ValueError):
+                continue
+        if states:
+            rows[ts] = states
+    return pd.DataFrame.from_dict(rows, orient='index').sort_index().fillna(0.0)
+
+
+class SaturationAnalyzer:
+    """压测机自饱和分析"""
+
+    def __init__(self, frame: Optional[AnalysisFrame] = None, cache: Optional[ReportCache] = None,
+                 utilization_threshold: float = SCHEDULER_UTILIZATION_THRESHOLD,
+                 run_queue_threshold: float = RUN_QUEUE_THRESHOLD, bench_cpu_threshold: float = BENCH_CPU_THRESHOLD):
+        """
+        Args:
+            frame: 共享分析数据帧, 为空时按文件单独加载
+            cache: 报告缓存 (单独加载时使用)
+            utilization_threshold: 调度器利用率中位数达到该值视为饱和
+            run_queue_threshold: 每个调度器的运行队列长度中位数达到该值视为饱和
+            bench_cpu_threshold: emqtt_bench 进程树 CPU 中位数达到该值 (占主机全部核心的百分比) 视为饱和
+        """
+        self.frame = frame
+        self.cache = cache
+        self.utilization_threshold = utilization_threshold
+        self.run_queue_threshold = run_queue_threshold
+        self.bench_cpu_threshold = bench_cpu_threshold
+
+    def analyze(self, continuous_data_files: Sequence[str]) -> SaturationReport:
+        """分析各持续指标文件"""
+        report = SaturationReport()
+        for file_path in continuous_data_files:
+            frame = self.frame if self.frame is not None else AnalysisFrame.load([], [file_path], cache=self.cache)
+            series = frame.get_series(file_path)
+            if series is None or len(series.values) < 2:
+                continue
+            report.results.append(self.analyze_series(series))
+        return report
+
+    def analyze_series(self, series: TestSeries) -> SaturationResult:
+        """分析单个测试的时间序列"""
+        result = SaturationResult(series.test_name, series.source_file)
+        values = series.values
+        schedulers = series.column(SCHEDULERS_METRIC).where(lambda count: count > 0)
+
+        # 调度器利用率: 优先使用微状态统计 (bench 启用了 microstate accounting 时才有数据)
+        msacc_columns = [name for name in values.columns if name.startswith(MSACC_PREFIX)]
+        if msacc_columns and values[msacc_columns].to_numpy().any():
+            states = _scheduler_microstates(series)
+            deltas = states.diff().iloc[1:].clip(lower=0)
+            totals = deltas.sum(axis=1)
+            busy = deltas.drop(columns=[MSACC_IDLE_STATE], errors='ignore').sum(axis=1)
+            utilization = (busy / totals.where(totals > 0)).dropna()
+            if len(utilization):
+                result.utilization_source = SOURCE_MSACC
+                overall = deltas.sum()
+                if overall.sum() > 0:
+                    result.microstates = {state: float(seconds / overall.sum())
+                                          for state, seconds in overall.sort_values(ascending=False).items()}
+                result.utilization = float(utilization.median())
+                result.utilization_p95 = float(utilization.quantile(0.95))
+
+        if result.utilization is None and RUNTIME_METRIC in values.columns and WALLCLOCK_METRIC in values.columns:
+            wall = values[WALLCLOCK_METRIC].diff()
+            utilization = (values[RUNTIME_METRIC].diff() / (wall.where(wall > 0) * schedulers)).clip(0, 1).dropna()
+            if len(utilization):
+                result.utilization_source = SOURCE_RUNTIME
+                result.utilization = float(utilization.median())
+                result.utilization_p95 = float(utilization.quantile(0.95))
+
+        # 运行队列: 所有调度器的可运行进程数, 按调度器数归一
+        for name in RUN_QUEUE_METRICS:
+            if name in values.columns:
+                per_scheduler = (values[name] / schedulers).dropna() if schedulers.notna().any() else values[name]
+                result.run_queue = _median(per_scheduler)
+                result.run_queue_max = float(per_scheduler.max()) if len(per_scheduler) else None
+                break
+
+        resources = series.resources
+        for attribute, column in (('bench_cpu', 'bench_cpu_percent'), ('host_cpu', 'cpu_percent'),
+                                  ('host_load', 'load_percent')):
+            if column in resources.columns:
+                setattr(result, attribute, _median(resources[column]))
+        self._resource_costs(series, result)
+
+        result.reasons = self._reasons(result)
+        return result
+
+    @staticmethod
+    def _resource_costs(series: TestSeries, result: SaturationResult):
+        """每连接内存和每消息 CPU 时间"""
+        resources = series.resources
+        if 'bench_rss_bytes' in resources.columns:
+            result.bench_rss = _median(resources['bench_rss_bytes'])
+        if 'bench_sockets' in resources.columns:
+            result.connections = _median(resources['bench_sockets'])
+        if not result.connections:
+            connected = series.column('connect_succ')
+            result.connections = float(connected.max()) if len(connected) else None
+        if result.bench_rss is not None and result.connections:
+            result.memory_per_connection = result.bench_rss / result.connections
+
+        if 'bench_cpu_seconds' in resources.columns:
+            cpu_seconds = resources['bench_cpu_seconds'].dropna()
+            messages = series.column('pub') + series.column('recv')
+            if len(cpu_seconds) >= 2 and len(messages) >= 2:
+                # 按 CPU 时间的首末采样点对齐消息计数
+                messages = messages.reindex(messages.index.union(cpu_seconds.index)).ffill().fillna(0.0)
+                sent = messages[cpu_seconds.index[-1]] - messages[cpu_seconds.index[0]]
+                if sent > 0:
+                    result.cpu_per_message = (cpu_seconds.iloc[-1] - cpu_seconds.iloc[0]) / sent * 1e6
+
+    def _reasons(self, result: SaturationResult) -> List[str]:
+        reasons = []
+        if result.utilization is not None and result.utilization >= self.utilization_threshold:
+            reasons.append(f"bench 调度器利用率 {result.utilization * 100:.0f}% ≥ {self.utilization_threshold * 100:.0f}%")
+        if result.run_queue is not None and result.run_queue >= self.run_queue_threshold:
+            reasons.append(f"bench 运行队列 {result.run_queue:.2f}/调度器 ≥ {self.run_queue_threshold:g}")
+        if result.bench_cpu is not None and result.bench_cpu >= self.bench_cpu_threshold:
+            reasons.append(f"emqtt_bench 进程 CPU {result.bench_cpu:.0f}% ≥ {self.bench_cpu_threshold:.0f}%")
+        if result.host_cpu is not None and result.host_cpu >= HOST_CPU_THRESHOLD:
+            reasons.append(f"压测机 CPU {result.host_cpu:.0f}% ≥ {HOST_CPU_THRESHOLD:.0f}%")
+        if result.host_load is not None and result.host_load >= HOST_LOAD_THRESHOLD:
+            reasons.append(f"压测机负载 {result.host_load:.0f}% ≥ {HOST_LOAD_THRESHOLD:.0f}% (可运行进程多于核数)")
+        return reasons
+
+
+def _format_value(value: Optional[float], scale: float = 1.0, digits: int = 0, suffix: str = '%') -> str:
+    if value is None or math.isnan(value):
+        return '-'
+    return f"{value * scale:.{digits}f}{suffix}"
+
+
+def format_microstates(result: SaturationResult, top: int = 4) -> str:
+    """占比最高的几个微状态"""
+    if not result.microstates:
+        return '-'
+    return ", ".join(f"{state} {share * 100:.0f}%" for state, share in list(result.microstates.items())[:top])
+
+
+def format_markdown(report: Optional[SaturationReport]) -> str:
+    """压测机饱和分析的 Markdown 章节内容"""
+    results = [result for result in (report.results if report else []) if result.has_data]
+    if not results:
+        return "没有可用于判断压测机是否饱和的数据。"
+
+    saturated = report.saturated
+    if saturated:
+        lines = [f"⚠️ **{len(saturated)} 个测试运行期间压测机 (emqtt_bench) 已饱和, 其结果反映的是压测机上限而非服务器性能**", ""]
+    else:
+        lines = ["✅ **压测机未饱和, 测试结果有效**", ""]
+
+    lines += ["| 测试 | 调度器利用率 (中位数/P95) | 微状态构成 | 运行队列/调度器 | emqtt_bench CPU | 主机 CPU | 主机负载 | 每连接内存 | 每消息 CPU | 结论 |",
+              "|------|--------------------------|------------|-----------------|-----------------|----------|----------|------------|------------|------|"]
+    for result in results:
+        utilization = '-'
+        if result.utilization is not None:
+            utilization = (f"{_format_value(result.utilization, 100)} / {_format_value(result.utilization_p95, 100)} "
+                           f"({result.utilization_source})")
+        verdict = "⚠️ 饱和: " + "; ".join(result.reasons) if result.saturated else "✅ 正常"
+        lines.append(f"| {result.test_name} | {utilization} | {format_microstates(result)} | "
+                     f"{_format_value(result.run_queue, digits=2, suffix='')} | {_format_value(result.bench_cpu)} | "
+                     f"{_format_value(result.host_cpu)} | {_format_value(result.host_load)} | "
+                     f"{_format_value(result.memory_per_connection, 1 / 1024, 1, ' KB')} | "
+                     f"{_format_value(result.cpu_per_message, digits=1, suffix=' µs')} | {verdict} |")
+    lines += ["", "*调度器利用率优先取自 bench VM 的微状态统计 (1 - sleep 占比, 需启用 microstate accounting), "
+                  "否则按运行时间 / (墙钟时间 × 在线调度器数) 估算; emqtt_bench CPU 为进程树占主机全部核心的百分比; "
+                  "每连接内存 = 进程树 RSS 中位数 / 已建立连接数, 每消息 CPU = 进程树 CPU 时间增量 / 发布与接收消息数增量。*"]
+    return "\n".join(lines)
+
+
+def main():
+    """命令行入口: 分析持续指标文件"""
+    parser = argparse.ArgumentParser(description='压测机自饱和分析')
+    parser.add_argument('files', nargs='+', help='持续指标文件 (continuous_metrics_*.json / *.cmts)')
+    parser.add_argument('--utilization', type=float, default=SCHEDULER_UTILIZATION_THRESHOLD,
+                        help='判定饱和的调度器利用率 (默认 0.9)')
+    parser.add_argument('--bench-cpu', type=float, default=BENCH_CPU_THRESHOLD,
+                        help='判定饱和的 emqtt_bench CPU 百分比 (默认 90)')
+    args = parser.parse_args()
+
+    analyzer = SaturationAnalyzer(utilization_threshold=args.utilization, bench_cpu_threshold=args.bench_cpu)
+    console.print(format_markdown(analyzer.analyze(args.files)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+编排程序自身的运行指标
+记录 Python 编排程序热路径的开销: 各端口的抓取延迟、解析、采集时过滤、持久化耗时,
+收集器和持久化队列深度、错过的采集周期和报告生成各阶段耗时。
+指标通过编排程序自己的 Prometheus 端点暴露 (prometheus_client), 并在每份最终报告中汇总,
+用于证明测量工具本身没有干扰测量结果
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from rich.console import Console
+
+console = Console()
+
+METRIC_PREFIX = 'emqtt_orchestrator_'
+DEFAULT_PORT = 9190  # 与 emqtt_bench 的 Prometheus 端口 (9090 起) 错开
+DEFAULT_ADDR = '127.0.0.1'  # 默认只在本机可访问, 需要远程抓取时显式配置监听地址
+
+# 耗时指标
+SCRAPE_SECONDS = 'scrape_seconds'
+PARSE_SECONDS = 'parse_seconds'
+FILTER_SECONDS = 'filter_seconds'
+PERSIST_SECONDS = 'persist_seconds'
+REPORT_STAGE_SECONDS = 'report_stage_seconds'
+REPORT_RENDER_SECONDS = 'report_render_seconds'
+# 其他指标
+QUEUE_DEPTH = 'collector_queue_depth'
+MISSED_TICKS = 'missed_ticks_total'
+
+# 名称 -> (类型, 说明, 标签)
+METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    SCRAPE_SECONDS: ('histogram', '抓取 emqtt_bench 指标端点的耗时', ('port',)),
+    PARSE_SECONDS: ('histogram', '解析 Prometheus 文本的耗时', ('collector',)),
+    FILTER_SECONDS: ('histogram', '采集时过滤的耗时', ('collector',)),
+    PERSIST_SECONDS: ('histogram', '持久化数据点或数据文件的耗时', ('target',)),
+    REPORT_STAGE_SECONDS: ('histogram', '报告生成前各分析阶段的耗时', ('stage',)),
+    REPORT_RENDER_SECONDS: ('histogram', '各报告的渲染耗时', ('report',)),
+    QUEUE_DEPTH: ('gauge', '等待保存的数据: 收集器内存中的数据点数 (按测试) 或持久化队列中的测试数', ('queue',)),
+    MISSED_TICKS: ('counter', '采集耗时超过间隔而跳过的周期数', ('collector',)),
+}
+# 每次采集热路径上的耗时指标 (持久化只计逐点写入, 不含测试结束后的整文件保存)
+HOT_PATH = (SCRAPE_SECONDS, PARSE_SECONDS, FILTER_SECONDS, PERSIST_SECONDS)
+PER_SCRAPE_TARGETS = ('target=raw', 'target=store')
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_LABELS = {
+    SCRAPE_SECONDS: '抓取', PARSE_SECONDS: '解析', FILTER_SECONDS: '过滤', PERSIST_SECONDS: '持久化',
+    REPORT_STAGE_SECONDS: '报告分析阶段', REPORT_RENDER_SECONDS: '报告渲染',
+    QUEUE_DEPTH: '队列深度', MISSED_TICKS: '错过的采集周期',
+}
+
+
+@dataclass
+class _Stat:
+    count: int = 0
+    total: float = 0.0
+    maximum: float = 0.0
+    last: float = 0.0
+
+
+@dataclass
+class SelfMetricRow:
+    """汇总中的一行 (一个指标的一组标签)"""
+    name: str
+    labels: str  # 如 "port=9090"
+    count: int
+    total: float
+    maximum: float
+    last: float
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class SelfMetricsSnapshot:
+    """某一时刻的编排程序自身指标汇总 (可序列化, 可传入报告渲染子进程)"""
+    rows: List[SelfMetricRow] = field(default_factory=list)
+    uptime: float = 0.0  # 编排程序运行秒数
+    cpu_seconds: float = 0.0  # 编排进程累计 CPU 时间
+    endpoint: Optional[str] = None
+
+    def select(self, name: str) -> List[SelfMetricRow]:
+        return [row for row in self.rows if row.name == name]
+
+    @property
+    def missed_ticks(self) -> int:
+        return int(sum(row.total for row in self.select(MISSED_TICKS)))
+
+    @property
+    def hot_path_seconds(self) -> float:
+        """采集热路径累计耗时"""
+        return sum(row.total for row in self.rows
+                   if row.name in HOT_PATH and (row.name != PERSIST_SECONDS or row.labels in PER_SCRAPE_TARGETS))
+
+    @property
+    def scrapes(self) -> int:
+        return sum(row.count for row in self.select(SCRAPE_SECONDS))
+
+
+class SelfMetrics:
+    """编排程序自身指标, 各线程共享"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], _Stat] = {}
+        self._started = time.monotonic()
+        self._cpu_started = self._cpu_seconds()
+        self.endpoint: Optional[str] = None
+        self._registry = None
+        self._collectors: Dict[str, object] = {}
+        try:
+            from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+            from prometheus_client import ProcessCollector
+        except ImportError:
+            return
+        self._registry = CollectorRegistry()
+        ProcessCollector(namespace=METRIC_PREFIX.rstrip('_'), registry=self._registry)
+        for name, (kind, description, labelnames) in METRICS.items():
+            full_name = METRIC_PREFIX + name
+            if kind == 'histogram':
+                metric = Histogram(full_name, description, labelnames, buckets=_BUCKETS, registry=self._registry)
+            elif kind == 'gauge':
+                metric = Gauge(full_name, description, labelnames, registry=self._registry)
+            else:
+                metric = Counter(full_name[:-len('_total')], description, labelnames, registry=self._registry)
+            self._collectors[name] = metric
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        times = os.times()
+        return times.user + times.system
+
+    def start_server(self, port: int = DEFAULT_PORT, addr: str = DEFAULT_ADDR) -> bool:
+        """启动 /metrics 端点, prometheus_client 未安装或端口不可用时返回 False"""
+        if self.endpoint is not None:
+            return True
+        if self._registry is None:
+            console.print("[yellow]⚠️ 未安装 prometheus_client, 编排程序自身指标只在报告中汇总[/yellow]")
+            return False
+        from prometheus_client import start_http_server
+        try:
+            start_http_server(port, addr=addr, registry=self._registry)
+        except OSError as e:
+            console.print(f"[yellow]⚠️ 编排程序指标端点启动失败 (端口 {port}): {e}[/yellow]")
+            return False
+        host = 'localhost' if addr in ('', '0.0.0.0', '127.0.0.1') else addr
+        self.endpoint = f"http://{host}:{port}/metrics"
+        console.print(f"[green]📡 编排程序自身指标: {self.endpoint}[/green]")
+        return True
+
+    def _record(self, name: str, value: float, labels: Dict[str, str], accumulate: bool):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            stat = self._stats.setdefault(key, _Stat())
+            stat.count += 1
+            stat.total = stat.total + value if accumulate else stat.total
+            stat.maximum = max(stat.maximum, value)
+            stat.last = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        """记录一次耗时"""
+        self._record(name, seconds, labels, accumulate=True)
+        metric = self._collectors.get(name)
+        if metric is not None:
+            metric.labels(**labels).observe(seconds)
+
+    @contextmanager
+    def time(self, name: str, **labels) -> Iterator[None]:
+        """计时代码块"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def set_gauge(self, name: str, value: float, **labels):
+        self._record(name, value, labels, accumulate=False)
+        metric = self._collectors.get(name)
+        if metric is not None:
+            metric.labels(**labels).set(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        self._record(name, amount, labels, accumulate=True)
+        metric = self._collectors.get(name)
+        if metric is not None:
+            metric.labels(**labels).inc(amount)
+
+    def snapshot(self) -> SelfMetricsSnapshot:
+        with self._lock:
+            rows = [SelfMetricRow(name, ", ".join(f"{k}={v}" for k, v in labels), stat.count, stat.total,
+                                  stat.maximum, stat.last)
+                    for (name, labels), stat in self._stats.items()]
+        order = list(METRICS)
+        rows.sort(key=lambda row: (order.index(row.name) if row.name in order else len(order), row.labels))
+        return SelfMetricsSnapshot(rows, time.monotonic() - self._started,
+                                   self._cpu_seconds() - self._cpu_started, self.endpoint)
+
+
+_shared_metrics: Optional[SelfMetrics] = None
+_shared_lock = threading.Lock()
+
+
+def get_self_metrics() -> SelfMetrics:
+    """进程内共享的编排程序自身指标"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = SelfMetrics()
+        return _shared_metrics
+
+
+def _format_seconds(seconds: float) -> str:
+    return f"{seconds * 1000:.2f} ms" if seconds < 1 else f"{seconds:.2f} s"
+
+
+def format_markdown(snapshot: Optional[SelfMetricsSnapshot]) -> str:
+    """编排程序自身开销的 Markdown 章节内容"""
+    if snapshot is None or not snapshot.rows:
+        return "没有编排程序自身的运行指标。"
+
+    lines = []
+    if snapshot.scrapes:
+        per_scrape = snapshot.hot_path_seconds / snapshot.scrapes
+        lines.append(f"- **采集热路径**: {snapshot.scrapes} 次抓取, 平均每次 {_format_seconds(per_scrape)} "
+                     f"(抓取 + 解析 + 过滤 + 持久化)")
+    missed = snapshot.missed_ticks
+    lines.append(f"- **错过的采集周期**: {missed}" + (" ⚠️ 采集耗时曾超过采集间隔" if missed else " ✅"))
+    if snapshot.uptime > 0:
+        lines.append(f"- **编排进程 CPU**: {snapshot.cpu_seconds:.1f} s / 运行 {snapshot.uptime:.0f} s "
+                     f"({snapshot.cpu_seconds / snapshot.uptime * 100:.1f}% 单核)")
+    if snapshot.endpoint:
+        lines.append(f"- **指标端点**: {snapshot.endpoint}")
+    lines += ["", "| 指标 | 标签 | 次数 | 平均 | 最大 | 累计 |", "|------|------|------|------|------|------|"]
+    for row in snapshot.rows:
+        label = _LABELS.get(row.name, row.name)
+        if row.name == QUEUE_DEPTH:
+            lines.append(f"| {label} | {row.labels} | {row.count} | - | {row.maximum:.0f} | 当前 {row.last:.0f} |")
+        elif row.name == MISSED_TICKS:
+            lines.append(f"| {label} | {row.labels} | {row.count} | - | - | {row.total:.0f} |")
+        else:
+            lines.append(f"| {label} | {row.labels} | {row.count} | {_format_seconds(row.mean)} | "
+                         f"{_format_seconds(row.maximum)} | {_format_seconds(row.total)} |")
+    lines += ["", "*汇总截至报告渲染开始; 本次报告的渲染耗时在渲染完成后写入指标端点和控制台。*"]
+    return "\n".join(lines)
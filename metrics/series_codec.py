@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+持续指标变化编码
+相邻两次采集之间大多数序列 (connect_fail、sub_fail、稳定后的直方图桶等) 的值不变,
+每个数据点只保存值发生变化的序列和消失的序列, 并定期写入完整的关键帧;
+读取时按需重建完整数据点
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 数据点类型: 关键帧保存全部序列, 增量帧只保存变化的序列
+FRAME_KEY = 'key'
+FRAME_DELTA = 'delta'
+
+# 默认每 60 个数据点写一个关键帧 (1秒采集间隔下约每分钟一个)
+DEFAULT_KEYFRAME_INTERVAL = 60
+
+
+def series_key(metric: Dict[str, Any]) -> str:
+    """序列标识: 指标名加排序后的标签, 如 e2e_latency_bucket{le="10"}"""
+    name = metric.get('name', '')
+    labels = metric.get('labels')
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{labels[key]}"' for key in sorted(labels)) + '}'
+
+
+class ChangeOnlyEncoder:
+    """把每次采集的完整指标列表编码为关键帧或增量帧"""
+
+    def __init__(self, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._values: Dict[str, Any] = {}
+        self._since_keyframe: Optional[int] = None
+
+    def reset(self):
+        """下一个数据点强制写关键帧"""
+        self._values = {}
+        self._since_keyframe = None
+
+    def encode(self, metrics: List[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]], List[str]]:
+        """
+        编码一次采集的指标
+
+        Args:
+            metrics: 完整指标列表
+
+        Returns:
+            (帧类型, 需要保存的指标, 已消失的序列标识)
+        """
+        current = {series_key(metric): metric for metric in metrics}
+        previous = self._values
+        self._values = {key: metric.get('value') for key, metric in current.items()}
+
+        if self._since_keyframe is None or self._since_keyframe + 1 >= self.keyframe_interval:
+            self._since_keyframe = 0
+            return FRAME_KEY, list(current.values()), []
+
+        self._since_keyframe += 1
+        changed = [metric for key, metric in current.items()
+                   if key not in previous or previous[key] != metric.get('value')]
+        removed = [key for key in previous if key not in current]
+        return FRAME_DELTA, changed, removed
+
+    def encode_point(self, point: Dict[str, Any]) -> Dict[str, Any]:
+        """编码完整数据点, 返回带 frame/removed 字段的新数据点"""
+        frame, metrics, removed = self.encode(point.get('metrics', []))
+        encoded = dict(point)
+        encoded['metrics'] = metrics
+        encoded['frame'] = frame
+        encoded.pop('removed', None)
+        if removed:
+            encoded['removed'] = removed
+        return encoded
+
+
+class ChangeOnlyDecoder:
+    """按顺序重建完整数据点, 未编码的数据点原样返回"""
+
+    def __init__(self):
+        self._state: Dict[str, Dict[str, Any]] = {}
+
+    def copy(self) -> 'ChangeOnlyDecoder':
+        """复制当前重建状态"""
+        decoder = ChangeOnlyDecoder()
+        decoder._state = dict(self._state)
+        return decoder
+
+    def apply(self, point: Dict[str, Any]):
+        """只更新重建状态, 不生成数据点"""
+        frame = point.get('frame')
+        if frame is None:
+            return
+        if frame == FRAME_KEY:
+            self._state = {}
+        for key in point.get('removed', ()):
+            self._state.pop(key, None)
+        for metric in point.get('metrics', []):
+            self._state[series_key(metric)] = metric
+
+    def current_metrics(self) -> List[Dict[str, Any]]:
+        """当前状态下的完整指标列表"""
+        return list(self._state.values())
+
+    def decode(self, point: Dict[str, Any]) -> Dict[str, Any]:
+        """重建完整数据点"""
+        if 'frame' not in point:
+            return point
+        self.apply(point)
+        full = dict(point)
+        full['metrics'] = self.current_metrics()
+        del full['frame']
+        full.pop('removed', None)
+        return full
+
+
+def is_change_only(points: Iterable[Dict[str, Any]]) -> bool:
+    """数据点是否使用变化编码 (看第一个数据点)"""
+    for point in points:
+        return 'frame' in point
+    return False
+
+
+def iter_frames(points: Iterable[Dict[str, Any]], decoder: Optional[ChangeOnlyDecoder] = None) -> Iterator[Dict[str, Any]]:
+    """
+    逐个重建完整数据点
+
+    Args:
+        points: 数据点 (变化编码或完整格式)
+        decoder: 可选, 已包含前序状态的解码器
+
+    Returns:
+        完整数据点迭代器
+    """
+    decoder = decoder or ChangeOnlyDecoder()
+    for point in points:
+        yield decoder.decode(point)
@@ -14,15 +14,30 @@ from datetime import datetime
 from typing import Dict, List, Any, Optional
 from pathlib import Path
 
+from report_cache import ReportCache
+from regression import format_markdown as format_regression_markdown
+from trial_runner import format_markdown as format_trial_markdown
+from saturation import format_markdown as format_saturation_markdown
+from self_metrics import format_markdown as format_self_metrics_markdown
+from metric_registry import registry, CATEGORY_CONNECTION, CATEGORY_HUAWEI, CATEGORY_LATENCY, CATEGORY_SUBSCRIBE, CATEGORY_THROUGHPUT, KIND_COUNTER
+
 class MarkdownReportGenerator:
     """Markdown详细分析报告生成器"""
     
-    def __init__(self, test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str = "reports"):
+    def __init__(self, test_results: List, all_metrics_data: Dict, start_time: datetime, reports_dir: str = "reports",
+                 cache: Optional[ReportCache] = None, regression_report: Any = None,
+                 trial_summary: Optional[Dict[str, Any]] = None, saturation_report: Any = None,
+                 self_metrics: Any = None):
         self.test_results = test_results
         self.all_metrics_data = all_metrics_data
         self.start_time = start_time
         self.report_timestamp = datetime.now()
         self.reports_dir = reports_dir
+        self.cache = cache
+        self.regression_report = regression_report  # regression.RegressionReport, 与历史基线的比较结果
+        self.trial_summary = trial_summary or {}  # 测试名 -> trial_runner.TrialSet, 重复试验统计
+        self.saturation_report = saturation_report  # saturation.SaturationReport, 压测机自饱和分析
+        self.self_metrics = self_metrics  # self_metrics.SelfMetricsSnapshot, 编排程序自身开销
         
         # 确保报告目录存在
         os.makedirs(self.reports_dir, exist_ok=True)
@@ -66,37 +81,37 @@ class MarkdownReportGenerator:
 
 ## 🔗 连接测试深度分析
 
-{self._generate_connection_analysis()}
+{self._cached_section('connection', ('连接测试', '华为云连接测试'), self._generate_connection_analysis)}
 
 ---
 
 ## 📤 发布测试深度分析
 
-{self._generate_publish_analysis()}
+{self._cached_section('publish', ('发布测试', '华为云发布测试'), self._generate_publish_analysis)}
 
 ---
 
 ## 📥 订阅测试深度分析
 
-{self._generate_subscribe_analysis()}
+{self._cached_section('subscribe', ('订阅测试', '华为云订阅测试'), self._generate_subscribe_analysis)}
 
 ---
 
 ## ☁️ 华为云连接测试深度分析
 
-{self._generate_huawei_connection_analysis()}
+{self._cached_section('huawei_connection', ('华为云连接测试',), self._generate_huawei_connection_analysis)}
 
 ---
 
 ## ☁️ 华为云发布测试深度分析
 
-{self._generate_huawei_publish_analysis()}
+{self._cached_section('huawei_publish', ('华为云发布测试', '发布测试'), self._generate_huawei_publish_analysis)}
 
 ---
 
 ## ☁️ 华为云订阅测试深度分析
 
-{self._generate_huawei_subscribe_analysis()}
+{self._cached_section('huawei_subscribe', ('华为云订阅测试',), self._generate_huawei_subscribe_analysis)}
 
 ---
 
@@ -106,6 +121,24 @@ class MarkdownReportGenerator:
 
 ---
 
+## 📉 跨运行回归检测
+
+{format_regression_markdown(self.regression_report)}
+
+---
+
+## 🖥️ 压测机饱和分析
+
+{format_saturation_markdown(self.saturation_report)}
+
+---
+
+## 🔬 测量工具自身开销
+
+{format_self_metrics_markdown(self.self_metrics)}
+
+---
+{self._generate_trial_section()}
 ## 📊 完整指标数据展示
 
 {self._generate_complete_metrics_display()}
@@ -142,6 +175,18 @@ class MarkdownReportGenerator:
 """
         return content
     
+    def _generate_trial_section(self) -> str:
+        """生成重复试验统计章节 (未启用重复试验时省略)"""
+        if not self.trial_summary:
+            return ""
+        return f"""
+## 🔁 重复试验统计
+
+{format_trial_markdown(self.trial_summary)}
+
+---
+"""
+    
     def _generate_executive_summary(self) -> str:
         """生成执行摘要"""
         total_tests = len(self.test_results)
@@ -438,6 +483,29 @@ class MarkdownReportGenerator:
 """
     
     # 辅助方法
+    def _cached_section(self, section_name: str, test_names: tuple, builder) -> str:
+        """渲染单个测试相关的章节, 对应指标文件内容未变化时直接复用缓存"""
+        if self.cache is None or not self.cache.enabled:
+            return builder()
+        
+        metrics_files = []
+        for test_name in test_names:
+            test_data = self._get_test_data(test_name)
+            if test_data is None:
+                continue
+            metrics_file = test_data.get('test_info', {}).get('metrics_file')
+            if not metrics_file or not os.path.exists(metrics_file):
+                # 数据不是来自文件, 无法按内容哈希缓存
+                return builder()
+            metrics_files.append(metrics_file)
+        
+        cache_key = self.cache.make_key(metrics_files, extra=[section_name, list(test_names)])
+        section = self.cache.get('markdown_section', cache_key)
+        if section is None:
+            section = builder()
+            self.cache.put('markdown_section', cache_key, section)
+        return section
+    
     def _get_test_data(self, test_name: str) -> Optional[Dict]:
         """获取指定测试的数据"""
         # 首先尝试精确匹配
@@ -458,263 +526,50 @@ class MarkdownReportGenerator:
         
         return None
     
-    def _extract_connection_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
-        """提取连接相关指标"""
-        connection_metrics = {}
+    def _extract_by_registry(self, metrics: List[Dict], predicate, use_report_key: bool = True) -> Dict[str, Any]:
+        """按指标注册表筛选指标, predicate 接收 MetricInfo 返回是否保留"""
+        extracted = {}
         for metric in metrics:
             name = metric.get('name', '').lower()
-            value = self._safe_float(metric.get('value', 0))
-            
-            # 映射实际指标名称到期望的指标名称
-            if name == 'connect_succ':
-                connection_metrics['emqtt_bench_connected_total'] = value
-            elif name == 'connect_fail':
-                connection_metrics['emqtt_bench_connect_fail_total'] = value
-            elif name == 'connection_idle':
-                connection_metrics['emqtt_bench_idle_connections'] = value
-            elif name == 'connect_retried':
-                connection_metrics['emqtt_bench_reconnect_total'] = value
-            elif name == 'reconnect_succ':
-                connection_metrics['emqtt_bench_reconnect_success_total'] = value
-            elif name == 'connection_timeout':
-                connection_metrics['emqtt_bench_connection_timeout_total'] = value
-            elif name == 'connection_refused':
-                connection_metrics['emqtt_bench_connection_refused_total'] = value
-            elif name == 'unreachable':
-                connection_metrics['emqtt_bench_unreachable_total'] = value
-            elif 'latency' in name or 'duration' in name:
-                connection_metrics[name] = value
-            elif 'concurrent' in name:
-                connection_metrics[name] = value
-        
-        return connection_metrics
+            info = registry.lookup(name)
+            if predicate(info):
+                key = info.report_key if use_report_key else name
+                extracted[key] = self._safe_float(metric.get('value', 0))
+        return extracted
+    
+    def _extract_connection_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
+        """提取连接相关指标"""
+        return self._extract_by_registry(
+            metrics,
+            lambda info: (info.known and info.scope == 'connection') or info.category in (CATEGORY_LATENCY, CATEGORY_CONNECTION)
+        )
     
     def _extract_publish_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
-        """提取发布相关指标"""
-        publish_metrics = {}
-        for metric in metrics:
-            name = metric.get('name', '').lower()
-            value = self._safe_float(metric.get('value', 0))
-
-            # 核心发布指标
-            if name == 'pub_succ':
-                publish_metrics['emqtt_bench_published_total'] = value
-            elif name == 'pub_fail':
-                publish_metrics['emqtt_bench_publish_fail_total'] = value
-            elif name == 'pub':
-                publish_metrics['emqtt_bench_publish_total'] = value
-            elif name == 'pub_overrun':
-                publish_metrics['emqtt_bench_publish_overrun_total'] = value
-            elif name == 'publish_latency':
-                publish_metrics['emqtt_bench_publish_latency_seconds'] = value
-            
-            # 连接相关指标
-            elif name == 'connect_succ':
-                publish_metrics['emqtt_bench_connected_total'] = value
-            elif name == 'connect_fail':
-                publish_metrics['emqtt_bench_connect_fail_total'] = value
-            elif name == 'connect_retried':
-                publish_metrics['emqtt_bench_reconnect_total'] = value
-            elif name == 'reconnect_succ':
-                publish_metrics['emqtt_bench_reconnect_success_total'] = value
-            elif name == 'connection_timeout':
-                publish_metrics['emqtt_bench_connection_timeout_total'] = value
-            elif name == 'connection_refused':
-                publish_metrics['emqtt_bench_connection_refused_total'] = value
-            elif name == 'connection_idle':
-                publish_metrics['emqtt_bench_idle_connections'] = value
-            elif name == 'unreachable':
-                publish_metrics['emqtt_bench_unreachable_total'] = value
-            
-            # 订阅相关指标
-            elif name == 'sub':
-                publish_metrics['emqtt_bench_subscribed_total'] = value
-            elif name == 'sub_fail':
-                publish_metrics['emqtt_bench_subscribe_fail_total'] = value
-            elif name == 'recv':
-                publish_metrics['emqtt_bench_messages_received_total'] = value
-            
-            # 延迟和性能指标
-            elif name == 'e2e_latency_sum':
-                publish_metrics['emqtt_bench_e2e_latency_sum'] = value
-            elif name == 'e2e_latency_count':
-                publish_metrics['emqtt_bench_e2e_latency_count'] = value
-            elif name == 'e2e_latency_bucket':
-                publish_metrics['emqtt_bench_e2e_latency_bucket'] = value
-            
-            # MQTT客户端延迟指标
-            elif 'mqtt_client_connect_duration' in name:
-                publish_metrics[name] = value
-            elif 'mqtt_client_handshake_duration' in name:
-                publish_metrics[name] = value
-            elif 'mqtt_client_tcp_handshake_duration' in name:
-                publish_metrics[name] = value
-            elif 'mqtt_client_subscribe_duration' in name:
-                publish_metrics[name] = value
-            
-            # 系统资源指标
-            elif name == 'erlang_vm_process_count':
-                publish_metrics['erlang_vm_process_count'] = value
-            elif name == 'erlang_vm_port_count':
-                publish_metrics['erlang_vm_port_count'] = value
-            elif name == 'erlang_vm_atom_count':
-                publish_metrics['erlang_vm_atom_count'] = value
-            elif name == 'erlang_vm_schedulers':
-                publish_metrics['erlang_vm_schedulers'] = value
-            elif name == 'erlang_vm_schedulers_online':
-                publish_metrics['erlang_vm_schedulers_online'] = value
-            elif name == 'erlang_vm_logical_processors':
-                publish_metrics['erlang_vm_logical_processors'] = value
-            elif name == 'erlang_vm_logical_processors_online':
-                publish_metrics['erlang_vm_logical_processors_online'] = value
-            elif name == 'erlang_vm_logical_processors_available':
-                publish_metrics['erlang_vm_logical_processors_available'] = value
-            
-            # 内存相关指标
-            elif name == 'erlang_vm_memory_bytes_total':
-                publish_metrics['erlang_vm_memory_bytes_total'] = value
-            elif name == 'erlang_vm_memory_processes_bytes_total':
-                publish_metrics['erlang_vm_memory_processes_bytes_total'] = value
-            elif name == 'erlang_vm_memory_system_bytes_total':
-                publish_metrics['erlang_vm_memory_system_bytes_total'] = value
-            elif name == 'erlang_vm_memory_atom_bytes_total':
-                publish_metrics['erlang_vm_memory_atom_bytes_total'] = value
-            elif name == 'erlang_vm_memory_ets_tables':
-                publish_metrics['erlang_vm_memory_ets_tables'] = value
-            elif name == 'erlang_vm_memory_dets_tables':
-                publish_metrics['erlang_vm_memory_dets_tables'] = value
-            
-            # 垃圾回收指标
-            elif name == 'erlang_vm_statistics_garbage_collection_number_of_gcs':
-                publish_metrics['erlang_vm_gc_count'] = value
-            elif name == 'erlang_vm_statistics_garbage_collection_words_reclaimed':
-                publish_metrics['erlang_vm_gc_words_reclaimed'] = value
-            elif name == 'erlang_vm_statistics_garbage_collection_bytes_reclaimed':
-                publish_metrics['erlang_vm_gc_bytes_reclaimed'] = value
-            
-            # 运行时统计指标
-            elif name == 'erlang_vm_statistics_reductions_total':
-                publish_metrics['erlang_vm_reductions_total'] = value
-            elif name == 'erlang_vm_statistics_runtime_milliseconds':
-                publish_metrics['erlang_vm_runtime_ms'] = value
-            elif name == 'erlang_vm_statistics_wallclock_time_milliseconds':
-                publish_metrics['erlang_vm_wallclock_ms'] = value
-            elif name == 'erlang_vm_statistics_context_switches':
-                publish_metrics['erlang_vm_context_switches'] = value
-            elif name == 'erlang_vm_statistics_run_queues_length':
-                publish_metrics['erlang_vm_run_queues_length'] = value
-            elif name == 'erlang_vm_statistics_dirty_cpu_run_queue_length':
-                publish_metrics['erlang_vm_dirty_cpu_run_queue_length'] = value
-            elif name == 'erlang_vm_statistics_dirty_io_run_queue_length':
-                publish_metrics['erlang_vm_dirty_io_run_queue_length'] = value
-            elif name == 'erlang_vm_statistics_bytes_received_total':
-                publish_metrics['erlang_vm_bytes_received_total'] = value
-            elif name == 'erlang_vm_statistics_bytes_output_total':
-                publish_metrics['erlang_vm_bytes_output_total'] = value
-            
-            # 调度器指标
-            elif name == 'erlang_vm_dirty_cpu_schedulers':
-                publish_metrics['erlang_vm_dirty_cpu_schedulers'] = value
-            elif name == 'erlang_vm_dirty_cpu_schedulers_online':
-                publish_metrics['erlang_vm_dirty_cpu_schedulers_online'] = value
-            elif name == 'erlang_vm_dirty_io_schedulers':
-                publish_metrics['erlang_vm_dirty_io_schedulers'] = value
-            
-            # 微状态统计指标
-            elif name == 'erlang_vm_msacc_emulator_seconds_total':
-                publish_metrics['erlang_vm_msacc_emulator_seconds'] = value
-            elif name == 'erlang_vm_msacc_gc_seconds_total':
-                publish_metrics['erlang_vm_msacc_gc_seconds'] = value
-            elif name == 'erlang_vm_msacc_port_seconds_total':
-                publish_metrics['erlang_vm_msacc_port_seconds'] = value
-            elif name == 'erlang_vm_msacc_other_seconds_total':
-                publish_metrics['erlang_vm_msacc_other_seconds'] = value
-            elif name == 'erlang_vm_msacc_sleep_seconds_total':
-                publish_metrics['erlang_vm_msacc_sleep_seconds'] = value
-            elif name == 'erlang_vm_msacc_check_io_seconds_total':
-                publish_metrics['erlang_vm_msacc_check_io_seconds'] = value
-            elif name == 'erlang_vm_msacc_aux_seconds_total':
-                publish_metrics['erlang_vm_msacc_aux_seconds'] = value
-            
-            # 系统配置指标
-            elif name == 'erlang_vm_wordsize_bytes':
-                publish_metrics['erlang_vm_wordsize_bytes'] = value
-            elif name == 'erlang_vm_time_correction':
-                publish_metrics['erlang_vm_time_correction'] = value
-            elif name == 'erlang_vm_thread_pool_size':
-                publish_metrics['erlang_vm_thread_pool_size'] = value
-            elif name == 'erlang_vm_threads':
-                publish_metrics['erlang_vm_threads'] = value
-            elif name == 'erlang_vm_smp_support':
-                publish_metrics['erlang_vm_smp_support'] = value
-            elif name == 'erlang_vm_process_limit':
-                publish_metrics['erlang_vm_process_limit'] = value
-            elif name == 'erlang_vm_port_limit':
-                publish_metrics['erlang_vm_port_limit'] = value
-            elif name == 'erlang_vm_atom_limit':
-                publish_metrics['erlang_vm_atom_limit'] = value
-            elif name == 'erlang_vm_ets_limit':
-                publish_metrics['erlang_vm_ets_limit'] = value
-            elif name == 'erlang_vm_allocators':
-                publish_metrics['erlang_vm_allocators'] = value
-            
-            # 其他性能指标
-            elif 'throughput' in name or 'rate' in name:
-                publish_metrics[name] = value
-            elif 'latency' in name or 'duration' in name:
-                publish_metrics[name] = value
-        
-        return publish_metrics
+        """提取发布相关指标 (发布报告同时展示连接、订阅、延迟及Erlang VM指标)"""
+        return self._extract_by_registry(
+            metrics,
+            lambda info: info.known or info.category in (CATEGORY_LATENCY, CATEGORY_THROUGHPUT)
+        )
     
     def _extract_subscribe_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
         """提取订阅相关指标"""
-        subscribe_metrics = {}
-        for metric in metrics:
-            name = metric.get('name', '').lower()
-            value = self._safe_float(metric.get('value', 0))
-            
-            # 映射实际指标名称到期望的指标名称
-            if name == 'sub':
-                subscribe_metrics['emqtt_bench_subscribed_total'] = value
-            elif name == 'sub_fail':
-                subscribe_metrics['emqtt_bench_subscribe_fail_total'] = value
-            elif name == 'recv':
-                subscribe_metrics['emqtt_bench_messages_received_total'] = value
-            elif 'message' in name:
-                subscribe_metrics[name] = value
-            elif 'qos' in name:
-                subscribe_metrics[name] = value
-        
-        return subscribe_metrics
+        return self._extract_by_registry(
+            metrics,
+            lambda info: (info.known and info.kind == KIND_COUNTER and info.scope == 'subscribe')
+            or (not info.known and info.category == CATEGORY_SUBSCRIBE)
+        )
     
     def _extract_huawei_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
         """提取华为云相关指标"""
-        huawei_metrics = {}
-        for metric in metrics:
-            name = metric.get('name', '').lower()
-            value = self._safe_float(metric.get('value', 0))
-            
-            # 华为云特有的指标
-            if any(keyword in name for keyword in ['huawei', 'cloud', 'iot', 'device']):
-                huawei_metrics[name] = value
-            elif 'auth' in name or 'authentication' in name:
-                huawei_metrics[name] = value
-            elif 'payload' in name:
-                huawei_metrics[name] = value
-        
-        return huawei_metrics
+        return self._extract_by_registry(metrics, lambda info: info.category == CATEGORY_HUAWEI)
     
     def _extract_performance_metrics(self, metrics: List[Dict]) -> Dict[str, Any]:
         """提取性能相关指标"""
-        performance_metrics = {}
-        for metric in metrics:
-            name = metric.get('name', '').lower()
-            value = self._safe_float(metric.get('value', 0))
-            
-            if any(keyword in name for keyword in ['latency', 'throughput', 'rate', 'duration', 'time']):
-                performance_metrics[name] = value
-        
-        return performance_metrics
+        return self._extract_by_registry(
+            metrics,
+            lambda info: info.category in (CATEGORY_LATENCY, CATEGORY_THROUGHPUT),
+            use_report_key=False
+        )
     
     def _safe_float(self, value) -> float:
         """安全转换为浮点数"""
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+自适应测试时长
+持续采集时逐点计算消息吞吐量和延迟, 先检测速率是否进入稳态 (滑动窗口前后两半均值接近),
+进入稳态后继续测量, 直到吞吐量和延迟估计的置信区间 (批均值法, 减少相邻样本自相关的影响)
+相对半宽都小于容差, 即可提前结束测试; 始终没有收敛时按原定时长结束
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from analysis_frame import LATENCY_HISTOGRAMS
+from trial_runner import t_critical
+
+DEFAULT_TOLERANCE = 0.05  # 置信区间半宽 / 均值
+DEFAULT_STEADY_WINDOW = 10  # 稳态检测窗口 (样本数)
+DEFAULT_STEADY_TOLERANCE = 0.10  # 窗口前后两半均值的相对差小于该值视为稳态
+DEFAULT_MIN_SAMPLES = 10  # 稳态后至少测量的样本数
+MIN_BATCHES = 5  # 批均值法至少需要的批数
+
+
+@dataclass
+class Estimate:
+    """稳态后的测量估计"""
+    mean: float
+    half_width: float  # 95% 置信区间半宽
+    samples: int
+
+    @property
+    def relative_half_width(self) -> float:
+        return self.half_width / abs(self.mean) if self.mean else math.inf
+
+
+def batch_means_estimate(samples: List[float], min_batches: int = MIN_BATCHES) -> Optional[Estimate]:
+    """
+    批均值法估计均值的置信区间: 把连续样本分成约 10 批, 以批均值之间的方差估计误差
+
+    Returns:
+        估计结果, 样本不足以分出 min_batches 批时返回 None
+    """
+    data = np.asarray(samples, dtype=float)
+    batch_size = max(1, len(data) // 10)
+    batches = len(data) // batch_size
+    if batches < min_batches:
+        return None
+    # 舍弃最早的零头, 保留最新的样本
+    means = data[len(data) - batches * batch_size:].reshape(batches, batch_size).mean(axis=1)
+    half_width = t_critical(batches - 1) * float(means.std(ddof=1)) / math.sqrt(batches)
+    return Estimate(float(means.mean()), half_width, len(data))
+
+
+class SteadyStateDetector:
+    """单个测试的稳态和收敛检测, 由持续指标收集线程逐点喂入数据"""
+
+    def __init__(self, tolerance: float = DEFAULT_TOLERANCE, min_duration: float = 0.0,
+                 steady_window: int = DEFAULT_STEADY_WINDOW, steady_tolerance: float = DEFAULT_STEADY_TOLERANCE,
+                 min_samples: int = DEFAULT_MIN_SAMPLES):
+        """
+        Args:
+            tolerance: 收敛条件, 吞吐量和延迟估计的置信区间相对半宽都小于该值
+            min_duration: 采集开始后至少运行的秒数
+            steady_window: 稳态检测窗口的样本数
+            steady_tolerance: 窗口前后两半吞吐量均值的相对差小于该值时进入稳态
+            min_samples: 进入稳态后至少测量的样本数
+        """
+        self.tolerance = tolerance
+        self.min_duration = min_duration
+        self.steady_window = max(4, steady_window)
+        self.steady_tolerance = steady_tolerance
+        self.min_samples = max(min_samples, MIN_BATCHES)
+        self._lock = threading.Lock()
+        self._first_ts: Optional[float] = None
+        self._last: Optional[Dict[str, float]] = None
+        self.throughput: List[float] = []  # msg/s
+        self.latency: List[Optional[float]] = []  # ms, 区间内没有新的延迟样本时为 None
+        self.steady_index: Optional[int] = None  # 稳态开始的样本下标
+        self.steady_at: Optional[float] = None  # 进入稳态时距采集开始的秒数
+        self.converged_at: Optional[float] = None  # 收敛时距采集开始的秒数
+        self.estimates: Dict[str, Optional[Estimate]] = {'throughput': None, 'latency': None}
+
+    @property
+    def converged(self) -> bool:
+        return self.converged_at is not None
+
+    @staticmethod
+    def _counters(metrics: List[Dict[str, Any]]) -> Dict[str, float]:
+        """汇总计算所需的累计值 (同名不同标签相加)"""
+        wanted = {'pub', 'recv'}
+        for histogram in LATENCY_HISTOGRAMS:
+            wanted.update((f'{histogram}_sum', f'{histogram}_count'))
+        totals: Dict[str, float] = {}
+        for metric in metrics:
+            name = metric.get('name', '')
+            if name in wanted:
+                try:
+                    totals[name] = totals.get(name, 0.0) + float(metric.get('value', 0))
+                except (TypeError, ValueError):
+                    continue
+        return totals
+
+    def observe(self, ts: float, metrics: List[Dict[str, Any]]):
+        """喂入一个完整数据点 (收集线程调用)"""
+        counters = self._counters(metrics)
+        with self._lock:
+            if self._first_ts is None:
+                self._first_ts = ts
+            last, self._last = self._last, dict(counters, ts=ts)
+            if last is None or ts <= last['ts']:
+                return
+            elapsed = ts - last['ts']
+
+            messages = counters.get('pub', 0.0) + counters.get('recv', 0.0)
+            previous = last.get('pub', 0.0) + last.get('recv', 0.0)
+            self.throughput.append(max(0.0, (messages - previous) / elapsed))
+
+            latency = None
+            for histogram in LATENCY_HISTOGRAMS:
+                count_delta = counters.get(f'{histogram}_count', 0.0) - last.get(f'{histogram}_count', 0.0)
+                if count_delta > 0:
+                    latency = (counters.get(f'{histogram}_sum', 0.0) - last.get(f'{histogram}_sum', 0.0)) / count_delta
+                    break
+            self.latency.append(latency)
+
+            if not self.converged:
+                self._update(ts - self._first_ts)
+
+    def _update(self, elapsed: float):
+        if self.steady_index is None:
+            window = self.throughput[-self.steady_window:]
+            if len(window) < self.steady_window:
+                return
+            half = len(window) // 2
+            mean = float(np.mean(window))
+            if mean <= 0:
+                return  # 没有消息流量 (如连接测试) 时不做提前结束
+            if abs(np.mean(window[half:]) - np.mean(window[:half])) / mean < self.steady_tolerance:
+                # 窗口前半可能仍在爬升, 从后半开始计入测量
+                self.steady_index = len(self.throughput) - (len(window) - half)
+                self.steady_at = elapsed
+
+        if self.steady_index is None:
+            return
+        throughput = self.throughput[self.steady_index:]
+        latency = [value for value in self.latency[self.steady_index:] if value is not None]
+        self.estimates['throughput'] = batch_means_estimate(throughput)
+        self.estimates['latency'] = batch_means_estimate(latency) if latency else None
+
+        if len(throughput) < self.min_samples or elapsed < self.min_duration:
+            return
+        if latency and self.estimates['latency'] is None:
+            return  # 有延迟数据但样本还不够估计
+        if all(estimate is None or estimate.relative_half_width < self.tolerance
+               for estimate in self.estimates.values()) and self.estimates['throughput'] is not None:
+            self.converged_at = elapsed
+
+    def describe(self) -> str:
+        """当前估计的简要说明"""
+        parts = []
+        for name, label, unit in (('throughput', '吞吐量', 'msg/s'), ('latency', '延迟', 'ms')):
+            estimate = self.estimates.get(name)
+            if estimate is not None:
+                parts.append(f"{label} {estimate.mean:.2f} ± {estimate.half_width:.2f} {unit} "
+                             f"(±{estimate.relative_half_width * 100:.1f}%)")
+        return ", ".join(parts) or "暂无稳态估计"
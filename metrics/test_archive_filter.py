@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive Filter Streaming Test Script
+Test that the streaming JSON array reader returns the same elements as
+json.loads for every chunk size, including values split across chunks
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import io
+import json
+import random
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from archive_filter import iter_json_array
+
+# Scalars that are easy to truncate at a chunk boundary
+SCALARS = [0, 1.5, -1.5e10, 2, 123456789, -0.25, 1e-7, 3.0e+20, True, False, None, "1.5", ""]
+
+
+def random_value(rng, depth=0):
+    """Build a random JSON value"""
+    kind = rng.randrange(4 if depth < 2 else 2)
+    if kind == 0:
+        return rng.choice(SCALARS)
+    if kind == 1:
+        return rng.uniform(-1e6, 1e6) if rng.random() < 0.5 else rng.randint(-10 ** 12, 10 ** 12)
+    if kind == 2:
+        return [random_value(rng, depth + 1) for _ in range(rng.randrange(4))]
+    return {
+        'timestamp': '2025-10-19T10:00:00',
+        'metrics': [{'name': 'connect_succ', 'value': random_value(rng, depth + 1)}]
+    }
+
+
+def round_trip(text, chunk_size):
+    return list(iter_json_array(io.StringIO(text), chunk_size))
+
+
+def test_split_floats():
+    """Floats split across chunk boundaries decode in full"""
+    print("Testing floats split across chunks...")
+    for text in ('[1.5, 2]', '[-1.5e10, 2]', '[1.5,2]', '[ 0.125 ]', '[1e5]', '[true,false,null]'):
+        expected = json.loads(text)
+        for chunk_size in range(1, len(text) + 2):
+            result = round_trip(text, chunk_size)
+            assert result == expected, "{!r} chunk_size={}: {} != {}".format(text, chunk_size, result, expected)
+    print("  ✅ Split floats decode correctly")
+
+
+def test_fuzz_round_trip():
+    """Random arrays round-trip through every small chunk size"""
+    print("Testing random arrays over chunk sizes...")
+    rng = random.Random(20251019)
+    for _ in range(200):
+        expected = [random_value(rng) for _ in range(rng.randrange(1, 6))]
+        separators = rng.choice([(',', ':'), (', ', ': ')])
+        text = json.dumps(expected, separators=separators, indent=rng.choice([None, 2]))
+        for chunk_size in list(range(1, 9)) + [13, 64, len(text)]:
+            result = round_trip(text, chunk_size)
+            assert result == expected, "chunk_size={}: {!r}".format(chunk_size, text)
+    print("  ✅ All arrays round-trip")
+
+
+if __name__ == "__main__":
+    test_split_floats()
+    test_fuzz_round_trip()
+    print("\n✅ Archive filter streaming tests passed!")
@@ -15,6 +15,64 @@ from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 import pandas as pd
 
+from artifact_io import artifact_path, dump_json, open_artifact
+from data_retention import RetentionEngine, RetentionPolicy, RetentionReport, format_report
+from run_catalog import RunCatalog
+
+# 列式导出的数据表: 运行元数据、单次采集的指标、持续时间序列
+COLUMNAR_TABLES = ('runs', 'metrics', 'continuous')
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _require_pyarrow():
+    """按需导入 pyarrow (可选依赖, 只有列式导出/导入需要)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet/Arrow 导出和导入需要安装 pyarrow: pip install pyarrow") from e
+    return pa, pq, feather
+
+
+def _columnar_schemas(pa) -> Dict[str, Any]:
+    """列式数据表结构, 重复度高的名称、标签等列使用字典编码"""
+    dict_string = pa.dictionary(pa.int32(), pa.string())
+    return {
+        'runs': pa.schema([
+            ('test_id', pa.int64()),
+            ('test_name', dict_string),
+            ('test_type', dict_string),
+            ('start_time', pa.string()),
+            ('end_time', pa.string()),
+            ('duration', pa.float64()),
+            ('port', pa.int32()),
+            ('success', pa.bool_()),
+            ('error_message', pa.string()),
+            ('metrics_file', pa.string()),
+            ('continuous_data_file', pa.string()),
+            ('config', pa.string()),  # JSON
+            ('performance_summary', pa.string()),  # JSON
+            ('created_at', pa.string())
+        ]),
+        'metrics': pa.schema([
+            ('test_id', pa.int64()),
+            ('name', dict_string),
+            ('value', pa.float64()),
+            ('labels', dict_string),  # JSON
+            ('timestamp', pa.string()),
+            ('metric_type', dict_string),
+            ('help_text', dict_string)
+        ]),
+        'continuous': pa.schema([
+            ('test_id', pa.int64()),
+            ('timestamp', pa.timestamp('us')),
+            ('name', dict_string),
+            ('labels', dict_string),  # JSON
+            ('value', pa.float64())
+        ])
+    }
+
 @dataclass
 class TestData:
     """测试数据结构"""
@@ -59,6 +117,7 @@ class TestDataManager:
         
         # 初始化数据库
         self.db_path = self.database_dir / "test_data.db"
+        self.catalog = RunCatalog(self.db_path)
         self._init_database()
     
     def _init_database(self):
@@ -66,6 +125,9 @@ class TestDataManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
+        # 新建的数据库使用增量空间回收, 删除旧数据后由保留策略逐步回收
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
         # 创建测试结果表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS test_results (
@@ -114,6 +176,13 @@ class TestDataManager:
             )
         ''')
         
+        # 持续数据聚合表和保留级别表
+        RetentionEngine.ensure_schema(conn)
+        
+        # 运行目录, 首次创建时导入旧的 data_index.json
+        RunCatalog.ensure_schema(conn)
+        self.catalog.migrate(conn, self.base_dir / "data_index.json")
+        
         conn.commit()
         conn.close()
     
@@ -127,100 +196,142 @@ class TestDataManager:
         Returns:
             str: 保存的文件路径
         """
+        return self.save_test_data_batch([test_data])[0]
+    
+    def save_test_data_batch(self, tests: List[TestData]) -> List[str]:
+        """
+        批量保存测试数据: 所有测试的数据库插入在同一个事务中完成, 运行目录一次追加
+        
+        Args:
+            tests: 测试数据对象列表
+            
+        Returns:
+            List[str]: 每个测试保存的原始数据文件路径
+        """
+        if not tests:
+            return []
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
         # 1. 保存到数据库
-        test_id = self._save_to_database(test_data)
+        test_ids = self.save_to_database(tests)
         
-        # 2. 保存原始数据到JSON文件
-        json_file = self._save_raw_data(test_data, timestamp)
+        # 2-5. 保存数据文件并追加到运行目录
+        return self.save_test_files(tests, test_ids, timestamp)
+    
+    def save_test_files(self, tests: List[TestData], test_ids: List[int], timestamp: Optional[str] = None) -> List[str]:
+        """
+        保存已写入数据库的测试的数据文件, 并追加到运行目录
+        文件名带数据库 test_id, 同一批次中同名的测试不会写到同一个文件
         
-        # 3. 保存指标数据到CSV文件
-        csv_file = self._save_metrics_to_csv(test_data, timestamp)
+        Args:
+            tests: 测试数据对象列表
+            test_ids: 对应的数据库 test_id
+            timestamp: 文件名中的时间戳, 默认为当前时间
+            
+        Returns:
+            List[str]: 每个测试保存的原始数据文件路径
+        """
+        timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        # 4. 保存性能摘要
-        summary_file = self._save_performance_summary(test_data, timestamp)
+        entries = []
+        for test_data, test_id in zip(tests, test_ids):
+            file_stamp = f"{timestamp}_{test_id}"
+            
+            # 2. 保存原始数据到JSON文件
+            json_file = self._save_raw_data(test_data, file_stamp)
+            
+            # 3. 保存指标数据到CSV文件
+            csv_file = self._save_metrics_to_csv(test_data, file_stamp)
+            
+            # 4. 保存性能摘要
+            summary_file = self._save_performance_summary(test_data, file_stamp)
+            
+            entries.append((test_id, test_data, {'json': json_file, 'csv': csv_file, 'summary': summary_file}))
         
-        # 5. 生成数据索引
-        self._update_data_index(test_data, test_id, json_file, csv_file, summary_file)
+        # 5. 追加到运行目录
+        self.catalog.record_many(entries)
         
-        return json_file
+        return [files['json'] for _, _, files in entries]
     
-    def _save_to_database(self, test_data: TestData) -> int:
-        """保存到SQLite数据库"""
-        conn = sqlite3.connect(self.db_path)
+    def save_to_database(self, tests: List[TestData]) -> List[int]:
+        """保存到SQLite数据库 (单个事务, 失败时整批回滚)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
         cursor = conn.cursor()
+        test_ids = []
+        
+        try:
+            for test_data in tests:
+                # 插入测试结果
+                cursor.execute('''
+                    INSERT INTO test_results (
+                        test_name, test_type, start_time, end_time, duration, port,
+                        success, error_message, metrics_file, continuous_data_file,
+                        config, performance_summary
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    test_data.test_name,
+                    test_data.test_type,
+                    test_data.start_time,
+                    test_data.end_time,
+                    test_data.duration,
+                    test_data.port,
+                    test_data.success,
+                    test_data.error_message,
+                    test_data.metrics_file,
+                    test_data.continuous_data_file,
+                    json.dumps(test_data.config),
+                    json.dumps(test_data.performance_summary)
+                ))
+            
+                test_id = cursor.lastrowid
+                test_ids.append(test_id)
+            
+                # 插入指标数据
+                cursor.executemany('''
+                    INSERT INTO metrics_data (
+                        test_result_id, metric_name, metric_value, metric_labels,
+                        timestamp, metric_type, help_text
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    test_id,
+                    metric.get('name', ''),
+                    metric.get('value', 0),
+                    json.dumps(metric.get('labels', {})),
+                    metric.get('timestamp', ''),
+                    metric.get('metric_type', ''),
+                    metric.get('help_text', '')
+                ) for metric in test_data.raw_metrics])
+        
+            conn.commit()
+        finally:
+            conn.close()
         
-        # 插入测试结果
-        cursor.execute('''
-            INSERT INTO test_results (
-                test_name, test_type, start_time, end_time, duration, port,
-                success, error_message, metrics_file, continuous_data_file,
-                config, performance_summary
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            test_data.test_name,
-            test_data.test_type,
-            test_data.start_time,
-            test_data.end_time,
-            test_data.duration,
-            test_data.port,
-            test_data.success,
-            test_data.error_message,
-            test_data.metrics_file,
-            test_data.continuous_data_file,
-            json.dumps(test_data.config),
-            json.dumps(test_data.performance_summary)
-        ))
-        
-        test_id = cursor.lastrowid
-        
-        # 插入指标数据
-        for metric in test_data.raw_metrics:
-            cursor.execute('''
-                INSERT INTO metrics_data (
-                    test_result_id, metric_name, metric_value, metric_labels,
-                    timestamp, metric_type, help_text
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                test_id,
-                metric.get('name', ''),
-                metric.get('value', 0),
-                json.dumps(metric.get('labels', {})),
-                metric.get('timestamp', ''),
-                metric.get('metric_type', ''),
-                metric.get('help_text', '')
-            ))
-        
-        conn.commit()
-        conn.close()
-        
-        return test_id
+        return test_ids
     
     def _save_raw_data(self, test_data: TestData, timestamp: str) -> str:
         """保存原始数据到JSON文件"""
         filename = f"{test_data.test_name.lower().replace(' ', '_')}_{timestamp}.json"
-        filepath = self.raw_data_dir / filename
+        filepath = artifact_path(self.raw_data_dir / filename)
         
         # 转换为可序列化格式
         data_dict = asdict(test_data)
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data_dict, f, indent=2, ensure_ascii=False)
+        dump_json(data_dict, filepath)
         
-        return str(filepath)
+        return filepath
     
     def _save_metrics_to_csv(self, test_data: TestData, timestamp: str) -> str:
         """保存指标数据到CSV文件"""
         filename = f"{test_data.test_name.lower().replace(' ', '_')}_metrics_{timestamp}.csv"
-        filepath = self.metrics_dir / filename
+        filepath = artifact_path(self.metrics_dir / filename)
         
         if test_data.raw_metrics:
-            # 转换为DataFrame
+            # 转换为DataFrame, 写入打开的文件对象 (压缩时流式压缩)
             df = pd.DataFrame(test_data.raw_metrics)
-            df.to_csv(filepath, index=False, encoding='utf-8')
+            with open_artifact(filepath, 'w', newline='') as f:
+                df.to_csv(f, index=False)
         
-        return str(filepath)
+        return filepath
     
     def _save_performance_summary(self, test_data: TestData, timestamp: str) -> str:
         """保存性能摘要"""
@@ -246,40 +357,6 @@ class TestDataManager:
         
         return str(filepath)
     
-    def _update_data_index(self, test_data: TestData, test_id: int, 
-                          json_file: str, csv_file: str, summary_file: str):
-        """更新数据索引"""
-        index_file = self.base_dir / "data_index.json"
-        
-        # 读取现有索引
-        if index_file.exists():
-            with open(index_file, 'r', encoding='utf-8') as f:
-                index_data = json.load(f)
-        else:
-            index_data = {'tests': [], 'last_updated': ''}
-        
-        # 添加新测试记录
-        test_record = {
-            'test_id': test_id,
-            'test_name': test_data.test_name,
-            'test_type': test_data.test_type,
-            'timestamp': datetime.now().isoformat(),
-            'success': test_data.success,
-            'duration': test_data.duration,
-            'files': {
-                'json': json_file,
-                'csv': csv_file,
-                'summary': summary_file
-            }
-        }
-        
-        index_data['tests'].append(test_record)
-        index_data['last_updated'] = datetime.now().isoformat()
-        
-        # 保存索引
-        with open(index_file, 'w', encoding='utf-8') as f:
-            json.dump(index_data, f, indent=2, ensure_ascii=False)
-    
     def load_test_data(self, test_id: int) -> Optional[TestData]:
         """从数据库加载测试数据"""
         conn = sqlite3.connect(self.db_path)
@@ -326,31 +403,28 @@ class TestDataManager:
         return test_data
     
     def get_all_tests(self) -> List[Dict[str, Any]]:
-        """获取所有测试记录"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, test_name, test_type, start_time, end_time, duration, 
-                   success, port, created_at
-            FROM test_results 
-            ORDER BY created_at DESC
-        ''')
+        """获取所有测试记录 (开始时间倒序)"""
+        return self.catalog.find()
+    
+    def find_tests(self, test_type: Optional[str] = None, since: Any = None, until: Any = None,
+                   config_fingerprint: Optional[str] = None, success: Optional[bool] = None,
+                   limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        按测试类型、时间范围、配置指纹查询运行目录
         
-        results = cursor.fetchall()
-        conn.close()
+        Args:
+            test_type: 测试类型
+            since: 开始时间下限 (含)
+            until: 开始时间上限 (不含)
+            config_fingerprint: 配置指纹 (run_catalog.config_fingerprint 计算)
+            success: 只查成功或失败的运行
+            limit: 最多返回条数
+            offset: 跳过条数
         
-        return [{
-            'id': r[0],
-            'test_name': r[1],
-            'test_type': r[2],
-            'start_time': r[3],
-            'end_time': r[4],
-            'duration': r[5],
-            'success': bool(r[6]),
-            'port': r[7],
-            'created_at': r[8]
-        } for r in results]
+        Returns:
+            List[Dict[str, Any]]: 运行记录 (包含 get_all_tests 的全部字段和数据文件路径)
+        """
+        return self.catalog.find(test_type, since, until, config_fingerprint, success, limit, offset)
     
     def export_test_data(self, test_ids: List[int], format: str = 'json') -> str:
         """
@@ -358,13 +432,16 @@ class TestDataManager:
         
         Args:
             test_ids: 测试ID列表
-            format: 导出格式 ('json', 'csv', 'excel')
-            
+            format: 导出格式 ('json', 'csv', 'excel', 'parquet', 'arrow')
+        
         Returns:
-            str: 导出文件路径
+            str: 导出文件路径 (parquet/arrow 为包含 runs/metrics/continuous 三个表的目录)
         """
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
+        if format in COLUMNAR_FORMATS:
+            return self._export_columnar(test_ids, format, timestamp)
+        
         if format == 'json':
             filename = f"test_data_export_{timestamp}.json"
             filepath = self.analysis_dir / filename
@@ -411,6 +488,164 @@ class TestDataManager:
         
         return str(filepath)
     
+    def _export_columnar(self, test_ids: List[int], format: str, timestamp: str) -> str:
+        """
+        列式导出: 按列批量查询数据库, 不为每条指标构建字典
+        
+        Returns:
+            str: 导出目录
+        """
+        pa, pq, feather = _require_pyarrow()
+        schemas = _columnar_schemas(pa)
+        export_dir = self.analysis_dir / f"test_data_export_{timestamp}_{format}"
+        export_dir.mkdir(parents=True, exist_ok=True)
+        
+        ids = list(test_ids)
+        placeholders = ','.join('?' * len(ids))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, test_name, test_type, start_time, end_time, duration, port, success,
+                       error_message, metrics_file, continuous_data_file, config, performance_summary, created_at
+                FROM test_results WHERE id IN ({placeholders}) ORDER BY id
+            ''', ids)
+            runs = [row[:7] + (bool(row[7]),) + row[8:] for row in cursor.fetchall()]
+            
+            cursor.execute(f'''
+                SELECT test_result_id, metric_name, metric_value, metric_labels, timestamp, metric_type, help_text
+                FROM metrics_data WHERE test_result_id IN ({placeholders}) ORDER BY test_result_id, id
+            ''', ids)
+            metrics = cursor.fetchall()
+            
+            cursor.execute(f'''
+                SELECT test_result_id, timestamp, metric_name, labels, metric_value
+                FROM continuous_data WHERE test_result_id IN ({placeholders}) ORDER BY test_result_id, id
+            ''', ids)
+            continuous_rows = cursor.fetchall()
+            
+            # 已降采样的运行导出聚合窗口的 last 值
+            cursor.execute(f'''
+                SELECT test_result_id, bucket_start, metric_name, labels, last_value
+                FROM continuous_rollup WHERE test_result_id IN ({placeholders})
+                ORDER BY test_result_id, bucket_start
+            ''', ids)
+            continuous_rows.extend((run_id, datetime.fromtimestamp(bucket_start).isoformat(), name, labels, value)
+                                   for run_id, bucket_start, name, labels, value in cursor.fetchall())
+        finally:
+            conn.close()
+        
+        tables = {
+            'runs': self._columnar_table(pa, schemas['runs'], list(zip(*runs))),
+            'metrics': self._columnar_table(pa, schemas['metrics'], list(zip(*metrics))),
+            'continuous': self._columnar_table(pa, schemas['continuous'],
+                                               self._continuous_columns(runs, continuous_rows))
+        }
+        
+        for name, table in tables.items():
+            path = export_dir / f"{name}{COLUMNAR_FORMATS[format]}"
+            if format == 'parquet':
+                pq.write_table(table, path, compression='zstd')
+            else:
+                feather.write_feather(table, path, compression='zstd')
+        
+        return str(export_dir)
+
+    @staticmethod
+    def _columnar_table(pa, schema, columns: List[Any]):
+        """按结构把列数据转为 Arrow 表 (字典列先构建普通数组再编码)"""
+        if not columns:
+            return schema.empty_table()
+        arrays = []
+        for field, values in zip(schema, columns):
+            if pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, type=field.type.value_type).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def _continuous_columns(self, runs: List[tuple], continuous_rows: List[tuple]) -> List[list]:
+        """
+        汇总持续时间序列: 数据库中的持续数据加上各测试的持续指标文件 (变化编码的文件逐点重建)
+        
+        Returns:
+            List[list]: test_id, timestamp, name, labels, value 五列, 无数据时为空列表
+        """
+        from archive_filter import iter_continuous_points
+        
+        test_ids, timestamps, names, labels, values = [], [], [], [], []
+        
+        def append(test_id, timestamp, name, label_text, value):
+            try:
+                ts = datetime.fromisoformat(timestamp)
+                value = float(value)
+            except (TypeError, ValueError):
+                return
+            test_ids.append(test_id)
+            timestamps.append(ts)
+            names.append(name)
+            labels.append(label_text)
+            values.append(value)
+        
+        def append_point(test_id, point):
+            timestamp = point.get('timestamp')
+            for metric in point.get('metrics', []):
+                append(test_id, timestamp, metric.get('name', ''),
+                       json.dumps(metric.get('labels', {}), sort_keys=True, ensure_ascii=False),
+                       metric.get('value'))
+        
+        for test_id, timestamp, name, label_text, value in continuous_rows:
+            append(test_id, timestamp, name, label_text or '{}', value)
+        
+        for run in runs:
+            test_id, continuous_file = run[0], run[10]
+            if not continuous_file or not os.path.exists(continuous_file):
+                continue
+            for point in iter_continuous_points(continuous_file):
+                append_point(test_id, point)
+        
+        if not test_ids:
+            return []
+        return [test_ids, timestamps, names, labels, values]
+
+    def import_columnar(self, paths: Any, as_pandas: bool = True) -> Dict[str, Any]:
+        """
+        导入一个或多个列式导出 (parquet/arrow 目录), 同名表按行合并
+        
+        Args:
+            paths: 导出目录, 目录列表, 或包含多个 test_data_export_* 导出的上级目录
+            as_pandas: True 返回 DataFrame, False 返回 pyarrow.Table
+        
+        Returns:
+            Dict[str, Any]: {'runs': ..., 'metrics': ..., 'continuous': ...}
+        """
+        pa, pq, feather = _require_pyarrow()
+        schemas = _columnar_schemas(pa)
+        
+        export_dirs = []
+        for path in ([paths] if isinstance(paths, (str, Path)) else paths):
+            path = Path(path)
+            if any((path / f"runs{ext}").exists() for ext in COLUMNAR_FORMATS.values()):
+                export_dirs.append(path)
+            elif path.is_dir():
+                export_dirs.extend(sorted(p for p in path.glob("test_data_export_*") if p.is_dir()))
+        
+        tables: Dict[str, List[Any]] = {name: [] for name in COLUMNAR_TABLES}
+        for export_dir in export_dirs:
+            for name in COLUMNAR_TABLES:
+                parquet_file = export_dir / f"{name}.parquet"
+                arrow_file = export_dir / f"{name}.arrow"
+                if parquet_file.exists():
+                    tables[name].append(pq.read_table(parquet_file))
+                elif arrow_file.exists():
+                    tables[name].append(feather.read_table(arrow_file))
+        
+        result = {}
+        for name in COLUMNAR_TABLES:
+            table = pa.concat_tables(tables[name]) if tables[name] else schemas[name].empty_table()
+            result[name] = table.to_pandas() if as_pandas else table
+        return result
+
     def generate_data_report(self, report_dir: str = None) -> str:
         """生成数据报告"""
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -483,7 +718,7 @@ class TestDataManager:
 1. **JSON文件**: 包含完整的测试数据，适合程序化处理
 2. **CSV文件**: 包含指标数据，适合Excel分析
 3. **数据库**: 支持复杂查询和数据分析
-4. **索引文件**: `{self.base_dir}/data_index.json` 包含所有测试的索引信息
+4. **运行目录**: 数据库中的 `run_catalog` 表, 可按测试类型、时间范围、配置指纹查询
 
 ## 后续开发建议
 
@@ -498,23 +733,50 @@ class TestDataManager:
         
         return str(report_file)
     
-    def cleanup_old_data(self, days: int = 30):
-        """清理旧数据"""
-        import time
-        cutoff_time = time.time() - (days * 24 * 60 * 60)
-        
-        # 清理文件
-        for dir_path in [self.raw_data_dir, self.metrics_dir, self.analysis_dir]:
-            for file_path in dir_path.iterdir():
-                if file_path.is_file() and file_path.stat().st_mtime < cutoff_time:
-                    file_path.unlink()
-        
-        # 清理数据库
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM test_results WHERE created_at < ?', 
-                      (datetime.fromtimestamp(cutoff_time).isoformat(),))
-        conn.commit()
-        conn.close()
+    def cleanup_old_data(self, days: int = 30, policy: Optional[RetentionPolicy] = None) -> RetentionReport:
+        """
+        按保留策略清理旧数据: 超过 days 天的运行降为 10秒/1分钟 聚合而不是直接删除,
+        超过最长保留期的运行连同关联数据一起删除, 并增量回收数据库空间
+        
+        Args:
+            days: 保留完整分辨率的天数
+            policy: 完整的保留策略, 设置后忽略 days
         
-        print(f"已清理 {days} 天前的数据")
+        Returns:
+            RetentionReport: 执行结果
+        """
+        policy = policy or RetentionPolicy(full_resolution_days=days)
+        report = RetentionEngine(self.db_path, self.base_dir, policy).apply()
+        
+        print(f"已按保留策略处理 {policy.full_resolution_days} 天前的数据:")
+        for line in format_report(report):
+            print(f"  {line}")
+        return report
+    
+    def load_rollup(self, test_id: int, resolution: Optional[int] = None) -> pd.DataFrame:
+        """
+        读取已降采样运行的聚合数据
+        
+        Args:
+            test_id: 测试ID
+            resolution: 聚合分辨率 (10 或 60 秒), 默认全部
+        
+        Returns:
+            pd.DataFrame: timestamp, resolution, metric_name, labels, min, max, avg, last, count
+        """
+        query = ('SELECT bucket_start, resolution, metric_name, labels, min_value, max_value, avg_value, '
+                 'last_value, sample_count FROM continuous_rollup WHERE test_result_id = ?')
+        params: List[Any] = [test_id]
+        if resolution is not None:
+            query += ' AND resolution = ?'
+            params.append(resolution)
+        query += ' ORDER BY bucket_start, metric_name'
+        
+        conn = sqlite3.connect(self.db_path)
+        try:
+            df = pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+        df.columns = ['timestamp', 'resolution', 'metric_name', 'labels', 'min', 'max', 'avg', 'last', 'count']
+        df['timestamp'] = pd.to_datetime([datetime.fromtimestamp(ts) for ts in df['timestamp']])
+        return df
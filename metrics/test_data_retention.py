@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Data Retention Test Script
+Test that old runs are rolled up to 10 s and then 60 s aggregates with
+correct values, that expired runs leave no orphan rows, and that data
+files are only deleted after the roll-up has been committed
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from data_retention import (LEVEL_10S, LEVEL_1M, RetentionEngine, RetentionPolicy, merge_rollup_rows,
+                            rollup_samples)
+from test_data_manager import TestData, TestDataManager
+
+# Run start, aligned to a whole minute so 10 s and 60 s buckets start at offset 0
+START = datetime(2025, 6, 1, 12, 0, 0)
+DAY = 24 * 60 * 60
+# connect_succ is sampled every 3 s with value == offset: 0..27 and 60..69
+OFFSETS = list(range(0, 30, 3)) + list(range(60, 70, 3))
+CHILD_TABLES = ('metrics_data', 'continuous_data', 'continuous_rollup', 'run_retention', 'run_catalog')
+
+
+def test_rollup_helpers():
+    """rollup_samples and merge_rollup_rows on hand-computed buckets"""
+    print("Testing rollup helpers...")
+    samples = [(100.0 + offset, 'recv', '{}', float(offset)) for offset in (0, 3, 6, 9, 12, 15)]
+    samples.append((101.0, 'recv', '{}', 50.0))  # out of order: not the last value of its bucket
+    buckets = rollup_samples(samples, 10)
+    # bucket 100: 0, 50, 3, 6, 9 -> min 0, max 50, sum 68, count 5, last 9 (at ts 109)
+    assert buckets[(100, 'recv', '{}')] == [0.0, 50.0, 68.0, 5, 9.0, 109.0]
+    assert buckets[(110, 'recv', '{}')] == [12.0, 15.0, 27.0, 2, 15.0, 115.0]
+
+    rows = [(0, 'recv', '{}', 0.0, 9.0, 4.5, 9.0, 4), (10, 'recv', '{}', 12.0, 18.0, 15.0, 18.0, 3),
+            (70, 'recv', '{}', 70.0, 70.0, 70.0, 70.0, 1)]
+    merged = merge_rollup_rows(reversed(rows), 60)
+    assert merged[(0, 'recv', '{}')] == [0.0, 18.0, 63.0, 7, 18.0, 10]
+    assert merged[(60, 'recv', '{}')] == [70.0, 70.0, 70.0, 1, 70.0, 70]
+    print("  ✅ Buckets aggregate correctly")
+
+
+def save_run(manager, base_dir):
+    """Save a run with a continuous metrics file, returns (test_id, files)"""
+    continuous_file = os.path.join(base_dir, 'continuous_metrics_connection_test.json')
+    points = [{
+        'timestamp': (START + timedelta(seconds=offset)).isoformat(),
+        'test_name': 'Connection Test',
+        'metrics': [{'name': 'connect_succ', 'value': offset, 'labels': {}}]
+    } for offset in OFFSETS]
+    with open(continuous_file, 'w', encoding='utf-8') as f:
+        json.dump(points, f)
+
+    test_data = TestData(
+        test_name='Connection Test', test_type='connection', start_time=START.isoformat(),
+        end_time=(START + timedelta(seconds=70)).isoformat(), duration=70.0, port=9090, success=True,
+        error_message=None, metrics_file=None, continuous_data_file=continuous_file, config={},
+        raw_metrics=[{'name': 'connect_succ', 'value': 69, 'labels': {}}], performance_summary={}
+    )
+    manager.save_test_data(test_data)
+    test_id = manager.get_all_tests()[0]['test_id']
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        files = manager.catalog.files(conn)[test_id]
+    finally:
+        conn.close()
+    return test_id, files
+
+
+def rollup_rows(db_path, resolution):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {row[0]: row[1:] for row in conn.execute(
+            'SELECT bucket_start - ?, min_value, max_value, avg_value, last_value, sample_count '
+            'FROM continuous_rollup WHERE resolution = ? ORDER BY bucket_start',
+            (int(START.timestamp()), resolution))}
+    finally:
+        conn.close()
+
+
+def count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_rollup_and_expiry():
+    """Full resolution -> 10 s -> 60 s -> deleted, with no orphans"""
+    print("Testing roll-up and expiry...")
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = TestDataManager(base_dir)
+        test_id, files = save_run(manager, base_dir)
+        engine = RetentionEngine(manager.db_path, manager.base_dir, RetentionPolicy(vacuum_pages=None))
+        start = START.timestamp()
+
+        # Younger than full_resolution_days: untouched
+        report = engine.apply(now=start + 3 * DAY)
+        assert not report.rolled_up_10s and not report.deleted_runs
+        assert os.path.exists(files['continuous']) and os.path.exists(files['json'])
+
+        # Older than 7 days: 10 s roll-up, full-resolution files removed, summary kept
+        report = engine.apply(now=start + 10 * DAY)
+        assert report.rolled_up_10s == [test_id] and not report.errors
+        assert rollup_rows(manager.db_path, LEVEL_10S) == {
+            0: (0.0, 9.0, 4.5, 9.0, 4),
+            10: (12.0, 18.0, 15.0, 18.0, 3),
+            20: (21.0, 27.0, 24.0, 27.0, 3),
+            60: (60.0, 69.0, 64.5, 69.0, 4),
+        }
+        for key in ('continuous', 'json', 'csv'):
+            assert not os.path.exists(files[key]), "{} file should be removed".format(key)
+        assert os.path.exists(files['summary'])
+
+        # Older than 90 days: merged into 60 s buckets, 10 s rows dropped
+        report = engine.apply(now=start + 100 * DAY)
+        assert report.rolled_up_1m == [test_id] and not report.errors
+        assert rollup_rows(manager.db_path, LEVEL_10S) == {}
+        assert rollup_rows(manager.db_path, LEVEL_1M) == {
+            0: (0.0, 27.0, 13.5, 27.0, 10),
+            60: (60.0, 69.0, 64.5, 69.0, 4),
+        }
+        assert manager.load_rollup(test_id)['resolution'].unique().tolist() == [LEVEL_1M]
+
+        # Older than 365 days: the run and every child row are deleted
+        report = engine.apply(now=start + 400 * DAY)
+        assert report.deleted_runs == [test_id]
+        for table in ('test_results',) + CHILD_TABLES:
+            assert count_rows(manager.db_path, table) == 0, "orphan rows left in {}".format(table)
+        assert not os.path.exists(files['summary'])
+        assert manager.get_all_tests() == []
+    print("  ✅ Runs roll up to 10 s, 60 s and are then deleted cleanly")
+
+
+def test_files_deleted_after_commit():
+    """A failing roll-up keeps the files; files are removed only once the roll-up is committed"""
+    print("Testing file deletion order...")
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = TestDataManager(base_dir)
+        test_id, files = save_run(manager, base_dir)
+        start = START.timestamp()
+
+        # The roll-up fails inside the transaction: nothing committed, nothing deleted
+        engine = RetentionEngine(manager.db_path, manager.base_dir)
+
+        def failing_set_level(conn, run_id, level):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        engine._set_level = failing_set_level
+        report = engine.apply(now=start + 100 * DAY)
+        assert [run_id for run_id, _ in report.errors] == [test_id]
+        assert not report.rolled_up_10s and not report.rolled_up_1m
+        assert count_rows(manager.db_path, 'continuous_rollup') == 0
+        for key in ('continuous', 'json', 'csv'):
+            assert os.path.exists(files[key]), "{} file deleted after a failed roll-up".format(key)
+
+        # When files are removed, the roll-up is already visible to other connections
+        engine = RetentionEngine(manager.db_path, manager.base_dir)
+        remove_files = engine._remove_full_resolution_files
+        committed = []
+
+        def checking_remove(continuous_file, run_files, report):
+            committed.append((count_rows(manager.db_path, 'continuous_rollup'),
+                              count_rows(manager.db_path, 'run_retention')))
+            remove_files(continuous_file, run_files, report)
+
+        engine._remove_full_resolution_files = checking_remove
+        report = engine.apply(now=start + 100 * DAY)
+        assert not report.errors and report.rolled_up_1m == [test_id]
+        assert committed and committed[0][0] == 2 and committed[0][1] == 1
+        assert not os.path.exists(files['continuous'])
+    print("  ✅ Files are only deleted after the commit")
+
+
+if __name__ == "__main__":
+    test_rollup_helpers()
+    test_rollup_and_expiry()
+    test_files_deleted_after_commit()
+    print("\n✅ Data retention tests passed!")
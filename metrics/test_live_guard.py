@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Live Guard Test Script
+Test that each guard rule fires on its trigger, that idle counters and
+the grace period never end a test, and how actions are applied
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from live_guard import (ACTION_ABORT, ACTION_SKIP, ACTION_WARN, RULE_ERROR_RATE, RULE_NO_RECV, RULE_OVERRUN,
+                        RULE_STALLED, LiveGuard)
+
+
+def run(guard, counters_at, seconds=120):
+    """Feed one sample per second; counters_at(t) returns {name: value}"""
+    for t in range(seconds + 1):
+        guard.observe(float(t), [{'name': name, 'value': value, 'labels': {}}
+                                 for name, value in counters_at(t).items()])
+    return guard
+
+
+def rules(guard):
+    return [violation.rule for violation in guard.violations]
+
+
+def test_error_rate():
+    """Failures above the ratio fire; too few failures in the window do not"""
+    print("Testing error_rate...")
+    guard = run(LiveGuard(), lambda t: {'connect_succ': 100, 'connect_fail': 10 * t})
+    assert rules(guard) == [RULE_ERROR_RATE] and guard.violations[0].elapsed == 10
+    assert '连接失败比例' in guard.reason
+
+    # Two failures per 5 s window: below min_errors
+    guard = run(LiveGuard(), lambda t: {'connect_succ': 0, 'connect_fail': t // 2.5})
+    assert rules(guard) == []
+    # Many failures but even more successes: ratio below the limit
+    guard = run(LiveGuard(), lambda t: {'pub': 1000 * t, 'pub_fail': 100 * t})
+    assert rules(guard) == []
+    print("  ✅ error_rate fires only above the ratio")
+
+
+def test_overrun():
+    """pub_overrun growing faster than the ratio allows fires"""
+    print("Testing pub_overrun...")
+    guard = run(LiveGuard(), lambda t: {'pub': 100 * t, 'pub_overrun': 50 * t})
+    assert rules(guard) == [RULE_OVERRUN]
+    guard = run(LiveGuard(), lambda t: {'pub': 100 * t, 'pub_overrun': 5 * t})
+    assert rules(guard) == []
+    print("  ✅ pub_overrun fires above the ratio")
+
+
+def test_stalled():
+    """A message counter that stops growing fires after stall_seconds"""
+    print("Testing stalled...")
+    guard = run(LiveGuard(), lambda t: {'pub': 100 * min(t, 12)})
+    assert rules(guard) == [RULE_STALLED]
+    assert guard.violations[0].elapsed == 12 + 15
+
+    # Counters stuck at 0 never started, so they are not stalled
+    guard = run(LiveGuard(), lambda t: {'connect_succ': 100, 'pub': 0, 'recv': 0})
+    assert rules(guard) == []
+    # A connection-only test without message counters
+    guard = run(LiveGuard(), lambda t: {'connect_succ': min(10 * t, 500)})
+    assert rules(guard) == []
+    print("  ✅ stalled fires only on counters that were growing")
+
+
+def test_no_recv():
+    """A test that expects messages fires when none arrive within recv_timeout"""
+    print("Testing no_recv...")
+    guard = run(LiveGuard(expect_recv=True), lambda t: {'sub': 10, 'recv': 0})
+    assert rules(guard) == [RULE_NO_RECV] and guard.violations[0].elapsed == 30
+    guard = run(LiveGuard(expect_recv=True), lambda t: {'sub': 10, 'recv': 5 * t})
+    assert rules(guard) == []
+    guard = run(LiveGuard(expect_recv=False), lambda t: {'sub': 10, 'recv': 0})
+    assert rules(guard) == []
+    print("  ✅ no_recv fires only when messages are expected")
+
+
+def test_grace_period():
+    """Nothing fires within grace_period, even with every trigger present"""
+    print("Testing grace period...")
+
+    def everything_wrong(t):
+        return {'connect_succ': 0, 'connect_fail': 50 * t, 'pub': 100, 'pub_overrun': 100 * t, 'recv': 0}
+
+    guard = run(LiveGuard(grace_period=60, expect_recv=True, action=ACTION_WARN), everything_wrong, seconds=59)
+    assert rules(guard) == []
+    guard.observe(60.0, [{'name': name, 'value': value} for name, value in everything_wrong(60).items()])
+    assert set(rules(guard)) == {RULE_ERROR_RATE, RULE_OVERRUN, RULE_STALLED, RULE_NO_RECV}
+    assert all(violation.elapsed == 60 for violation in guard.violations)
+    print("  ✅ Grace period holds")
+
+
+def test_actions():
+    """skip/abort stop after the first rule; warn keeps checking and never stops"""
+    print("Testing actions...")
+
+    def failing(t):
+        return {'connect_succ': 0, 'connect_fail': 50 * t, 'pub': 100 * min(t, 12)}
+
+    guard = run(LiveGuard(action=ACTION_SKIP), failing)
+    assert rules(guard) == [RULE_ERROR_RATE] and guard.should_stop
+    assert [violation.rule for violation in guard.pop_new()] == [RULE_ERROR_RATE] and guard.pop_new() == []
+    assert run(LiveGuard(action=ACTION_ABORT), failing).should_stop
+
+    guard = run(LiveGuard(action=ACTION_WARN), failing)
+    assert rules(guard) == [RULE_ERROR_RATE, RULE_STALLED]  # each rule recorded once
+    assert guard.tripped and not guard.should_stop
+
+    try:
+        LiveGuard(action='ignore')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown guard_action must be rejected")
+    print("  ✅ Actions applied")
+
+
+if __name__ == "__main__":
+    test_error_rate()
+    test_overrun()
+    test_stalled()
+    test_no_recv()
+    test_grace_period()
+    test_actions()
+    print("\n✅ Live guard tests passed!")
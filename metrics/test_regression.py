@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regression Detection Test Script
+Test the Mann-Whitney U test, the bootstrap interval, the per-metric
+comparison and the exit codes the nightly job gates on
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import math
+from pathlib import Path
+from statistics import NormalDist
+
+import numpy as np
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from regression import (EXIT_NO_DATA, EXIT_OK, EXIT_REGRESSION, STATUS_IMPROVED, STATUS_INSUFFICIENT,
+                        STATUS_OK, STATUS_REGRESSION, MetricComparison, RegressionEngine, RegressionReport,
+                        RunRegression, bootstrap_ci, mann_whitney_u)
+
+
+def close(a, b, tol=1e-9):
+    return abs(a - b) <= tol
+
+
+def make_engine(**kwargs):
+    """compare() does not touch the data manager"""
+    kwargs.setdefault('resamples', 500)
+    return RegressionEngine(None, **kwargs)
+
+
+def flat_baseline(center, runs=5):
+    """Baseline runs whose medians are exactly center, samples spread +-50%"""
+    return [np.linspace(center * 0.5, center * 1.5, 31) for _ in range(runs)]
+
+
+def noisy_baseline(center, runs=5, seed=1):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(center, center * 0.01, 30) for _ in range(runs)]
+
+
+def test_mann_whitney_u():
+    """U and p against hand-computed values"""
+    print("Testing Mann-Whitney U...")
+    # x entirely below y: U = 0, mu = 4.5, sigma = sqrt(3*3/12 * 7)
+    sigma = math.sqrt(9 / 12 * 7)
+    u, p = mann_whitney_u([1, 2, 3], [4, 5, 6], 'less')
+    assert u == 0.0
+    assert close(p, NormalDist().cdf((0 - 4.5 + 0.5) / sigma)) and close(p, 0.040427799185, 1e-9)
+    u, p = mann_whitney_u([1, 2, 3], [4, 5, 6], 'greater')
+    assert close(p, 1 - NormalDist().cdf((0 - 4.5 - 0.5) / sigma)) and close(p, 0.985451834129, 1e-9)
+    # Swapping the samples mirrors U and the tail
+    u, p = mann_whitney_u([4, 5, 6], [1, 2, 3], 'greater')
+    assert u == 9.0 and close(p, 0.040427799185, 1e-9)
+
+    # Ties: 2.5 pairs with x > y, tie correction (3^3-3 + 2^3-2) / (8*7)
+    u, p = mann_whitney_u([1, 2, 2, 3], [2, 3, 4, 5])
+    assert u == 2.5
+    sigma = math.sqrt(16 / 12 * (9 - 30 / 56))
+    assert close(p, 2 * (1 - NormalDist().cdf((abs(2.5 - 8) - 0.5) / sigma)))
+    assert close(p, 0.136658247738, 1e-9)
+
+    # Degenerate inputs
+    u, p = mann_whitney_u([], [1, 2])
+    assert math.isnan(u) and p == 1.0
+    assert mann_whitney_u([3, 3], [3, 3]) == (2.0, 1.0)
+    print("  ✅ U and p values match")
+
+
+def test_bootstrap_ci():
+    """Bootstrap interval of the median"""
+    print("Testing bootstrap interval...")
+    assert bootstrap_ci([5, 5, 5]) == (5.0, 5.0)
+    low, high = bootstrap_ci([])
+    assert math.isnan(low) and math.isnan(high)
+    values = [98, 99, 100, 101, 102, 103, 97]
+    low, high = bootstrap_ci(values)
+    assert low <= np.median(values) <= high and low >= min(values) and high <= max(values)
+    assert bootstrap_ci(values) == (low, high), "seeded interval must be reproducible"
+    print("  ✅ Interval brackets the median")
+
+
+def test_compare_status():
+    """Regression, improvement and insufficient baselines"""
+    print("Testing compare() status...")
+    engine = make_engine()
+    baseline = noisy_baseline(1000)
+
+    result = engine.compare('throughput', np.full(30, 800.0), baseline)
+    assert result.status == STATUS_REGRESSION and result.change_pct < -15 and result.p_value < 0.05
+    assert result.baseline_runs == 5 and result.ci_low <= result.baseline <= result.ci_high
+
+    result = engine.compare('throughput', np.full(30, 1200.0), baseline)
+    assert result.status == STATUS_IMPROVED and result.change_pct > 15 and result.p_value < 0.05
+
+    result = engine.compare('throughput', np.random.default_rng(9).normal(1000, 10, 30), baseline)
+    assert result.status == STATUS_OK
+
+    # Latency: lower is better, so a higher value is a regression with a negative change
+    latency = noisy_baseline(20)
+    result = engine.compare('latency', np.full(30, 30.0), latency)
+    assert result.status == STATUS_REGRESSION and result.change_pct < 0
+    result = engine.compare('latency', np.full(30, 10.0), latency)
+    assert result.status == STATUS_IMPROVED and result.change_pct > 0
+
+    # Too few comparable runs; runs without samples do not count
+    result = engine.compare('throughput', np.full(30, 500.0), baseline[:2] + [np.array([])])
+    assert result.status == STATUS_INSUFFICIENT and result.baseline_runs == 2
+    assert make_engine(min_runs=2).compare('throughput', np.full(30, 500.0), baseline[:2]).status == STATUS_REGRESSION
+
+    # No current samples
+    assert engine.compare('throughput', np.array([]), baseline) is None
+    print("  ✅ Status follows the direction of the change")
+
+
+def test_compare_threshold_alpha_testable():
+    """The threshold, alpha and testable branches"""
+    print("Testing threshold / alpha / testable branches...")
+    baseline = noisy_baseline(1000)
+    current = np.full(30, 980.0)  # 2% worse, well outside the tight interval
+    assert make_engine(threshold=0.05).compare('throughput', current, baseline).status == STATUS_OK
+    assert make_engine(threshold=0.01).compare('throughput', current, baseline).status == STATUS_REGRESSION
+
+    # Run medians are exactly 1000 but samples spread widely: 10% worse, not significant
+    baseline = flat_baseline(1000)
+    current = np.array([880.0, 900.0, 920.0])
+    result = make_engine(alpha=0.05).compare('throughput', current, baseline)
+    assert result.status == STATUS_OK and result.p_value > 0.05 and result.current < result.ci_low
+    assert make_engine(alpha=0.5).compare('throughput', current, baseline).status == STATUS_REGRESSION
+
+    # A single current sample (summary only) cannot be tested; interval and threshold decide
+    result = make_engine(alpha=1e-9).compare('throughput', np.array([900.0]), baseline)
+    assert result.status == STATUS_REGRESSION
+    result = make_engine(alpha=1e-9).compare('throughput', np.array([1100.0]), baseline)
+    assert result.status == STATUS_IMPROVED
+
+    # Zero baseline: the relative change is undefined, never a verdict
+    result = make_engine().compare('throughput', np.full(30, 5.0), [np.zeros(10)] * 5)
+    assert result.status == STATUS_OK and math.isnan(result.change_pct)
+    print("  ✅ Each branch gates the verdict")
+
+
+def test_exit_codes():
+    """RegressionReport.exit_code for no data, clean and regressed runs"""
+    print("Testing exit codes...")
+    assert RegressionReport().exit_code == EXIT_NO_DATA
+
+    clean = RunRegression(1, 'Connection Test', '2025-10-19T10:00:00', 'abc',
+                          comparisons=[MetricComparison('throughput', STATUS_OK, 1000.0),
+                                       MetricComparison('latency', STATUS_IMPROVED, 10.0),
+                                       MetricComparison('latency', STATUS_INSUFFICIENT, 10.0)])
+    no_samples = RunRegression(2, 'Publish Test', '2025-10-19T10:05:00', 'def')
+    assert RegressionReport([clean, no_samples]).exit_code == EXIT_OK
+
+    regressed = RunRegression(3, 'Publish Test', '2025-10-19T10:10:00', 'def',
+                              comparisons=[MetricComparison('throughput', STATUS_REGRESSION, 500.0)])
+    report = RegressionReport([clean, regressed])
+    assert report.exit_code == EXIT_REGRESSION
+    assert [(run.test_id, item.metric) for run, item in report.regressions] == [(3, 'throughput')]
+    print("  ✅ Exit codes match")
+
+
+if __name__ == "__main__":
+    test_mann_whitney_u()
+    test_bootstrap_ci()
+    test_compare_status()
+    test_compare_threshold_alpha_testable()
+    test_exit_codes()
+    print("\n✅ Regression detection tests passed!")
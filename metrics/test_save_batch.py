@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Save Test Script
+Test that tests saved in one batch get their own data files and that
+the persistence fallback never inserts a test twice
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from test_data_manager import TestData, TestDataManager
+from persistence_service import PersistenceService
+
+
+def make_test_data(test_name, value):
+    """Build a minimal TestData with one metric"""
+    return TestData(
+        test_name=test_name, test_type=test_name.lower(), start_time="2025-10-19T10:00:00",
+        end_time="2025-10-19T10:01:00", duration=60.0, port=9090, success=True,
+        error_message=None, metrics_file=None, continuous_data_file=None, config={},
+        raw_metrics=[{'name': 'connect_succ', 'value': value, 'labels': {}}],
+        performance_summary={'total_metrics': 1}
+    )
+
+
+def count_rows(manager):
+    conn = sqlite3.connect(manager.db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM test_results").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_same_name_batch():
+    """Two tests with the same name in one batch must not share a file"""
+    print("Testing same-name tests in one batch...")
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = TestDataManager(base_dir)
+        paths = manager.save_test_data_batch([make_test_data("Connection Test", 1),
+                                              make_test_data("Connection Test", 2)])
+
+        assert len(set(paths)) == 2, "raw data files collide: {}".format(paths)
+        assert all(os.path.exists(path) for path in paths)
+        for folder in (manager.metrics_dir, manager.analysis_dir):
+            assert len(os.listdir(folder)) == 2, "files collide in {}".format(folder)
+
+        # Each catalog row points at its own file
+        runs = manager.get_all_tests()
+        assert len({run['json_file'] for run in runs}) == 2
+    print("  ✅ Each test has its own files")
+
+
+def test_file_retry_no_duplicate_rows():
+    """A file-writing failure after the database commit must not insert the tests again"""
+    print("Testing persistence retry after a file-writing failure...")
+    with tempfile.TemporaryDirectory() as base_dir:
+        manager = TestDataManager(base_dir)
+        save_test_files = manager.save_test_files
+        calls = []
+
+        def flaky_save_test_files(tests, test_ids, timestamp=None):
+            calls.append(list(test_ids))
+            if len(calls) == 1:
+                raise OSError("disk full")
+            return save_test_files(tests, test_ids, timestamp)
+
+        manager.save_test_files = flaky_save_test_files
+        service = PersistenceService(manager, batch_wait=0.2)
+        service.submit(make_test_data("Publish Test", 1))
+        service.submit(make_test_data("Publish Test", 2))
+        assert service.close(timeout=10)
+
+        assert count_rows(manager) == 2, "duplicate rows: {}".format(count_rows(manager))
+        assert service.stats.saved == 2 and service.stats.failed == 0
+        assert len(set(service.saved_files)) == 2
+        # The retry reused the ids from the first attempt
+        assert sorted(sum(calls[1:], [])) == sorted(calls[0])
+    print("  ✅ Retry only rewrote the files")
+
+
+if __name__ == "__main__":
+    test_same_name_batch()
+    test_file_retry_no_duplicate_rows()
+    print("\n✅ Batch save tests passed!")
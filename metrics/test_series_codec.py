@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Change-Only Encoding Test Script
+Test the keyframe interval, removed series, history eviction into the
+reconstruction base and that saved continuous files start with a keyframe
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import json
+import tempfile
+import threading
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from series_codec import (FRAME_DELTA, FRAME_KEY, ChangeOnlyDecoder, ChangeOnlyEncoder, is_change_only,
+                          iter_frames, series_key)
+from continuous_metrics_collector import ContinuousMetricsCollector
+
+# Scripted samples: series key -> value; a missing key means the series disappeared
+SAMPLES = [
+    {'recv': 0, 'pub': 0, 'conn{state="up"}': 1},
+    {'recv': 1, 'pub': 0, 'conn{state="up"}': 1},
+    {'recv': 2, 'pub': 0},
+    {'recv': 3, 'pub': 0, 'conn{state="up"}': 5},
+    {'recv': 3, 'pub': 1, 'conn{state="up"}': 5},
+    {'recv': 4, 'pub': 1, 'conn{state="up"}': 5},
+    {'recv': 4, 'pub': 1},
+    {'recv': 5, 'pub': 2},
+]
+KEYFRAME_INTERVAL = 4
+MAX_HISTORY = 5
+
+
+def to_metrics(sample):
+    metrics = []
+    for key, value in sample.items():
+        name, _, labels = key.partition('{')
+        metrics.append({'name': name, 'value': float(value),
+                        'labels': dict(item.replace('"', '').split('=') for item in labels.rstrip('}').split(','))
+                        if labels else {}})
+    return metrics
+
+
+def values_of(metrics):
+    return {series_key(metric): metric['value'] for metric in metrics}
+
+
+def test_encoder_frames():
+    """Keyframes every KEYFRAME_INTERVAL points, deltas carry only changes and removals"""
+    print("Testing encoder frames...")
+    encoder = ChangeOnlyEncoder(KEYFRAME_INTERVAL)
+    frames = [encoder.encode(to_metrics(sample)) for sample in SAMPLES]
+    assert [frame for frame, _, _ in frames] == [FRAME_KEY, FRAME_DELTA, FRAME_DELTA, FRAME_DELTA,
+                                                  FRAME_KEY, FRAME_DELTA, FRAME_DELTA, FRAME_DELTA]
+    assert values_of(frames[0][1]) == SAMPLES[0]
+    assert values_of(frames[1][1]) == {'recv': 1} and frames[1][2] == []
+    assert values_of(frames[2][1]) == {'recv': 2} and frames[2][2] == ['conn{state="up"}']
+    # A series that comes back is sent again even if its value is unchanged elsewhere
+    assert values_of(frames[3][1]) == {'recv': 3, 'conn{state="up"}': 5}
+    assert values_of(frames[4][1]) == SAMPLES[4]
+    assert values_of(frames[7][1]) == {'recv': 5, 'pub': 2} and frames[7][2] == []
+
+    encoder.reset()
+    assert encoder.encode(to_metrics(SAMPLES[0]))[0] == FRAME_KEY
+    print("  ✅ Frames follow the keyframe interval")
+
+
+def test_round_trip():
+    """Decoding the encoded points reproduces every sample"""
+    print("Testing encode/decode round trip...")
+    encoder = ChangeOnlyEncoder(KEYFRAME_INTERVAL)
+    points = [encoder.encode_point({'timestamp': str(i), 'metrics': to_metrics(sample)})
+              for i, sample in enumerate(SAMPLES)]
+    assert is_change_only(points) and 'removed' in points[2] and 'removed' not in points[1]
+    decoded = list(iter_frames(points))
+    assert [values_of(point['metrics']) for point in decoded] == SAMPLES
+    assert all('frame' not in point and 'removed' not in point for point in decoded)
+
+    # Decoding from a copied state continues from where it left off
+    decoder = ChangeOnlyDecoder()
+    for point in points[:5]:
+        decoder.apply(point)
+    copy = decoder.copy()
+    assert values_of(copy.decode(points[5])['metrics']) == SAMPLES[5]
+    assert values_of(decoder.current_metrics()) == SAMPLES[4]
+
+    # Points without frames pass through unchanged
+    plain = {'timestamp': '0', 'metrics': to_metrics(SAMPLES[0])}
+    assert ChangeOnlyDecoder().decode(plain) is plain and not is_change_only([plain])
+    print("  ✅ All samples round-trip")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Serves the scripted samples, then stops the collector after the last one"""
+
+    def __init__(self, collector):
+        self.collector = collector
+        self.index = 0
+        self.done = threading.Event()
+
+    def get(self, url):
+        sample = SAMPLES[self.index]
+        self.index += 1
+        if self.index == len(SAMPLES):
+            self.collector.running = False
+            self.done.set()
+        return FakeResponse('\n'.join(f"{key} {value}" for key, value in sample.items()) + '\n')
+
+
+def test_collector_history_and_save():
+    """History eviction folds into _history_base and the saved file starts with a keyframe"""
+    print("Testing collector history and saved file...")
+    collector = ContinuousMetricsCollector(change_only=True, keyframe_interval=KEYFRAME_INTERVAL)
+    collector.max_history_points = MAX_HISTORY
+    session = collector.session = FakeSession(collector)
+    test_name = 'Codec Test'
+    assert collector.start_collection(test_name, 9090, interval=0.01)
+    assert session.done.wait(10), "collector did not consume the scripted samples"
+    collector.stop_collection(test_name)
+
+    # The deque keeps the last MAX_HISTORY points; the oldest kept point is a delta frame
+    history = list(collector.metrics_history[test_name])
+    kept = SAMPLES[-MAX_HISTORY:]
+    assert len(history) == MAX_HISTORY and history[0].frame == FRAME_DELTA
+    # Evicted points were folded into the base state
+    base = collector._history_base[test_name]
+    assert values_of(base.current_metrics()) == SAMPLES[len(SAMPLES) - MAX_HISTORY - 1]
+
+    full = collector.get_test_history(test_name)
+    assert [values_of(point.metrics) for point in full] == kept
+    assert all(point.frame is None for point in full)
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        path = collector.save_test_data(test_name, output_dir)
+        with open(path, 'r', encoding='utf-8') as f:
+            points = json.load(f)
+        assert points[0]['frame'] == FRAME_KEY and values_of(points[0]['metrics']) == kept[0]
+        assert [point['frame'] for point in points[1:]] == [FRAME_KEY, FRAME_DELTA, FRAME_DELTA, FRAME_DELTA]
+        assert [values_of(point['metrics']) for point in iter_frames(points)] == kept
+    # Saving does not mutate the in-memory history
+    assert collector.metrics_history[test_name][0].frame == FRAME_DELTA
+    print("  ✅ History and saved file reconstruct the kept samples")
+
+
+if __name__ == "__main__":
+    test_encoder_frames()
+    test_round_trip()
+    test_collector_history_and_save()
+    print("\n✅ Change-only encoding tests passed!")
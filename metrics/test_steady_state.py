@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive Duration Test Script
+Test the batch-means estimate and that the steady-state detector only
+ends tests early on stable throughput
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import math
+import random
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from steady_state import SteadyStateDetector, batch_means_estimate
+from trial_runner import t_critical
+
+
+def feed(detector, rates, latency_ms=None, seed=7, noise=0.01):
+    """Feed one sample per second with pub counters growing at the given rates"""
+    rng = random.Random(seed)
+    pub = 0.0
+    lat_sum = lat_count = 0.0
+    detector.observe(0.0, [{'name': 'pub', 'value': 0}])
+    for second, rate in enumerate(rates, start=1):
+        pub += rate * (1 + rng.uniform(-noise, noise))
+        metrics = [{'name': 'pub', 'value': pub, 'labels': {'client': '1'}}]
+        if latency_ms is not None:
+            lat_count += 100
+            lat_sum += 100 * latency_ms * (1 + rng.uniform(-noise, noise))
+            metrics += [{'name': 'e2e_latency_sum', 'value': lat_sum},
+                        {'name': 'e2e_latency_count', 'value': lat_count}]
+        detector.observe(float(second), metrics)
+        if detector.converged:
+            return second
+    return None
+
+
+def test_batch_means_estimate():
+    """Batch means against hand-computed intervals"""
+    print("Testing batch-means estimate...")
+    assert batch_means_estimate([1, 2, 3, 4]) is None  # fewer than 5 batches
+
+    estimate = batch_means_estimate(list(range(1, 11)))  # 10 batches of one sample
+    std = math.sqrt(sum((x - 5.5) ** 2 for x in range(1, 11)) / 9)
+    assert estimate.mean == 5.5 and estimate.samples == 10
+    assert abs(estimate.half_width - t_critical(9) * std / math.sqrt(10)) < 1e-12
+
+    # 25 samples -> 12 batches of 2, the oldest sample is dropped
+    estimate = batch_means_estimate([100.0] + [1.0, 3.0] * 12)
+    assert estimate.mean == 2.0 and estimate.half_width == 0.0 and estimate.samples == 25
+
+    constant = batch_means_estimate([50.0] * 40)
+    assert constant.relative_half_width == 0.0
+    assert math.isinf(batch_means_estimate([0.0] * 10).relative_half_width)
+    print("  ✅ Intervals match")
+
+
+def test_stable_rate_converges():
+    """A stable rate (with latency) reaches steady state and converges"""
+    print("Testing stable rate...")
+    detector = SteadyStateDetector(tolerance=0.05)
+    # Ramp up for 10 s, then hold 1000 msg/s
+    rates = [100 * i for i in range(1, 11)] + [1000] * 200
+    converged = feed(detector, rates, latency_ms=10.0)
+    assert converged is not None and detector.converged
+    assert detector.steady_at is not None and detector.steady_at >= 10
+    assert abs(detector.estimates['throughput'].mean - 1000) < 20
+    assert abs(detector.estimates['latency'].mean - 10) < 0.5
+    assert detector.estimates['throughput'].relative_half_width < 0.05
+
+    # min_duration keeps the test running even once the estimate is tight
+    detector = SteadyStateDetector(tolerance=0.05, min_duration=1000)
+    assert feed(detector, [1000] * 200) is None and detector.steady_index is not None
+    print("  ✅ Converged at {}s".format(converged))
+
+
+def test_ramping_rate_never_converges():
+    """A rate that keeps ramping never reaches steady state"""
+    print("Testing ramping rate...")
+    detector = SteadyStateDetector(tolerance=0.05)
+    assert feed(detector, [100 * 1.05 ** i for i in range(200)]) is None
+    assert detector.steady_index is None and not detector.converged
+    assert detector.describe() == "暂无稳态估计"
+    print("  ✅ Ramp never converges")
+
+
+def test_connection_only_never_stops():
+    """A test without message throughput is never ended early"""
+    print("Testing connection-only test...")
+    detector = SteadyStateDetector(tolerance=0.05)
+    for second in range(300):
+        detector.observe(float(second), [{'name': 'connect_succ', 'value': min(second * 10, 1000)},
+                                         {'name': 'pub', 'value': 0}])
+    assert not detector.converged and detector.steady_index is None
+    assert detector.throughput and all(rate == 0 for rate in detector.throughput)
+    print("  ✅ Zero throughput never stops early")
+
+
+if __name__ == "__main__":
+    test_batch_means_estimate()
+    test_stable_rate_converges()
+    test_ramping_rate_never_converges()
+    test_connection_only_never_stops()
+    print("\n✅ Adaptive duration tests passed!")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binary Time Series Store Test Script
+Test writing and reading .cmts files, the wide frame used by reports
+and recovery of files that were never closed or were cut off mid-write
+Author: Jaxon
+Date: 2025-10-19
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+# Add current directory to Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from series_codec import series_key
+from timeseries_store import RESOURCE_KEYS, TimeSeriesStore, TimeSeriesWriter, is_store_file
+
+START = 1760000000.0
+SAMPLES = 7
+
+
+def sample_metrics(i):
+    """recv on two clients, a histogram bucket, and a series that disappears after sample 2"""
+    metrics = [
+        {'name': 'recv', 'value': i, 'labels': {'client': '1'}, 'metric_type': 'counter'},
+        {'name': 'recv', 'value': 2 * i, 'labels': {'client': '2'}, 'metric_type': 'counter'},
+        {'name': 'e2e_latency_bucket', 'value': i, 'labels': {'le': '10'}},
+    ]
+    if i < 3:
+        metrics.append({'name': 'connection_idle', 'value': 7, 'labels': {}})
+    return metrics
+
+
+def values_of(metrics):
+    return {series_key(metric): float(metric['value']) for metric in metrics}
+
+
+def write_store(path, header_size=256, flush_each=False):
+    """Write SAMPLES samples, returns the file size after each flushed sample"""
+    writer = TimeSeriesWriter(path, 'Store Test', 9091, keyframe_interval=3, header_size=header_size)
+    sizes = []
+    for i in range(SAMPLES):
+        writer.append(START + i, sample_metrics(i), {'cpu_percent': 10 + i, 'memory_percent': None})
+        if flush_each:
+            writer.flush()
+            sizes.append(os.path.getsize(path))
+    return writer, sizes
+
+
+def test_write_read_round_trip():
+    """Every sample reads back with its metrics, labels and resources"""
+    print("Testing write/read round trip...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'continuous_metrics_store_test.cmts')
+        writer, _ = write_store(path)  # 256-byte header forces the header to grow
+        writer.close()
+        assert is_store_file(path) and not is_store_file(path + '.json')
+
+        store = TimeSeriesStore(path)
+        assert store.test_name == 'Store Test' and store.port == 9091
+        assert store.header_size > 256
+        points = list(store.iter_points())
+        assert len(points) == SAMPLES == len(store.points())
+        for i, point in enumerate(points):
+            assert values_of(point['metrics']) == values_of(sample_metrics(i)), "sample {}".format(i)
+            assert point['system_resources'] == {'cpu_percent': 10.0 + i}
+            assert point['test_name'] == 'Store Test' and point['performance_stats']['total_metrics'] == len(point['metrics'])
+        recv = [m for m in points[0]['metrics'] if m['name'] == 'recv'][0]
+        assert recv['labels'] == {'client': '1'} and recv['metric_type'] == 'counter'
+
+        # Random access and time windows start from the nearest keyframe
+        assert values_of(store.points()[5]['metrics']) == values_of(sample_metrics(5))
+        window = list(store.iter_points(START + 4, START + 5))
+        assert [values_of(point['metrics']) for point in window] == [values_of(sample_metrics(i)) for i in (4, 5)]
+        assert list(store.iter_points(START + 100)) == []
+    print("  ✅ Samples round-trip")
+
+
+def test_wide_frame():
+    """wide_frame sums labels, drops buckets, zeroes removed series and keeps resources"""
+    print("Testing wide frame...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'continuous_metrics_store_test.cmts')
+        writer, _ = write_store(path)
+        writer.close()
+
+        wide, resources = TimeSeriesStore(path).wide_frame()
+        assert sorted(wide.columns) == ['connection_idle', 'recv']
+        assert wide.index.tolist() == [START + i for i in range(SAMPLES)]
+        assert wide['recv'].tolist() == [3.0 * i for i in range(SAMPLES)]
+        assert wide['connection_idle'].tolist() == [7.0, 7.0, 7.0, 0.0, 0.0, 0.0, 0.0]
+        assert list(resources.columns) == list(RESOURCE_KEYS)
+        assert resources['cpu_percent'].tolist() == [10.0 + i for i in range(SAMPLES)]
+        assert resources['memory_percent'].isna().all()
+
+        # A store with no samples gives empty frames
+        empty_path = os.path.join(tmp_dir, 'empty.cmts')
+        TimeSeriesWriter(empty_path, 'Empty', 9090).close()
+        wide, resources = TimeSeriesStore(empty_path).wide_frame()
+        assert wide.empty and list(resources.columns) == list(RESOURCE_KEYS)
+    print("  ✅ Wide frame matches the samples")
+
+
+def test_unclosed_and_truncated_files():
+    """Files never closed, or cut off inside a record, read back up to the last complete sample"""
+    print("Testing recovery of unclosed and truncated files...")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'continuous_metrics_store_test.cmts')
+        writer, sizes = write_store(path, flush_each=True)
+
+        # Never closed: everything flushed so far is readable, including series added later
+        store = TimeSeriesStore(path)
+        assert len(store.points()) == SAMPLES
+        assert values_of(list(store.iter_points())[-1]['metrics']) == values_of(sample_metrics(SAMPLES - 1))
+
+        # Cut off a few bytes into the next sample's records: the partial record is ignored
+        for kept in (1, 3, 5):
+            cut_path = os.path.join(tmp_dir, 'cut_{}.cmts'.format(kept))
+            shutil.copyfile(path, cut_path)
+            with open(cut_path, 'r+b') as f:
+                f.truncate(sizes[kept - 1] + 5)
+            store = TimeSeriesStore(cut_path)
+            points = list(store.iter_points())
+            assert len(points) == kept, "kept {} got {}".format(kept, len(points))
+            assert [values_of(point['metrics']) for point in points] == \
+                [values_of(sample_metrics(i)) for i in range(kept)]
+            wide, _ = store.wide_frame()
+            assert wide['recv'].tolist() == [3.0 * i for i in range(kept)]
+        writer.close()
+
+        # Header only (crashed before the first sample), and a file cut inside the header
+        header_path = os.path.join(tmp_dir, 'header_only.cmts')
+        TimeSeriesWriter(header_path, 'Header', 9090).flush()
+        assert list(TimeSeriesStore(header_path).iter_points()) == []
+        broken_path = os.path.join(tmp_dir, 'broken.cmts')
+        with open(path, 'rb') as src, open(broken_path, 'wb') as dst:
+            dst.write(src.read(8))
+        try:
+            TimeSeriesStore(broken_path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("a file cut inside the header must be rejected")
+    print("  ✅ Unclosed and truncated files recover")
+
+
+if __name__ == "__main__":
+    test_write_read_round_trip()
+    test_wide_frame()
+    test_unclosed_and_truncated_files()
+    print("\n✅ Time series store tests passed!")
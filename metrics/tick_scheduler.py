@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+采集周期调度
+按单调时钟上的绝对截止时间 (启动时刻 + n × 间隔) 触发采集, 抓取和解析耗时不会累积成漂移;
+某次采集超过一个周期时跳过错过的截止时间并记录错过的周期数。
+每次触发给出一个时间戳 (单调时钟 + 由单调时钟推算的墙钟时间), 同一次抓取的所有指标共用它,
+长时间浸泡测试中系统时钟被调整也不会影响速率计算
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator
+
+MAX_SLEEP = 0.5  # 单次休眠上限 (秒), 保证停止标志能及时生效
+
+
+@dataclass(frozen=True)
+class ScrapeStamp:
+    """一次抓取的时间戳"""
+    monotonic: float  # time.monotonic()
+    wall: float  # Unix 时间戳, 由启动时的墙钟时间加单调时钟增量推算
+
+    @classmethod
+    def now(cls) -> 'ScrapeStamp':
+        """不经调度器的单次抓取时间戳"""
+        return cls(time.monotonic(), time.time())
+
+    def isoformat(self) -> str:
+        return datetime.fromtimestamp(self.wall).isoformat()
+
+
+@dataclass(frozen=True)
+class Tick:
+    """一次周期触发"""
+    index: int  # 自启动以来的周期序号 (错过的周期也计数)
+    stamp: ScrapeStamp
+    lateness: float  # 实际触发时刻晚于截止时间的秒数
+    missed: int  # 与上一次触发之间错过的周期数
+
+
+class TickScheduler:
+    """按绝对截止时间触发的周期调度器, 在采集线程中迭代使用"""
+
+    def __init__(self, interval: float, is_running: Callable[[], bool] = lambda: True):
+        """
+        Args:
+            interval: 采集间隔(秒)
+            is_running: 返回 False 时停止迭代
+        """
+        if interval <= 0:
+            raise ValueError(f"采集间隔必须大于 0: {interval}")
+        self.interval = interval
+        self.is_running = is_running
+        self.ticks = 0  # 已触发次数
+        self.missed = 0  # 累计错过的周期数
+        self.max_lateness = 0.0
+        self._wall_offset = time.time() - time.monotonic()
+
+    def stamp(self) -> ScrapeStamp:
+        """当前时刻的时间戳"""
+        now = time.monotonic()
+        return ScrapeStamp(now, now + self._wall_offset)
+
+    def __iter__(self) -> Iterator[Tick]:
+        start = time.monotonic()
+        index = 0
+        while self.is_running():
+            deadline = start + index * self.interval
+            remaining = deadline - time.monotonic()
+            while remaining > 0:
+                time.sleep(min(remaining, MAX_SLEEP))
+                if not self.is_running():
+                    return
+                remaining = deadline - time.monotonic()
+
+            stamp = self.stamp()
+            # 上一次采集超过一个周期: 跳过已经错过的截止时间, 不连续补采
+            missed = int((stamp.monotonic - deadline) // self.interval)
+            if missed > 0:
+                index += missed
+                deadline += missed * self.interval
+                self.missed += missed
+            lateness = stamp.monotonic - deadline
+            self.max_lateness = max(self.max_lateness, lateness)
+            self.ticks += 1
+            yield Tick(index, stamp, lateness, missed)
+            index += 1
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+持续指标二进制时间序列存储 (.cmts)
+文件由固定大小的文件头 (含序列字典) 和定长记录 (时间戳, 序列ID, 值) 组成,
+采集时只追加记录, 读取时通过 numpy.memmap 按需访问, 长时间压测的大文件也可以随机读取任意时间窗口
+
+记录类型:
+- 采样标记: 序列ID为 SAMPLE_ID, 值为 1 表示关键帧 (其后写入全部序列), 0 表示增量帧
+- 数据记录: 增量帧只写入值发生变化的序列, 值为 NaN 表示序列已消失
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import json
+import os
+import struct
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from series_codec import DEFAULT_KEYFRAME_INTERVAL, series_key
+
+STORE_SUFFIX = ".cmts"
+STORE_MAGIC = b"EMQTTS01"
+STORE_VERSION = 1
+
+# 定长记录: float64 时间戳(秒) + uint32 序列ID + float64 值, 紧凑排列共 20 字节
+RECORD_DTYPE = np.dtype([('ts', '<f8'), ('sid', '<u4'), ('value', '<f8')])
+
+# 采样标记的序列ID
+SAMPLE_ID = 0xFFFFFFFF
+
+# 文件头默认预留大小, 序列字典超出时整体重写并加倍
+DEFAULT_HEADER_SIZE = 64 * 1024
+_PREFIX = struct.Struct('<8sII')  # magic, 文件头大小, 文件头JSON长度
+
+# 系统资源作为特殊序列保存
+RESOURCE_SERIES = '__resource__'
+RESOURCE_KEYS = ('cpu_percent', 'memory_percent', 'disk_percent', 'load_percent', 'bench_cpu_percent',
+                 'bench_cpu_seconds', 'bench_rss_bytes', 'bench_fds', 'bench_threads', 'bench_ctx_switches',
+                 'bench_sockets')
+
+# 查找关键帧时每次向前扫描的记录数
+_SCAN_STEP = 64 * 1024
+_FRAME_CHUNK = 1024 * 1024  # 构建宽表时每块处理的记录数
+
+
+def is_store_file(file_path: str) -> bool:
+    """是否为二进制时间序列文件"""
+    return str(file_path).endswith(STORE_SUFFIX)
+
+
+class TimeSeriesWriter:
+    """追加写入二进制时间序列文件"""
+
+    def __init__(self, file_path: str, test_name: str, port: int,
+                 keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL,
+                 header_size: int = DEFAULT_HEADER_SIZE):
+        self.file_path = file_path
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.header_size = header_size
+        self.samples = 0
+        self._meta = {
+            'version': STORE_VERSION,
+            'test_name': test_name,
+            'port': port,
+            'created_at': datetime.now().isoformat(),
+            'keyframe_interval': self.keyframe_interval,
+            'series': []
+        }
+        self._series_ids: Dict[str, int] = {}
+        self._last_values: Dict[int, float] = {}
+        self._header_dirty = True
+
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        self._file = open(file_path, 'w+b')
+        self._write_header()
+
+    def _series_id(self, key: str, info: Dict[str, Any]) -> int:
+        sid = self._series_ids.get(key)
+        if sid is None:
+            sid = self._series_ids[key] = len(self._meta['series'])
+            self._meta['series'].append(info)
+            self._header_dirty = True
+        return sid
+
+    def append(self, timestamp: float, metrics: List[Dict[str, Any]],
+               system_resources: Optional[Dict[str, Any]] = None):
+        """
+        追加一次采集
+
+        Args:
+            timestamp: 采集时间 (Unix 秒)
+            metrics: 完整指标列表
+            system_resources: 系统资源使用率
+        """
+        values: Dict[int, float] = {}
+        for metric in metrics:
+            try:
+                value = float(metric.get('value', 0))
+            except (TypeError, ValueError):
+                continue
+            sid = self._series_id(series_key(metric), {
+                'name': metric.get('name', ''),
+                'labels': metric.get('labels') or {},
+                'help_text': metric.get('help_text', ''),
+                'metric_type': metric.get('metric_type', '')
+            })
+            values[sid] = value
+        for key in RESOURCE_KEYS:
+            value = (system_resources or {}).get(key)
+            if value is not None:
+                labels = {'resource': key}
+                sid = self._series_id(series_key({'name': RESOURCE_SERIES, 'labels': labels}),
+                                      {'name': RESOURCE_SERIES, 'labels': labels})
+                values[sid] = float(value)
+
+        keyframe = self.samples % self.keyframe_interval == 0
+        if keyframe:
+            changed = values
+        else:
+            changed = {sid: value for sid, value in values.items() if self._last_values.get(sid) != value}
+        removed = [sid for sid in self._last_values if sid not in values]
+
+        records = np.empty(1 + len(changed) + len(removed), dtype=RECORD_DTYPE)
+        records['ts'] = timestamp
+        records[0] = (timestamp, SAMPLE_ID, 1.0 if keyframe else 0.0)
+        if changed:
+            records['sid'][1:1 + len(changed)] = list(changed.keys())
+            records['value'][1:1 + len(changed)] = list(changed.values())
+        if removed:
+            records['sid'][1 + len(changed):] = removed
+            records['value'][1 + len(changed):] = np.nan
+
+        if self._header_dirty:
+            self._write_header()
+        self._file.write(records.tobytes())
+        self._last_values = values
+        self.samples += 1
+
+    def _write_header(self):
+        """在文件开头原地重写文件头, 序列字典超出预留空间时加倍预留空间"""
+        payload = json.dumps(self._meta, ensure_ascii=False).encode('utf-8')
+        if _PREFIX.size + len(payload) > self.header_size:
+            self._grow_header(_PREFIX.size + len(payload))
+        header = _PREFIX.pack(STORE_MAGIC, self.header_size, len(payload)) + payload
+        end = self._file.seek(0, os.SEEK_END)
+        self._file.seek(0)
+        self._file.write(header.ljust(self.header_size, b' '))
+        self._file.seek(max(end, self.header_size))
+        self._header_dirty = False
+
+    def _grow_header(self, required: int):
+        """扩大文件头: 把已写入的记录整体后移"""
+        old_size = self.header_size
+        while self.header_size < required:
+            self.header_size *= 2
+        self._file.flush()
+        self._file.seek(old_size)
+        records = self._file.read()
+        self._file.seek(self.header_size)
+        self._file.write(records)
+        self._file.truncate()
+
+    def flush(self):
+        if self._header_dirty:
+            self._write_header()
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class StorePoints(Sequence):
+    """按需从二进制文件重建数据点的只读序列 (不一次性加载)"""
+
+    def __init__(self, store: 'TimeSeriesStore'):
+        self._store = store
+
+    def __len__(self) -> int:
+        return len(self._store.sample_index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        ts = float(self._store.timestamps[index])
+        return next(self._store.iter_points(ts, ts))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._store.iter_points()
+
+
+class TimeSeriesStore:
+    """通过 numpy.memmap 读取二进制时间序列文件"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, 'rb') as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size:
+                raise ValueError(f"不是有效的时间序列文件: {file_path}")
+            magic, self.header_size, payload_size = _PREFIX.unpack(prefix)
+            if magic != STORE_MAGIC:
+                raise ValueError(f"不是有效的时间序列文件: {file_path}")
+            self.meta: Dict[str, Any] = json.loads(f.read(payload_size).decode('utf-8'))
+
+        self.series: List[Dict[str, Any]] = self.meta.get('series', [])
+        self.test_name: str = self.meta.get('test_name', '')
+        self.port = self.meta.get('port', 0)
+
+        # 忽略写入中断留下的不完整记录
+        count = max(0, (os.path.getsize(file_path) - self.header_size) // RECORD_DTYPE.itemsize)
+        if count:
+            self.records = np.memmap(file_path, dtype=RECORD_DTYPE, mode='r',
+                                     offset=self.header_size, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=RECORD_DTYPE)
+        self._sample_index: Optional[np.ndarray] = None
+
+    @property
+    def sample_index(self) -> np.ndarray:
+        """各采样标记的记录下标"""
+        if self._sample_index is None:
+            self._sample_index = np.flatnonzero(self.records['sid'] == SAMPLE_ID)
+        return self._sample_index
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """各次采集的时间戳 (秒)"""
+        return np.asarray(self.records['ts'][self.sample_index])
+
+    def points(self) -> StorePoints:
+        return StorePoints(self)
+
+    def _keyframe_before(self, index: int) -> int:
+        """下标 index 处或之前最近的关键帧标记位置"""
+        sid = self.records['sid']
+        value = self.records['value']
+        hi = index + 1
+        while hi > 0:
+            lo = max(0, hi - _SCAN_STEP)
+            hits = np.flatnonzero((sid[lo:hi] == SAMPLE_ID) & (value[lo:hi] == 1.0))
+            if hits.size:
+                return lo + int(hits[-1])
+            hi = lo
+        return 0
+
+    def iter_points(self, start_ts: Optional[float] = None, end_ts: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        重建 [start_ts, end_ts] 时间窗口内的完整数据点, 只读取窗口前最近的关键帧到窗口末尾的记录
+
+        Returns:
+            与持续指标JSON文件相同格式的数据点
+        """
+        if not len(self.records):
+            return
+        ts_column = self.records['ts']
+        first = 0 if start_ts is None else int(np.searchsorted(ts_column, start_ts, side='left'))
+        last = len(self.records) if end_ts is None else int(np.searchsorted(ts_column, end_ts, side='right'))
+        if first >= last:
+            return
+        begin = self._keyframe_before(first)
+
+        state: Dict[int, float] = {}
+        current_ts: Optional[float] = None
+        for chunk_start in range(begin, last, _SCAN_STEP):
+            chunk = np.asarray(self.records[chunk_start:min(last, chunk_start + _SCAN_STEP)])
+            for ts, sid, value in zip(chunk['ts'].tolist(), chunk['sid'].tolist(), chunk['value'].tolist()):
+                if sid == SAMPLE_ID:
+                    if current_ts is not None and (start_ts is None or current_ts >= start_ts):
+                        yield self._build_point(current_ts, state)
+                    current_ts = ts
+                    if value == 1.0:
+                        state = {}
+                elif value != value:  # NaN: 序列已消失
+                    state.pop(sid, None)
+                else:
+                    state[sid] = value
+        if current_ts is not None and (start_ts is None or current_ts >= start_ts):
+            yield self._build_point(current_ts, state)
+
+    def _build_point(self, ts: float, state: Dict[int, float]) -> Dict[str, Any]:
+        metrics = []
+        resources: Dict[str, Any] = {}
+        for sid, value in state.items():
+            info = self.series[sid]
+            if info['name'] == RESOURCE_SERIES:
+                resources[info['labels'].get('resource', '')] = value
+                continue
+            metrics.append({
+                'name': info['name'],
+                'value': value,
+                'labels': info.get('labels', {}),
+                'help_text': info.get('help_text', ''),
+                'metric_type': info.get('metric_type', '')
+            })
+        return {
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'test_name': self.test_name,
+            'port': self.port,
+            'metrics': metrics,
+            'performance_stats': {'total_metrics': len(metrics)},
+            'system_resources': resources
+        }
+
+    def wide_frame(self) -> Tuple[Any, Any]:
+        """
+        向量化构建报告使用的宽表 (与 AnalysisFrame 解析JSON文件的结果结构一致)
+
+        Returns:
+            (指标宽表: 索引为时间戳, 列为指标名, 同名不同标签的值相加并忽略直方图桶,
+             系统资源表: 索引为时间戳, 列为 RESOURCE_KEYS 中的资源项)
+        """
+        import pandas as pd
+
+        sample_ts = pd.Index(np.unique(self.timestamps), name='ts')
+        # 按固定大小的记录块在 memmap 上聚合, 不把整个文件读入内存; 直方图桶序列不参与宽表, 直接跳过
+        wanted = np.array([sid for sid, info in enumerate(self.series) if not info['name'].endswith('_bucket')],
+                          dtype=RECORD_DTYPE['sid'])
+        parts = []
+        for lo in range(0, len(self.records), _FRAME_CHUNK):
+            chunk = self.records[lo:lo + _FRAME_CHUNK]
+            keep = np.isin(chunk['sid'], wanted)
+            if not keep.any():
+                continue
+            # 消失的序列记为 -inf, 前向填充后再置 0, 避免被填充成消失前的旧值
+            values = chunk['value'][keep]
+            values = np.where(np.isnan(values), -np.inf, values)
+            part = pd.DataFrame({'ts': chunk['ts'][keep], 'sid': chunk['sid'][keep], 'value': values})
+            parts.append(part.groupby(['ts', 'sid'], sort=False)['value'].last())
+        if not parts:
+            return (pd.DataFrame(index=sample_ts, dtype=float),
+                    pd.DataFrame(index=sample_ts, columns=list(RESOURCE_KEYS), dtype=float))
+
+        per_series = pd.concat(parts).groupby(level=['ts', 'sid'], sort=True).last().unstack('sid')
+        per_series = per_series.reindex(sample_ts).ffill().replace(-np.inf, np.nan)
+
+        names = {sid: self.series[sid]['name'] for sid in per_series.columns}
+        resource_sids = {sid: self.series[sid]['labels'].get('resource') for sid, name in names.items()
+                         if name == RESOURCE_SERIES}
+        metric_sids = [sid for sid, name in names.items()
+                       if name != RESOURCE_SERIES and not name.endswith('_bucket')]
+
+        metric_values = per_series[metric_sids].fillna(0.0)
+        metric_values.columns = [names[sid] for sid in metric_sids]
+        wide = metric_values.T.groupby(level=0).sum().T.astype(float)
+        wide.columns.name = 'name'
+
+        resources = per_series[list(resource_sids)].rename(columns=resource_sids)
+        resources = resources.reindex(columns=list(RESOURCE_KEYS)).astype(float)
+        return wide, resources
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+重复试验
+把每个选中的测试重复执行 N 次 (可按轮次交错执行不同测试, 减少服务器状态在相邻试验间的相关性),
+按试验汇总吞吐量和延迟的均值、标准差、t 分布置信区间和变异系数,
+变异系数过大时给出使置信区间达到目标精度所需的试验次数
+作者: Jaxon
+日期: 2025-10-19
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from regression import METRICS, continuous_samples
+from report_cache import ReportCache
+
+# 双侧 95% t 分布临界值 (自由度 -> t), 未列出的自由度取较小的相邻值, 大于 30 时用正态近似
+_T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+         10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042}
+_Z_95 = 1.960
+
+DEFAULT_MAX_CV = 0.10  # 变异系数超过该值时建议增加试验次数
+DEFAULT_PRECISION = 0.05  # 目标精度: 置信区间半宽不超过均值的 5%
+
+
+def t_critical(df: int) -> float:
+    """双侧 95% t 分布临界值"""
+    if df < 1:
+        return math.nan
+    if df > 30:
+        return _Z_95
+    return _T_95[max(key for key in _T_95 if key <= df)]
+
+
+def build_trial_schedule(tasks: Sequence[Dict[str, Any]], trials: int, interleave: bool = True) -> List[Dict[str, Any]]:
+    """
+    生成试验执行顺序
+
+    Args:
+        tasks: 选中的测试任务
+        trials: 每个测试的重复次数
+        interleave: True 按轮次交错 (A B C A B C), False 连续重复 (A A B B C C)
+
+    Returns:
+        任务副本列表, 带 trial (从 1 开始) 和 trials 字段
+    """
+    trials = max(1, trials)
+    if interleave:
+        order = [(task, trial) for trial in range(1, trials + 1) for task in tasks]
+    else:
+        order = [(task, trial) for task in tasks for trial in range(1, trials + 1)]
+    return [dict(task, trial=trial, trials=trials) for task, trial in order]
+
+
+@dataclass
+class TrialStats:
+    """单个指标在多次试验间的统计"""
+    metric: str
+    values: List[float]
+    mean: float = math.nan
+    std: float = math.nan  # 样本标准差
+    ci_low: float = math.nan
+    ci_high: float = math.nan
+    cv: float = math.nan  # 变异系数 std / mean
+    recommended_trials: Optional[int] = None  # 达到目标精度所需的试验次数, 已足够时为 None
+
+    @property
+    def label(self) -> str:
+        return METRICS[self.metric][0]
+
+    @property
+    def unit(self) -> str:
+        return METRICS[self.metric][1]
+
+    @property
+    def n(self) -> int:
+        return len(self.values)
+
+
+def summarize_trials(metric: str, values: Sequence[float], max_cv: float = DEFAULT_MAX_CV,
+                     precision: float = DEFAULT_PRECISION) -> TrialStats:
+    """
+    汇总单个指标的试验结果
+
+    Args:
+        metric: 'throughput' 或 'latency'
+        values: 每次试验的值 (试验内逐区间样本的中位数)
+        max_cv: 变异系数上限, 超过时给出建议试验次数
+        precision: 目标精度 (置信区间半宽 / 均值)
+
+    Returns:
+        统计结果
+    """
+    data = np.asarray([value for value in values if not math.isnan(value)], dtype=float)
+    stats = TrialStats(metric, [float(value) for value in data])
+    if len(data) == 0:
+        return stats
+    stats.mean = float(data.mean())
+    if len(data) < 2:
+        return stats
+
+    stats.std = float(data.std(ddof=1))
+    half_width = t_critical(len(data) - 1) * stats.std / math.sqrt(len(data))
+    stats.ci_low, stats.ci_high = stats.mean - half_width, stats.mean + half_width
+    if stats.mean:
+        stats.cv = stats.std / abs(stats.mean)
+        if stats.cv > max_cv:
+            # 以正态近似估算: n = (z * cv / precision)^2
+            stats.recommended_trials = max(len(data) + 1, math.ceil((_Z_95 * stats.cv / precision) ** 2))
+    return stats
+
+
+@dataclass
+class TrialSet:
+    """单个测试的全部试验"""
+    test_name: str
+    trials: List[Dict[str, Any]] = field(default_factory=list)  # 每次试验: trial, success, throughput, latency, continuous_file
+    stats: Dict[str, TrialStats] = field(default_factory=dict)
+
+    @property
+    def successful(self) -> int:
+        return sum(1 for trial in self.trials if trial['success'])
+
+
+class TrialRecorder:
+    """记录各测试的试验结果并汇总"""
+
+    def __init__(self, max_cv: float = DEFAULT_MAX_CV, precision: float = DEFAULT_PRECISION,
+                 cache: Optional[ReportCache] = None):
+        self.max_cv = max_cv
+        self.precision = precision
+        self.cache = cache
+        self.tests: Dict[str, TrialSet] = {}
+
+    def record(self, test_name: str, trial: int, success: bool, continuous_file: Optional[str]):
+        """记录一次试验, 吞吐量和延迟取持续指标逐区间样本的中位数"""
+        entry = {'trial': trial, 'success': success, 'continuous_file': continuous_file,
+                 'throughput': math.nan, 'latency': math.nan}
+        samples = continuous_samples(continuous_file, self.cache) if success else None
+        if samples is not None:
+            for metric in METRICS:
+                values = samples.get(metric)
+                if len(values):
+                    entry[metric] = float(np.median(values))
+        self.tests.setdefault(test_name, TrialSet(test_name)).trials.append(entry)
+
+    def summarize(self) -> Dict[str, TrialSet]:
+        """汇总各测试成功试验的统计"""
+        for test in self.tests.values():
+            successful = [trial for trial in test.trials if trial['success']]
+            test.stats = {metric: summarize_trials(metric, [trial[metric] for trial in successful],
+                                                   self.max_cv, self.precision)
+                          for metric in METRICS}
+        return self.tests
+
+
+def _format(value: float, digits: int = 2) -> str:
+    return '-' if value is None or math.isnan(value) else f"{value:.{digits}f}"
+
+
+def format_markdown(tests: Optional[Dict[str, TrialSet]], precision: float = DEFAULT_PRECISION) -> str:
+    """重复试验统计的 Markdown 章节内容"""
+    if not tests:
+        return "本次未启用重复试验 (trial_count = 1)。"
+
+    lines = ["| 测试 | 指标 | 成功试验 | 均值 | 标准差 | 95% 置信区间 | 变异系数 | 建议 |",
+             "|------|------|----------|------|--------|--------------|----------|------|"]
+    for test in tests.values():
+        for stats in test.stats.values():
+            if stats.n == 0:
+                continue
+            ci = '-' if math.isnan(stats.ci_low) else f"{stats.ci_low:.2f} ~ {stats.ci_high:.2f}"
+            cv = '-' if math.isnan(stats.cv) else f"{stats.cv * 100:.1f}%"
+            if stats.recommended_trials:
+                advice = f"⚠️ 波动大, 建议 {stats.recommended_trials} 次"
+            elif stats.n < 2:
+                advice = "⏳ 试验不足"
+            else:
+                advice = "✅ 稳定"
+            lines.append(f"| {test.test_name} | {stats.label} ({stats.unit}) | {test.successful}/{len(test.trials)} | "
+                         f"{_format(stats.mean)} | {_format(stats.std)} | {ci} | {cv} | {advice} |")
+    lines += ["", f"*每次试验取逐区间样本的中位数; 置信区间按 t 分布计算; 变异系数过大时"
+                  f"给出使置信区间半宽不超过均值 {precision * 100:.0f}% 所需的试验次数。*"]
+    return "\n".join(lines)